@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmark of the model backends with HiGHS.
+
+Times data load, build, solve, result extraction and aggregation of each
+backend on each dataset, and stores the results as JSON with machine info.
+
+Usage:
+    # Toy and minimal core datasets, all backends
+    python scripts/benchmark.py --output benchmark.json
+
+    # ESTD dataset with the HiGHS interior point solver
+    python scripts/benchmark.py --datasets estd --backends xarray highs --solver ipm --output estd.json
+
+    # Synthetic dataset of 300 technologies on 24 typical days
+    python scripts/benchmark.py --datasets synthetic --backends highs --synthetic n_technologies=300 n_typical_days=24
+
+    # Compare with a baseline (exit code 1 on regression)
+    python scripts/benchmark.py --compare baseline.json benchmark.json
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from energyscope.benchmark import (
+    BACKENDS, DATASETS, compare_results, format_report, load_results, results_table, run_benchmark, save_results
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the model backends with HiGHS')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS, help='Backends to run')
+    parser.add_argument('--datasets', nargs='+', choices=DATASETS, default=['toy', 'minimal'],
+                        help='Datasets to run on (estd takes tens of minutes per backend)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per combination (fastest time kept)')
+    parser.add_argument('--solver', choices=['simplex', 'ipm', 'pdlp'], help='HiGHS algorithm')
+    parser.add_argument('--time-limit', type=float, help='HiGHS time limit per solve [s]')
+    parser.add_argument('--synthetic', nargs='+', metavar='NAME=VALUE', default=[],
+                        help='Options of the synthetic dataset (see energyscope.synthetic.create_synthetic_dataset)')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='Compare two result files instead of running the benchmark')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative slowdown reported as regression')
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = (load_results(path) for path in args.compare)
+        comparison = compare_results(baseline, current, threshold=args.threshold)
+        print(format_report(comparison, baseline, current))
+        return 1 if comparison['regression'].any() else 0
+
+    solver_options = {}
+    if args.solver:
+        solver_options['solver'] = args.solver
+    if args.time_limit:
+        solver_options['time_limit'] = args.time_limit
+
+    synthetic_options = {}
+    for option in args.synthetic:
+        name, value = option.split('=', 1)
+        synthetic_options[name] = float(value) if '.' in value else int(value)
+
+    print("=" * 70)
+    print("BENCHMARK")
+    print("=" * 70)
+    results = run_benchmark(args.backends, args.datasets, repeat=args.repeat, solver_options=solver_options,
+                            synthetic_options=synthetic_options, verbose=True)
+    print()
+    print(results_table(results).drop(columns='reason').to_string(float_format='{:.3f}'.format))
+    if args.output:
+        save_results(results, args.output)
+        print(f"\n✓ Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,566 @@
+"""
+End-to-end benchmark of the model backends.
+
+Each run times the five stages of a model run (data load, build, solve, result
+extraction and aggregation of the Result) for one backend (AMPL, loop-based linopy,
+xarray linopy, PyOptInterface, direct HiGHS) on one dataset (toy, minimal
+core, ESTD core, or a synthetic dataset of chosen size), always with HiGHS as
+solver. Results are plain dicts, stored
+as JSON together with the machine they ran on (:func:`save_results`), and two
+result files are compared stage by stage with :func:`compare_results` to catch
+regressions, e.g. before upgrading linopy or HiGHS.
+
+Example:
+    >>> results = run_benchmark(datasets=['toy', 'minimal'])
+    >>> save_results(results, 'benchmark.json')
+    >>> comparison = compare_results(load_results('baseline.json'), results)
+    >>> print(format_report(comparison))
+"""
+
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import time
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+STAGES = ['load', 'build', 'solve', 'extract', 'aggregate']
+DATASETS = ['toy', 'minimal', 'estd', 'synthetic']
+BACKENDS = ['ampl', 'linopy', 'xarray', 'pyoptinterface', 'highs']
+
+# Packages whose versions are stored with the results
+PACKAGES = ['energyscope', 'amplpy', 'linopy', 'xarray', 'pyoptinterface', 'highspy', 'numpy', 'pandas', 'scipy']
+
+# Combinations without a model of the dataset in the backend
+UNSUPPORTED = {
+    ('ampl', 'toy'): "no AMPL formulation of the toy model",
+    ('ampl', 'minimal'): "no AMPL formulation of the minimal core data",
+    ('highs', 'toy'): "the HiGHS backend only builds the core model",
+    ('pyoptinterface', 'minimal'): "create_minimal_core_data lacks the yearly demands and time series "
+                                   "build_full_model reads",
+    ('linopy', 'estd'): "the loop-based model does not complete on the ESTD dataset",
+    ('ampl', 'synthetic'): "synthetic datasets are not written as .dat files",
+    ('linopy', 'synthetic'): "the loop-based model does not complete on datasets of ESTD size",
+}
+
+
+def machine_info() -> Dict[str, Any]:
+    """
+    Description of the machine and software environment of a benchmark.
+
+    Returns:
+        dict: Platform, processor, CPU count, total memory [GB] (None if unknown),
+        Python version and versions of the packages in PACKAGES (None if not installed)
+    """
+    try:
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1e9
+    except (AttributeError, ValueError, OSError):
+        memory = None
+    packages = {}
+    for package in PACKAGES:
+        try:
+            packages[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            packages[package] = None
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'memory_gb': memory,
+        'python': platform.python_version(),
+        'packages': packages,
+    }
+
+
+def ampl_available() -> Optional[str]:
+    """
+    Check that amplpy can start an AMPL process.
+
+    Returns:
+        None if AMPL is available, otherwise the reason why it is not
+    """
+    try:
+        from amplpy import AMPL
+        AMPL().close()
+    except Exception as error:
+        return f"AMPL not available: {error}".strip()
+    return None
+
+
+@contextlib.contextmanager
+def _silenced():
+    """Silence Python output, progress bars and solver (file descriptor 1) output."""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        try:
+            stdout = os.dup(1)
+        except OSError:
+            yield
+            return
+        with open(os.devnull, 'w') as devnull:
+            os.dup2(devnull.fileno(), 1)
+            try:
+                yield
+            finally:
+                os.dup2(stdout, 1)
+                os.close(stdout)
+
+
+def _tabular_parameters(data: dict) -> dict:
+    """Copy of a dict dataset with dict parameters as Series and DataFrame parameters stacked."""
+    parameters = {}
+    for name, value in data['parameters'].items():
+        if isinstance(value, dict):
+            value = pd.Series(value, dtype=float)
+        elif isinstance(value, pd.DataFrame):
+            value = value.stack()
+        parameters[name] = value
+    return {**data, 'parameters': parameters}
+
+
+def _aggregate(result) -> Dict[str, pd.Series]:
+    """
+    Aggregation stage: total of each variable by its first index (technology, resource, ...).
+
+    Stands for the work done on a Result after extraction. energyscope.result.postprocessing
+    is not timed: it needs variables only the AMPL model outputs (Annual_Prod, F_Mult, F_Mult_t, tau).
+    """
+    totals = {}
+    for name, frame in result.variables.items():
+        values = frame.select_dtypes('number').drop(columns='Run', errors='ignore')
+        totals[name] = values.groupby(level=0).sum().sum(axis=1) if values.index.nlevels > 1 else values.sum(axis=1)
+    return totals
+
+
+# ============================================================================
+# STAGES OF EACH BACKEND
+# ============================================================================
+# Each case maps the stages to callables: load() -> data, build(data) -> model,
+# solve(model, options) -> objective, extract(model, data) -> Result,
+# aggregate(result). Stages a backend does not separate are None (their time
+# is included in the next stage).
+
+def _linopy_solve(model, options):
+    model.solve(solver_name='highs', output_flag=False, **options)
+    if model.termination_condition != 'optimal':
+        raise RuntimeError(f"HiGHS did not solve to optimality: {model.termination_condition}")
+    return float(model.objective.value)
+
+
+def _linopy_extract(model, data):
+    from energyscope.linopy_backend.result_parser import parse_linopy_result
+    return parse_linopy_result(model, data)
+
+
+def _linopy_toy_load():
+    from energyscope.linopy_backend.data_loader import create_toy_data
+    return create_toy_data()
+
+
+def _linopy_toy_build(data):
+    from energyscope.linopy_backend.toy_model import build_toy_model
+    return build_toy_model(data)
+
+
+def _minimal_load():
+    from energyscope.linopy_backend.test_data_core import create_minimal_core_data
+    return create_minimal_core_data()
+
+
+def _linopy_core_build(data):
+    from energyscope.linopy_backend.core_model import build_core_model
+    return build_core_model(data)
+
+
+def _xarray_toy_load():
+    from energyscope.linopy_backend.data_loader_xarray import create_toy_data_xarray
+    return create_toy_data_xarray()
+
+
+def _xarray_toy_build(data):
+    from energyscope.linopy_backend.toy_model_xarray import build_toy_model_xarray
+    return build_toy_model_xarray(data)
+
+
+def _xarray_minimal_load():
+    from energyscope.linopy_backend.data_loader_xarray import create_full_dataset_xarray
+    return create_full_dataset_xarray(_tabular_parameters(_minimal_load()))
+
+
+def _xarray_estd_load():
+    from energyscope.linopy_backend.data_loader_xarray import create_full_dataset_xarray
+    return create_full_dataset_xarray()
+
+
+def _xarray_core_build(data):
+    from energyscope.linopy_backend.core_model_xarray import build_core_model_xarray
+    return build_core_model_xarray(data)
+
+
+def _pyoptinterface_toy_load():
+    from energyscope.pyoptinterface_backend.data_loader import create_toy_data
+    return create_toy_data()
+
+
+def _pyoptinterface_toy_solve(data, options):
+    from energyscope.pyoptinterface_backend.toy_model import build_toy_model
+    result = build_toy_model(data, solver='highs', verbose=False)
+    if 'objective' not in result:
+        raise RuntimeError(f"HiGHS did not solve to optimality: {result.get('status')}")
+    return float(result['objective'])
+
+
+def _pyoptinterface_estd_load():
+    from energyscope.pyoptinterface_backend.data_loader import create_full_dataset
+    return create_full_dataset()
+
+
+def _pyoptinterface_build(data):
+    from energyscope.pyoptinterface_backend.parametric import ParametricModel
+    return ParametricModel(data, solver='highs')
+
+
+def _pyoptinterface_solve(model, options):
+    for name, value in options.items():
+        model.model.set_raw_parameter(name, value)
+    model.solve()
+    if np.isnan(model.objective):
+        raise RuntimeError(f"HiGHS did not solve to optimality: {model.result['status']}")
+    return float(model.objective)
+
+
+def _pyoptinterface_extract(model, data):
+    return model.to_result()
+
+
+def _highs_minimal_load():
+    return _tabular_parameters(_minimal_load())
+
+
+def _highs_estd_load():
+    from energyscope.linopy_backend.data_loader_full import create_full_dataset
+    return create_full_dataset()
+
+
+def _synthetic_load(**options):
+    from energyscope.synthetic import create_synthetic_dataset
+    return create_synthetic_dataset(**options)
+
+
+def _xarray_synthetic_load(**options):
+    from energyscope.synthetic import create_synthetic_dataset_xarray
+    return create_synthetic_dataset_xarray(**options)
+
+
+def _highs_build(data):
+    from energyscope.highs_backend import build_core_model_highs
+    return build_core_model_highs(data, verbose=False)
+
+
+def _highs_solve(model, options):
+    import highspy
+    if model.solve(**options) != highspy.HighsModelStatus.kOptimal:
+        raise RuntimeError(f"HiGHS did not solve to optimality: {model.status}")
+    return float(model.objective)
+
+
+def _highs_extract(model, data):
+    from energyscope.highs_backend import parse_highs_result
+    return parse_highs_result(model, data)
+
+
+def _ampl_load():
+    from energyscope.energyscope import Energyscope
+    from energyscope.models import core
+    es = Energyscope(model=core, solver_options={'solver': 'highs'})
+    es._initial_run()
+    return es
+
+
+def _ampl_solve(es, options):
+    if options:
+        es.es_model.set_option('highs_options', ' '.join(f"{name}={value}" for name, value in options.items()))
+    es.es_model.solve()
+    if es.es_model.solve_result_num > 99:
+        raise RuntimeError(f"HiGHS did not solve to optimality: {es.es_model.solve_result}")
+    return float(es.es_model.get_objective('TotalCost').value())
+
+
+def _ampl_extract(es, data):
+    from energyscope.result import parse_result
+    return parse_result(es.es_model, id_run=0)
+
+
+CASES: Dict[tuple, Dict[str, Optional[Callable]]] = {
+    ('ampl', 'estd'): {'load': _ampl_load, 'build': None, 'solve': _ampl_solve, 'extract': _ampl_extract},
+    ('linopy', 'toy'): {'load': _linopy_toy_load, 'build': _linopy_toy_build, 'solve': _linopy_solve,
+                        'extract': _linopy_extract},
+    ('linopy', 'minimal'): {'load': _minimal_load, 'build': _linopy_core_build, 'solve': _linopy_solve,
+                            'extract': _linopy_extract},
+    ('xarray', 'toy'): {'load': _xarray_toy_load, 'build': _xarray_toy_build, 'solve': _linopy_solve,
+                        'extract': _linopy_extract},
+    ('xarray', 'minimal'): {'load': _xarray_minimal_load, 'build': _xarray_core_build, 'solve': _linopy_solve,
+                            'extract': _linopy_extract},
+    ('xarray', 'estd'): {'load': _xarray_estd_load, 'build': _xarray_core_build, 'solve': _linopy_solve,
+                         'extract': _linopy_extract},
+    # build_toy_model builds and solves, and returns no registry to extract a Result from
+    ('pyoptinterface', 'toy'): {'load': _pyoptinterface_toy_load, 'build': None,
+                                'solve': _pyoptinterface_toy_solve, 'extract': None},
+    ('pyoptinterface', 'estd'): {'load': _pyoptinterface_estd_load, 'build': _pyoptinterface_build,
+                                 'solve': _pyoptinterface_solve, 'extract': _pyoptinterface_extract},
+    ('highs', 'minimal'): {'load': _highs_minimal_load, 'build': _highs_build, 'solve': _highs_solve,
+                           'extract': _highs_extract},
+    ('highs', 'estd'): {'load': _highs_estd_load, 'build': _highs_build, 'solve': _highs_solve,
+                        'extract': _highs_extract},
+    # Loaders of the synthetic dataset take the options of create_synthetic_dataset
+    ('xarray', 'synthetic'): {'load': _xarray_synthetic_load, 'build': _xarray_core_build, 'solve': _linopy_solve,
+                              'extract': _linopy_extract},
+    ('pyoptinterface', 'synthetic'): {'load': _synthetic_load, 'build': _pyoptinterface_build,
+                                      'solve': _pyoptinterface_solve, 'extract': _pyoptinterface_extract},
+    ('highs', 'synthetic'): {'load': _synthetic_load, 'build': _highs_build, 'solve': _highs_solve,
+                             'extract': _highs_extract},
+}
+
+
+def run_case(backend: str, dataset: str, solver_options: Optional[dict] = None,
+             synthetic_options: Optional[dict] = None) -> Dict[str, Any]:
+    """
+    Run one backend on one dataset and time each stage.
+
+    Output of the backends is silenced. Errors are recorded in the run instead
+    of being raised, so that one failing backend does not stop a benchmark.
+
+    Args:
+        backend: One of BACKENDS
+        dataset: One of DATASETS
+        solver_options: HiGHS options (e.g. {'solver': 'ipm', 'time_limit': 600})
+        synthetic_options: Sizes and seed of the synthetic dataset (see
+            energyscope.synthetic.create_synthetic_dataset)
+
+    Returns:
+        dict: backend, dataset, status ('ok', 'skipped' or 'failed'), reason (why
+        the run was skipped or failed), stages (seconds per stage; None for
+        stages the backend does not separate or that did not run) and objective
+
+    Raises:
+        ValueError: If the backend or dataset is unknown
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    run = {'backend': backend, 'dataset': dataset, 'status': 'skipped', 'reason': None,
+           'stages': dict.fromkeys(STAGES), 'objective': None}
+    if (backend, dataset) in UNSUPPORTED:
+        run['reason'] = UNSUPPORTED[backend, dataset]
+        return run
+    if backend == 'ampl':
+        run['reason'] = ampl_available()
+        if run['reason']:
+            return run
+
+    case = CASES[backend, dataset]
+    stages = {**case, 'aggregate': _aggregate if case['extract'] else None}
+    data = model = result = None
+    try:
+        for stage in STAGES:
+            if stages[stage] is None:
+                continue
+            with _silenced():
+                t_start = time.perf_counter()
+                if stage == 'load':
+                    options = (synthetic_options or {}) if dataset == 'synthetic' else {}
+                    data = model = stages['load'](**options)
+                elif stage == 'build':
+                    model = stages['build'](data)
+                elif stage == 'solve':
+                    run['objective'] = stages['solve'](model, solver_options or {})
+                elif stage == 'extract':
+                    result = stages['extract'](model, data)
+                else:
+                    stages['aggregate'](result)
+                run['stages'][stage] = time.perf_counter() - t_start
+    except Exception as error:
+        run['status'], run['reason'] = 'failed', f"{stage}: {type(error).__name__}: {error}"
+        return run
+    run['status'] = 'ok'
+    return run
+
+
+def run_benchmark(backends: Optional[List[str]] = None, datasets: Optional[List[str]] = None,
+                  repeat: int = 1, solver_options: Optional[dict] = None,
+                  synthetic_options: Optional[dict] = None, verbose: bool = False) -> Dict[str, Any]:
+    """
+    Benchmark backends on datasets.
+
+    Args:
+        backends: Backends to run (default: all of BACKENDS)
+        datasets: Datasets to run them on (default: all of DATASETS; the ESTD
+            dataset takes tens of minutes per backend with HiGHS, and so can
+            large synthetic ones)
+        repeat: Number of runs of each combination; the fastest time of each
+            stage is kept
+        solver_options: HiGHS options passed to every backend
+        synthetic_options: Sizes and seed of the synthetic dataset (see
+            energyscope.synthetic.create_synthetic_dataset)
+        verbose: Whether to print each run
+
+    Returns:
+        dict: 'created' (ISO timestamp), 'machine' (see machine_info),
+        'solver_options', 'synthetic_options', 'repeat' and 'runs' (list of
+        run_case outputs)
+    """
+    runs = []
+    for dataset in datasets or DATASETS:
+        for backend in backends or BACKENDS:
+            repeats = [run_case(backend, dataset, solver_options, synthetic_options) for _ in range(max(repeat, 1))]
+            run = repeats[0]
+            if run['status'] == 'ok':
+                for stage in STAGES:
+                    times = [r['stages'][stage] for r in repeats if r['stages'][stage] is not None]
+                    run['stages'][stage] = min(times) if times else None
+            runs.append(run)
+            if verbose:
+                _print_run(run)
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'solver_options': solver_options or {},
+        'synthetic_options': synthetic_options or {},
+        'repeat': repeat,
+        'runs': runs,
+    }
+
+
+def _print_run(run: dict) -> None:
+    name = f"{run['backend']:<15} {run['dataset']:<9}"
+    if run['status'] != 'ok':
+        mark = '⚠' if run['status'] == 'failed' else '-'
+        print(f"  {mark} {name} {run['status']}: {run['reason']}")
+        return
+    times = '  '.join(f"{stage} {run['stages'][stage]:.3f}s" for stage in STAGES if run['stages'][stage] is not None)
+    print(f"  ✓ {name} {times}  (objective {run['objective']:.4f})")
+
+
+def save_results(results: Dict[str, Any], path) -> None:
+    """Write benchmark results (output of run_benchmark) to a JSON file."""
+    Path(path).write_text(json.dumps(results, indent=2))
+
+
+def load_results(path) -> Dict[str, Any]:
+    """Read benchmark results written by save_results."""
+    return json.loads(Path(path).read_text())
+
+
+def results_table(results: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Stage times of benchmark results as a table.
+
+    Returns:
+        pd.DataFrame: Indexed by (backend, dataset), with one column per stage,
+        total, objective, status and reason
+    """
+    records = []
+    for run in results['runs']:
+        times = [run['stages'][stage] for stage in STAGES]
+        records.append([run['backend'], run['dataset']] + times + [
+            sum(t for t in times if t is not None) if run['status'] == 'ok' else None,
+            run['objective'], run['status'], run['reason']])
+    table = pd.DataFrame(records, columns=['backend', 'dataset'] + STAGES + ['total', 'objective', 'status', 'reason'])
+    return table.set_index(['backend', 'dataset'])
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.2,
+                    min_time: float = 0.05, objective_tolerance: float = 1e-6) -> pd.DataFrame:
+    """
+    Compare two benchmark results stage by stage.
+
+    A stage is a regression if it is more than `threshold` slower (relative),
+    ignoring stages faster than `min_time` in both results (timer noise). The
+    objectives of a run should not change: an objective differing by more than
+    `objective_tolerance` (relative) is reported on the 'objective' row of the run.
+
+    Args:
+        baseline: Reference results (output of run_benchmark or load_results)
+        current: Results to check
+        threshold: Relative slowdown above which a stage is a regression
+        min_time: Time [s] under which stages are not compared
+        objective_tolerance: Relative tolerance on objectives
+
+    Returns:
+        pd.DataFrame: One row per (backend, dataset, stage) run successfully in
+        both results, plus 'total' and 'objective', with columns baseline,
+        current, ratio (current / baseline) and regression (bool)
+    """
+    before, after = results_table(baseline), results_table(current)
+    both = before.index.intersection(after.index)
+    both = both[(before.loc[both, 'status'] == 'ok').values & (after.loc[both, 'status'] == 'ok').values]
+
+    records = []
+    for key in both:
+        for stage in STAGES + ['total']:
+            old, new = before.loc[key, stage], after.loc[key, stage]
+            if pd.isna(old) or pd.isna(new):
+                continue
+            ratio = new / old if old > 0 else np.inf
+            regression = bool(max(old, new) >= min_time and ratio > 1 + threshold)
+            records.append([*key, stage, old, new, ratio, regression])
+        old, new = before.loc[key, 'objective'], after.loc[key, 'objective']
+        changed = not np.isclose(new, old, rtol=objective_tolerance, atol=objective_tolerance)
+        records.append([*key, 'objective', old, new, new / old if old else np.nan, bool(changed)])
+    comparison = pd.DataFrame(records, columns=['backend', 'dataset', 'stage', 'baseline', 'current', 'ratio',
+                                                'regression'])
+    return comparison.set_index(['backend', 'dataset', 'stage'])
+
+
+def format_report(comparison: pd.DataFrame, baseline: Optional[Dict[str, Any]] = None,
+                  current: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Text report of a comparison (output of compare_results).
+
+    Args:
+        comparison: Output of compare_results
+        baseline: Baseline results, to report its machine and package versions
+        current: Current results, to report its machine and package versions
+
+    Returns:
+        str: Report listing the regressions first, then every compared stage
+    """
+    lines = ["=" * 70, "BENCHMARK COMPARISON", "=" * 70]
+    for label, results in (('Baseline', baseline), ('Current', current)):
+        if results is None:
+            continue
+        machine = results['machine']
+        versions = ', '.join(f"{name} {version}" for name, version in machine['packages'].items() if version)
+        lines.append(f"{label}: {results['created']} on {machine['platform']} "
+                     f"({machine['cpu_count']} CPUs, Python {machine['python']})")
+        lines.append(f"  {versions}")
+    if baseline is not None and current is not None:
+        changed = {name for name, version in current['machine']['packages'].items()
+                   if baseline['machine']['packages'].get(name) != version}
+        if changed:
+            lines.append(f"⚠ Package versions differ: {', '.join(sorted(changed))}")
+
+    regressions = comparison[comparison['regression']]
+    lines.append("")
+    if regressions.empty:
+        lines.append("✓ No regression")
+    else:
+        lines.append(f"⚠ {len(regressions)} regression(s):")
+        for (backend, dataset, stage), row in regressions.iterrows():
+            lines.append(f"  {backend:<15} {dataset:<9} {stage:<12} {row['baseline']:>12.4f} -> "
+                         f"{row['current']:>12.4f} (x{row['ratio']:.2f})")
+
+    lines.append("")
+    lines.append(f"  {'backend':<15} {'dataset':<9} {'stage':<12} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for (backend, dataset, stage), row in comparison.iterrows():
+        mark = '⚠' if row['regression'] else ' '
+        lines.append(f"{mark} {backend:<15} {dataset:<9} {stage:<12} {row['baseline']:>12.4f} "
+                     f"{row['current']:>12.4f} {row['ratio']:>7.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,504 @@
+"""
+Numerical conditioning of assembled models.
+
+:func:`model_matrix` extracts the LP of any backend (HiGHS MatrixModel, linopy
+model, PyOptInterface full model, AMPL instance) as a :class:`ModelMatrix`:
+cost vector, bounds and constraint matrix, with the constraint and variable
+family of each row and column. :func:`analyze_conditioning` reports the
+coefficient ranges of the matrix, right-hand sides, bounds and objective by
+constraint group and family, and flags the entries outside the recommended
+ranges (e.g. ``c_p * total_time`` multipliers, or a division by a near-zero
+``storage_eff_out``), which slow down barrier convergence.
+
+:func:`geometric_mean_scaling` computes row and column scale factors that
+bring the matrix coefficients around 1; ``MatrixModel.solve(scale=True)``
+solves the scaled LP and unscales the solution.
+
+Example:
+    >>> profiler = BuildProfiler(memory=False)
+    >>> model = build_core_model_highs(data, profiler=profiler)
+    >>> report = analyze_conditioning(model, groups=profiler.family_groups)
+    >>> print(report)
+    >>> model.solve(solver='ipm', scale=True)
+"""
+
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import Callable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from energyscope.profiling import AMPL_CONSTRAINT_GROUPS
+
+# Ranges of absolute values (zeros excluded) above and below which entries are flagged
+MATRIX_RANGE = (1e-3, 1e3)
+VALUE_RANGE = (1e-3, 1e6)
+
+# Known causes of extreme coefficients in the core model, by (constraint family, 'small' or 'large')
+HINTS = {
+    ('capacity_factor', 'large'): "c_p * total_time multiplier (hours of the year)",
+    ('capacity_factor_t', 'small'): "near-zero hourly capacity factor c_p_t",
+    ('storage_level', 'large'): "division by a near-zero storage_eff_out",
+    ('storage_level_intra', 'large'): "division by a near-zero storage_eff_out",
+    ('storage_layer_out', 'large'): "division by a near-zero storage_eff_out",
+    ('storage_layer_in', 'large'): "division by a near-zero storage_eff_in",
+    ('limit_energy_to_power_ratio', 'large'): "long storage charge or discharge time",
+    ('investment_cost_calc', 'large'): "large investment cost c_inv",
+    ('gwp_constr_calc', 'large'): "large construction emissions gwp_constr",
+}
+
+_ROW_GROUP = {family: group for group, families in AMPL_CONSTRAINT_GROUPS.items() for family in families}
+
+
+class ModelMatrix:
+    """
+    LP ``min c'x`` s.t. ``row_lower <= A x <= row_upper``, ``col_lower <= x <= col_upper`` of a model.
+
+    Attributes:
+        cost, col_lower, col_upper, row_lower, row_upper: Vectors of the LP
+        A: Constraint matrix (CSR, duplicates summed)
+        row_family, col_family: Family of each row and column, as positions in
+            `row_families` and `col_families` ('other' for rows and columns of
+            no known family)
+    """
+
+    def __init__(self, cost: np.ndarray, col_lower: np.ndarray, col_upper: np.ndarray, A: sp.spmatrix,
+                 row_lower: np.ndarray, row_upper: np.ndarray, row_families: Mapping[str, np.ndarray],
+                 col_families: Mapping[str, np.ndarray], row_label: Optional[Callable[[int], str]] = None,
+                 col_label: Optional[Callable[[int], str]] = None):
+        """
+        Args:
+            cost, col_lower, col_upper, A, row_lower, row_upper: The LP
+            row_families: Rows of each constraint family
+            col_families: Columns of each variable family
+            row_label: Name of a row (default: family and position)
+            col_label: Name of a column (default: family and position)
+        """
+        self.cost, self.col_lower, self.col_upper = (np.asarray(v, dtype=float) for v in (cost, col_lower, col_upper))
+        self.row_lower, self.row_upper = np.asarray(row_lower, dtype=float), np.asarray(row_upper, dtype=float)
+        self.A = sp.csr_matrix(A)
+        self.A.sum_duplicates()
+        self.row_families, self.row_family = _codes(self.A.shape[0], row_families)
+        self.col_families, self.col_family = _codes(self.A.shape[1], col_families)
+        self._row_label, self._col_label = row_label, col_label
+
+    def __repr__(self) -> str:
+        return f"ModelMatrix(rows={self.A.shape[0]:,}, columns={self.A.shape[1]:,}, nonzeros={self.A.nnz:,})"
+
+    def row_label(self, row: int) -> str:
+        """Name of a row (family and labels)."""
+        if self._row_label is not None:
+            return self._row_label(row)
+        return f"{self.row_families[self.row_family[row]]}#{row}"
+
+    def col_label(self, col: int) -> str:
+        """Name of a column (family and labels)."""
+        if self._col_label is not None:
+            return self._col_label(col)
+        return f"{self.col_families[self.col_family[col]]}#{col}"
+
+
+def _codes(n: int, families: Mapping[str, np.ndarray]) -> Tuple[list, np.ndarray]:
+    """Family position of each of `n` items ('other' for items of no family)."""
+    names = list(families) + ['other']
+    codes = np.full(n, len(families), dtype=np.int64)
+    for k, items in enumerate(families.values()):
+        codes[np.asarray(items, dtype=np.int64)] = k
+    return names, codes
+
+
+def _indexed(arrays: Mapping[str, Tuple[Sequence[pd.Index], np.ndarray]]) -> Tuple[dict, Callable[[int], str]]:
+    """
+    Items of each family and label function, from the labels and index array
+    (-1 where no item exists) of each family.
+    """
+    families = {name: index[index >= 0] for name, (_, index) in arrays.items()}
+    owner = pd.Series(dtype=object)
+    if families:
+        owner = pd.Series(np.repeat(list(families), [len(items) for items in families.values()]),
+                          index=np.concatenate(list(families.values())))
+
+    def label(item):
+        if item not in owner.index:
+            return f"other#{item}"
+        name = owner.loc[item]
+        name = name if isinstance(name, str) else name.iloc[0]
+        labels, index = arrays[name]
+        position = np.argwhere(index == item)[0]
+        return f"{name}[{', '.join(str(axis[k]) for axis, k in zip(labels, position))}]"
+
+    return families, label
+
+
+# ============================================================================
+# EXTRACTION OF THE LP OF EACH BACKEND
+# ============================================================================
+
+def matrix_from_highs(model) -> ModelMatrix:
+    """LP of a HiGHS MatrixModel (see highs_backend.build_core_model_highs)."""
+    cost, col_lower, col_upper, A, row_lower, row_upper = model.matrices()
+    rows, row_label = _indexed({name: (array.labels, array.index) for name, array in model.constraints.items()})
+    cols, col_label = _indexed({name: (array.labels, array.index) for name, array in model.variables.items()})
+    return ModelMatrix(cost, col_lower, col_upper, A, row_lower, row_upper, rows, cols, row_label, col_label)
+
+
+def matrix_from_linopy(model) -> ModelMatrix:
+    """LP of a linopy model (loop-based or xarray core model, toy models)."""
+    matrices = model.matrices
+    clabels, vlabels = np.asarray(matrices.clabels), np.asarray(matrices.vlabels)
+    sense, b = np.asarray(matrices.sense), np.asarray(matrices.b, dtype=float)
+    row_lower = np.where(sense == '<', -np.inf, b)
+    row_upper = np.where(sense == '>', np.inf, b)
+
+    def positions(container, labels):
+        position = pd.Series(np.arange(len(labels)), index=labels)
+        families = {}
+        for name in container:
+            family_labels = np.asarray(container[name].labels).ravel()
+            families[name] = position.reindex(family_labels[family_labels >= 0]).dropna().to_numpy(np.int64)
+        return families
+
+    def label(container, labels, item):
+        name, coords = container.get_label_position(int(labels[item]))
+        return f"{name}[{', '.join(str(value) for value in coords.values())}]"
+
+    return ModelMatrix(
+        matrices.c, matrices.lb, matrices.ub, matrices.A, row_lower, row_upper,
+        positions(model.constraints, clabels), positions(model.variables, vlabels),
+        lambda row: label(model.constraints, clabels, row), lambda col: label(model.variables, vlabels, col),
+    )
+
+
+def matrix_from_mps(path, row_families: Optional[Mapping[str, np.ndarray]] = None,
+                    col_families: Optional[Mapping[str, np.ndarray]] = None) -> ModelMatrix:
+    """
+    LP of an MPS file, read with HiGHS.
+
+    Args:
+        path: MPS file
+        row_families: Rows of each constraint family (default: from the row names,
+            up to the first '[' or '(')
+        col_families: Columns of each variable family (default: from the column names)
+    """
+    import highspy
+
+    highs = highspy.Highs()
+    highs.setOptionValue('output_flag', False)
+    if highs.readModel(str(path)) == highspy.HighsStatus.kError:
+        raise RuntimeError(f"HiGHS could not read {path}")
+    lp = highs.getLp()
+    A = sp.csc_matrix((np.asarray(lp.a_matrix_.value_), np.asarray(lp.a_matrix_.index_),
+                       np.asarray(lp.a_matrix_.start_)), shape=(lp.num_row_, lp.num_col_))
+    row_names, col_names = list(lp.row_names_), list(lp.col_names_)
+
+    def by_name(names):
+        families = pd.Series([re.split(r'[\[(]', name, maxsplit=1)[0] for name in names])
+        return {name: items.to_numpy() for name, items in families.groupby(families).groups.items()}
+
+    if row_families is None and row_names:
+        row_families = by_name(row_names)
+    if col_families is None and col_names:
+        col_families = by_name(col_names)
+    return ModelMatrix(lp.col_cost_, lp.col_lower_, lp.col_upper_, A, lp.row_lower_, lp.row_upper_,
+                       row_families or {}, col_families or {},
+                       (lambda row: row_names[row]) if row_names else None,
+                       (lambda col: col_names[col]) if col_names else None)
+
+
+def matrix_from_pyoptinterface(result: dict) -> ModelMatrix:
+    """
+    LP of a PyOptInterface full model (output of build_full_model).
+
+    The model is written to a temporary MPS file. HiGHS only writes models whose
+    row and column names are unique and non-blank, so columns are temporarily
+    renamed x<column> and rows r<row>.
+    """
+    import pyoptinterface as poi
+
+    model = result['model']
+
+    def handle_indices(handles):
+        return np.array([-1 if handle is None else handle.index for handle in np.ravel(handles)],
+                        dtype=np.int64).reshape(np.shape(handles))
+
+    rows = {name: (array.labels, handle_indices(array.handles)) for name, array in result['constraints'].items()}
+    cols = {}
+    for name, variables in result['variables'].items():
+        if isinstance(getattr(variables, 'index', None), np.ndarray):
+            cols[name] = (variables.labels, variables.index)
+        elif isinstance(variables, dict):
+            cols[name] = ((pd.Index([str(key) for key in variables]),), handle_indices(list(variables.values())))
+        else:
+            cols[name] = ((pd.Index(['']),), handle_indices([variables]))
+    row_families, row_label = _indexed(rows)
+    col_families, col_label = _indexed(cols)
+
+    names = {}
+    for col in range(model.number_of_variables()):
+        variable = poi.VariableIndex(col)
+        names[col] = model.get_variable_name(variable)
+        model.set_variable_name(variable, f"x{col}")
+    for row in range(model.number_of_constraints(poi.ConstraintType.Linear)):
+        model.set_constraint_name(poi.ConstraintIndex(poi.ConstraintType.Linear, row), f"r{row}")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.mps')
+            model.write(path)
+            matrix = matrix_from_mps(path, row_families, col_families)
+    finally:
+        for col, name in names.items():
+            if name:
+                model.set_variable_name(poi.VariableIndex(col), name)
+    matrix._row_label, matrix._col_label = row_label, col_label
+    return matrix
+
+
+def matrix_from_ampl(ampl) -> ModelMatrix:
+    """
+    LP of an AMPL instance (e.g. ``Energyscope.es_model`` after loading the model).
+
+    The instance is written as an MPS file with AMPL's ``write m`` command, with
+    the row and column names (auxfiles rc).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        stub = os.path.join(directory, 'model')
+        ampl.eval(f'option auxfiles rc; write m"{stub}";')
+        row_names = open(stub + '.row').read().split()
+        col_names = open(stub + '.col').read().split()
+        matrix = matrix_from_mps(stub + '.mps')
+    families = {}
+    for names, kind in ((row_names, 'row'), (col_names, 'col')):
+        family = pd.Series([name.split('[', 1)[0] for name in names])
+        families[kind] = {name: items.to_numpy() for name, items in family.groupby(family).groups.items()}
+    return ModelMatrix(matrix.cost, matrix.col_lower, matrix.col_upper, matrix.A, matrix.row_lower,
+                       matrix.row_upper, families['row'], families['col'],
+                       lambda row: row_names[row], lambda col: col_names[col])
+
+
+def model_matrix(model) -> ModelMatrix:
+    """
+    LP of a model of any backend.
+
+    Args:
+        model: HiGHS MatrixModel, linopy Model, output of the PyOptInterface
+            build_full_model, AMPL instance, Energyscope (AMPL) or ModelMatrix
+
+    Raises:
+        TypeError: If the model type is unknown
+    """
+    if isinstance(model, ModelMatrix):
+        return model
+    if isinstance(model, dict) and 'constraints' in model and 'model' in model:
+        return matrix_from_pyoptinterface(model)
+    if hasattr(model, 'matrices') and callable(model.matrices):
+        return matrix_from_highs(model)
+    if hasattr(model, 'matrices') and hasattr(model, 'constraints'):
+        return matrix_from_linopy(model)
+    if hasattr(model, 'es_model'):
+        return matrix_from_ampl(model.es_model)
+    if hasattr(model, 'eval') and hasattr(model, 'getConstraints'):
+        return matrix_from_ampl(model)
+    raise TypeError(f"Unknown model type: {type(model).__name__}")
+
+
+# ============================================================================
+# ANALYSIS
+# ============================================================================
+
+@dataclass
+class ConditioningReport:
+    """
+    Coefficient ranges of a model.
+
+    Attributes:
+        summary: Smallest and largest absolute value (zeros excluded) and their
+            ratio, for the matrix, right-hand sides, bounds and objective
+        constraints: Ranges of the matrix and right-hand sides by (group, family)
+            of constraints, with the rows and nonzeros of each family
+        variables: Ranges of the matrix, bounds and objective by variable family
+        offenders: Entries outside the recommended ranges, grouped by (kind,
+            group, family, reason), with their count, extreme value, an example
+            and the known cause (hint) if any
+    """
+    summary: pd.DataFrame
+    constraints: pd.DataFrame
+    variables: pd.DataFrame
+    offenders: pd.DataFrame
+
+    def __str__(self) -> str:
+        lines = ["=" * 70, "MODEL CONDITIONING", "=" * 70]
+        for kind, row in self.summary.iterrows():
+            if row.isna().all():
+                lines.append(f"  {kind:<10} -")
+            else:
+                lines.append(f"  {kind:<10} [{row['min']:.0e}, {row['max']:.0e}]  ratio {row['ratio']:.0e}")
+        lines.append("")
+        if self.offenders.empty:
+            lines.append("✓ No coefficient outside the recommended ranges")
+        else:
+            lines.append(f"⚠ {int(self.offenders['count'].sum()):,} entries outside the recommended ranges:")
+            for (kind, group, family, reason), row in self.offenders.iterrows():
+                hint = f" ({row['hint']})" if row['hint'] else ""
+                lines.append(f"  {kind:<9} {group:<15} {family:<32} {row['count']:>8,} {reason} "
+                             f"up to {row['extreme']:.1e}, e.g. {row['example']}{hint}")
+        return "\n".join(lines)
+
+
+def _group(family: str, groups: Optional[Mapping[str, str]]) -> str:
+    if groups and family in groups:
+        return groups[family]
+    if family in _ROW_GROUP:
+        return _ROW_GROUP[family]
+    # Loop-based linopy families are named after their index (capacity_factor_t_PV_1_1)
+    prefixes = [name for name in _ROW_GROUP if family.startswith(name + '_')]
+    return _ROW_GROUP[max(prefixes, key=len)] if prefixes else 'other'
+
+
+def _base_family(family: str) -> str:
+    if family in _ROW_GROUP:
+        return family
+    prefixes = [name for name in _ROW_GROUP if family.startswith(name + '_')]
+    return max(prefixes, key=len) if prefixes else family
+
+
+def _ranges(values: np.ndarray, codes: np.ndarray, n: int, prefix: str) -> pd.DataFrame:
+    """Smallest and largest absolute nonzero finite value of each of `n` families."""
+    values = np.abs(values)
+    keep = np.isfinite(values) & (values > 0)
+    frame = pd.DataFrame({'code': codes[keep], 'value': values[keep]}).groupby('code')['value'].agg(['min', 'max'])
+    return frame.reindex(range(n)).rename(columns=lambda column: f"{prefix}_{column}")
+
+
+def _summary_row(values: np.ndarray) -> list:
+    values = np.abs(values)
+    values = values[np.isfinite(values) & (values > 0)]
+    if not len(values):
+        return [np.nan, np.nan, np.nan]
+    return [values.min(), values.max(), values.max() / values.min()]
+
+
+def analyze_conditioning(model, groups: Optional[Mapping[str, str]] = None,
+                         matrix_range: Tuple[float, float] = MATRIX_RANGE,
+                         value_range: Tuple[float, float] = VALUE_RANGE) -> ConditioningReport:
+    """
+    Coefficient ranges of a model, by constraint group and family.
+
+    Args:
+        model: Model of any backend (see model_matrix)
+        groups: Group of each constraint family (e.g. BuildProfiler.family_groups;
+            default: the groups of the AMPL constraints in
+            profiling.AMPL_CONSTRAINT_GROUPS, 'other' for unknown families)
+        matrix_range: Absolute matrix coefficients outside this range are flagged
+        value_range: Absolute right-hand sides, bounds and objective coefficients
+            outside this range are flagged
+
+    Returns:
+        ConditioningReport
+    """
+    lp = model_matrix(model)
+    A = lp.A
+    rows = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+    cols, data = A.indices, A.data
+    row_groups = [_group(family, groups) for family in lp.row_families]
+
+    # Right-hand sides: finite row bounds (both for ranges and equalities, once)
+    rhs = np.where(np.isfinite(lp.row_upper), lp.row_upper, lp.row_lower)
+    rhs_low = np.where(np.isfinite(lp.row_lower) & (lp.row_lower != lp.row_upper), lp.row_lower, np.nan)
+    bounds = np.concatenate([lp.col_lower, lp.col_upper])
+
+    summary = pd.DataFrame([_summary_row(data), _summary_row(np.concatenate([rhs, rhs_low])),
+                            _summary_row(bounds), _summary_row(lp.cost)],
+                           index=['matrix', 'rhs', 'bounds', 'objective'], columns=['min', 'max', 'ratio'])
+
+    n_row_families = len(lp.row_families)
+    constraints = pd.concat([
+        pd.DataFrame({'rows': np.bincount(lp.row_family, minlength=n_row_families),
+                      'nonzeros': np.bincount(lp.row_family[rows], minlength=n_row_families)}),
+        _ranges(data, lp.row_family[rows], n_row_families, 'matrix'),
+        _ranges(np.concatenate([rhs, rhs_low]), np.concatenate([lp.row_family, lp.row_family]), n_row_families, 'rhs'),
+    ], axis=1)
+    constraints.index = pd.MultiIndex.from_arrays([row_groups, lp.row_families], names=['group', 'family'])
+    constraints = constraints[constraints['rows'] > 0].sort_index(level='group', sort_remaining=False)
+
+    n_col_families = len(lp.col_families)
+    variables = pd.concat([
+        pd.DataFrame({'columns': np.bincount(lp.col_family, minlength=n_col_families)}),
+        _ranges(data, lp.col_family[cols], n_col_families, 'matrix'),
+        _ranges(bounds, np.concatenate([lp.col_family, lp.col_family]), n_col_families, 'bound'),
+        _ranges(lp.cost, lp.col_family, n_col_families, 'cost'),
+    ], axis=1)
+    variables.index = pd.Index(lp.col_families, name='family')
+    variables = variables[variables['columns'] > 0]
+
+    # Offending entries: (kind, row or column, family code, value) outside the ranges
+    records = []
+
+    def flag(kind, values, items, codes, names, family_groups, bounds_, label):
+        magnitude = np.abs(values)
+        for reason, outside in (('small', (magnitude > 0) & (magnitude < bounds_[0])),
+                                ('large', np.isfinite(magnitude) & (magnitude > bounds_[1]))):
+            if not outside.any():
+                continue
+            frame = pd.DataFrame({'code': codes[outside], 'item': items[outside], 'value': values[outside],
+                                  'magnitude': magnitude[outside]})
+            for code, entries in frame.groupby('code'):
+                extreme = entries.loc[entries['magnitude'].idxmin() if reason == 'small' else entries['magnitude'].idxmax()]
+                family = names[code]
+                records.append([kind, family_groups[code], family, reason, len(entries), extreme['value'],
+                                label(extreme), HINTS.get((_base_family(family), reason), '')])
+
+    flag('matrix', data, np.arange(len(data)), lp.row_family[rows], lp.row_families, row_groups, matrix_range,
+         lambda e: f"{lp.row_label(int(rows[int(e['item'])]))} x {lp.col_label(int(cols[int(e['item'])]))}")
+    flag('rhs', np.concatenate([rhs, np.nan_to_num(rhs_low)]), np.tile(np.arange(A.shape[0]), 2),
+         np.concatenate([lp.row_family, lp.row_family]), lp.row_families, row_groups, value_range,
+         lambda e: lp.row_label(int(e['item'])))
+    col_groups = [''] * n_col_families
+    flag('bounds', bounds, np.tile(np.arange(A.shape[1]), 2), np.concatenate([lp.col_family, lp.col_family]),
+         lp.col_families, col_groups, value_range, lambda e: lp.col_label(int(e['item'])))
+    flag('objective', lp.cost, np.arange(A.shape[1]), lp.col_family, lp.col_families, col_groups, value_range,
+         lambda e: lp.col_label(int(e['item'])))
+
+    offenders = pd.DataFrame(records, columns=['kind', 'group', 'family', 'reason', 'count', 'extreme', 'example',
+                                               'hint']).set_index(['kind', 'group', 'family', 'reason'])
+    return ConditioningReport(summary, constraints, variables, offenders)
+
+
+# ============================================================================
+# SCALING
+# ============================================================================
+
+def geometric_mean_scaling(A: sp.spmatrix, passes: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row and column scale factors of geometric-mean scaling.
+
+    Each pass divides every row, then every column, of ``R A C`` by the
+    geometric mean of its smallest and largest absolute coefficient, which
+    brings the coefficients around 1. Factors are rounded to powers of 2, so
+    that scaling introduces no rounding error.
+
+    Args:
+        A: Constraint matrix
+        passes: Number of row and column passes
+
+    Returns:
+        (row_scale, col_scale): the scaled matrix is ``diag(row_scale) A diag(col_scale)``
+    """
+    A = abs(sp.csr_matrix(A, dtype=float))
+    A.eliminate_zeros()
+    row_scale, col_scale = np.ones(A.shape[0]), np.ones(A.shape[1])
+
+    def extremes(matrix, axis):
+        largest = matrix.max(axis=axis).toarray().ravel()
+        inverse = matrix.copy()
+        inverse.data = 1 / inverse.data
+        smallest = 1 / np.where(largest > 0, inverse.max(axis=axis).toarray().ravel(), 1.0)
+        return np.where(largest > 0, np.sqrt(smallest * largest), 1.0)
+
+    for _ in range(passes):
+        row_scale /= extremes(sp.diags(row_scale) @ A @ sp.diags(col_scale), axis=1)
+        col_scale /= extremes(sp.diags(row_scale) @ A @ sp.diags(col_scale), axis=0)
+    return 2.0 ** np.round(np.log2(row_scale)), 2.0 ** np.round(np.log2(col_scale))
@@ -0,0 +1,624 @@
+"""
+Native reader for AMPL data (.dat) files.
+
+This module parses the subset of the AMPL data language used by the
+EnergyScope datasets (plain and tuple sets, indexed sets, scalar and indexed
+parameters, ``param : ... :=`` tables, ``[a,*,*]`` slices, ``default``
+values and ``let`` assignments) without starting an AMPL process. Script
+commands such as ``for`` loops are not supported.
+
+Files are tokenized line by line and only one statement is held in memory
+at a time. Parameters are returned as pandas Series (with a MultiIndex for
+multi-dimensional parameters) and scalars as floats, matching the layout
+produced by ``extract_data_from_ampl`` in the linopy and PyOptInterface
+data loaders.
+"""
+
+import re
+from itertools import chain
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+_TOKEN_RE = re.compile(r"""
+      \#.*                          # comment until end of line
+    | '[^']*' | "[^"]*"             # quoted symbol
+    | :=                            # assignment
+    | [:;,()\[\]{}*=]               # punctuation
+    | [^\s:;,()\[\]{}*=\#'"]+       # number or bare symbol
+""", re.VERBOSE)
+
+_DECLARATION_RE = re.compile(
+    r"^(set|param)\s+(\w+)\s*(\{[^}]*\})?(.*)$", re.DOTALL
+)
+_RANGE_RE = re.compile(r"^\s*:=\s*(-?\d+)\s*\.\.\s*(-?\d+)\s*$")
+_DEFAULT_RE = re.compile(r"\bdefault\s+([^\s,;]+)")
+
+
+# ============================================================================
+# TOKENIZER
+# ============================================================================
+
+def tokenize(lines) -> Iterator[tuple[str, int]]:
+    """
+    Split AMPL data text into tokens.
+
+    Args:
+        lines: Iterable of text lines (e.g. an open file)
+
+    Yields:
+        (token, line_number) tuples, comments excluded
+    """
+    in_block_comment = False
+    for lineno, line in enumerate(lines, start=1):
+        if in_block_comment or '/*' in line:
+            line, in_block_comment = _strip_block_comments(line, in_block_comment)
+        for match in _TOKEN_RE.finditer(line):
+            token = match.group()
+            if token[0] != '#':
+                yield token, lineno
+
+
+def _strip_block_comments(line: str, in_block_comment: bool) -> tuple[str, bool]:
+    """Remove ``/* ... */`` comments that may span several lines."""
+    kept = []
+    while line:
+        if in_block_comment:
+            end = line.find('*/')
+            if end < 0:
+                return ''.join(kept), True
+            line, in_block_comment = line[end + 2:], False
+        else:
+            start = line.find('/*')
+            if start < 0 or '#' in line[:start]:
+                kept.append(line)
+                break
+            kept.append(line[:start] + ' ')
+            line, in_block_comment = line[start + 2:], True
+    return ''.join(kept), in_block_comment
+
+
+def iter_statements(lines) -> Iterator[list[tuple[str, int]]]:
+    """
+    Group tokens into ';'-terminated statements.
+
+    Args:
+        lines: Iterable of text lines
+
+    Yields:
+        List of (token, line_number) tuples for each statement
+    """
+    statement = []
+    for token, lineno in tokenize(lines):
+        if token == ';':
+            if statement:
+                yield statement
+            statement = []
+        else:
+            statement.append((token, lineno))
+    if statement:
+        yield statement
+
+
+def _member(token: str):
+    """Convert a token to a set member / index value (int, float or str)."""
+    if token[0] in '\'"':
+        return token[1:-1]
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def _value(token: str) -> float:
+    """Convert a token to a numeric parameter value."""
+    return float(_member(token))
+
+
+# ============================================================================
+# MODEL DECLARATIONS (.mod)
+# ============================================================================
+
+def read_model_declarations(mod_file: Union[str, Path]) -> dict[str, dict]:
+    """
+    Read set and parameter declarations from an AMPL model file.
+
+    Only the information needed to interpret data files is kept: the
+    indexing sets, the ``default`` value and the defining expression.
+
+    Args:
+        mod_file: Path to the AMPL .mod file
+
+    Returns:
+        Dictionary mapping each declared name to a dict with keys
+        'kind' ('set' or 'param'), 'index' (list of indexing expressions),
+        'default' (float or None), 'definition' (str or None) and 'range'
+        ((start, stop) for sets defined as ``start .. stop``, else None)
+    """
+    text = Path(mod_file).read_text(encoding='utf-8', errors='replace')
+    text = re.sub(r'/\*.*?\*/', ' ', text, flags=re.DOTALL)
+    text = '\n'.join(line.split('#', 1)[0] for line in text.splitlines())
+
+    declarations = {}
+    for statement in text.split(';'):
+        match = _DECLARATION_RE.match(statement.strip())
+        if not match:
+            continue
+        kind, name, index, rest = match.groups()
+        index_terms = []
+        if index:
+            body = index[1:-1].split(':', 1)[0]
+            index_terms = [term.split(' in ')[-1].strip() for term in body.split(',')]
+        default = _DEFAULT_RE.search(rest)
+        bounds = _RANGE_RE.match(rest)
+        definition = rest.split(':=', 1)[1].strip() if ':=' in rest else None
+        declarations[name] = {
+            'kind': kind,
+            'index': index_terms,
+            'default': _value(default.group(1)) if default else None,
+            'definition': definition,
+            'range': tuple(int(b) for b in bounds.groups()) if bounds else None,
+        }
+    return declarations
+
+
+# ============================================================================
+# DATA FILE PARSER (.dat)
+# ============================================================================
+
+class DatParser:
+    """
+    Streaming parser for AMPL data files.
+
+    Statements are parsed one at a time and accumulated into plain Python
+    containers; call :meth:`to_pandas` once all files have been read.
+
+    Args:
+        declarations: Optional output of :func:`read_model_declarations`,
+            used to know the arity of parameters given as flat lists
+    """
+
+    def __init__(self, declarations: Optional[dict] = None):
+        self.declarations = declarations or {}
+        self.sets: dict[str, Union[list, dict]] = {}
+        self.parameters: dict[str, Union[float, dict]] = {}
+        self.defaults: dict[str, float] = {}
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def read(self, dat_file: Union[str, Path]):
+        """Parse one .dat file and accumulate its content."""
+        with open(dat_file, encoding='utf-8', errors='replace') as f:
+            for statement in iter_statements(f):
+                self._parse_statement(statement, dat_file)
+        return self
+
+    def to_pandas(self) -> tuple[dict, dict]:
+        """
+        Convert the accumulated data to the loader output format.
+
+        Returns:
+            (sets, parameters): sets as lists (or dicts of lists for indexed
+            sets), parameters as floats or pandas Series
+        """
+        parameters = {}
+        for name, values in self.parameters.items():
+            if isinstance(values, dict):
+                parameters[name] = _to_series(name, values)
+            else:
+                parameters[name] = values
+        return dict(self.sets), parameters
+
+    # ------------------------------------------------------------------
+    # Statements
+    # ------------------------------------------------------------------
+
+    def _parse_statement(self, statement, source):
+        tokens = [t for t, _ in statement]
+        keyword = tokens[0]
+        try:
+            if keyword == 'set':
+                self._parse_set(tokens[1:])
+            elif keyword == 'param':
+                self._parse_param(statement[1:])
+            elif keyword == 'let':
+                self._parse_let(tokens[1:])
+            elif keyword in ('data', 'model', 'end', 'reset'):
+                pass
+            else:
+                raise ValueError(f"unsupported statement '{keyword}'")
+        except (ValueError, IndexError) as e:
+            raise ValueError(
+                f"{source}:{statement[0][1]}: could not parse '{' '.join(tokens[:6])} ...': {e}"
+            ) from e
+
+    def _parse_set(self, tokens):
+        name = tokens[0]
+        pos = 1
+        key = None
+        if pos < len(tokens) and tokens[pos] == '[':
+            end = tokens.index(']', pos)
+            key = _key([_member(t) for t in tokens[pos + 1:end] if t != ','])
+            pos = end + 1
+        if pos < len(tokens) and tokens[pos] == 'dimen':
+            pos += 2
+        if pos < len(tokens) and tokens[pos] in (':=', '='):
+            pos += 1
+        elif pos < len(tokens) and tokens[pos] == ':':
+            raise ValueError("set tables are not supported")
+
+        members = []
+        body = tokens[pos:]
+        if '(' in body:
+            tuple_members = []
+            for t in body:
+                if t == '(':
+                    tuple_members = []
+                elif t == ')':
+                    members.append(tuple(tuple_members))
+                elif t != ',':
+                    tuple_members.append(_member(t))
+        else:
+            members = [_member(t) for t in body if t != ',']
+
+        if key is None:
+            self.sets[name] = members
+        else:
+            self.sets.setdefault(name, {})[key] = members
+
+    def _parse_param(self, statement):
+        tokens = [t for t, _ in statement]
+        if tokens[0] == ':':
+            self._parse_param_columns(statement[1:])
+            return
+
+        name = tokens[0]
+        pos = 1
+        if tokens[pos] == 'default':
+            self.defaults[name] = _value(tokens[pos + 1])
+            pos += 2
+        if pos == len(tokens):
+            return
+        if tokens[pos] in (':=', '='):
+            pos += 1
+            if len(tokens) - pos == 1 and self._arity(name) in (0, None):
+                self.parameters[name] = _value(tokens[pos])
+                return
+        self._parse_param_data(name, statement[pos:])
+
+    def _parse_param_columns(self, statement):
+        """Parse ``param : p1 p2 ... := rows`` (one column per parameter)."""
+        tokens = [t for t, _ in statement]
+        assign = next(i for i, t in enumerate(tokens) if t in (':=', '='))
+        header = tokens[:assign]
+        set_name = None
+        if ':' in header:
+            set_name = header[0]
+            header = header[header.index(':') + 1:]
+        names = [t for t in header if t != ',']
+
+        arity = self._arity(names[0]) or 1
+        width = arity + len(names)
+        rows = [t for t in tokens[assign + 1:] if t != ',']
+        if len(rows) % width:
+            raise ValueError(f"{len(rows)} values do not fit {width} columns")
+
+        keys = []
+        for name in names:
+            self.parameters.setdefault(name, {})
+        for i in range(0, len(rows), width):
+            key = _key([_member(t) for t in rows[i:i + arity]])
+            keys.append(key)
+            for name, token in zip(names, rows[i + arity:i + width]):
+                if token != '.':
+                    self.parameters[name][key] = _value(token)
+        if set_name is not None:
+            self.sets[set_name] = keys
+
+    def _parse_param_data(self, name, statement):
+        """Parse the data part of an indexed parameter (lists, tables, slices)."""
+        values = self.parameters.setdefault(name, {})
+        tokens = [t for t, _ in statement]
+        lines = [line for _, line in statement]
+        template = None
+        pos = 0
+        while pos < len(tokens):
+            token = tokens[pos]
+            if token == '[':
+                end = tokens.index(']', pos)
+                template = [t for t in tokens[pos + 1:end] if t != ',']
+                pos = end + 1
+            elif token == ':':
+                pos = self._parse_table(values, tokens, pos + 1, template, name)
+            else:
+                pos = self._parse_list(values, tokens, lines, pos, template, name)
+
+    def _parse_table(self, values, tokens, pos, template, name):
+        """Parse a two-dimensional table; returns the position after it."""
+        if tokens[pos] == '(':
+            raise ValueError("transposed tables are not supported")
+        assign = pos
+        while tokens[assign] not in (':=', '='):
+            assign += 1
+        columns = [_member(t) for t in tokens[pos:assign]]
+
+        if template is not None:
+            free = [i for i, t in enumerate(template) if t == '*']
+            n_row_keys = len(free) - 1
+        else:
+            n_row_keys = (self._arity(name) or 2) - 1
+        width = n_row_keys + len(columns)
+
+        pos = assign + 1
+        while pos < len(tokens) and tokens[pos] not in ('[', ':'):
+            row = tokens[pos:pos + width]
+            row_key = [_member(t) for t in row[:n_row_keys]]
+            for column, token in zip(columns, row[n_row_keys:]):
+                if token == '.':
+                    continue
+                key = _fill(template, row_key + [column])
+                values[key] = _value(token)
+            pos += width
+        return pos
+
+    def _parse_list(self, values, tokens, lines, pos, template, name):
+        """Parse a flat ``key... value`` list; returns the position after it."""
+        if template is not None:
+            arity = template.count('*')
+        else:
+            arity = self._arity(name)
+        while pos < len(tokens) and tokens[pos] not in ('[', ':'):
+            if arity is None:
+                # Unknown arity: one entry per line
+                end = pos
+                while end < len(tokens) and lines[end] == lines[pos]:
+                    end += 1
+                row = [t for t in tokens[pos:end] if t != ',']
+            else:
+                row = []
+                end = pos
+                while len(row) < arity + 1:
+                    if tokens[end] != ',':
+                        row.append(tokens[end])
+                    end += 1
+            if row[-1] != '.':
+                key = _fill(template, [_member(t) for t in row[:-1]])
+                values[key] = _value(row[-1])
+            pos = end
+        return pos
+
+    def _parse_let(self, tokens):
+        name = tokens[0]
+        pos = 1
+        if tokens[pos] == '[':
+            end = tokens.index(']', pos)
+            key = _key([_member(t) for t in tokens[pos + 1:end] if t != ','])
+            self.parameters.setdefault(name, {})[key] = _value(tokens[end + 2])
+        else:
+            self.parameters[name] = _value(tokens[pos + 1])
+
+    def _arity(self, name):
+        declaration = self.declarations.get(name)
+        return len(declaration['index']) if declaration else None
+
+
+def _key(parts: list):
+    """Index key: scalar for one-dimensional parameters, tuple otherwise."""
+    return parts[0] if len(parts) == 1 else tuple(parts)
+
+
+def _fill(template, parts):
+    """Substitute ``parts`` into the '*' positions of a slice template."""
+    if template is None:
+        return _key(parts)
+    parts = iter(parts)
+    return _key([next(parts) if t == '*' else _member(t) for t in template])
+
+
+def _to_series(name: str, values: dict) -> pd.Series:
+    """Build a float Series (MultiIndex for tuple keys) from a key -> value dict."""
+    keys = list(values.keys())
+    data = np.fromiter(values.values(), dtype=float, count=len(values))
+    if keys and isinstance(keys[0], tuple):
+        index = pd.MultiIndex.from_tuples(keys)
+    else:
+        index = pd.Index(keys)
+    return pd.Series(data, index=index, name=name)
+
+
+# ============================================================================
+# MODEL-LEVEL DATA ASSEMBLY
+# ============================================================================
+
+def parse_dat_files(dat_files, declarations: Optional[dict] = None) -> tuple[dict, dict]:
+    """
+    Parse AMPL .dat files.
+
+    Args:
+        dat_files: Path or list of paths to AMPL .dat files, read in order
+        declarations: Optional output of :func:`read_model_declarations`
+
+    Returns:
+        (sets, parameters) as described in :meth:`DatParser.to_pandas`
+    """
+    return _read(dat_files, declarations).to_pandas()
+
+
+def _read(dat_files, declarations: Optional[dict] = None) -> DatParser:
+    if isinstance(dat_files, (str, Path)):
+        dat_files = [dat_files]
+    parser = DatParser(declarations)
+    for dat_file in dat_files:
+        parser.read(dat_file)
+    return parser
+
+
+def read_ampl_data(dat_files, mod_file: Optional[Union[str, Path]] = None) -> dict:
+    """
+    Read an EnergyScope dataset from .dat files without AMPL.
+
+    When the model file is given, sets defined by ranges in the model
+    (e.g. ``HOURS``) are created, declared defaults are expanded over the
+    indexing sets and the derived sets/parameters of the ESTD core model
+    (``END_USES_TYPES``, ``LAYERS``, ``TECHNOLOGIES``, ``end_uses_input``,
+    ``tau``, ``total_time``, ...) are computed as AMPL would.
+
+    Args:
+        dat_files: Path or list of paths to AMPL .dat files
+        mod_file: Optional path to the AMPL .mod file
+
+    Returns:
+        dict with keys 'sets', 'parameters' and 'time_series'
+    """
+    declarations = read_model_declarations(mod_file) if mod_file else {}
+    parser = _read(dat_files, declarations)
+    sets, parameters = parser.to_pandas()
+    for name, default in parser.defaults.items():
+        declaration = declarations.setdefault(
+            name, {'kind': 'param', 'index': [], 'definition': None, 'range': None}
+        )
+        declaration['default'] = default
+
+    for name, declaration in declarations.items():
+        if declaration['kind'] == 'set' and declaration['range'] and name not in sets:
+            start, stop = declaration['range']
+            sets[name] = list(range(start, stop + 1))
+
+    _derive_core_sets(sets)
+    _expand_defaults(sets, parameters, declarations)
+    _derive_core_parameters(sets, parameters)
+
+    return {
+        'sets': sets,
+        'parameters': parameters,
+        'time_series': {},
+    }
+
+
+def load_dat_data(mod_file: Union[str, Path], dat_files) -> dict:
+    """
+    Load EnergyScope core data with the native .dat parser (no AMPL required).
+
+    Reads the data with :func:`read_ampl_data`, names the index of ``t_op``
+    (``hour``, ``td``) as the backend data loaders expect, and reports the
+    files read and the number of sets and parameters.
+
+    Args:
+        mod_file: Path to the AMPL model file (declarations, defaults)
+        dat_files: List of AMPL .dat files, read in order
+
+    Returns:
+        dict: Model data with keys 'sets', 'parameters', 'time_series'
+    """
+    print("Parsing AMPL model data...")
+    print(f"  Model: {mod_file}")
+    for dat_file in dat_files:
+        print(f"  Data:  {dat_file}")
+
+    data = read_ampl_data(dat_files, mod_file)
+    if 't_op' in data['parameters']:
+        data['parameters']['t_op'].index.names = ['hour', 'td']
+
+    print(f"  ✓ Extracted {len(data['sets'])} sets")
+    print(f"  ✓ Extracted {len(data['parameters'])} parameters")
+    return data
+
+
+def _unique(items) -> list:
+    """Ordered union, as produced by AMPL's ``union``/``setof``."""
+    return list(dict.fromkeys(items))
+
+
+def _derive_core_sets(sets: dict):
+    """Compute the sets defined in ESTD_model_core.mod from the data sets."""
+    if 'END_USES_TYPES_OF_CATEGORY' in sets and 'END_USES_TYPES' not in sets:
+        categories = sets.get('END_USES_CATEGORIES', list(sets['END_USES_TYPES_OF_CATEGORY']))
+        sets['END_USES_TYPES'] = _unique(chain.from_iterable(
+            sets['END_USES_TYPES_OF_CATEGORY'].get(c, []) for c in categories
+        ))
+
+    end_uses_types = sets.get('END_USES_TYPES', [])
+    if 'RESOURCES' in sets and 'LAYERS' not in sets:
+        excluded = set(sets.get('BIOFUELS', [])) | set(sets.get('EXPORT', []))
+        sets['LAYERS'] = _unique(
+            [r for r in sets['RESOURCES'] if r not in excluded] + list(end_uses_types)
+        )
+
+    tech_of_type = sets.get('TECHNOLOGIES_OF_END_USES_TYPE', {})
+    if tech_of_type and 'TECHNOLOGIES' not in sets:
+        sets['TECHNOLOGIES'] = _unique(chain(
+            chain.from_iterable(tech_of_type.get(t, []) for t in end_uses_types),
+            sets.get('STORAGE_TECH', []),
+            sets.get('INFRASTRUCTURE', []),
+        ))
+
+    if tech_of_type and 'END_USES_TYPES_OF_CATEGORY' in sets \
+            and 'TECHNOLOGIES_OF_END_USES_CATEGORY' not in sets:
+        sets['TECHNOLOGIES_OF_END_USES_CATEGORY'] = {
+            category: _unique(chain.from_iterable(tech_of_type.get(t, []) for t in types))
+            for category, types in sets['END_USES_TYPES_OF_CATEGORY'].items()
+        }
+
+
+def _expand_defaults(sets: dict, parameters: dict, declarations: dict):
+    """Fill declared defaults over the full indexing set, like AMPL's getValues()."""
+    for name, declaration in declarations.items():
+        if declaration['kind'] != 'param' or declaration['default'] is None:
+            continue
+        default = declaration['default']
+        index = declaration['index']
+        if not index:
+            parameters.setdefault(name, default)
+            continue
+        if not all(term in sets and isinstance(sets[term], list) for term in index):
+            continue
+
+        if len(index) == 1:
+            keys = pd.Index(sets[index[0]])
+        else:
+            keys = pd.MultiIndex.from_product([sets[term] for term in index])
+        full = pd.Series(default, index=keys, name=name, dtype=float)
+        given = parameters.get(name)
+        if isinstance(given, pd.Series) and not given.empty:
+            full.update(given)
+            extra = given.index.difference(keys)
+            if len(extra):
+                full = pd.concat([full, given.loc[extra]])
+        parameters[name] = full
+
+
+def _derive_core_parameters(sets: dict, parameters: dict):
+    """Compute the parameters defined by expressions in ESTD_model_core.mod."""
+    demand = parameters.get('end_uses_demand_year')
+    if isinstance(demand, pd.Series) and 'end_uses_input' not in parameters:
+        end_uses_input = demand.groupby(level=0, sort=False).sum()
+        if 'END_USES_INPUT' in sets:
+            end_uses_input = end_uses_input.reindex(sets['END_USES_INPUT'], fill_value=0.0)
+        end_uses_input.name = 'end_uses_input'
+        parameters['end_uses_input'] = end_uses_input
+
+    lifetime = parameters.get('lifetime')
+    i_rate = parameters.get('i_rate')
+    if isinstance(lifetime, pd.Series) and i_rate is not None and 'tau' not in parameters:
+        growth = (1 + i_rate) ** lifetime
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tau = i_rate * growth / (growth - 1)
+        tau.name = 'tau'
+        parameters['tau'] = tau
+
+    t_op = parameters.get('t_op')
+    if 'T_H_TD' in sets and 'total_time' not in parameters:
+        if isinstance(t_op, pd.Series):
+            hour_td = [(h, td) for _, h, td in sets['T_H_TD']]
+            parameters['total_time'] = float(t_op.reindex(hour_td, fill_value=1.0).sum())
+        else:
+            parameters['total_time'] = float(len(sets['T_H_TD']))
@@ -57,6 +57,8 @@ set TS_OF_DEC_TECH {TECHNOLOGIES_OF_END_USES_TYPE["HEAT_LOW_T_DECEN"] diff {"DEC
 ##Additional SETS added just to simplify equations.
 set TYPICAL_DAY_OF_PERIOD {t in PERIODS} := setof {h in HOURS, td in TYPICAL_DAYS: (t,h,td) in T_H_TD} td; #TD_OF_PERIOD(T)
 set HOUR_OF_PERIOD {t in PERIODS} := setof {h in HOURS, td in TYPICAL_DAYS: (t,h,td) in T_H_TD} h; #H_OF_PERIOD(T)
+set DAYS := 1 .. card(PERIODS) / card(HOURS); # days of the year (used by the intra/inter-day storage formulation)
+set TYPICAL_DAY_OF_DAY {d in DAYS} := TYPICAL_DAY_OF_PERIOD[(d - 1) * card(HOURS) + 1]; #TD_OF_DAY(D)
 
 ## Additional SETS: only needed for printing out results (not represented in Figure 3).
 set COGEN within TECHNOLOGIES; # cogeneration tech
@@ -110,6 +112,7 @@ param storage_losses {STORAGE_TECH} >= 0, <= 1; # %_sto_loss [-]: Self losses in
 param storage_charge_time    {STORAGE_TECH} >= 0; # t_sto_in [h]: Time to charge storage (Energy to Power ratio). If value =  5 <=>  5h for a full charge.
 param storage_discharge_time {STORAGE_TECH} >= 0; # t_sto_out [h]: Time to discharge storage (Energy to Power ratio). If value =  5 <=>  5h for a full discharge.
 param storage_availability {STORAGE_TECH} >=0, default 1;# %_sto_avail [-]: Storage technology availability to charge/discharge. Used for EVs 
+param intra_inter_storage binary default 0; # Storage level formulation. 0: level at each period. 1: daily storage level within each typical day, seasonal storage level as an inter-day level plus an intra-day deviation (Kotzur et al., 2018)
 param loss_network {END_USES_TYPES} >= 0 default 0; # %_net_loss: Losses coefficient [0; 1] in the networks (grid and DHN)
 param batt_per_car {V2G} >= 0; # ev_batt_size [GWh]: Battery size per EVs car technology
 param c_grid_extra >=0; # Cost to reinforce the grid due to IRE penetration [Meuros/GW of (PV + Wind)].
@@ -153,7 +156,11 @@ var TotalGWP >= 0; # GWP_tot [ktCO2-eq./year]: Total global warming potential (G
 var GWP_constr {TECHNOLOGIES} >= 0; # GWP_constr [ktCO2-eq.]: Total emissions of the technologies
 var GWP_op {RESOURCES} >= 0; #  GWP_op [ktCO2-eq.]: Total yearly emissions of the resources [ktCO2-eq./y]
 var Network_losses {END_USES_TYPES, HOURS, TYPICAL_DAYS} >= 0; # Net_loss [GW]: Losses in the networks (normally electricity grid and DHN)
-var Storage_level {STORAGE_TECH, PERIODS} >= 0; # Sto_level [GWh]: Energy stored at each period
+var Storage_level {STORAGE_TECH, PERIODS: intra_inter_storage = 0} >= 0; # Sto_level [GWh]: Energy stored at each period
+var Storage_level_intra {STORAGE_TECH, HOURS, TYPICAL_DAYS: intra_inter_storage = 1}; # [GWh]: Energy stored in each typical day (daily storage), or change since the start of the day (seasonal storage)
+var Storage_level_inter {STORAGE_TECH diff STORAGE_DAILY, DAYS: intra_inter_storage = 1} >= 0; # [GWh]: Energy stored at the start of each day (seasonal storage)
+var Storage_intra_max {STORAGE_TECH diff STORAGE_DAILY, TYPICAL_DAYS: intra_inter_storage = 1} >= 0; # [GWh]: Highest change of level within each typical day (seasonal storage)
+var Storage_intra_min {STORAGE_TECH diff STORAGE_DAILY, TYPICAL_DAYS: intra_inter_storage = 1} <= 0; # [GWh]: Lowest change of level within each typical day (seasonal storage)
 
 #############################################
 ###      CONSTRAINTS Eqs [2.1-2.39]       ###
@@ -272,7 +279,7 @@ subject to layer_balance {l in LAYERS, h in HOURS, td in TYPICAL_DAYS}:
 # For the first period of the year, this equation is slightly modified to set the storage level at the beginning 
 # of the year according to the one at the end of the year. 
 
-subject to storage_level {j in STORAGE_TECH, t in PERIODS, h in HOUR_OF_PERIOD[t], td in TYPICAL_DAY_OF_PERIOD[t]}:
+subject to storage_level {j in STORAGE_TECH, t in PERIODS, h in HOUR_OF_PERIOD[t], td in TYPICAL_DAY_OF_PERIOD[t]: intra_inter_storage = 0}:
 	Storage_level [j, t] = (if t == 1 then
 	 			Storage_level [j, card(PERIODS)] * (1.0 -  storage_losses[j])
 				+ t_op [h, td] * (   (sum {l in LAYERS: storage_eff_in [j,l] > 0}  (Storage_in [j, l, h, td]  * storage_eff_in  [j, l])) 
@@ -286,12 +293,43 @@ subject to storage_level {j in STORAGE_TECH, t in PERIODS, h in HOUR_OF_PERIOD[t
 # [Eq. 2.15] Bounding daily storage
 # The storage systems which can only be used for short-term (daily) applications are included in the daily storage set (STO DAILY). 
 # For these units, the equation imposes that the storage level be the same at the end of each typical day.
-subject to impose_daily_storage {j in STORAGE_DAILY, t in PERIODS, h in HOUR_OF_PERIOD[t], td in TYPICAL_DAY_OF_PERIOD[t]}:
+subject to impose_daily_storage {j in STORAGE_DAILY, t in PERIODS, h in HOUR_OF_PERIOD[t], td in TYPICAL_DAY_OF_PERIOD[t]: intra_inter_storage = 0}:
 	Storage_level [j, t] = F_t [j, h, td];
 	
 # [Eq. 2.16] Bounding seasonal storage
-subject to limit_energy_stored_to_maximum {j in STORAGE_TECH diff STORAGE_DAILY , t in PERIODS}:
+subject to limit_energy_stored_to_maximum {j in STORAGE_TECH diff STORAGE_DAILY , t in PERIODS: intra_inter_storage = 0}:
 	Storage_level [j, t] <= F [j];# Never exceed the size of the storage unit
+
+# [Eqs. 2.14-2.16, intra/inter-day formulation] Used instead of the three equations above if intra_inter_storage = 1.
+# Levels are tracked within each typical day: from the level at the last hour of the same typical day for daily storage
+# (cyclic day), from 0 at the start of the day for seasonal storage. The level of seasonal storage at the start of each
+# day of the year is carried from day to day by the change of level over the typical day of the previous day.
+subject to storage_level_intra {j in STORAGE_TECH, h in HOURS, td in TYPICAL_DAYS: intra_inter_storage = 1}:
+	Storage_level_intra [j, h, td] = (if h == 1 then
+				(if j in STORAGE_DAILY then Storage_level_intra [j, card(HOURS), td] * (1.0 -  storage_losses[j]) else 0)
+	else
+				Storage_level_intra [j, h-1, td] * (1.0 -  storage_losses[j])
+				)
+				+ t_op [h, td] * (   (sum {l in LAYERS: storage_eff_in [j,l] > 0}  (Storage_in [j, l, h, td]  * storage_eff_in  [j, l])) 
+				                   - (sum {l in LAYERS: storage_eff_out [j,l] > 0} (Storage_out [j, l, h, td] / storage_eff_out [j, l])));
+
+subject to impose_daily_storage_td {j in STORAGE_DAILY, h in HOURS, td in TYPICAL_DAYS: intra_inter_storage = 1}:
+	Storage_level_intra [j, h, td] = F_t [j, h, td];
+
+subject to storage_level_inter {j in STORAGE_TECH diff STORAGE_DAILY, d in DAYS, td in TYPICAL_DAY_OF_DAY[(if d == 1 then card(DAYS) else d - 1)]: intra_inter_storage = 1}:
+	Storage_level_inter [j, d] = Storage_level_inter [j, (if d == 1 then card(DAYS) else d - 1)] * (1.0 -  storage_losses[j]) ^ card(HOURS)
+				+ Storage_level_intra [j, card(HOURS), td];
+
+subject to storage_intra_max {j in STORAGE_TECH diff STORAGE_DAILY, h in HOURS, td in TYPICAL_DAYS: intra_inter_storage = 1}:
+	Storage_level_intra [j, h, td] <= Storage_intra_max [j, td];
+subject to storage_intra_min {j in STORAGE_TECH diff STORAGE_DAILY, h in HOURS, td in TYPICAL_DAYS: intra_inter_storage = 1}:
+	Storage_level_intra [j, h, td] >= Storage_intra_min [j, td];
+
+# The level within each day stays between 0 and the size of the storage unit (bounds on the extreme levels of the day)
+subject to limit_energy_stored_inter_max {j in STORAGE_TECH diff STORAGE_DAILY, d in DAYS, td in TYPICAL_DAY_OF_DAY[d]: intra_inter_storage = 1}:
+	Storage_level_inter [j, d] + Storage_intra_max [j, td] <= F [j];
+subject to limit_energy_stored_inter_min {j in STORAGE_TECH diff STORAGE_DAILY, d in DAYS, td in TYPICAL_DAY_OF_DAY[d]: intra_inter_storage = 1}:
+	Storage_level_inter [j, d] * (1.0 -  storage_losses[j]) ^ card(HOURS) + Storage_intra_min [j, td] >= 0;
 	
 # [Eqs. 2.17-2.18] Each storage technology can have input/output only to certain layers. If incompatible then the variable is set to 0
 subject to storage_layer_in {j in STORAGE_TECH, l in LAYERS, h in HOURS, td in TYPICAL_DAYS}:
@@ -0,0 +1,210 @@
+"""
+Content-addressed on-disk cache for extracted model data.
+
+Extracting the ESTD dataset (through AMPL or the native .dat parser) is paid
+by every process that builds a model. This module stores the extracted
+``{'sets', 'parameters', 'time_series'}`` dictionary on disk, keyed by a hash
+of the model/data file contents, the source of the extraction code (parser and
+loader modules) and the library version,
+so that later processes only read the cache:
+
+- sets and scalar parameters are stored in a JSON manifest,
+- indexed parameters (Series/DataFrames) are stored as one Parquet file each
+  and read back with memory mapping.
+
+The cache directory defaults to ``~/.cache/energyscope`` and can be changed
+with the ``ENERGYSCOPE_CACHE_DIR`` environment variable.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from energyscope import __version__
+
+
+CACHE_FORMAT = 1
+_SECTIONS = ('parameters', 'time_series')
+# Source files of the native extraction code, hashed into the cache key so that a parser change invalidates
+# the cache (default of the `sources` argument; loaders add their own module)
+PARSER_FILES = (Path(__file__).with_name('dat_parser.py'),)
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory (``$ENERGYSCOPE_CACHE_DIR`` or ``~/.cache/energyscope``)."""
+    env_dir = os.environ.get("ENERGYSCOPE_CACHE_DIR")
+    if env_dir:
+        return Path(env_dir)
+    return Path.home() / ".cache" / "energyscope"
+
+
+def dataset_key(files, tag: str = '', sources=None) -> str:
+    """
+    Compute the cache key of a dataset.
+
+    Args:
+        files: Model and data files the dataset is extracted from
+        tag: Extra discriminator (e.g. the extraction method)
+        sources: Source files of the code that extracts and converts the data
+            (default: :data:`PARSER_FILES`)
+
+    Returns:
+        Hexadecimal SHA-256 digest of the file contents, extraction code,
+        library version, cache format and tag
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{__version__}|{CACHE_FORMAT}|{tag}".encode())
+    for file in [*(PARSER_FILES if sources is None else sources), *files]:
+        digest.update(b'\0')
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _to_json(value):
+    """json.dump fallback for NumPy scalars."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode_members(members: list) -> dict:
+    is_tuple = bool(members) and isinstance(members[0], tuple)
+    return {'tuple': is_tuple, 'members': [list(m) if is_tuple else m for m in members]}
+
+
+def _decode_members(entry: dict) -> list:
+    if entry['tuple']:
+        return [tuple(m) for m in entry['members']]
+    return entry['members']
+
+
+def save_dataset(data: dict, path: Union[str, Path]):
+    """
+    Write a dataset to a cache directory.
+
+    Args:
+        data: dict with keys 'sets', 'parameters' and optionally 'time_series'
+        path: Target directory (created; replaced atomically if it exists)
+
+    Raises:
+        TypeError: If a set or parameter has a type the cache cannot store
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}."))
+    try:
+        manifest = {'format': CACHE_FORMAT, 'version': __version__, 'sets': {}}
+        for name, members in data.get('sets', {}).items():
+            if isinstance(members, dict):
+                manifest['sets'][name] = {
+                    'indexed': [[key, _encode_members(list(values))] for key, values in members.items()]
+                }
+            else:
+                manifest['sets'][name] = _encode_members(list(members))
+
+        for section in _SECTIONS:
+            entries = manifest[section] = {}
+            for i, (name, value) in enumerate(data.get(section, {}).items()):
+                if isinstance(value, (pd.Series, pd.DataFrame)):
+                    frame = value.to_frame(name='value') if isinstance(value, pd.Series) else value
+                    file_name = f"{section}_{i}.parquet"
+                    frame.to_parquet(tmp_dir / file_name)
+                    entries[name] = {'kind': 'series' if isinstance(value, pd.Series) else 'frame',
+                                     'file': file_name}
+                elif isinstance(value, (int, float, np.number)):
+                    entries[name] = {'kind': 'scalar', 'value': value}
+                else:
+                    raise TypeError(f"Cannot cache {section[:-1]} '{name}' of type {type(value).__name__}")
+
+        with open(tmp_dir / "manifest.json", 'w') as f:
+            json.dump(manifest, f, default=_to_json)
+
+        if path.exists():
+            shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_dir, path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def load_dataset(path: Union[str, Path]) -> dict:
+    """
+    Read a dataset written by :func:`save_dataset`.
+
+    Args:
+        path: Cache directory
+
+    Returns:
+        dict with keys 'sets', 'parameters' and 'time_series'
+    """
+    path = Path(path)
+    with open(path / "manifest.json") as f:
+        manifest = json.load(f)
+
+    sets = {}
+    for name, entry in manifest['sets'].items():
+        if 'indexed' in entry:
+            sets[name] = {
+                tuple(key) if isinstance(key, list) else key: _decode_members(values)
+                for key, values in entry['indexed']
+            }
+        else:
+            sets[name] = _decode_members(entry)
+
+    data = {'sets': sets}
+    for section in _SECTIONS:
+        values = data[section] = {}
+        for name, entry in manifest.get(section, {}).items():
+            if entry['kind'] == 'scalar':
+                values[name] = entry['value']
+                continue
+            frame = pd.read_parquet(path / entry['file'], memory_map=True)
+            if entry['kind'] == 'series':
+                frame = frame['value'].rename(name)
+            values[name] = frame
+    return data
+
+
+def cached_dataset(files, loader: Callable[[], dict], cache_dir: Optional[Union[str, Path]] = None,
+                   tag: str = '', sources=None) -> dict:
+    """
+    Load a dataset from the cache, extracting and storing it on a miss.
+
+    Args:
+        files: Model and data files the dataset depends on (hashed)
+        loader: Function returning the dataset when it is not cached
+        cache_dir: Cache root directory (default: :func:`default_cache_dir`)
+        tag: Extra discriminator for the cache key
+        sources: Source files of the code behind `loader` (hashed; default:
+            :data:`PARSER_FILES`)
+
+    Returns:
+        dict with keys 'sets', 'parameters' and 'time_series'
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    entry = cache_dir / dataset_key(files, tag, sources)
+
+    if (entry / "manifest.json").exists():
+        try:
+            data = load_dataset(entry)
+            print(f"  ✓ Loaded cached dataset from {entry}")
+            return data
+        except Exception as e:
+            print(f"  ⚠ Could not read cached dataset ({e}), extracting again")
+
+    data = loader()
+    try:
+        save_dataset(data, entry)
+        print(f"  ✓ Dataset cached in {entry}")
+    except (OSError, TypeError, ValueError, ImportError) as e:
+        print(f"  ⚠ Dataset could not be cached: {e}")
+    return data
@@ -1,13 +1,17 @@
+import multiprocessing
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from typing import Callable
 
+import numpy as np
 import pandas as pd
 from amplpy import AMPL, Environment, ampl_notebook, modules
 
 from energyscope.datasets import Dataset
 from energyscope.models import Model, monthly
-from energyscope.result import parse_result, Result
+from energyscope.profiling import AMPL_CONSTRAINT_GROUPS, BuildProfiler
+from energyscope.result import parse_result, Result, RunParameters
 
 
 class Energyscope:
@@ -44,18 +48,25 @@ class Energyscope:
                     self.__es_model = AMPL()
         return self.__es_model
 
-    def _load_model_files(self, ds: Dataset = None):
+    def _load_model_files(self, ds: Dataset = None, profiler: BuildProfiler = None):
         """
         Loads the model and data files into the given AMPL instance.
 
         Args:
             ds (Dataset, optional): An optional dataset to set specific data in the model.
+            profiler (BuildProfiler, optional): Records the reading of the model and data files
+                ('read_model', 'read_data') and the instances of each constraint group.
         """
+        if profiler is None:
+            profiler = BuildProfiler(enabled=False)
+
         # Read the model and data files
         for file in self.model.files:
             if file[0] == 'mod':
+                profiler.start('read_model')
                 self.es_model.read(file[1])
             elif file[0] == 'dat':
+                profiler.start('read_data')
                 self.es_model.read_data(file[1])
 
         # Set dataset-specific data if provided
@@ -64,31 +75,58 @@ class Energyscope:
             self.es_model.set_data(ds.demands, set_name='demands')
             self.es_model.set_data(ds.resources, set_name='resources')
 
-    def _initial_run(self, ds: Dataset = None) -> None:
+        if profiler.enabled:
+            self._profile_constraint_groups(profiler)
+        profiler.stop()
+
+    def _profile_constraint_groups(self, profiler: BuildProfiler) -> None:
+        """
+        Counts the instances of the constraints of each group (`AMPL_CONSTRAINT_GROUPS`, 'other' for
+        the constraints of other models), which makes AMPL evaluate their indexing sets. AMPL only
+        generates the constraint bodies when the problem is sent to the solver, so the nonzeros and
+        variables of the groups are not reported.
+        """
+        group_of = {name: group for group, names in AMPL_CONSTRAINT_GROUPS.items() for name in names}
+        constraints = [name for name, _ in self.es_model.get_constraints()]
+        for group in list(AMPL_CONSTRAINT_GROUPS) + ['other']:
+            names = [name for name in constraints if group_of.get(name, 'other') == group]
+            if names:
+                profiler.start(group)
+                for name in names:
+                    profiler.add(rows=self.es_model.get_constraint(name).num_instances())
+
+    def _initial_run(self, ds: Dataset = None, profiler: BuildProfiler = None) -> None:
         """
         Calls AMPL with `df` as .dat.
         """
 
         # Load the model files
-        self._load_model_files(ds=ds)
+        self._load_model_files(ds=ds, profiler=profiler)
 
         # Set solver options if provided
         for name, value in self.solver_options.items():
             self.es_model.set_option(name, value)
 
-    def calc(self, ds: Dataset = None, parser: Callable[[AMPL], Result] = parse_result) -> Result:
+    def calc(self, ds: Dataset = None, parser: Callable[[AMPL], Result] = parse_result,
+             profiler: BuildProfiler = None) -> Result:
         """
         Calls AMPL with `df` as .dat and returns the parsed result.
+
+        If a `profiler` is given, the profile of the loading of the model (see `_load_model_files`)
+        is attached to the result as `build_profile`.
         """
         if self.es_model.getSets().__len__() == 0:  # Check if AMPL instance is empty
-            self._initial_run(ds=ds)
+            self._initial_run(ds=ds, profiler=profiler)
 
         # Solve the model
         self.es_model.solve()
         if self.es_model.solve_result_num > 99:
             raise ValueError(f"No optimal solution found, see error: ", self.es_model.solve_result_num)
 
-        return parser(self.es_model, id_run=0)
+        result = parser(self.es_model, id_run=0)
+        if profiler is not None and profiler.enabled:
+            result.build_profile = profiler.table()
+        return result
 
     def export_ampl(self, mod_filename: str = 'tutorial_output/AMPL_infrastructure_ch_2050.mod',
                     dat_filename: str = 'tutorial_output/AMPL_infrastructure_ch_2050.dat'):
@@ -193,8 +231,11 @@ class Energyscope:
     def calc_sequence(self,
                       data: pd.DataFrame,
                       parser: Callable[[AMPL], Result] = parse_result,
-                      ds: Dataset = None
-                      ) -> list[Result]:
+                      ds: Dataset = None,
+                      n_workers: int = 1,
+                      threads_per_worker: int = None,
+                      deduplicate_parameters: bool = True
+                      ) -> Result:
         """
         Calls AMPL `n` times, varying parameters based on `sequence` with `data` as .dat.
 
@@ -216,15 +257,36 @@ class Energyscope:
         parser : Callable[[AMPL], Result], optional
             A function that parses the AMPL model results. It should accept an AMPL object
             as input and return a Result object. Defaults to parse_result.
+            With `n_workers > 1` it must be picklable (i.e. a module-level function or a
+            `functools.partial` of one). Use e.g. `functools.partial(parse_result, include=[...])`
+            to only parse the entities needed from each run.
 
         ds : Dataset, optional
             An optional dataset object that can be used during the initial run of the model.
 
+        n_workers : int, optional
+            Number of worker processes. With `n_workers > 1` the runs are distributed over
+            a process pool; each worker owns its own AMPL instance, created and loaded with
+            the model on its first run. Defaults to 1 (sequential runs on `es_model`).
+            Calling scripts must be guarded by `if __name__ == '__main__':`.
+
+        threads_per_worker : int, optional
+            Number of solver threads per worker (passed as `threads=` in the
+            `<solver>_options`). Defaults to the number of CPUs divided by `n_workers`
+            in parallel mode, so that solver threads x workers do not oversubscribe cores.
+
+        deduplicate_parameters : bool, optional
+            If True (default), the results store the parameters whose values are the same in
+            every run once, and the others as per-run differences to the first run (see
+            `RunParameters`). Invariance is decided by comparing the values parsed from each
+            run, so parameters computed by the model (e.g. `tau` from `i_rate`) are kept per run.
+            Each run is reduced as soon as it is parsed, so only the first run's parameters are
+            held in full. `result.parameters[name]` still returns the Run-tagged DataFrame.
+
         Returns:
         --------
-        list[Result]
-            A list of results obtained after each model run. Each element in the list
-            corresponds to the result of one iteration of the model.
+        Result
+            The results of all runs, merged in run order and identified by the 'Run' column.
 
         Raises:
         -------
@@ -235,7 +297,49 @@ class Energyscope:
         TypeError
             If any 'value' column is not numeric.
         """
-
+        value_columns = self._check_sequence_data(data)
+
+        # Group the rows once, so that each run updates each parameter in a single call
+        groups = self._group_sequence_data(data)
+
+        # With deduplication, each run's parameters are reduced to their changes to the first run
+        # as soon as it is parsed, so that only one full set of parameters is held at a time
+        runs = []
+        parameters = None
+
+        def collect(result: Result, id_run: int) -> None:
+            nonlocal parameters
+            if deduplicate_parameters:
+                if parameters is None:
+                    # The swept parameters are always stored per run
+                    parameters = RunParameters.from_first_run(result.parameters, id_run, set(data['param']))
+                else:
+                    parameters.add_run(result.parameters, id_run)
+                result.parameters = {}
+            runs.append(result)
+
+        if n_workers > 1 and len(value_columns) > 1:
+            self._calc_sequence_parallel(data, groups, value_columns, parser, ds, n_workers, threads_per_worker,
+                                         collect)
+        else:
+            # If AMPL has not been initialized, do so now
+            if self.es_model.getSets().__len__() == 0:
+                self._initial_run(ds=ds)
+
+            for j, col_name in enumerate(value_columns):
+                collect(self._solve_run(groups, data[col_name].to_numpy(), col_name, j + 1, parser), j + 1)
+
+        # Merge all runs at once, in run order
+        result = Result.concat(runs)
+        if parameters is not None:
+            result.parameters = parameters
+        return result
+
+    @staticmethod
+    def _check_sequence_data(data: pd.DataFrame) -> list[str]:
+        """
+        Validates the `calc_sequence` input and returns its 'value' columns.
+        """
         # Check for required columns
         required_columns = ['param', 'index0', 'index1', 'index2', 'index3']
         missing_columns = [col for col in required_columns if col not in data.columns]
@@ -267,79 +371,106 @@ class Energyscope:
             # Optionally, check for NaN values introduced by coercion
             if data[col].isnull().any():
                 raise ValueError(f"Column '{col}' contains non-numeric values that could not be converted.")
-        
-
-        # If AMPL has not been initialized, do so now
-        if self.es_model.getSets().__len__() == 0:
-            self._initial_run(ds=ds)
-
-        # Map each unique 'param' to the AMPL parameter object
-        unique_params = data['param'].unique()
-        parameters = {param: self.es_model.get_parameter(param) for param in unique_params}
-
-        # Gather the index columns for convenience
-        data_index_columns = data.columns[data.columns.str.startswith('index')].to_list()
-
-        # Container for merged results across runs
-        results_n = {}
-
-        # Loop over each 'value' column => each separate model run
-        for j in range(len(value_columns)):
-            col_name = value_columns[j]
-
-            for row_idx, row in data.iterrows():
-                param_name = row['param']
-                param_val = row[col_name]
 
-                # Extract only non-NA entries among index0..index3
-                idx_data = {idx_col: row[idx_col]
-                            for idx_col in data_index_columns
-                            if pd.notnull(row[idx_col])}
+        return value_columns
 
-                if len(idx_data) == 0:
-                    # No valid index => treat as a scalar
-                    parameters[param_name].set(param_val)
-                else:
-                    # At least one valid index => build a small DataFrame and set via set_values
-                    row_slice = row[data_index_columns + [col_name]].dropna()
-                    param_df = pd.DataFrame([row_slice.values], columns=row_slice.index)
-
-                    # Identify which columns actually function as indices here
-                    index_cols = [ic for ic in data_index_columns if ic in param_df.columns]
-                    param_df.set_index(index_cols, inplace=True)
+    @staticmethod
+    def _group_sequence_data(data: pd.DataFrame) -> list[tuple]:
+        """
+        Groups the rows of the sequence data by parameter and index arity.
 
-                    parameters[param_name].set_values(param_df)
+        Returns a list of (param_name, index, positions) tuples: `positions` are the row
+        positions of the group in `data` and `index` is the (Multi)Index of their non-NA
+        index columns, or None for scalar parameters. Duplicated indices keep the last
+        row, as successive row-by-row updates would.
+        """
+        index_columns = data.columns[data.columns.str.startswith('index')].to_list()
+        present = data[index_columns].notna().to_numpy()
+
+        rows = {}
+        for pos, (param_name, mask) in enumerate(zip(data['param'], present)):
+            rows.setdefault((param_name, tuple(mask)), []).append(pos)
+
+        groups = []
+        for (param_name, mask), positions in rows.items():
+            cols = [col for col, is_set in zip(index_columns, mask) if is_set]
+            if not cols:
+                # No valid index => scalar, the last row wins
+                groups.append((param_name, None, np.array(positions[-1:])))
+                continue
+            frame = data.iloc[positions][cols]
+            index = pd.Index(frame[cols[0]]) if len(cols) == 1 else pd.MultiIndex.from_frame(frame)
+            keep = ~index.duplicated(keep='last')
+            groups.append((param_name, index[keep], np.asarray(positions)[keep]))
+        return groups
+
+    def _set_run_values(self, groups: list[tuple], values: np.ndarray, col_name: str) -> None:
+        """
+        Pushes the values of one run to the AMPL parameters, one call per parameter group.
+        """
+        for param_name, index, positions in groups:
+            parameter = self.es_model.get_parameter(param_name)
+            if index is None:
+                parameter.set(float(values[positions[0]]))
+            else:
+                parameter.set_values(pd.DataFrame({col_name: values[positions]}, index=index))
 
-            # Solve model after all parameters for this run have been updated
-            self.es_model.solve()
-            print(f"Run {j + 1} complete.")
+    def _solve_run(self, groups: list[tuple], values: np.ndarray, col_name: str, id_run: int,
+                   parser: Callable[[AMPL], Result]) -> Result:
+        """
+        Runs one step of a sequence: updates the parameters, solves and parses the results.
+        """
+        self._set_run_values(groups, values, col_name)
 
-            # Check solver status
-            if self.es_model.solve_result_num > 99:
-                print("No optimal solution found, solver status:", self.es_model.solve_result_num)
+        # Solve model after all parameters for this run have been updated
+        self.es_model.solve()
+        print(f"Run {id_run} complete.")
 
-            # Parse this run's results
-            results_current = parser(self.es_model, id_run=j + 1)
+        # Check solver status
+        if self.es_model.solve_result_num > 99:
+            print("No optimal solution found, solver status:", self.es_model.solve_result_num)
+
+        # Parse this run's results; lazily parsed entities must be read before the next run
+        result = parser(self.es_model, id_run=id_run)
+        if isinstance(result, Result):
+            result.materialize()
+        return result
+
+    def _calc_sequence_parallel(self, data: pd.DataFrame, groups: list[tuple], value_columns: list[str],
+                                parser: Callable[[AMPL], Result], ds: Dataset,
+                                n_workers: int, threads_per_worker: int,
+                                collect: Callable[[Result, int], None]) -> None:
+        """
+        Distributes the runs of `calc_sequence` over a pool of worker processes.
 
-            # Merge with previous runs or store as first
-            if j == 0:
-                results_n = results_current
-            else:
-                # Merge new data into results_n
-                for var_name in results_n.variables.keys():
-                    results_n.variables[var_name] = pd.concat(
-                        [results_n.variables[var_name], results_current.variables[var_name]]
-                    )
-                for par_name in results_n.parameters.keys():
-                    results_n.parameters[par_name] = pd.concat(
-                        [results_n.parameters[par_name], results_current.parameters[par_name]]
-                    )
-                for obj_name in results_n.objectives.keys():
-                    results_n.objectives[obj_name] = pd.concat(
-                        [results_n.objectives[obj_name], results_current.objectives[obj_name]]
-                    )
-
-        return results_n
+        Passes the parsed results to `collect(result, id_run)` in run order, releasing each
+        one from its future once collected.
+        """
+        n_workers = min(n_workers, len(value_columns))
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // n_workers)
+
+        config = {
+            'model': self.model,
+            'solver_options': _with_solver_threads(self.solver_options, threads_per_worker),
+            'notebook': self.notebook,
+            'license_uuid': self.license_uuid,
+            'modules': self.modules,
+            'ds': ds,
+            'threads': threads_per_worker,
+        }
+
+        # 'spawn' so that no AMPL process state is inherited from the parent
+        with ProcessPoolExecutor(max_workers=n_workers,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_sequence_worker,
+                                 initargs=(config,)) as pool:
+            futures = [pool.submit(_run_sequence_worker, groups, data[col_name].to_numpy(), col_name, j + 1,
+                                   parser)
+                       for j, col_name in enumerate(value_columns)]
+            for j, future in enumerate(futures):
+                futures[j] = None
+                collect(future.result(), j + 1)
 
     def add_technology(self, tech_parameters: dict, output_dir: str, tech_sets: dict = None):
         """
@@ -471,3 +602,52 @@ class Energyscope:
             # Handle errors, print a message, and prevent further processing.
             print(f"Error while adding technology: {e}")
             return None
+
+
+def _with_solver_threads(solver_options: dict, threads: int) -> dict:
+    """
+    Returns a copy of `solver_options` limiting the solver to `threads` threads.
+
+    The `threads=` setting of an existing `<solver>_options` string is replaced,
+    otherwise it is appended to the string.
+    """
+    options = dict(solver_options)
+    key = f"{options.get('solver', 'gurobi')}_options"
+    current = options.get(key, '')
+    if re.search(r'(?<!\S)threads=\S*', current):
+        options[key] = re.sub(r'(?<!\S)threads=\S*', f'threads={threads}', current)
+    else:
+        options[key] = f"{current} threads={threads}".strip()
+    return options
+
+
+# State of a `calc_sequence` worker process: its configuration and its lazily created model
+_worker_config = None
+_worker_es = None
+
+
+def _init_sequence_worker(config: dict) -> None:
+    """
+    Initializer of the `calc_sequence` worker processes.
+    """
+    global _worker_config
+    _worker_config = config
+    # Keep numerical libraries in line with the solver thread budget
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(config['threads'])
+
+
+def _run_sequence_worker(groups: list[tuple], values: np.ndarray, col_name: str, id_run: int,
+                         parser: Callable[[AMPL], Result]) -> Result:
+    """
+    Solves one run of a sequence in a worker process, loading the model on first use.
+    """
+    global _worker_es
+    if _worker_es is None:
+        _worker_es = Energyscope(model=_worker_config['model'],
+                                 solver_options=_worker_config['solver_options'],
+                                 notebook=_worker_config['notebook'],
+                                 license_uuid=_worker_config['license_uuid'],
+                                 modules=_worker_config['modules'])
+        _worker_es._initial_run(ds=_worker_config['ds'])
+    return _worker_es._solve_run(groups, values, col_name, id_run, parser)
@@ -0,0 +1,13 @@
+"""
+Direct HiGHS backend for Energyscope models.
+
+This module builds the core model as NumPy arrays (cost vector, bounds and a
+column-compressed constraint matrix) and passes it to HiGHS with a single
+``highspy.Highs.passModel`` call, without an intermediate modelling layer.
+"""
+
+from .matrix_model import MatrixModel, RowArray
+from .core_model import build_core_model_highs
+from .result_parser import parse_highs_result
+
+__all__ = ['MatrixModel', 'RowArray', 'build_core_model_highs', 'parse_highs_result']
@@ -0,0 +1,598 @@
+"""
+EnergyScope core model assembled as matrices for HiGHS.
+
+Same formulation as linopy_backend.core_model_xarray (ESTD_model_core.mod):
+yearly sums run over the periods of the year, storage flows are indexed by
+(hour, typical day) and structurally zero variables are not created. Each
+constraint family is one ConstraintBlock of (row, column, coefficient)
+triplets computed with NumPy broadcasting; the whole LP is then handed to
+HiGHS in a single passModel call (see matrix_model.MatrixModel).
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from energyscope.profiling import BuildProfiler
+from energyscope.pyoptinterface_backend.assembly import ConstraintBlock, lookup, positions
+from energyscope.time_index import TimeIndex
+from .matrix_model import MatrixModel
+
+ALL_GROUPS = ['energy_balance', 'resources', 'storage', 'costs', 'gwp', 'mobility', 'heating', 'network', 'policy']
+SHARES = ('share_mobility_public', 'share_freight_train', 'share_freight_road', 'share_freight_boat', 'share_heat_dhn')
+
+
+def _end_uses_input(parameters: Dict[str, Any]) -> Dict[str, float]:
+    """Yearly end-use demands, summed over the sectors."""
+    end_uses_input = parameters.get('end_uses_input')
+    if end_uses_input is None:
+        demand = parameters.get('end_uses_demand_year', pd.Series(dtype=float))
+        end_uses_input = demand.groupby(level=0).sum() if len(demand) else demand
+    return {key: float(value) for key, value in dict(end_uses_input).items()}
+
+
+def build_core_model_highs(data: Optional[Dict[str, Any]] = None, constraint_groups: list = None,
+                           storage_formulation: str = 'chronological', verbose: bool = True,
+                           profiler: Optional[BuildProfiler] = None) -> MatrixModel:
+    """
+    Build the EnergyScope core model as a MatrixModel.
+
+    Args:
+        data: Dataset in the format of data_loader_full.create_full_dataset (dict with
+            'sets' and 'parameters'; default: the full ESTD dataset)
+        constraint_groups: List of groups to include (default: all)
+        storage_formulation: 'chronological' or 'intra_inter' (see
+            core_model_xarray.build_core_model_xarray)
+        verbose: Whether to print progress messages
+        profiler: Records the wall time, CPU time, memory and size of each constraint
+            group (see energyscope.profiling.BuildProfiler); its table is stored in
+            the model's `profile`
+
+    Returns:
+        MatrixModel ready to solve (variable and constraint families named as in
+        the xarray model)
+
+    Raises:
+        ValueError: If the storage formulation is unknown
+    """
+    if storage_formulation not in ('chronological', 'intra_inter'):
+        raise ValueError(f"Unknown storage formulation: {storage_formulation}")
+    if constraint_groups is None:
+        constraint_groups = ALL_GROUPS
+    if data is None:
+        from energyscope.linopy_backend.data_loader_full import create_full_dataset
+        data = create_full_dataset()
+    t_start = time.time()
+
+    if verbose:
+        print("=" * 70)
+        print("Building HiGHS matrix core model")
+        print("=" * 70)
+
+    sets, parameters = data['sets'], data['parameters']
+    m = MatrixModel()
+    if profiler is None:
+        profiler = BuildProfiler(enabled=False)
+    profiler.bind(m.constraints)
+
+    # =========================================================================
+    # SETS AND PARAMETERS (dense arrays)
+    # =========================================================================
+
+    HOURS = pd.Index(sets['HOURS'], name='hour')
+    TYPICAL_DAYS = pd.Index(sets['TYPICAL_DAYS'], name='td')
+    STORAGE_TECH = pd.Index(sets['STORAGE_TECH'], name='storage')
+    RESOURCES = pd.Index(sets['RESOURCES'], name='resource')
+    LAYERS = pd.Index(sets['LAYERS'], name='layer')
+    END_USES_TYPES = pd.Index(sets.get('END_USES_TYPES', []), name='end_use_type')
+    # TECHNOLOGIES includes STORAGE_TECH in the AMPL model; each technology appears once
+    ALL_TECH = pd.Index(list(dict.fromkeys(list(sets['TECHNOLOGIES']) + list(STORAGE_TECH))), name='tech')
+    TECH_NOSTORAGE = ALL_TECH[~ALL_TECH.isin(STORAGE_TECH)]
+    ENTITIES = pd.Index(list(dict.fromkeys(list(RESOURCES) + list(ALL_TECH))), name='entity')
+    STORAGE_DAILY = [j for j in sets.get('STORAGE_DAILY', []) if j in STORAGE_TECH]
+    SEASONAL = STORAGE_TECH[~STORAGE_TECH.isin(STORAGE_DAILY)]
+    TECHNOLOGIES_OF_END_USES_TYPE = sets.get('TECHNOLOGIES_OF_END_USES_TYPE', {})
+    TECHNOLOGIES_OF_END_USES_CATEGORY = sets.get('TECHNOLOGIES_OF_END_USES_CATEGORY', {})
+    EVs_BATT_OF_V2G = sets.get('EVs_BATT_OF_V2G', {})
+    V2G = pd.Index([i for i in sets.get('V2G', []) if EVs_BATT_OF_V2G.get(i) and i in ALL_TECH], name='v2g')
+    EV_BATTERIES = [EVs_BATT_OF_V2G[i][0] for i in V2G]  # One battery per V2G vehicle
+    n_h, n_td = len(HOURS), len(TYPICAL_DAYS)
+
+    def param(name, axes, default=0.0):
+        values = lookup(parameters.get(name, {}), axes, default)
+        return np.where(np.isnan(values), default, values)
+
+    def scalar(name, default=0.0):
+        return float(parameters.get(name, default))
+
+    # Time: yearly sums run over the periods (each (h, td) weighted by its number of periods)
+    time_index = TimeIndex(sets['T_H_TD'], HOURS, TYPICAL_DAYS)
+    PERIODS = pd.Index(time_index.periods, name='period')
+    hp, tdp = time_index.hour_pos, time_index.td_pos
+    T_OP = param('t_op', [HOURS, TYPICAL_DAYS], 1.0)
+    T_OP_YEAR = T_OP * time_index.incidence().sum(axis=0).A1.reshape(n_h, n_td)
+    TOTAL_TIME = float(T_OP_YEAR.sum())
+
+    F_MAX = param('f_max', [ALL_TECH], np.inf)
+    F_MIN = param('f_min', [ALL_TECH], 0.0)
+    LAYERS_IN_OUT = param('layers_in_out', [ENTITIES, LAYERS])
+    C_P_T = param('c_p_t', [ALL_TECH, HOURS, TYPICAL_DAYS], 1.0)
+    EFF_IN = param('storage_eff_in', [STORAGE_TECH, LAYERS])
+    EFF_OUT = param('storage_eff_out', [STORAGE_TECH, LAYERS])
+    I_RATE = scalar('i_rate', 0.05)
+    eui = _end_uses_input(parameters)
+
+    def tech(labels):
+        return positions(labels, ALL_TECH)
+
+    def entity(labels):
+        return positions(labels, ENTITIES)
+
+    # =========================================================================
+    # VARIABLES
+    # =========================================================================
+
+    F = m.add_variables('F', [ALL_TECH], F_MIN, F_MAX).index
+
+    # Operation level: not created for entities on no layer (other than daily storage, whose
+    # F_t is the storage level) and technologies at hours without capacity factor
+    available = np.ones((len(ENTITIES), n_h, n_td), dtype=bool)
+    available[entity(ALL_TECH)] = C_P_T > 0
+    operating = (LAYERS_IN_OUT != 0).any(axis=1) | ENTITIES.isin(STORAGE_DAILY)
+    F_t_mask = operating[:, None, None] & available
+    F_t = m.add_variables('F_t', [ENTITIES, HOURS, TYPICAL_DAYS], mask=F_t_mask).index
+
+    # Storage flows on compatible layers only, levels as in the chosen formulation
+    storage_flow = [STORAGE_TECH, LAYERS, HOURS, TYPICAL_DAYS]
+    Storage_in = m.add_variables('Storage_in', storage_flow, mask=(EFF_IN > 0)[:, :, None, None]).index
+    Storage_out = m.add_variables('Storage_out', storage_flow, mask=(EFF_OUT > 0)[:, :, None, None]).index
+    if storage_formulation == 'chronological':
+        Storage_level = m.add_variables('Storage_level', [STORAGE_TECH, PERIODS]).index
+    else:
+        day_td_pos = time_index.day_td_pos()
+        DAYS = pd.Index(np.arange(1, len(day_td_pos) + 1), name='day')
+        intra = m.add_variables('Storage_level_intra', [STORAGE_TECH, HOURS, TYPICAL_DAYS], -np.inf).index
+        inter = m.add_variables('Storage_level_inter', [SEASONAL, DAYS]).index
+        intra_max = m.add_variables('Storage_intra_max', [SEASONAL, TYPICAL_DAYS]).index
+        intra_min = m.add_variables('Storage_intra_min', [SEASONAL, TYPICAL_DAYS], -np.inf, 0.0).index
+
+    shares = {share: m.add_variables(share.capitalize(), [], scalar(f'{share}_min', 0.0),
+                                     scalar(f'{share}_max', 1.0)).index for share in SHARES}
+    End_uses = m.add_variables('End_uses', [LAYERS, HOURS, TYPICAL_DAYS]).index
+    Network_losses = m.add_variables('Network_losses', [END_USES_TYPES, HOURS, TYPICAL_DAYS]).index
+
+    def annual(block, columns, coefficients=1.0, rows=None):
+        """Add the yearly total of (..., hour, td) columns to `rows`."""
+        block.add_terms(columns, np.asarray(coefficients)[..., None, None] * T_OP_YEAR,
+                        block.rows[..., None, None] if rows is None else rows)
+
+    # Hourly demand profiles (hour, td)
+    elec_ts = param('electricity_time_series', [HOURS, TYPICAL_DAYS])
+    heat_ts = param('heating_time_series', [HOURS, TYPICAL_DAYS])
+    heat_low_t = eui.get('HEAT_LOW_T_HW', 0.0) / TOTAL_TIME + eui.get('HEAT_LOW_T_SH', 0.0) * heat_ts / T_OP
+    passenger = eui.get('MOBILITY_PASSENGER', 0.0) * param('mob_pass_time_series', [HOURS, TYPICAL_DAYS]) / T_OP
+    freight = eui.get('MOBILITY_FREIGHT', 0.0) * param('mob_freight_time_series', [HOURS, TYPICAL_DAYS]) / T_OP
+
+    # =========================================================================
+    # GROUP 1: ENERGY BALANCE
+    # =========================================================================
+
+    if 'energy_balance' in constraint_groups:
+        profiler.start('energy_balance')
+        # End_uses[l,h,td] = fixed demand + demand shared by the share variables (+ DHN losses) [Eq. 2.8]
+        fixed_demand = np.zeros((len(LAYERS), n_h, n_td))
+        for layer, profile in {
+            'ELECTRICITY': eui.get('ELECTRICITY', 0.0) / TOTAL_TIME + eui.get('LIGHTING', 0.0) * elec_ts / T_OP,
+            'HEAT_LOW_T_DECEN': heat_low_t, 'MOB_PRIVATE': passenger,
+            'HEAT_HIGH_T': eui.get('HEAT_HIGH_T', 0.0) / TOTAL_TIME,
+        }.items():
+            if layer in LAYERS:
+                fixed_demand[LAYERS.get_loc(layer)] = profile
+        block = ConstraintBlock(End_uses.shape)
+        block.add_terms(End_uses)
+        for share, profiles in {
+            'share_heat_dhn': {'HEAT_LOW_T_DHN': heat_low_t, 'HEAT_LOW_T_DECEN': -heat_low_t},
+            'share_mobility_public': {'MOB_PUBLIC': passenger, 'MOB_PRIVATE': -passenger},
+            'share_freight_train': {'MOB_FREIGHT_RAIL': freight},
+            'share_freight_road': {'MOB_FREIGHT_ROAD': freight},
+            'share_freight_boat': {'MOB_FREIGHT_BOAT': freight},
+        }.items():
+            for layer, profile in profiles.items():
+                if layer in LAYERS:
+                    block.add_terms(shares[share], -profile, block.rows[LAYERS.get_loc(layer)])
+        if 'HEAT_LOW_T_DHN' in LAYERS and 'HEAT_LOW_T_DHN' in END_USES_TYPES:
+            block.add_terms(Network_losses[END_USES_TYPES.get_loc('HEAT_LOW_T_DHN')], -1.0,
+                            block.rows[LAYERS.get_loc('HEAT_LOW_T_DHN')])
+        m.add_constraints('end_uses_t', block, '==', fixed_demand, labels=[LAYERS, HOURS, TYPICAL_DAYS])
+
+        # F_t[j,h,td] <= F[j] * c_p_t[j,h,td] [Eq. 2.10]
+        F_t_tech = F_t[entity(ALL_TECH)]
+        block = ConstraintBlock(F_t_tech.shape, mask=F_t_mask[entity(ALL_TECH)])
+        block.add_terms(F_t_tech)
+        block.add_terms(F[:, None, None], -C_P_T)
+        m.add_constraints('capacity_factor_t', block, '<=', labels=[ALL_TECH, HOURS, TYPICAL_DAYS])
+
+        # Yearly output <= F * c_p * total_time [Eq. 2.11]
+        block = ConstraintBlock(len(ALL_TECH))
+        annual(block, F_t_tech)
+        block.add_terms(F, -param('c_p', [ALL_TECH], 1.0) * TOTAL_TIME)
+        m.add_constraints('capacity_factor', block, '<=', labels=[ALL_TECH])
+
+        # sum(layers_in_out * F_t) + sum(Storage_out - Storage_in) = End_uses [Eq. 2.13]
+        block = ConstraintBlock(End_uses.shape)
+        block.add_terms(F_t[:, None], LAYERS_IN_OUT[:, :, None, None], block.rows[None])
+        block.add_terms(Storage_out, 1.0, block.rows[None])
+        block.add_terms(Storage_in, -1.0, block.rows[None])
+        block.add_terms(End_uses, -1.0)
+        m.add_constraints('layer_balance', block, '==', labels=[LAYERS, HOURS, TYPICAL_DAYS])
+        if verbose:
+            print(f"  ✓ Energy balance: {m.n_rows:,} constraints")
+
+    # =========================================================================
+    # GROUP 2: RESOURCES
+    # =========================================================================
+
+    F_t_resources = F_t[entity(RESOURCES)]
+    if 'resources' in constraint_groups:
+        profiler.start('resources')
+        # Yearly use <= avail, for resources with a finite availability [Eq. 2.12]
+        avail = param('avail', [RESOURCES], np.inf)
+        limited = np.isfinite(avail)
+        block = ConstraintBlock(len(RESOURCES), mask=limited)
+        annual(block, F_t_resources)
+        m.add_constraints('resource_availability', block, '<=', np.where(limited, avail, 0.0), labels=[RESOURCES])
+
+        # F_t[i,h,td] * t_op[h,td] = Import_constant[i]
+        RES_IMPORT_CONSTANT = pd.Index([i for i in sets.get('RES_IMPORT_CONSTANT', []) if i in RESOURCES],
+                                       name='resource')
+        if len(RES_IMPORT_CONSTANT) > 0:
+            Import_constant = m.add_variables('Import_constant', [RES_IMPORT_CONSTANT]).index
+            block = ConstraintBlock((len(RES_IMPORT_CONSTANT), n_h, n_td))
+            block.add_terms(F_t[entity(RES_IMPORT_CONSTANT)], T_OP)
+            block.add_terms(Import_constant[:, None, None], -1.0)
+            m.add_constraints('resource_constant_import', block, '==',
+                              labels=[RES_IMPORT_CONSTANT, HOURS, TYPICAL_DAYS])
+
+    # =========================================================================
+    # GROUP 3: STORAGE
+    # =========================================================================
+
+    if 'storage' in constraint_groups and len(STORAGE_TECH) > 0:
+        profiler.start('storage')
+        n_rows = m.n_rows
+        losses = param('storage_losses', [STORAGE_TECH])
+        daily = positions(STORAGE_DAILY, STORAGE_TECH)
+        seasonal = positions(SEASONAL, STORAGE_TECH)
+        inverse_eff_out = np.divide(1.0, EFF_OUT, out=np.zeros_like(EFF_OUT), where=EFF_OUT > 0)
+
+        if storage_formulation == 'chronological':
+            # Storage_level[j,t] = Storage_level[j,t-1] * (1-losses) + t_op * (inputs - outputs) [Eq. 2.14],
+            # the first period following the last one (cyclic year)
+            block = ConstraintBlock(Storage_level.shape)
+            block.add_terms(Storage_level)
+            block.add_terms(Storage_level[:, time_index.previous], -(1.0 - losses)[:, None])
+            block.add_terms(Storage_in[:, :, hp, tdp], -EFF_IN[:, :, None] * T_OP[hp, tdp], block.rows[:, None])
+            block.add_terms(Storage_out[:, :, hp, tdp], inverse_eff_out[:, :, None] * T_OP[hp, tdp], block.rows[:, None])
+            m.add_constraints('storage_level', block, '==', labels=[STORAGE_TECH, PERIODS])
+
+            # Daily storage: Storage_level[j,t] = F_t[j, h(t), td(t)] [Eq. 2.15]
+            if STORAGE_DAILY:
+                block = ConstraintBlock((len(daily), len(PERIODS)))
+                block.add_terms(Storage_level[daily])
+                block.add_terms(F_t[entity(STORAGE_DAILY)][:, hp, tdp], -1.0)
+                m.add_constraints('impose_daily_storage', block, '==', labels=[STORAGE_DAILY, PERIODS])
+
+            # Storage_level[j,t] <= F[j], for storage that is not daily [Eq. 2.16]
+            block = ConstraintBlock((len(seasonal), len(PERIODS)))
+            block.add_terms(Storage_level[seasonal])
+            block.add_terms(F[tech(SEASONAL)][:, None], -1.0)
+            m.add_constraints('limit_energy_stored_to_maximum', block, '<=', labels=[SEASONAL, PERIODS])
+        else:
+            # Level within each typical day: from the last hour of the same day for daily storage,
+            # from 0 at the start of the day for seasonal storage
+            carried = np.ones((len(STORAGE_TECH), n_h))
+            carried[seasonal, 0] = 0.0
+            block = ConstraintBlock(intra.shape)
+            block.add_terms(intra)
+            block.add_terms(np.roll(intra, 1, axis=1), -((1.0 - losses)[:, None] * carried)[:, :, None])
+            block.add_terms(Storage_in, -EFF_IN[:, :, None, None] * T_OP, block.rows[:, None])
+            block.add_terms(Storage_out, inverse_eff_out[:, :, None, None] * T_OP, block.rows[:, None])
+            m.add_constraints('storage_level_intra', block, '==', labels=[STORAGE_TECH, HOURS, TYPICAL_DAYS])
+
+            if STORAGE_DAILY:
+                block = ConstraintBlock((len(daily), n_h, n_td))
+                block.add_terms(intra[daily])
+                block.add_terms(F_t[entity(STORAGE_DAILY)], -1.0)
+                m.add_constraints('impose_daily_storage_td', block, '==', labels=[STORAGE_DAILY, HOURS, TYPICAL_DAYS])
+
+        if storage_formulation == 'intra_inter' and len(SEASONAL) > 0:
+            # Seasonal storage: level at the start of each day carried by the change over the
+            # typical day of the previous day (cyclic year), kept between 0 and F within each day
+            day_loss = (1.0 - losses[seasonal]) ** n_h
+            previous_day = np.roll(np.arange(len(DAYS)), 1)
+            block = ConstraintBlock(inter.shape)
+            block.add_terms(inter)
+            block.add_terms(inter[:, previous_day], -day_loss[:, None])
+            block.add_terms(intra[seasonal, -1][:, day_td_pos[previous_day]], -1.0)
+            m.add_constraints('storage_level_inter', block, '==', labels=[SEASONAL, DAYS])
+            for name, extreme, sense in (('storage_intra_max', intra_max, '<='), ('storage_intra_min', intra_min, '>=')):
+                block = ConstraintBlock((len(seasonal), n_h, n_td))
+                block.add_terms(intra[seasonal])
+                block.add_terms(extreme[:, None, :], -1.0)
+                m.add_constraints(name, block, sense, labels=[SEASONAL, HOURS, TYPICAL_DAYS])
+            block = ConstraintBlock(inter.shape)
+            block.add_terms(inter)
+            block.add_terms(intra_max[:, day_td_pos])
+            block.add_terms(F[tech(SEASONAL)][:, None], -1.0)
+            m.add_constraints('limit_energy_stored_inter_max', block, '<=', labels=[SEASONAL, DAYS])
+            block = ConstraintBlock(inter.shape)
+            block.add_terms(inter, day_loss[:, None])
+            block.add_terms(intra_min[:, day_td_pos])
+            m.add_constraints('limit_energy_stored_inter_min', block, '>=', labels=[SEASONAL, DAYS])
+
+        # Storage_in * t_charge + Storage_out * t_discharge <= F * availability, on compatible
+        # layers, EV batteries excepted [Eq. 2.17]
+        charge_time = param('storage_charge_time', [STORAGE_TECH])
+        discharge_time = param('storage_discharge_time', [STORAGE_TECH])
+        availability = param('storage_availability', [STORAGE_TECH], 1.0)
+        compatible = (EFF_IN > 0) | (EFF_OUT > 0)
+        not_ev = ~STORAGE_TECH.isin(EV_BATTERIES)
+        block = ConstraintBlock(Storage_in.shape, mask=(compatible & not_ev[:, None])[:, :, None, None])
+        block.add_terms(Storage_in, charge_time[:, None, None, None])
+        block.add_terms(Storage_out, discharge_time[:, None, None, None])
+        block.add_terms(F[tech(STORAGE_TECH)][:, None, None, None], -availability[:, None, None, None])
+        m.add_constraints('limit_energy_to_power_ratio', block, '<=', labels=storage_flow)
+
+        # EV batteries: the power used by the vehicles and their capacity in use are not available [Eq. 2.18]
+        if len(V2G) > 0:
+            batteries = positions(EV_BATTERIES, STORAGE_TECH)
+            elec_in_out = LAYERS_IN_OUT[entity(V2G), LAYERS.get_loc('ELECTRICITY')]
+            batteries_in_use = param('batt_per_car', [V2G]) / param('vehicle_capacity', [V2G])
+            block = ConstraintBlock((len(V2G), len(LAYERS), n_h, n_td))
+            block.add_terms(Storage_in[batteries], charge_time[batteries, None, None, None])
+            block.add_terms(Storage_out[batteries], discharge_time[batteries, None, None, None])
+            block.add_terms(F_t[entity(V2G)][:, None], (elec_in_out * discharge_time[batteries]
+                                                        + batteries_in_use * availability[batteries])[:, None, None, None],
+                            block.rows)
+            block.add_terms(F[tech(EV_BATTERIES)][:, None, None, None], -availability[batteries, None, None, None])
+            m.add_constraints('limit_energy_to_power_ratio_bis', block, '<=', labels=[V2G, LAYERS, HOURS, TYPICAL_DAYS])
+        if verbose:
+            print(f"  ✓ Storage: {m.n_rows - n_rows:,} constraints")
+
+    # =========================================================================
+    # GROUP 4: COSTS
+    # =========================================================================
+
+    if 'costs' in constraint_groups:
+        profiler.start('costs')
+        lifetime = param('lifetime', [ALL_TECH])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tau = np.where(lifetime > 0, I_RATE * (1 + I_RATE)**lifetime / ((1 + I_RATE)**lifetime - 1), 0.0)
+        C_inv = m.add_variables('C_inv', [ALL_TECH]).index
+        C_maint = m.add_variables('C_maint', [ALL_TECH]).index
+        C_op = m.add_variables('C_op', [RESOURCES]).index
+        TotalCost = m.add_variables('TotalCost', []).index
+
+        # Cost breakdown [Eqs. 2.3-2.5]
+        for name, columns, coefficient, base in (
+            ('investment_cost_calc', C_inv, param('c_inv', [ALL_TECH]), F),
+            ('main_cost_calc', C_maint, param('c_maint', [ALL_TECH]), F),
+        ):
+            block = ConstraintBlock(len(ALL_TECH))
+            block.add_terms(columns)
+            block.add_terms(base, -coefficient)
+            m.add_constraints(name, block, '==', labels=[ALL_TECH])
+        block = ConstraintBlock(len(RESOURCES))
+        block.add_terms(C_op)
+        annual(block, F_t_resources, -param('c_op', [RESOURCES]))
+        m.add_constraints('op_cost_calc', block, '==', labels=[RESOURCES])
+
+        # Total cost [Eq. 2.1], the objective
+        block = ConstraintBlock(1)
+        block.add_terms(TotalCost)
+        block.add_terms(C_inv, -tau, 0)
+        block.add_terms(C_maint, -1.0, 0)
+        block.add_terms(C_op, -1.0, 0)
+        m.add_constraints('totalcost_cal', block, '==')
+        m.add_objective(TotalCost)
+
+    # =========================================================================
+    # GROUP 5: GWP
+    # =========================================================================
+
+    if 'gwp' in constraint_groups:
+        profiler.start('gwp')
+        GWP_constr = m.add_variables('GWP_constr', [ALL_TECH]).index
+        GWP_op = m.add_variables('GWP_op', [RESOURCES]).index
+        TotalGWP = m.add_variables('TotalGWP', []).index
+
+        # Emission breakdown [Eqs. 2.6-2.7]
+        block = ConstraintBlock(len(ALL_TECH))
+        block.add_terms(GWP_constr)
+        block.add_terms(F, -param('gwp_constr', [ALL_TECH]))
+        m.add_constraints('gwp_constr_calc', block, '==', labels=[ALL_TECH])
+        block = ConstraintBlock(len(RESOURCES))
+        block.add_terms(GWP_op)
+        annual(block, F_t_resources, -param('gwp_op', [RESOURCES]))
+        m.add_constraints('gwp_op_calc', block, '==', labels=[RESOURCES])
+
+        # Total GWP: operating emissions only, as in the AMPL model [Eq. 2.5]
+        block = ConstraintBlock(1)
+        block.add_terms(TotalGWP)
+        block.add_terms(GWP_op, -1.0, 0)
+        m.add_constraints('totalGWP_calc', block, '==')
+
+        # GWP limit [Eq. 2.38]
+        gwp_limit = scalar('gwp_limit', np.inf)
+        if np.isfinite(gwp_limit):
+            block = ConstraintBlock(1)
+            block.add_terms(TotalGWP)
+            m.add_constraints('Minimum_GWP_reduction', block, '<=', gwp_limit)
+
+    # =========================================================================
+    # GROUP 6: MOBILITY
+    # =========================================================================
+
+    if 'mobility' in constraint_groups:
+        profiler.start('mobility')
+        # Constant share of the mobility demand per vehicle [Eqs. 2.24-2.25]
+        for category, name, demand, constraint in (
+            ('MOBILITY_PASSENGER', 'Shares_mobility_passenger', passenger, 'operating_strategy_mob_passenger'),
+            ('MOBILITY_FREIGHT', 'Shares_mobility_freight', freight, 'operating_strategy_mobility_freight'),
+        ):
+            techs = pd.Index([j for j in TECHNOLOGIES_OF_END_USES_CATEGORY.get(category, []) if j in ALL_TECH],
+                             name='tech')
+            if len(techs) == 0:
+                continue
+            category_shares = m.add_variables(name, [techs]).index
+            block = ConstraintBlock((len(techs), n_h, n_td))
+            block.add_terms(F_t[entity(techs)])
+            block.add_terms(category_shares[:, None, None], -demand)
+            m.add_constraints(constraint, block, '==', labels=[techs, HOURS, TYPICAL_DAYS])
+
+        # Freight shares [Eq. 2.26]
+        block = ConstraintBlock(1)
+        for share in ('share_freight_train', 'share_freight_road', 'share_freight_boat'):
+            block.add_terms(shares[share], 1.0, 0)
+        m.add_constraints('Freight_shares', block, '==', 1.0)
+
+        # EV batteries [Eqs. 2.30-2.31]: size proportional to the number of cars, and supply of
+        # the electricity used by the vehicles
+        if len(V2G) > 0:
+            batteries_per_vehicle = param('batt_per_car', [V2G]) / param('vehicle_capacity', [V2G])
+            block = ConstraintBlock(len(V2G))
+            block.add_terms(F[tech(EV_BATTERIES)])
+            block.add_terms(F[tech(V2G)], -batteries_per_vehicle)
+            m.add_constraints('EV_storage_size', block, '==', labels=[V2G])
+            if 'storage' in constraint_groups:
+                batteries = positions(EV_BATTERIES, STORAGE_TECH)
+                elec = LAYERS.get_loc('ELECTRICITY')
+                block = ConstraintBlock((len(V2G), n_h, n_td))
+                block.add_terms(Storage_out[batteries, elec])
+                block.add_terms(F_t[entity(V2G)], LAYERS_IN_OUT[entity(V2G), elec][:, None, None])
+                m.add_constraints('EV_storage_for_V2G_demand', block, '>=', labels=[V2G, HOURS, TYPICAL_DAYS])
+
+    # =========================================================================
+    # GROUP 7: HEATING
+    # =========================================================================
+
+    techs_heat = pd.Index([j for j in TECHNOLOGIES_OF_END_USES_TYPE.get('HEAT_LOW_T_DECEN', [])
+                           if j != 'DEC_SOLAR' and j in ALL_TECH], name='tech')
+    if 'heating' in constraint_groups and len(techs_heat) > 0 and 'DEC_SOLAR' in ALL_TECH:
+        profiler.start('heating')
+        solar_cf = C_P_T[ALL_TECH.get_loc('DEC_SOLAR')]
+        F_solar = m.add_variables('F_solar', [techs_heat]).index
+        F_t_solar = m.add_variables('F_t_solar', [techs_heat, HOURS, TYPICAL_DAYS], mask=solar_cf > 0).index
+        Shares_lowT_dec = m.add_variables('Shares_lowT_dec', [techs_heat]).index
+
+        # F_t_solar <= F_solar * c_p_t['DEC_SOLAR'] [Eq. 2.27]
+        block = ConstraintBlock(F_t_solar.shape, mask=solar_cf > 0)
+        block.add_terms(F_t_solar)
+        block.add_terms(F_solar[:, None, None], -solar_cf)
+        m.add_constraints('thermal_solar_capacity_factor', block, '<=', labels=[techs_heat, HOURS, TYPICAL_DAYS])
+
+        # Total solar capacity [Eq. 2.28]
+        block = ConstraintBlock(1)
+        block.add_terms(F[ALL_TECH.get_loc('DEC_SOLAR')], 1.0, 0)
+        block.add_terms(F_solar, -1.0, 0)
+        m.add_constraints('thermal_solar_total_capacity', block, '==')
+
+        # Heat balance of each technology with its solar panels and thermal storage [Eq. 2.29]
+        TS_OF_DEC_TECH = sets.get('TS_OF_DEC_TECH', {})
+        techs_ts = pd.Index([j for j in techs_heat if TS_OF_DEC_TECH.get(j)], name='tech')
+        if len(techs_ts) > 0 and 'storage' in constraint_groups and len(STORAGE_TECH) > 0:
+            thermal_storage = positions([TS_OF_DEC_TECH[j][0] for j in techs_ts], STORAGE_TECH)
+            block = ConstraintBlock((len(techs_ts), n_h, n_td))
+            block.add_terms(F_t[entity(techs_ts)])
+            block.add_terms(F_t_solar[positions(techs_ts, techs_heat)])
+            block.add_terms(Storage_out[thermal_storage], 1.0, block.rows[:, None])
+            block.add_terms(Storage_in[thermal_storage], -1.0, block.rows[:, None])
+            block.add_terms(Shares_lowT_dec[positions(techs_ts, techs_heat)][:, None, None], -heat_low_t)
+            m.add_constraints('decentralised_heating_balance', block, '==', labels=[techs_ts, HOURS, TYPICAL_DAYS])
+
+    # =========================================================================
+    # GROUP 8: NETWORK
+    # =========================================================================
+
+    if 'network' in constraint_groups:
+        profiler.start('network')
+        # Network_losses[eut,h,td] = loss_network[eut] * production to eut [Eq. 2.20]
+        if len(END_USES_TYPES) > 0:
+            production = np.zeros((len(ENTITIES), len(END_USES_TYPES)))
+            for k, eut in enumerate(END_USES_TYPES):
+                if eut in LAYERS:
+                    production[:, k] = LAYERS_IN_OUT[:, LAYERS.get_loc(eut)].clip(min=0)
+            block = ConstraintBlock(Network_losses.shape)
+            block.add_terms(Network_losses)
+            block.add_terms(F_t[:, None], -(production * param('loss_network', [END_USES_TYPES]))[:, :, None, None],
+                            block.rows[None])
+            m.add_constraints('network_losses', block, '==', labels=[END_USES_TYPES, HOURS, TYPICAL_DAYS])
+
+        # F[GRID] = 1 + c_grid_extra / c_inv[GRID] * (new wind and PV capacity) [Eq. 2.21]
+        c_inv = param('c_inv', [ALL_TECH])
+        renewables = [j for j in ('WIND_ONSHORE', 'WIND_OFFSHORE', 'PV') if j in ALL_TECH]
+        if 'GRID' in ALL_TECH and renewables and c_inv[ALL_TECH.get_loc('GRID')] > 0:
+            grid_per_capacity = scalar('c_grid_extra') / c_inv[ALL_TECH.get_loc('GRID')]
+            block = ConstraintBlock(1)
+            block.add_terms(F[ALL_TECH.get_loc('GRID')], 1.0, 0)
+            block.add_terms(F[tech(renewables)], -grid_per_capacity, 0)
+            m.add_constraints('extra_grid', block, '==', 1 - grid_per_capacity * F_MIN[tech(renewables)].sum())
+
+        # F[DHN] = sum of the capacities supplying the DHN layer [Eq. 2.22]
+        if 'DHN' in ALL_TECH and 'HEAT_LOW_T_DHN' in LAYERS:
+            block = ConstraintBlock(1)
+            block.add_terms(F[ALL_TECH.get_loc('DHN')], 1.0, 0)
+            block.add_terms(F[tech(TECH_NOSTORAGE)],
+                            -LAYERS_IN_OUT[entity(TECH_NOSTORAGE), LAYERS.get_loc('HEAT_LOW_T_DHN')].clip(min=0), 0)
+            m.add_constraints('extra_dhn', block, '==')
+
+    # =========================================================================
+    # GROUP 9: POLICY
+    # =========================================================================
+
+    if 'policy' in constraint_groups:
+        profiler.start('policy')
+        # Yearly output of j within [fmin_perc, fmax_perc] * yearly output of its end-use type [Eq. 2.36],
+        # one row per (end-use type, technology) pair with an actual limit
+        if TECHNOLOGIES_OF_END_USES_TYPE:
+            membership = np.array([[j in TECHNOLOGIES_OF_END_USES_TYPE[eut] for j in TECH_NOSTORAGE]
+                                   for eut in TECHNOLOGIES_OF_END_USES_TYPE])
+            F_t_nostorage = F_t[entity(TECH_NOSTORAGE)]
+            for name, perc_name, default, sign in (('f_max_perc', 'fmax_perc', 1.0, 1.0),
+                                                   ('f_min_perc', 'fmin_perc', 0.0, -1.0)):
+                perc = param(perc_name, [TECH_NOSTORAGE], default)
+                pairs = np.argwhere(membership & (perc != default))
+                if len(pairs) == 0:
+                    continue
+                block = ConstraintBlock(len(pairs))
+                annual(block, F_t_nostorage[pairs[:, 1]], sign)
+                coefficients = -sign * perc[pairs[:, 1], None] * membership[pairs[:, 0]]
+                annual(block, F_t_nostorage[None], coefficients, block.rows[:, None, None, None])
+                m.add_constraints(name, block, '<=')
+
+        if 'EFFICIENCY' in ALL_TECH:
+            block = ConstraintBlock(1)
+            block.add_terms(F[ALL_TECH.get_loc('EFFICIENCY')], 1.0, 0)
+            m.add_constraints('extra_efficiency', block, '==', 1 / (1 + I_RATE))
+
+        # F[PV] / power_density_pv + (F[DEC_SOLAR] + F[DHN_SOLAR]) / power_density_solar_thermal <= solar_area [Eq. 2.39]
+        density_pv = scalar('power_density_pv')
+        density_thermal = scalar('power_density_solar_thermal')
+        solar_area = scalar('solar_area', np.inf)
+        solar_thermal = [j for j in ('DEC_SOLAR', 'DHN_SOLAR') if j in ALL_TECH]
+        if 'PV' in ALL_TECH and density_pv > 0 and density_thermal > 0 and np.isfinite(solar_area):
+            block = ConstraintBlock(1)
+            block.add_terms(F[ALL_TECH.get_loc('PV')], 1 / density_pv, 0)
+            block.add_terms(F[tech(solar_thermal)], 1 / density_thermal, 0)
+            m.add_constraints('solar_area_limited', block, '<=', solar_area)
+
+    profiler.stop()
+    if profiler.enabled:
+        m.profile = profiler.table()
+    m.timing['build'] = time.time() - t_start
+    if verbose:
+        print(f"  ✓ Model built in {m.timing['build']:.2f}s")
+        print(f"    Variables: {m.n_cols:,}, constraints: {m.n_rows:,}")
+    return m
@@ -0,0 +1,312 @@
+"""
+Linear program in matrix form, passed to HiGHS in one call.
+
+:class:`MatrixModel` allocates variable families as column ranges and
+constraint families as row ranges (from :class:`ConstraintBlock` triplets),
+then assembles the cost vector, the bounds and the column-compressed
+constraint matrix as NumPy arrays and hands them to ``highspy.Highs.passModel``.
+The index arrays of the families map the solution vectors back to labels.
+"""
+
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import highspy
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from energyscope.pyoptinterface_backend.assembly import ConstraintBlock
+from energyscope.pyoptinterface_backend.registry import VariableArray
+
+
+class RowArray:
+    """
+    Rows of one constraint family over the product of some sets.
+
+    Attributes:
+        name: Name of the family
+        labels: Labels of each axis (pd.Index)
+        index: int64 array of row numbers, -1 where no constraint exists
+        nonzeros: Number of nonzero coefficients of the rows
+        columns: Columns with a nonzero coefficient
+    """
+
+    def __init__(self, name: str, labels: Tuple[pd.Index, ...], index: np.ndarray, nonzeros: int = 0,
+                 columns: Optional[np.ndarray] = None):
+        self.name = name
+        self.labels = labels
+        self.index = index
+        self.nonzeros = nonzeros
+        self.columns = np.empty(0, dtype=np.int64) if columns is None else columns
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.index.shape
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Combinations with a constraint."""
+        return self.index >= 0
+
+    def __repr__(self) -> str:
+        return f"RowArray({self.name!r}, constraints={len(self)})"
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.mask))
+
+
+class MatrixModel:
+    """
+    LP ``min c'x + offset`` s.t. ``row_lower <= A x <= row_upper``, ``col_lower <= x <= col_upper``.
+
+    Example:
+        >>> model = MatrixModel()
+        >>> F = model.add_variables('F', [TECHNOLOGIES], upper=f_max)
+        >>> block = ConstraintBlock(len(TECHNOLOGIES))
+        >>> block.add_terms(F.index, 1.0)
+        >>> model.add_constraints('f_min', block, '>=', f_min, labels=[TECHNOLOGIES])
+        >>> model.add_objective(F.index, c_inv)
+        >>> model.solve()
+        >>> model.values('F')                     # solution over TECHNOLOGIES
+    """
+
+    def __init__(self):
+        self.variables: Dict[str, VariableArray] = {}
+        self.constraints: Dict[str, RowArray] = {}
+        self.n_cols = 0
+        self.n_rows = 0
+        self.offset = 0.0
+        self._col_lower, self._col_upper, self._cost = [], [], []
+        self._row_lower, self._row_upper = [], []
+        self._rows, self._cols, self._coefficients = [], [], []
+        self.highs: Optional[highspy.Highs] = None
+        self.status = None
+        self.row_scale: Optional[np.ndarray] = None
+        self.col_scale: Optional[np.ndarray] = None
+        self.timing = {}
+        self.profile: Optional[pd.DataFrame] = None
+
+    def __repr__(self) -> str:
+        return f"MatrixModel(variables={self.n_cols:,}, constraints={self.n_rows:,}, status={self.status})"
+
+    def add_variables(self, name: str, labels: Sequence[Sequence], lower=0.0, upper=np.inf,
+                      mask: Optional[np.ndarray] = None) -> VariableArray:
+        """
+        Create a family of columns.
+
+        Args:
+            name: Name of the family
+            labels: Labels of each indexing set (named pd.Index, or sequences)
+            lower: Lower bounds, broadcastable to the product of the sets
+            upper: Upper bounds, broadcastable to the product of the sets
+            mask: Combinations for which a variable is created, broadcastable to the
+                product of the sets (default: all)
+
+        Returns:
+            VariableArray: Column of each variable, -1 where none is created
+
+        Raises:
+            ValueError: If a family with the same name exists
+        """
+        if name in self.variables:
+            raise ValueError(f"Variable family {name!r} already exists")
+        labels = tuple(pd.Index(list(axis), name=getattr(axis, 'name', None)) for axis in labels)
+        shape = tuple(len(axis) for axis in labels)
+        mask = np.ones(shape, dtype=bool) if mask is None else np.broadcast_to(np.asarray(mask, dtype=bool), shape)
+        n = int(np.count_nonzero(mask))
+        index = np.full(shape, -1, dtype=np.int64)
+        index[mask] = np.arange(self.n_cols, self.n_cols + n)
+        self._col_lower.append(np.broadcast_to(np.asarray(lower, dtype=float), shape)[mask])
+        self._col_upper.append(np.broadcast_to(np.asarray(upper, dtype=float), shape)[mask])
+        self._cost.append(np.zeros(n))
+        self.n_cols += n
+        sets = tuple(axis.name or f'index{i}' for i, axis in enumerate(labels))
+        self.variables[name] = VariableArray(name, sets, labels, index)
+        return self.variables[name]
+
+    def add_constraints(self, name: str, block: ConstraintBlock, sense: str, rhs=0.0,
+                        labels: Optional[Sequence[Sequence]] = None) -> RowArray:
+        """
+        Append the rows of a constraint block.
+
+        Args:
+            name: Name of the family
+            block: Rows to add (terms on the columns of this model)
+            sense: '<=', '==' or '>='
+            rhs: Right-hand side, broadcastable to the block shape
+            labels: Labels of each axis of the block (default: positions)
+
+        Returns:
+            RowArray: Row of each constraint, -1 where the block has none
+
+        Raises:
+            ValueError: If the sense is unknown or a family with the same name exists
+        """
+        if sense not in ('<=', '==', '>='):
+            raise ValueError(f"Unknown constraint sense: {sense}")
+        if name in self.constraints:
+            raise ValueError(f"Constraint family {name!r} already exists")
+        indptr, cols, coefficients = block.to_csr()
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=float), block.shape)
+        rhs = rhs.ravel() if block.mask is None else rhs[block.mask]
+        self._row_lower.append(rhs if sense != '<=' else np.full(block.n_rows, -np.inf))
+        self._row_upper.append(rhs if sense != '>=' else np.full(block.n_rows, np.inf))
+        self._rows.append(self.n_rows + np.repeat(np.arange(block.n_rows), np.diff(indptr)))
+        self._cols.append(cols)
+        self._coefficients.append(coefficients)
+
+        index = np.where(block.rows >= 0, block.rows + self.n_rows, -1)
+        if labels is None:
+            labels = [range(n) for n in block.shape]
+        self.constraints[name] = RowArray(name, tuple(pd.Index(list(axis)) for axis in labels), index,
+                                          len(cols), np.unique(cols))
+        self.n_rows += block.n_rows
+        return self.constraints[name]
+
+    def add_objective(self, columns, coefficients=1.0):
+        """
+        Add ``coefficient * x[column]`` terms to the (minimized) objective.
+
+        Args:
+            columns: Column indices, -1 for missing variables
+            coefficients: Coefficients, broadcastable against `columns`
+        """
+        columns, coefficients = np.broadcast_arrays(np.asarray(columns, dtype=np.int64),
+                                                    np.asarray(coefficients, dtype=float))
+        keep = columns >= 0
+        cost = np.concatenate(self._cost) if self._cost else np.zeros(0)
+        np.add.at(cost, columns[keep], coefficients[keep])
+        self._cost = [cost]
+
+    def matrices(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, sp.csc_matrix, np.ndarray, np.ndarray]:
+        """
+        Arrays of the LP.
+
+        Returns:
+            (cost, col_lower, col_upper, A, row_lower, row_upper), A in CSC format
+            with duplicate entries summed
+        """
+        def stack(parts):
+            return np.concatenate(parts) if parts else np.zeros(0)
+
+        A = sp.csc_matrix((stack(self._coefficients), (stack(self._rows).astype(np.int64),
+                                                       stack(self._cols).astype(np.int64))),
+                          shape=(self.n_rows, self.n_cols))
+        A.sum_duplicates()
+        return (stack(self._cost), stack(self._col_lower), stack(self._col_upper), A,
+                stack(self._row_lower), stack(self._row_upper))
+
+    def to_highs_lp(self, scale: bool = False) -> highspy.HighsLp:
+        """
+        The LP as a highspy.HighsLp (column-wise matrix).
+
+        Args:
+            scale: Whether to pass ``diag(row_scale) A diag(col_scale)`` with the
+                geometric-mean scale factors of conditioning.geometric_mean_scaling,
+                kept in :attr:`row_scale` and :attr:`col_scale`
+        """
+        cost, col_lower, col_upper, A, row_lower, row_upper = self.matrices()
+        self.row_scale = self.col_scale = None
+        if scale:
+            from energyscope.conditioning import geometric_mean_scaling
+
+            self.row_scale, self.col_scale = geometric_mean_scaling(A)
+            A = sp.csc_matrix(sp.diags(self.row_scale) @ A @ sp.diags(self.col_scale))
+            cost = cost * self.col_scale
+            col_lower, col_upper = col_lower / self.col_scale, col_upper / self.col_scale
+            row_lower, row_upper = row_lower * self.row_scale, row_upper * self.row_scale
+        lp = highspy.HighsLp()
+        lp.num_col_ = self.n_cols
+        lp.num_row_ = self.n_rows
+        lp.col_cost_ = cost
+        lp.col_lower_ = col_lower
+        lp.col_upper_ = col_upper
+        lp.row_lower_ = row_lower
+        lp.row_upper_ = row_upper
+        lp.offset_ = self.offset
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        return lp
+
+    def solve(self, verbose: bool = False, scale: bool = False, **options) -> highspy.HighsModelStatus:
+        """
+        Pass the LP to HiGHS in one call and solve it.
+
+        Args:
+            verbose: Whether to enable the HiGHS log
+            scale: Whether to solve the geometric-mean scaled LP (see
+                :meth:`to_highs_lp`); :meth:`solution` and :meth:`row_duals` are
+                unscaled
+            **options: HiGHS options (e.g. solver='ipm', time_limit=600)
+
+        Returns:
+            HiGHS model status
+
+        Raises:
+            RuntimeError: If HiGHS rejects the model
+        """
+        t_start = time.time()
+        lp = self.to_highs_lp(scale=scale)
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue('output_flag', verbose)
+        for option, value in options.items():
+            self.highs.setOptionValue(option, value)
+        if self.highs.passModel(lp) == highspy.HighsStatus.kError:
+            raise RuntimeError("HiGHS rejected the model")
+        self.timing['pass'] = time.time() - t_start
+
+        t_start = time.time()
+        self.highs.run()
+        self.timing['solve'] = time.time() - t_start
+        self.status = self.highs.getModelStatus()
+        return self.status
+
+    @property
+    def objective(self) -> float:
+        """Objective value of the last solve (NaN if not optimal)."""
+        if self.status != highspy.HighsModelStatus.kOptimal:
+            return np.nan
+        return self.highs.getInfo().objective_function_value
+
+    def solution(self) -> np.ndarray:
+        """
+        Primal values of all columns.
+
+        Raises:
+            ValueError: If the model was not solved to optimality
+        """
+        if self.status != highspy.HighsModelStatus.kOptimal:
+            raise ValueError(f"Model has no optimal solution (status: {self.status})")
+        solution = np.asarray(self.highs.getSolution().col_value)
+        return solution if self.col_scale is None else solution * self.col_scale
+
+    def row_duals(self) -> np.ndarray:
+        """Duals of all rows (see :meth:`solution`)."""
+        self.solution()
+        duals = np.asarray(self.highs.getSolution().row_dual)
+        return duals if self.row_scale is None else duals * self.row_scale
+
+    def values(self, name: str, solution: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Solution values of a variable family as a dense array (NaN where no variable exists).
+
+        Args:
+            name: Name of the family
+            solution: Result of :meth:`solution`, to reuse across families (default: read now)
+        """
+        array = self.variables[name]
+        solution = self.solution() if solution is None else solution
+        values = np.full(array.shape, np.nan)
+        values[array.mask] = solution[array.index[array.mask]]
+        return values
+
+    def duals(self, name: str, row_duals: Optional[np.ndarray] = None) -> np.ndarray:
+        """Duals of a constraint family as a dense array (NaN where no constraint exists)."""
+        rows = self.constraints[name]
+        row_duals = self.row_duals() if row_duals is None else row_duals
+        values = np.full(rows.shape, np.nan)
+        values[rows.mask] = row_duals[rows.index[rows.mask]]
+        return values
@@ -0,0 +1,70 @@
+"""
+Result parser for HiGHS matrix models.
+
+Converts the solution of a :class:`MatrixModel` into EnergyScope Result format.
+The solution vector is read once and scattered into each family through its
+index array (see MatrixModel.values).
+"""
+
+import numpy as np
+
+from energyscope.pyoptinterface_backend.result_parser import _frame, _parameter_frame, _scalar_frame, _set_frame
+from energyscope.result import Result
+from .matrix_model import MatrixModel
+
+
+def parse_highs_result(model: MatrixModel, data: dict, id_run=None, duals: bool = False) -> Result:
+    """
+    Convert the solution of a HiGHS matrix model to EnergyScope Result format.
+
+    Variable families (F_t, Storage_in, ...) are given over the full product of
+    their sets, with 0 for combinations without a variable (e.g. storage flows on
+    incompatible layers).
+
+    Args:
+        model: Solved model (e.g. from build_core_model_highs)
+        data: Dataset used to build the model (dict with 'sets' and 'parameters')
+        id_run: Optional run ID for multi-run scenarios
+        duals: Whether to read the duals of the constraint families into `constraints`
+
+    Returns:
+        Result instance compatible with EnergyScope analysis tools
+
+    Raises:
+        ValueError: If the model was not solved to optimality
+    """
+    solution = model.solution()
+
+    variables = {}
+    for name, array in model.variables.items():
+        values = np.nan_to_num(model.values(name, solution))
+        if not array.labels:
+            variables[name] = _scalar_frame(name, float(values))
+        else:
+            variables[name] = _frame(name, array.labels, values)
+
+    objectives = {'TotalCost': _scalar_frame('TotalCost', model.objective)}
+
+    constraints = {}
+    if duals:
+        row_duals = model.row_duals()
+        for name, rows in model.constraints.items():
+            constraints[name] = _frame(name, rows.labels, model.duals(name, row_duals)).dropna()
+
+    parameters = {name: _parameter_frame(name, value) for name, value in data['parameters'].items()}
+    sets = {name: _set_frame(name, value) for name, value in data['sets'].items()}
+
+    # Add Run column if id_run is specified
+    if id_run is not None:
+        for group in (objectives, variables, parameters, constraints):
+            for df in group.values():
+                df['Run'] = id_run
+
+    return Result(
+        constraints=constraints,
+        objectives=objectives,
+        variables=variables,
+        parameters=parameters,
+        sets=sets,
+        build_profile=model.profile
+    )
@@ -23,7 +23,10 @@ import linopy
 import numpy as np
 import pandas as pd
 import xarray as xr
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+from energyscope.profiling import BuildProfiler
+from energyscope.time_index import TimeIndex
 
 
 def load_core_data_from_ampl(mod_file, dat_files):
@@ -43,7 +46,78 @@ def load_core_data_from_ampl(mod_file, dat_files):
     )
 
 
-def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str] = None) -> linopy.Model:
+def hourly_end_uses(data: Dict[str, Any]) -> pd.Series:
+    """
+    Hourly end-use demands of an ESTD dataset, End_uses[l, h, td] [Eq. 2.8].
+
+    The yearly demands (end_uses_input, or end_uses_demand_year summed over the
+    sectors) are spread over the (hour, td) with the demand profiles, as in the
+    xarray and HiGHS builders. This model has no share variables: the shares of
+    public mobility, DHN heat, rail and boat freight are fixed at their lower
+    bounds (share_*_min) and road freight takes the rest. DHN network losses are
+    not added to the demand.
+
+    Args:
+        data: Dataset in the format of data_loader_full.create_full_dataset
+
+    Returns:
+        pd.Series: Demand indexed by (layer, hour, td), for the layers with a demand
+    """
+    sets, parameters = data['sets'], data['parameters']
+    HOURS, TYPICAL_DAYS = sets['HOURS'], sets['TYPICAL_DAYS']
+    hours_tds = pd.MultiIndex.from_product([HOURS, TYPICAL_DAYS])
+
+    def profile(name, default=0.0):
+        values = pd.Series(parameters.get(name, {}), dtype=float).reindex(hours_tds).fillna(default)
+        return values.to_numpy().reshape(len(HOURS), len(TYPICAL_DAYS))
+
+    end_uses_input = parameters.get('end_uses_input')
+    if end_uses_input is None:
+        demand = parameters['end_uses_demand_year']
+        end_uses_input = demand.groupby(level=0).sum() if demand.index.nlevels > 1 else demand
+    eui = {key: float(value) for key, value in dict(end_uses_input).items()}
+    share = {name: float(parameters.get(f'{name}_min', 0.0)) for name in (
+        'share_mobility_public', 'share_heat_dhn', 'share_freight_train', 'share_freight_boat')}
+    share['share_freight_road'] = max(0.0, 1.0 - share['share_freight_train'] - share['share_freight_boat'])
+
+    # Time series are normalized over the year: yearly sums run over the periods
+    t_op = profile('t_op', 1.0)
+    counts = TimeIndex(sets['T_H_TD'], HOURS, TYPICAL_DAYS).incidence().sum(axis=0).A1
+    total_time = float((t_op * counts.reshape(t_op.shape)).sum())
+    heat_low_t = eui.get('HEAT_LOW_T_HW', 0.0) / total_time \
+        + eui.get('HEAT_LOW_T_SH', 0.0) * profile('heating_time_series') / t_op
+    passenger = eui.get('MOBILITY_PASSENGER', 0.0) * profile('mob_pass_time_series') / t_op
+    freight = eui.get('MOBILITY_FREIGHT', 0.0) * profile('mob_freight_time_series') / t_op
+    demand = {
+        'ELECTRICITY': eui.get('ELECTRICITY', 0.0) / total_time
+        + eui.get('LIGHTING', 0.0) * profile('electricity_time_series') / t_op,
+        'HEAT_HIGH_T': eui.get('HEAT_HIGH_T', 0.0) / total_time,
+        'HEAT_LOW_T_DHN': share['share_heat_dhn'] * heat_low_t,
+        'HEAT_LOW_T_DECEN': (1 - share['share_heat_dhn']) * heat_low_t,
+        'MOB_PUBLIC': share['share_mobility_public'] * passenger,
+        'MOB_PRIVATE': (1 - share['share_mobility_public']) * passenger,
+        'MOB_FREIGHT_RAIL': share['share_freight_train'] * freight,
+        'MOB_FREIGHT_ROAD': share['share_freight_road'] * freight,
+        'MOB_FREIGHT_BOAT': share['share_freight_boat'] * freight,
+    }
+    layers = [layer for layer in sets['LAYERS'] if layer in demand]
+    values = np.stack([np.broadcast_to(demand[layer], t_op.shape) for layer in layers]) if layers \
+        else np.empty((0,) + t_op.shape)
+    index = pd.MultiIndex.from_product([layers, HOURS, TYPICAL_DAYS])
+    return pd.Series(values.ravel(), index=index, name='End_uses')
+
+
+def _lookup(table, key, default: float = 0.0) -> float:
+    """Entry `key` of a parameter table (DataFrame or Series), `default` if it is not defined."""
+    try:
+        return float(table.loc[key])
+    except (KeyError, IndexError, TypeError):
+        return default
+
+
+def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str] = None,
+                             storage_formulation: str = 'chronological', engine: str = 'loop',
+                             profiler: Optional[BuildProfiler] = None) -> linopy.Model:
     """
     Build the EnergyScope core model in linopy (incremental version).
     
@@ -52,7 +126,9 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     before adding the next.
     
     Args:
-        data: Dictionary containing all model data (sets, parameters, time_series)
+        data: Dictionary containing all model data (sets, parameters, time_series);
+              without hourly End_uses, the yearly ESTD demands are converted
+              (see hourly_end_uses)
         constraint_groups: List of constraint group names to include.
                           If None, includes all implemented groups.
                           Available groups:
@@ -65,14 +141,35 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
                           - 'heating'
                           - 'network'
                           - 'policy'
+        storage_formulation: 'chronological' (storage level at each period) or
+                             'intra_inter' (level within each typical day, carried
+                             across the days of the year for seasonal storage)
+        engine: 'loop' (one linopy constraint per index, e.g. capacity_factor_t_{j}_{h}_{td})
+                or 'matrix' (same model, one constraint block per family, see
+                core_model_matrix.build_core_model_matrix)
+        profiler: Records the wall time, CPU time, memory and size of each constraint
+                  group (see energyscope.profiling.BuildProfiler)
     
     Returns:
         linopy.Model instance ready to solve
+    
+    Raises:
+        ValueError: If the storage formulation or the engine is unknown
     """
+    if storage_formulation not in ('chronological', 'intra_inter'):
+        raise ValueError(f"Unknown storage formulation: {storage_formulation}")
+    if engine == 'matrix':
+        from .core_model_matrix import build_core_model_matrix
+        return build_core_model_matrix(data, constraint_groups, storage_formulation, profiler)
+    if engine != 'loop':
+        raise ValueError(f"Unknown engine: {engine}")
     if constraint_groups is None:
         constraint_groups = ['energy_balance']  # Start with just energy balance
     
     m = linopy.Model()
+    if profiler is None:
+        profiler = BuildProfiler(enabled=False)
+    profiler.bind(m.constraints)
     
     # ====================================================================
     # EXTRACT DATA
@@ -90,7 +187,8 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     END_USES_TYPES = data['sets']['END_USES_TYPES']
     
     # Derived sets
-    ALL_TECH = TECHNOLOGIES + STORAGE_TECH  # All technologies including storage
+    # All technologies including storage (TECHNOLOGIES already lists them in ESTD data)
+    ALL_TECH = list(dict.fromkeys(list(TECHNOLOGIES) + list(STORAGE_TECH)))
     TECH_NOSTORAGE = [t for t in ALL_TECH if t not in STORAGE_TECH]
     
     # Parameters
@@ -98,8 +196,11 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     f_min = data['parameters']['f_min']
     layers_in_out = data['parameters']['layers_in_out']
     c_p_t = data['parameters']['c_p_t']  # Capacity factors
-    # End_uses can be in time_series with different names
-    End_uses = data['time_series'].get('End_uses', data['time_series'].get('end_uses_demand', None))
+    # End_uses can be in time_series with different names; ESTD datasets have yearly demands
+    time_series = data.get('time_series', {})
+    End_uses = time_series.get('End_uses', time_series.get('end_uses_demand', None))
+    if End_uses is None and 'end_uses_demand_year' in data['parameters']:
+        End_uses = hourly_end_uses(data)
     
     # ====================================================================
     # DECISION VARIABLES
@@ -119,32 +220,70 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # F_t: Operation of technology/resource at each time step [GW]
     # In AMPL: F_t {RESOURCES union TECHNOLOGIES, HOURS, TYPICAL_DAYS}
     # Indexed by: (RESOURCES + TECHNOLOGIES_NOSTORAGE) x HOURS x TYPICAL_DAYS
+    # Structurally zero entries are not created (entities on no layer, hours with c_p_t = 0);
+    # absent entries count as 0 in the expressions (fillna)
     ENTITIES_WITH_F_T = RESOURCES + TECH_NOSTORAGE
+    F_t_mask = xr.DataArray(
+        [[[any(abs(_lookup(layers_in_out, (entity, l))) > 1e-10 for l in LAYERS)
+           and _lookup(c_p_t, (entity, h, td), 1.0) > 0
+           for td in TYPICAL_DAYS] for h in HOURS] for entity in ENTITIES_WITH_F_T],
+        coords=[ENTITIES_WITH_F_T, HOURS, TYPICAL_DAYS]
+    )
     F_t = m.add_variables(
         lower=0,
         coords=[ENTITIES_WITH_F_T, HOURS, TYPICAL_DAYS],
-        name="F_t"
-    )
+        name="F_t",
+        mask=F_t_mask
+    ).fillna(0)
     
     # Storage variables (create if there are storage technologies)
+    # Flows only exist on compatible layers (efficiency > 0): this replaces storage_layer_in/out [Eq. 2.17-2.18]
     if STORAGE_TECH:
+        storage_eff_in = data['parameters'].get('storage_eff_in', pd.Series(dtype=float))
+        storage_eff_out = data['parameters'].get('storage_eff_out', pd.Series(dtype=float))
+        storage_layers_in = xr.DataArray(
+            [[_lookup(storage_eff_in, (j, l)) > 0 for l in LAYERS] for j in STORAGE_TECH], coords=[STORAGE_TECH, LAYERS]
+        )
+        storage_layers_out = xr.DataArray(
+            [[_lookup(storage_eff_out, (j, l)) > 0 for l in LAYERS] for j in STORAGE_TECH], coords=[STORAGE_TECH, LAYERS]
+        )
+        flow_shape = (len(STORAGE_TECH), len(LAYERS), len(HOURS), len(TYPICAL_DAYS))
         Storage_in = m.add_variables(
             lower=0,
             coords=[STORAGE_TECH, LAYERS, HOURS, TYPICAL_DAYS],
-            name="Storage_in"
-        )
+            name="Storage_in",
+            mask=np.broadcast_to(storage_layers_in.values[:, :, None, None], flow_shape)
+        ).fillna(0)
         
         Storage_out = m.add_variables(
             lower=0,
             coords=[STORAGE_TECH, LAYERS, HOURS, TYPICAL_DAYS],
-            name="Storage_out"
-        )
+            name="Storage_out",
+            mask=np.broadcast_to(storage_layers_out.values[:, :, None, None], flow_shape)
+        ).fillna(0)
         
-        Storage_level = m.add_variables(
-            lower=0,
-            coords=[STORAGE_TECH, PERIODS],
-            name="Storage_level"
-        )
+        STORAGE_DAILY = data['sets'].get('STORAGE_DAILY', [])
+        STORAGE_SEASONAL = [s for s in STORAGE_TECH if s not in STORAGE_DAILY]
+        if storage_formulation == 'chronological':
+            Storage_level = m.add_variables(
+                lower=0,
+                coords=[STORAGE_TECH, PERIODS],
+                name="Storage_level"
+            )
+        else:
+            # Level within each typical day: absolute for daily storage, change since the start
+            # of the day for seasonal storage (which can be negative)
+            DAYS = list(range(1, len(TimeIndex(T_H_TD, HOURS, TYPICAL_DAYS).day_td_pos()) + 1))
+            Storage_level_intra = m.add_variables(
+                lower=np.broadcast_to(np.array([0.0 if j in STORAGE_DAILY else -np.inf for j in STORAGE_TECH])[:, None, None],
+                                      (len(STORAGE_TECH), len(HOURS), len(TYPICAL_DAYS))),
+                coords=[STORAGE_TECH, HOURS, TYPICAL_DAYS],
+                name="Storage_level_intra"
+            )
+            # Level at the start of each day of the year, and extreme changes within each typical day
+            Storage_level_inter = m.add_variables(lower=0, coords=[STORAGE_SEASONAL, DAYS], name="Storage_level_inter")
+            Storage_intra_max = m.add_variables(lower=0, coords=[STORAGE_SEASONAL, TYPICAL_DAYS], name="Storage_intra_max")
+            Storage_intra_min = m.add_variables(upper=0, coords=[STORAGE_SEASONAL, TYPICAL_DAYS], name="Storage_intra_min")
     
     # Resource consumption variables
     # In AMPL, resources also use F_t variable
@@ -163,6 +302,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # ====================================================================
     
     if 'energy_balance' in constraint_groups:
+        profiler.start('energy_balance')
         print("Adding Group 1: Energy Balance constraints...")
         
         # Get additional parameters
@@ -179,6 +319,9 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
         for j in TECH_NOSTORAGE:
             for h in HOURS:
                 for td in TYPICAL_DAYS:
+                    if not F_t_mask.loc[j, h, td]:
+                        continue  # No operation variable (c_p_t = 0 or no layer)
+                    
                     # Get capacity factor
                     if (j, h, td) in c_p_t.index:
                         cf = c_p_t.loc[(j, h, td)]
@@ -273,6 +416,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # ====================================================================
     
     if 'resources' in constraint_groups:
+        profiler.start('resources')
         print("Adding Group 2: Resource constraints...")
         
         avail = data['parameters'].get('avail', {})
@@ -284,7 +428,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
         # [Eq. 2.12] sum(F_t[i,h,td] * t_op[h,td]) <= avail[i]
         # Annual resource consumption cannot exceed availability
         # ----------------------------------------------------------------
-        if avail:
+        if len(avail):
             print("  Adding resource_availability constraints...")
             constraint_count = 0
             for i in RESOURCES:
@@ -319,6 +463,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # ====================================================================
     
     if 'storage' in constraint_groups and STORAGE_TECH:
+        profiler.start('storage')
         print("Adding Group 3: Storage constraints...")
         
         storage_eff_in = data['parameters']['storage_eff_in']
@@ -327,144 +472,128 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
         storage_charge_time = data['parameters'].get('storage_charge_time', {s: 1 for s in STORAGE_TECH})
         storage_discharge_time = data['parameters'].get('storage_discharge_time', {s: 1 for s in STORAGE_TECH})
         storage_availability = data['parameters'].get('storage_availability', {s: 1 for s in STORAGE_TECH})
-        T_H_TD = data['sets']['T_H_TD']
+        time_index = TimeIndex(T_H_TD, HOURS, TYPICAL_DAYS)
         
         # ----------------------------------------------------------------
-        # Constraint 3.1: storage_layer_in (compatibility)
-        # [Eq. 2.17] Storage_in[j,l,h,td] * (ceil(storage_eff_in[j,l]) - 1) = 0
-        # This sets Storage_in = 0 for incompatible layer/storage pairs
+        # Constraints 3.1-3.2: storage_layer_in / storage_layer_out (compatibility)
+        # [Eq. 2.17-2.18] Hold by construction: Storage_in/out are only created on compatible layers
         # ----------------------------------------------------------------
-        print("  Adding storage_layer_in constraints...")
-        constraint_count = 0
-        for j in STORAGE_TECH:
-            for l in LAYERS:
-                try:
-                    eff = storage_eff_in.loc[j, l]
-                    if eff == 0:  # Incompatible
-                        for h in HOURS:
-                            for td in TYPICAL_DAYS:
-                                m.add_constraints(
-                                    Storage_in.loc[j, l, h, td] == 0,
-                                    name=f"storage_layer_in_{j}_{l}_{h}_{td}"
-                                )
-                                constraint_count += 1
-                except (KeyError, IndexError):
-                    # If efficiency not defined, assume incompatible
-                    for h in HOURS:
-                        for td in TYPICAL_DAYS:
-                            m.add_constraints(
-                                Storage_in.loc[j, l, h, td] == 0,
-                                name=f"storage_layer_in_{j}_{l}_{h}_{td}"
-                            )
-                            constraint_count += 1
-        print(f"    Added {constraint_count} storage_layer_in constraints")
         
-        # ----------------------------------------------------------------
-        # Constraint 3.2: storage_layer_out (compatibility)
-        # [Eq. 2.18] Storage_out[j,l,h,td] * (ceil(storage_eff_out[j,l]) - 1) = 0
-        # ----------------------------------------------------------------
-        print("  Adding storage_layer_out constraints...")
-        constraint_count = 0
+        # Net charge per (storage, hour, td): inputs and outputs over the compatible layers
+        net_charge = {}
         for j in STORAGE_TECH:
-            for l in LAYERS:
-                try:
-                    eff = storage_eff_out.loc[j, l]
-                    if eff == 0:  # Incompatible
-                        for h in HOURS:
-                            for td in TYPICAL_DAYS:
-                                m.add_constraints(
-                                    Storage_out.loc[j, l, h, td] == 0,
-                                    name=f"storage_layer_out_{j}_{l}_{h}_{td}"
-                                )
-                                constraint_count += 1
-                except (KeyError, IndexError):
-                    # If efficiency not defined, assume incompatible
-                    for h in HOURS:
-                        for td in TYPICAL_DAYS:
-                            m.add_constraints(
-                                Storage_out.loc[j, l, h, td] == 0,
-                                name=f"storage_layer_out_{j}_{l}_{h}_{td}"
-                            )
-                            constraint_count += 1
-        print(f"    Added {constraint_count} storage_layer_out constraints")
-        
-        # ----------------------------------------------------------------
-        # Constraint 3.3: storage_level
-        # [Eq. 2.14] Storage_level[j,t] = Storage_level[j,t-1] * (1-losses) + inputs - outputs
-        # ----------------------------------------------------------------
-        print("  Adding storage_level constraints...")
-        constraint_count = 0
-        for j in STORAGE_TECH:
-            loss_rate = storage_losses.get(j, 0)
-            
-            for t in PERIODS:
-                # Find (h, td) for this period
-                h_td_for_t = [(h, td) for (period, h, td) in T_H_TD if period == t]
-                if not h_td_for_t:
-                    continue
-                h, td = h_td_for_t[0]
-                
-                try:
-                    t_op_val = t_op.loc[(h, td)]
-                except (KeyError, IndexError):
-                    t_op_val = 1.0
-                
-                # Calculate input and output over all layers
-                storage_input = 0
-                storage_output = 0
-                for l in LAYERS:
+            for h in HOURS:
+                for td in TYPICAL_DAYS:
                     try:
-                        eff_in = storage_eff_in.loc[j, l]
-                        if eff_in > 0:
-                            storage_input += Storage_in.loc[j, l, h, td] * eff_in
+                        t_op_val = t_op.loc[(h, td)]
                     except (KeyError, IndexError):
-                        pass
+                        t_op_val = 1.0
                     
-                    try:
-                        eff_out = storage_eff_out.loc[j, l]
-                        if eff_out > 0:
-                            storage_output += Storage_out.loc[j, l, h, td] / eff_out
-                    except (KeyError, IndexError):
-                        pass
+                    storage_input = 0
+                    storage_output = 0
+                    for l in LAYERS:
+                        try:
+                            eff_in = storage_eff_in.loc[j, l]
+                            if eff_in > 0:
+                                storage_input += Storage_in.loc[j, l, h, td] * eff_in
+                        except (KeyError, IndexError):
+                            pass
+                        
+                        try:
+                            eff_out = storage_eff_out.loc[j, l]
+                            if eff_out > 0:
+                                storage_output += Storage_out.loc[j, l, h, td] / eff_out
+                        except (KeyError, IndexError):
+                            pass
+                    net_charge[j, h, td] = t_op_val * (storage_input - storage_output)
+        
+        if storage_formulation == 'chronological':
+            # ----------------------------------------------------------------
+            # Constraint 3.3: storage_level
+            # [Eq. 2.14] Storage_level[j,t] = Storage_level[j,t-1] * (1-losses) + inputs - outputs
+            # ----------------------------------------------------------------
+            print("  Adding storage_level constraints...")
+            constraint_count = 0
+            for j in STORAGE_TECH:
+                loss_rate = storage_losses.get(j, 0)
                 
-                # Storage balance equation
-                if t == 1:
-                    # First period: cyclic boundary
-                    last_period = PERIODS[-1]
+                for t, h, td, t_prev in time_index.iter_periods():
+                    # Storage balance equation (the first period follows the last one: cyclic boundary)
                     m.add_constraints(
                         Storage_level.loc[j, t] == 
-                        Storage_level.loc[j, last_period] * (1.0 - loss_rate) +
-                        t_op_val * (storage_input - storage_output),
+                        Storage_level.loc[j, t_prev] * (1.0 - loss_rate) + net_charge[j, h, td],
                         name=f"storage_level_{j}_{t}"
                     )
-                else:
-                    # Regular period
+                    constraint_count += 1
+            print(f"    Added {constraint_count} storage_level constraints")
+            
+            # ----------------------------------------------------------------
+            # Constraint 3.4: limit_energy_stored_to_maximum
+            # [Eq. 2.16] Storage_level[j,t] <= F[j]
+            # ----------------------------------------------------------------
+            print("  Adding limit_energy_stored_to_maximum constraints...")
+            constraint_count = 0
+            for j in STORAGE_SEASONAL:
+                for t in PERIODS:
                     m.add_constraints(
-                        Storage_level.loc[j, t] == 
-                        Storage_level.loc[j, t-1] * (1.0 - loss_rate) +
-                        t_op_val * (storage_input - storage_output),
-                        name=f"storage_level_{j}_{t}"
+                        Storage_level.loc[j, t] <= F.loc[j],
+                        name=f"limit_energy_stored_to_maximum_{j}_{t}"
                     )
-                constraint_count += 1
-        print(f"    Added {constraint_count} storage_level constraints")
-        
-        # ----------------------------------------------------------------
-        # Constraint 3.4: limit_energy_stored_to_maximum
-        # [Eq. 2.16] Storage_level[j,t] <= F[j]
-        # ----------------------------------------------------------------
-        print("  Adding limit_energy_stored_to_maximum constraints...")
-        STORAGE_DAILY = data['sets'].get('STORAGE_DAILY', [])
-        STORAGE_SEASONAL = [s for s in STORAGE_TECH if s not in STORAGE_DAILY]
+                    constraint_count += 1
+            print(f"    Added {constraint_count} limit_energy_stored_to_maximum constraints")
         
-        constraint_count = 0
-        for j in STORAGE_SEASONAL:
-            for t in PERIODS:
-                m.add_constraints(
-                    Storage_level.loc[j, t] <= F.loc[j],
-                    name=f"limit_energy_stored_to_maximum_{j}_{t}"
-                )
-                constraint_count += 1
-        print(f"    Added {constraint_count} limit_energy_stored_to_maximum constraints")
+        else:
+            # ----------------------------------------------------------------
+            # Constraint 3.3: storage_level_intra (Kotzur et al., 2018)
+            # Level within each typical day; the first hour follows the last one for daily
+            # storage (cyclic day) and starts from 0 for seasonal storage
+            # ----------------------------------------------------------------
+            print("  Adding storage_level_intra constraints...")
+            constraint_count = 0
+            for j in STORAGE_TECH:
+                loss_rate = storage_losses.get(j, 0)
+                for td in TYPICAL_DAYS:
+                    for h_prev, h in zip(HOURS[-1:] + HOURS[:-1], HOURS):
+                        carried = 0.0 if (j in STORAGE_SEASONAL and h == HOURS[0]) else 1.0 - loss_rate
+                        m.add_constraints(
+                            Storage_level_intra.loc[j, h, td] ==
+                            Storage_level_intra.loc[j, h_prev, td] * carried + net_charge[j, h, td],
+                            name=f"storage_level_intra_{j}_{h}_{td}"
+                        )
+                        constraint_count += 1
+            print(f"    Added {constraint_count} storage_level_intra constraints")
+            
+            # ----------------------------------------------------------------
+            # Constraint 3.4: storage_level_inter and its bounds
+            # Level at the start of each day = level at the start of the previous day + change over
+            # the typical day of the previous day (cyclic year); the level within the day stays
+            # between 0 and F[j]
+            # ----------------------------------------------------------------
+            print("  Adding storage_level_inter constraints...")
+            constraint_count = 0
+            day_tds = [TYPICAL_DAYS[pos] for pos in time_index.day_td_pos()]
+            for j in STORAGE_SEASONAL:
+                day_loss = (1.0 - storage_losses.get(j, 0)) ** len(HOURS)
+                for d, td_prev in zip(DAYS, day_tds[-1:] + day_tds[:-1]):
+                    d_prev = d - 1 if d > 1 else DAYS[-1]
+                    m.add_constraints(
+                        Storage_level_inter.loc[j, d] ==
+                        Storage_level_inter.loc[j, d_prev] * day_loss + Storage_level_intra.loc[j, HOURS[-1], td_prev],
+                        name=f"storage_level_inter_{j}_{d}"
+                    )
+                for h in HOURS:
+                    for td in TYPICAL_DAYS:
+                        m.add_constraints(Storage_level_intra.loc[j, h, td] <= Storage_intra_max.loc[j, td],
+                                          name=f"storage_intra_max_{j}_{h}_{td}")
+                        m.add_constraints(Storage_level_intra.loc[j, h, td] >= Storage_intra_min.loc[j, td],
+                                          name=f"storage_intra_min_{j}_{h}_{td}")
+                for d, td in zip(DAYS, day_tds):
+                    m.add_constraints(Storage_level_inter.loc[j, d] + Storage_intra_max.loc[j, td] <= F.loc[j],
+                                      name=f"limit_energy_stored_inter_max_{j}_{d}")
+                    m.add_constraints(Storage_level_inter.loc[j, d] * day_loss + Storage_intra_min.loc[j, td] >= 0,
+                                      name=f"limit_energy_stored_inter_min_{j}_{d}")
+                constraint_count += 3 * len(DAYS) + 2 * len(HOURS) * len(TYPICAL_DAYS)
+            print(f"    Added {constraint_count} storage_level_inter constraints")
         
         # ----------------------------------------------------------------
         # Constraint 3.5: limit_energy_to_power_ratio
@@ -479,6 +608,8 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
             avail = storage_availability.get(j, 1)
             
             for l in LAYERS:
+                if not (storage_layers_in.loc[j, l] or storage_layers_out.loc[j, l]):
+                    continue  # No flow on this layer
                 for h in HOURS:
                     for td in TYPICAL_DAYS:
                         m.add_constraints(
@@ -495,6 +626,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # ====================================================================
     
     if 'costs' in constraint_groups:
+        profiler.start('costs')
         print("Adding Group 4: Cost constraints...")
         
         c_inv = data['parameters']['c_inv']
@@ -584,6 +716,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # ====================================================================
     
     if 'gwp' in constraint_groups:
+        profiler.start('gwp')
         print("Adding Group 5: GWP (emissions) constraints...")
         
         gwp_constr_param = data['parameters'].get('gwp_constr', {})
@@ -659,6 +792,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # ====================================================================
     
     if 'network' in constraint_groups:
+        profiler.start('network')
         print("Adding Group 8: Network constraints...")
         
         loss_network = data['parameters'].get('loss_network', {})
@@ -666,7 +800,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
         c_inv_dict = data['parameters']['c_inv']
         
         # Create Network_losses variable if needed
-        if loss_network:
+        if len(loss_network):
             Network_losses = m.add_variables(
                 lower=0,
                 coords=[END_USES_TYPES, HOURS, TYPICAL_DAYS],
@@ -712,6 +846,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # ====================================================================
     
     if 'policy' in constraint_groups:
+        profiler.start('policy')
         print("Adding Group 9: Policy constraints...")
         
         fmax_perc = data['parameters'].get('fmax_perc', {})
@@ -722,7 +857,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
         # Constraint 9.1: f_max_perc
         # [Eq. 2.36] sum(F_t[j]) <= fmax_perc[j] * sum(F_t[all j in category])
         # ----------------------------------------------------------------
-        if fmax_perc and TECHNOLOGIES_OF_END_USES_TYPE:
+        if len(fmax_perc) and TECHNOLOGIES_OF_END_USES_TYPE:
             print("  Adding f_max_perc constraints...")
             constraint_count = 0
             for eut in END_USES_TYPES:
@@ -752,18 +887,19 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
                                                 t_op_val = 1.0
                                             annual_category += F_t.loc[j2, h, td] * t_op_val
                             
-                            if annual_category != 0:
-                                m.add_constraints(
-                                    annual_j <= fmax_perc[j] * annual_category,
-                                    name=f"f_max_perc_{j}"
-                                )
-                                constraint_count += 1
+                            # annual_category includes j itself (comparing a linopy expression
+                            # to 0 is always False, so it is not tested)
+                            m.add_constraints(
+                                annual_j <= fmax_perc[j] * annual_category,
+                                name=f"f_max_perc_{j}"
+                            )
+                            constraint_count += 1
             print(f"    Added {constraint_count} f_max_perc constraints")
         
         # ----------------------------------------------------------------
         # Constraint 9.2: f_min_perc (similar to f_max_perc)
         # ----------------------------------------------------------------
-        if fmin_perc and TECHNOLOGIES_OF_END_USES_TYPE:
+        if len(fmin_perc) and TECHNOLOGIES_OF_END_USES_TYPE:
             print("  Adding f_min_perc constraints...")
             # Similar implementation to f_max_perc
             # Skip for minimal model
@@ -774,6 +910,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # ====================================================================
     
     if 'mobility' in constraint_groups:
+        profiler.start('mobility')
         print("Adding Group 6: Mobility constraints...")
         
         TECHNOLOGIES_OF_END_USES_CATEGORY = data['sets'].get('TECHNOLOGIES_OF_END_USES_CATEGORY', {})
@@ -885,6 +1022,7 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     # ====================================================================
     
     if 'heating' in constraint_groups:
+        profiler.start('heating')
         print("Adding Group 7: Heating constraints...")
         
         TECHNOLOGIES_OF_END_USES_TYPE = data['sets'].get('TECHNOLOGIES_OF_END_USES_TYPE', {})
@@ -941,6 +1079,8 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
         # ----------------------------------------------------------------
         # Skip for minimal model - requires specific heating demand data
     
+    profiler.stop()
+
     # ====================================================================
     # OBJECTIVE FUNCTION
     # ====================================================================
@@ -956,7 +1096,8 @@ def build_core_model_partial(data: Dict[str, Any], constraint_groups: List[str]
     return m
 
 
-def build_core_model(data: Dict[str, Any]) -> linopy.Model:
+def build_core_model(data: Dict[str, Any], storage_formulation: str = 'chronological',
+                     engine: str = 'loop', profiler: Optional[BuildProfiler] = None) -> linopy.Model:
     """
     Build the complete EnergyScope core model in linopy.
     
@@ -964,6 +1105,9 @@ def build_core_model(data: Dict[str, Any]) -> linopy.Model:
     
     Args:
         data: Dictionary containing all model data
+        storage_formulation: 'chronological' or 'intra_inter' (see build_core_model_partial)
+        engine: 'loop' or 'matrix' (see build_core_model_partial)
+        profiler: Records the build of each constraint group (see build_core_model_partial)
     
     Returns:
         linopy.Model instance ready to solve
@@ -981,7 +1125,10 @@ def build_core_model(data: Dict[str, Any]) -> linopy.Model:
             'heating',         # Group 7: 0-3 constraints (data-dependent)
             'network',         # Group 8: 1/4 constraints
             'policy',          # Group 9: 0-4 constraints (data-dependent)
-        ]
+        ],
+        storage_formulation=storage_formulation,
+        engine=engine,
+        profiler=profiler
     )
 
 
@@ -0,0 +1,592 @@
+"""
+EnergyScope Core Model - Linopy Implementation (matrix assembly)
+
+Same model as core_model.build_core_model_partial, for the same data format and
+constraint groups, but each constraint family is assembled as one block:
+the coefficients over all its rows are computed with NumPy broadcasting as
+(row, variable, coefficient) triplets (ConstraintBlock) and handed to linopy
+as a single labelled constraint, instead of one linopy constraint per
+(j, h, td). Variables are created exactly as in the loop builder.
+
+Like the loop builder, it reads hourly end-use demands from
+data['time_series']['End_uses'] (minimal-core format) and converts the yearly
+demands of ESTD datasets with core_model.hourly_end_uses.
+
+Used through build_core_model(data, engine='matrix').
+"""
+
+import linopy
+import numpy as np
+import pandas as pd
+import xarray as xr
+from linopy.expressions import LinearExpression
+from typing import Dict, List, Any, Optional, Sequence
+
+from energyscope.profiling import BuildProfiler
+from energyscope.pyoptinterface_backend.assembly import ConstraintBlock, lookup, positions
+from energyscope.time_index import TimeIndex
+from .core_model import hourly_end_uses
+
+
+def _dense(table, axes: Sequence[Sequence], default: float = 0.0) -> np.ndarray:
+    """Dense array of a parameter table (DataFrame of rows x columns, Series or dict) over `axes`."""
+    if isinstance(table, pd.DataFrame):
+        return table.reindex(index=list(axes[0]), columns=list(axes[1])).astype(float).fillna(default).to_numpy()
+    return lookup(table, axes, default)
+
+
+def _add_block(m: linopy.Model, name: str, block: ConstraintBlock, sign: str, rhs=0.0,
+               labels: Sequence[pd.Index] = ()) -> int:
+    """
+    Add the rows of a constraint block to a linopy model as one constraint.
+
+    Args:
+        m: Model holding the variables referenced by the block
+        name: Name of the constraint
+        block: Rows to add (terms on linopy variable labels)
+        sign: '<=', '==' or '>='
+        rhs: Right-hand side, broadcastable to the block shape
+        labels: Named index of each axis of the block (none for a single row)
+
+    Returns:
+        int: Number of constraints added
+    """
+    indptr, variables, coefficients = block.to_csr()
+    n_terms = np.diff(indptr)
+    width = max(int(n_terms.max(initial=0)), 1)
+    row = np.repeat(np.arange(block.n_rows), n_terms)
+    term = np.arange(len(variables)) - indptr[row]
+
+    # Terms of each row padded to the longest row (-1: no variable), scattered over the block shape
+    shape = tuple(len(axis) for axis in labels)
+    mask = np.ones(block.shape, dtype=bool) if block.mask is None else block.mask
+    vars_ = np.full(shape + (width,), -1, dtype=np.int64)
+    coeffs = np.full(shape + (width,), np.nan)
+    rows_vars = np.full((block.n_rows, width), -1, dtype=np.int64)
+    rows_coeffs = np.full((block.n_rows, width), np.nan)
+    rows_vars[row, term] = variables
+    rows_coeffs[row, term] = coefficients
+    vars_.reshape(-1, width)[mask.reshape(-1)] = rows_vars
+    coeffs.reshape(-1, width)[mask.reshape(-1)] = rows_coeffs
+
+    dims = [axis.name for axis in labels]
+    coords = {axis.name: axis for axis in labels}
+    lhs = LinearExpression(xr.Dataset({'coeffs': (dims + ['_term'], coeffs), 'vars': (dims + ['_term'], vars_)},
+                                      coords=coords), m)
+    rhs = xr.DataArray(np.broadcast_to(np.asarray(rhs, dtype=float), shape), coords=coords, dims=dims)
+    m.add_constraints(lhs, sign, rhs, name=name,
+                      mask=xr.DataArray(mask.reshape(shape), coords=coords, dims=dims) if dims else None)
+    print(f"    Added {block.n_rows} {name} constraints")
+    return block.n_rows
+
+
+def build_core_model_matrix(data: Dict[str, Any], constraint_groups: List[str] = None,
+                            storage_formulation: str = 'chronological',
+                            profiler: Optional[BuildProfiler] = None) -> linopy.Model:
+    """
+    Build the EnergyScope core model in linopy, one constraint block per family.
+
+    Args:
+        data: Dictionary containing all model data (sets, parameters, time_series),
+              as for core_model.build_core_model_partial
+        constraint_groups: List of constraint group names to include (see
+                          build_core_model_partial). If None, includes energy_balance.
+        storage_formulation: 'chronological' or 'intra_inter'
+        profiler: Records the build of each constraint group (see build_core_model_partial)
+
+    Returns:
+        linopy.Model instance ready to solve, with the variables of the loop builder
+        and one constraint per family (e.g. 'capacity_factor_t' over (tech, hour, td))
+
+    Raises:
+        ValueError: If the storage formulation is unknown
+    """
+    if storage_formulation not in ('chronological', 'intra_inter'):
+        raise ValueError(f"Unknown storage formulation: {storage_formulation}")
+    if constraint_groups is None:
+        constraint_groups = ['energy_balance']
+
+    m = linopy.Model()
+    if profiler is None:
+        profiler = BuildProfiler(enabled=False)
+    profiler.bind(m.constraints)
+
+    # ====================================================================
+    # EXTRACT DATA
+    # ====================================================================
+
+    sets, parameters = data['sets'], data['parameters']
+    PERIODS = sets['PERIODS']
+    HOURS = sets['HOURS']
+    TYPICAL_DAYS = sets['TYPICAL_DAYS']
+    T_H_TD = sets['T_H_TD']
+    TECHNOLOGIES = sets['TECHNOLOGIES']
+    STORAGE_TECH = sets['STORAGE_TECH']
+    RESOURCES = sets['RESOURCES']
+    LAYERS = sets['LAYERS']
+    END_USES_TYPES = sets['END_USES_TYPES']
+
+    # Derived sets (each technology appears once, also if TECHNOLOGIES already lists the storage)
+    ALL_TECH = list(dict.fromkeys(list(TECHNOLOGIES) + list(STORAGE_TECH)))
+    TECH_NOSTORAGE = [t for t in ALL_TECH if t not in STORAGE_TECH]
+    ENTITIES_WITH_F_T = list(RESOURCES) + TECH_NOSTORAGE
+
+    f_max = parameters['f_max']
+    f_min = parameters['f_min']
+    c_p_t = parameters['c_p_t']
+    time_series = data.get('time_series', {})
+    End_uses = time_series.get('End_uses', time_series.get('end_uses_demand', None))
+    if End_uses is None and 'end_uses_demand_year' in parameters:
+        End_uses = hourly_end_uses(data)
+
+    # Named axes of the constraint blocks
+    hours = pd.Index(HOURS, name='hour')
+    tds = pd.Index(TYPICAL_DAYS, name='td')
+    layers = pd.Index(LAYERS, name='layer')
+    layers_in_out = _dense(parameters['layers_in_out'], [ENTITIES_WITH_F_T, LAYERS])
+    layers_in_out = np.where(np.abs(layers_in_out) > 1e-10, layers_in_out, 0.0)
+    t_op = lookup(parameters.get('t_op', {}), [HOURS, TYPICAL_DAYS], 1.0)
+    n_h, n_td = len(HOURS), len(TYPICAL_DAYS)
+
+    def entity(labels):
+        return positions(labels, ENTITIES_WITH_F_T)
+
+    def tech(labels):
+        return positions(labels, ALL_TECH)
+
+    def annual(block, columns, coefficients=1.0, rows=None):
+        """Add sum over (h, td) of coefficients * columns * t_op to `rows`."""
+        block.add_terms(columns, np.asarray(coefficients, dtype=float)[..., None, None] * t_op,
+                        block.rows[..., None, None] if rows is None else rows)
+
+    # ====================================================================
+    # DECISION VARIABLES
+    # ====================================================================
+
+    print("Creating decision variables...")
+
+    F = m.add_variables(
+        lower=pd.Series([f_min[tech_] for tech_ in ALL_TECH], index=ALL_TECH),
+        upper=pd.Series([f_max[tech_] for tech_ in ALL_TECH], index=ALL_TECH),
+        coords=[ALL_TECH],
+        name="F"
+    )
+    F_ = F.labels.values
+
+    # Structurally zero operation levels are not created (entities on no layer, hours with c_p_t = 0)
+    F_t_mask = (layers_in_out != 0).any(axis=1)[:, None, None] \
+        & (lookup(c_p_t, [ENTITIES_WITH_F_T, HOURS, TYPICAL_DAYS], 1.0) > 0)
+    F_t = m.add_variables(
+        lower=0,
+        coords=[ENTITIES_WITH_F_T, HOURS, TYPICAL_DAYS],
+        name="F_t",
+        mask=xr.DataArray(F_t_mask, coords=[ENTITIES_WITH_F_T, HOURS, TYPICAL_DAYS])
+    )
+    F_t_ = F_t.labels.values
+
+    if STORAGE_TECH:
+        eff_in = _dense(parameters.get('storage_eff_in', pd.Series(dtype=float)), [STORAGE_TECH, LAYERS])
+        eff_out = _dense(parameters.get('storage_eff_out', pd.Series(dtype=float)), [STORAGE_TECH, LAYERS])
+        flow_shape = (len(STORAGE_TECH), len(LAYERS), n_h, n_td)
+        Storage_in_ = m.add_variables(
+            lower=0, coords=[STORAGE_TECH, LAYERS, HOURS, TYPICAL_DAYS], name="Storage_in",
+            mask=np.broadcast_to((eff_in > 0)[:, :, None, None], flow_shape)
+        ).labels.values
+        Storage_out_ = m.add_variables(
+            lower=0, coords=[STORAGE_TECH, LAYERS, HOURS, TYPICAL_DAYS], name="Storage_out",
+            mask=np.broadcast_to((eff_out > 0)[:, :, None, None], flow_shape)
+        ).labels.values
+
+        STORAGE_DAILY = sets.get('STORAGE_DAILY', [])
+        STORAGE_SEASONAL = [s for s in STORAGE_TECH if s not in STORAGE_DAILY]
+        time_index = TimeIndex(T_H_TD, HOURS, TYPICAL_DAYS)
+        if storage_formulation == 'chronological':
+            Storage_level_ = m.add_variables(lower=0, coords=[STORAGE_TECH, PERIODS], name="Storage_level").labels.values
+        else:
+            day_td_pos = time_index.day_td_pos()
+            DAYS = list(range(1, len(day_td_pos) + 1))
+            Storage_level_intra_ = m.add_variables(
+                lower=np.broadcast_to(np.array([0.0 if j in STORAGE_DAILY else -np.inf for j in STORAGE_TECH])[:, None, None],
+                                      (len(STORAGE_TECH), n_h, n_td)),
+                coords=[STORAGE_TECH, HOURS, TYPICAL_DAYS],
+                name="Storage_level_intra"
+            ).labels.values
+            Storage_level_inter_ = m.add_variables(lower=0, coords=[STORAGE_SEASONAL, DAYS],
+                                                   name="Storage_level_inter").labels.values
+            Storage_intra_max_ = m.add_variables(lower=0, coords=[STORAGE_SEASONAL, TYPICAL_DAYS],
+                                                 name="Storage_intra_max").labels.values
+            Storage_intra_min_ = m.add_variables(upper=0, coords=[STORAGE_SEASONAL, TYPICAL_DAYS],
+                                                 name="Storage_intra_min").labels.values
+
+    if 'costs' in constraint_groups:
+        TotalCost = m.add_variables(lower=0, name="TotalCost")
+
+    # ====================================================================
+    # CONSTRAINT GROUP 1: ENERGY BALANCE
+    # ====================================================================
+
+    F_t_tech = F_t_[entity(TECH_NOSTORAGE)]
+    techs = pd.Index(TECH_NOSTORAGE, name='tech')
+
+    if 'energy_balance' in constraint_groups:
+        profiler.start('energy_balance')
+        print("Adding Group 1: Energy Balance constraints...")
+
+        # [Eq. 2.10] F_t[j,h,td] <= F[j] * c_p_t[j,h,td], where F_t exists
+        block = ConstraintBlock(F_t_tech.shape, mask=F_t_tech >= 0)
+        block.add_terms(F_t_tech)
+        block.add_terms(F_[tech(TECH_NOSTORAGE)][:, None, None],
+                        -lookup(c_p_t, [TECH_NOSTORAGE, HOURS, TYPICAL_DAYS], 1.0))
+        _add_block(m, 'capacity_factor_t', block, '<=', labels=[techs, hours, tds])
+
+        # [Eq. 2.13] sum(layers_in_out * F_t) + sum(Storage_out - Storage_in) = End_uses
+        block = ConstraintBlock((len(LAYERS), n_h, n_td))
+        block.add_terms(F_t_[:, None], layers_in_out[:, :, None, None], block.rows[None])
+        if STORAGE_TECH:
+            block.add_terms(Storage_out_, 1.0, block.rows[None])
+            block.add_terms(Storage_in_, -1.0, block.rows[None])
+        demand = lookup(End_uses, [LAYERS, HOURS, TYPICAL_DAYS]) if End_uses is not None else 0.0
+        _add_block(m, 'layer_balance', block, '==', demand, labels=[layers, hours, tds])
+
+        # [Eq. 2.11] sum(F_t * t_op) <= F * c_p * total_time
+        c_p = parameters.get('c_p', {tech_: 1.0 for tech_ in TECHNOLOGIES})
+        block = ConstraintBlock(len(TECH_NOSTORAGE))
+        annual(block, F_t_tech)
+        block.add_terms(F_[tech(TECH_NOSTORAGE)], -lookup(c_p, [TECH_NOSTORAGE], 1.0) * parameters['total_time'])
+        _add_block(m, 'capacity_factor', block, '<=', labels=[techs])
+
+    # ====================================================================
+    # CONSTRAINT GROUP 2: RESOURCES
+    # ====================================================================
+
+    F_t_resources = F_t_[entity(RESOURCES)]
+    resources = pd.Index(RESOURCES, name='resource')
+
+    if 'resources' in constraint_groups:
+        profiler.start('resources')
+        print("Adding Group 2: Resource constraints...")
+
+        # [Eq. 2.12] sum(F_t[i,h,td] * t_op[h,td]) <= avail[i], for resources with an availability
+        avail = parameters.get('avail', {})
+        if len(avail) > 0:
+            limited = np.array([i in avail for i in RESOURCES])
+            block = ConstraintBlock(len(RESOURCES), mask=limited)
+            annual(block, F_t_resources)
+            _add_block(m, 'resource_availability', block, '<=', lookup(avail, [RESOURCES], 0.0), labels=[resources])
+
+    # ====================================================================
+    # CONSTRAINT GROUP 3: STORAGE
+    # ====================================================================
+
+    if 'storage' in constraint_groups and STORAGE_TECH:
+        profiler.start('storage')
+        print("Adding Group 3: Storage constraints...")
+
+        storage = pd.Index(STORAGE_TECH, name='storage')
+        seasonal_storage = pd.Index(STORAGE_SEASONAL, name='storage')
+        losses = lookup(parameters.get('storage_losses', {}), [STORAGE_TECH], 0.0)
+        seasonal = positions(STORAGE_SEASONAL, STORAGE_TECH)
+        inverse_eff_out = np.divide(1.0, eff_out, out=np.zeros_like(eff_out), where=eff_out > 0)
+
+        # Net charge terms (storage, layer, hour, td): t_op * (Storage_in * eff_in - Storage_out / eff_out)
+        charge_in = np.where(eff_in > 0, eff_in, 0.0)[:, :, None, None] * t_op
+        charge_out = -inverse_eff_out[:, :, None, None] * t_op
+
+        if storage_formulation == 'chronological':
+            # [Eq. 2.14] Storage_level[j,t] = Storage_level[j,t-1] * (1-losses) + net charge (cyclic year)
+            hp, tdp = time_index.hour_pos, time_index.td_pos
+            level = Storage_level_[:, positions(time_index.periods, PERIODS)]
+            block = ConstraintBlock(level.shape)
+            block.add_terms(level)
+            block.add_terms(level[:, time_index.previous], -(1.0 - losses)[:, None])
+            block.add_terms(Storage_in_[:, :, hp, tdp], -charge_in[:, :, hp, tdp], block.rows[:, None])
+            block.add_terms(Storage_out_[:, :, hp, tdp], -charge_out[:, :, hp, tdp], block.rows[:, None])
+            _add_block(m, 'storage_level', block, '==', labels=[storage, pd.Index(time_index.periods, name='period')])
+
+            # [Eq. 2.16] Storage_level[j,t] <= F[j]
+            block = ConstraintBlock((len(STORAGE_SEASONAL), len(PERIODS)))
+            block.add_terms(Storage_level_[seasonal])
+            block.add_terms(F_[tech(STORAGE_SEASONAL)][:, None], -1.0)
+            _add_block(m, 'limit_energy_stored_to_maximum', block, '<=',
+                       labels=[seasonal_storage, pd.Index(PERIODS, name='period')])
+        else:
+            # Level within each typical day: the first hour follows the last one for daily storage
+            # (cyclic day) and starts from 0 for seasonal storage (Kotzur et al., 2018)
+            carried = np.ones((len(STORAGE_TECH), n_h))
+            carried[seasonal, 0] = 0.0
+            intra = Storage_level_intra_
+            block = ConstraintBlock(intra.shape)
+            block.add_terms(intra)
+            block.add_terms(np.roll(intra, 1, axis=1), -((1.0 - losses)[:, None] * carried)[:, :, None])
+            block.add_terms(Storage_in_, -charge_in, block.rows[:, None])
+            block.add_terms(Storage_out_, -charge_out, block.rows[:, None])
+            _add_block(m, 'storage_level_intra', block, '==', labels=[storage, hours, tds])
+
+            # Level at the start of each day = level at the start of the previous day + change over
+            # the typical day of the previous day (cyclic year); the level within the day stays
+            # between 0 and F[j]
+            if STORAGE_SEASONAL:
+                days = pd.Index(DAYS, name='day')
+                day_loss = (1.0 - losses[seasonal]) ** n_h
+                previous_day = np.roll(np.arange(len(DAYS)), 1)
+                inter = Storage_level_inter_
+                block = ConstraintBlock(inter.shape)
+                block.add_terms(inter)
+                block.add_terms(inter[:, previous_day], -day_loss[:, None])
+                block.add_terms(intra[seasonal, -1][:, day_td_pos[previous_day]], -1.0)
+                _add_block(m, 'storage_level_inter', block, '==', labels=[seasonal_storage, days])
+                for name, extreme, sign in (('storage_intra_max', Storage_intra_max_, '<='),
+                                            ('storage_intra_min', Storage_intra_min_, '>=')):
+                    block = ConstraintBlock((len(STORAGE_SEASONAL), n_h, n_td))
+                    block.add_terms(intra[seasonal])
+                    block.add_terms(extreme[:, None, :], -1.0)
+                    _add_block(m, name, block, sign, labels=[seasonal_storage, hours, tds])
+                block = ConstraintBlock(inter.shape)
+                block.add_terms(inter)
+                block.add_terms(Storage_intra_max_[:, day_td_pos])
+                block.add_terms(F_[tech(STORAGE_SEASONAL)][:, None], -1.0)
+                _add_block(m, 'limit_energy_stored_inter_max', block, '<=', labels=[seasonal_storage, days])
+                block = ConstraintBlock(inter.shape)
+                block.add_terms(inter, day_loss[:, None])
+                block.add_terms(Storage_intra_min_[:, day_td_pos])
+                _add_block(m, 'limit_energy_stored_inter_min', block, '>=', labels=[seasonal_storage, days])
+
+        # [Eq. 2.19] Storage_in * charge_time + Storage_out * discharge_time <= F * availability,
+        # on the compatible layers of storage other than EV batteries
+        charge_time = lookup(parameters.get('storage_charge_time', {}), [STORAGE_TECH], 1.0)
+        discharge_time = lookup(parameters.get('storage_discharge_time', {}), [STORAGE_TECH], 1.0)
+        availability = lookup(parameters.get('storage_availability', {}), [STORAGE_TECH], 1.0)
+        not_ev = ~np.isin(STORAGE_TECH, ['BEV_BATT', 'PHEV_BATT'])
+        rows_mask = (((eff_in > 0) | (eff_out > 0)) & not_ev[:, None])[:, :, None, None]
+        block = ConstraintBlock(Storage_in_.shape, mask=rows_mask)
+        block.add_terms(Storage_in_, charge_time[:, None, None, None])
+        block.add_terms(Storage_out_, discharge_time[:, None, None, None])
+        block.add_terms(F_[tech(STORAGE_TECH)][:, None, None, None], -availability[:, None, None, None])
+        _add_block(m, 'limit_energy_to_power_ratio', block, '<=', labels=[storage, layers, hours, tds])
+
+    # ====================================================================
+    # CONSTRAINT GROUP 4: COSTS
+    # ====================================================================
+
+    if 'costs' in constraint_groups:
+        profiler.start('costs')
+        print("Adding Group 4: Cost constraints...")
+
+        all_tech = pd.Index(ALL_TECH, name='tech')
+        c_op = parameters.get('c_op', {})
+        lifetime = lookup(parameters['lifetime'], [ALL_TECH])
+        i_rate = parameters['i_rate']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tau = np.where(lifetime > 0, i_rate * (1 + i_rate)**lifetime / ((1 + i_rate)**lifetime - 1), 0.0)
+
+        C_inv_ = m.add_variables(lower=0, coords=[ALL_TECH], name="C_inv").labels.values
+        C_maint_ = m.add_variables(lower=0, coords=[ALL_TECH], name="C_maint").labels.values
+        C_op_ = m.add_variables(lower=0, coords=[RESOURCES], name="C_op").labels.values
+
+        # [Eqs. 2.3-2.4] C_inv[j] = c_inv[j] * F[j], C_maint[j] = c_maint[j] * F[j]
+        for name, columns, param in (('investment_cost_calc', C_inv_, 'c_inv'), ('main_cost_calc', C_maint_, 'c_maint')):
+            block = ConstraintBlock(len(ALL_TECH))
+            block.add_terms(columns)
+            block.add_terms(F_, -lookup(parameters[param], [ALL_TECH]))
+            _add_block(m, name, block, '==', labels=[all_tech])
+
+        # [Eq. 2.5] C_op[i] = sum(c_op[i] * F_t[i,h,td] * t_op[h,td]), for resources with a cost
+        block = ConstraintBlock(len(RESOURCES), mask=np.array([i in c_op for i in RESOURCES]))
+        block.add_terms(C_op_)
+        annual(block, F_t_resources, -lookup(c_op, [RESOURCES]))
+        _add_block(m, 'op_cost_calc', block, '==', labels=[resources])
+
+        # [Eq. 2.1] TotalCost = sum(tau * C_inv + C_maint) + sum(C_op)
+        block = ConstraintBlock(1)
+        block.add_terms(TotalCost.labels.values, 1.0, 0)
+        block.add_terms(C_inv_, -tau, 0)
+        block.add_terms(C_maint_, -1.0, 0)
+        block.add_terms(C_op_, -1.0, 0)
+        _add_block(m, 'totalcost_cal', block, '==')
+
+    # ====================================================================
+    # CONSTRAINT GROUP 5: GWP (Emissions)
+    # ====================================================================
+
+    if 'gwp' in constraint_groups:
+        profiler.start('gwp')
+        print("Adding Group 5: GWP (emissions) constraints...")
+
+        gwp_op = lookup(parameters.get('gwp_op', {}), [RESOURCES])
+        gwp_limit = parameters.get('gwp_limit', float('inf'))
+
+        GWP_constr_ = m.add_variables(lower=0, coords=[ALL_TECH], name="GWP_constr").labels.values
+        GWP_op_ = m.add_variables(lower=0, coords=[RESOURCES], name="GWP_op").labels.values
+        TotalGWP_ = m.add_variables(lower=0, name="TotalGWP").labels.values
+
+        # [Eq. 2.7] GWP_constr[j] = gwp_constr[j] * F[j]
+        block = ConstraintBlock(len(ALL_TECH))
+        block.add_terms(GWP_constr_)
+        block.add_terms(F_, -lookup(parameters.get('gwp_constr', {}), [ALL_TECH]))
+        _add_block(m, 'gwp_constr_calc', block, '==', labels=[pd.Index(ALL_TECH, name='tech')])
+
+        # [Eq. 2.8] GWP_op[i] = gwp_op[i] * sum(F_t[i,h,td] * t_op[h,td]), for emitting resources
+        block = ConstraintBlock(len(RESOURCES), mask=gwp_op > 0)
+        block.add_terms(GWP_op_)
+        annual(block, F_t_resources, -gwp_op)
+        _add_block(m, 'gwp_op_calc', block, '==', labels=[resources])
+
+        # [Eq. 2.6] TotalGWP = sum(GWP_op[i])
+        block = ConstraintBlock(1)
+        block.add_terms(TotalGWP_, 1.0, 0)
+        block.add_terms(GWP_op_, -1.0, 0)
+        _add_block(m, 'totalGWP_calc', block, '==')
+
+        if gwp_limit < float('inf'):
+            block = ConstraintBlock(1)
+            block.add_terms(TotalGWP_, 1.0, 0)
+            _add_block(m, 'Minimum_GWP_reduction', block, '<=', gwp_limit)
+
+    # ====================================================================
+    # CONSTRAINT GROUP 8: NETWORK
+    # ====================================================================
+
+    if 'network' in constraint_groups:
+        profiler.start('network')
+        print("Adding Group 8: Network constraints...")
+
+        loss_network = parameters.get('loss_network', {})
+        if len(loss_network) > 0:
+            Network_losses_ = m.add_variables(
+                lower=0, coords=[END_USES_TYPES, HOURS, TYPICAL_DAYS], name="Network_losses"
+            ).labels.values
+
+            # [Eq. 2.20] Network_losses = loss_network * sum of the outputs to the end-use type
+            loss = lookup(loss_network, [END_USES_TYPES])
+            production = np.zeros((len(ENTITIES_WITH_F_T), len(END_USES_TYPES)))
+            for k, eut in enumerate(END_USES_TYPES):
+                if eut in LAYERS:
+                    production[:, k] = layers_in_out[:, LAYERS.index(eut)].clip(min=0)
+            block = ConstraintBlock(Network_losses_.shape, mask=(loss > 0)[:, None, None])
+            block.add_terms(Network_losses_)
+            block.add_terms(F_t_[:, None], -(production * loss)[:, :, None, None], block.rows[None])
+            _add_block(m, 'network_losses', block, '==',
+                       labels=[pd.Index(END_USES_TYPES, name='end_use_type'), hours, tds])
+
+    # ====================================================================
+    # CONSTRAINT GROUP 9: POLICY
+    # ====================================================================
+
+    if 'policy' in constraint_groups:
+        profiler.start('policy')
+        print("Adding Group 9: Policy constraints...")
+
+        fmax_perc = parameters.get('fmax_perc', {})
+        TECHNOLOGIES_OF_END_USES_TYPE = sets.get('TECHNOLOGIES_OF_END_USES_TYPE', {})
+
+        # [Eq. 2.36] sum(F_t[j] * t_op) <= fmax_perc[j] * sum(F_t[j2] * t_op for j2 of the end-use type),
+        # one row per (end-use type, technology) pair
+        if len(fmax_perc) > 0 and TECHNOLOGIES_OF_END_USES_TYPE:
+            pairs = [(eut, j) for eut in END_USES_TYPES if eut in TECHNOLOGIES_OF_END_USES_TYPE
+                     for j in TECHNOLOGIES_OF_END_USES_TYPE[eut] if j in fmax_perc and j in TECH_NOSTORAGE]
+            if pairs:
+                membership = np.array([[j2 in TECHNOLOGIES_OF_END_USES_TYPE[eut] for j2 in TECH_NOSTORAGE]
+                                       for eut, _ in pairs])
+                pair_techs = positions([j for _, j in pairs], TECH_NOSTORAGE)
+                block = ConstraintBlock(len(pairs))
+                annual(block, F_t_tech[pair_techs])
+                annual(block, F_t_tech[None], -lookup(fmax_perc, [[j for _, j in pairs]])[:, None] * membership,
+                       block.rows[:, None, None, None])
+                _add_block(m, 'f_max_perc', block, '<=', labels=[pd.MultiIndex.from_tuples(
+                    pairs, names=['end_use_type', 'tech']).to_flat_index().rename('pair')])
+
+    # ====================================================================
+    # CONSTRAINT GROUP 6: MOBILITY
+    # ====================================================================
+
+    if 'mobility' in constraint_groups:
+        profiler.start('mobility')
+        print("Adding Group 6: Mobility constraints...")
+
+        TECHNOLOGIES_OF_END_USES_CATEGORY = sets.get('TECHNOLOGIES_OF_END_USES_CATEGORY', {})
+        end_uses_input = parameters.get('end_uses_input', {})
+        V2G = sets.get('V2G', [])
+        EVs_BATT_OF_V2G = sets.get('EVs_BATT_OF_V2G', {})
+        vehicle_capacity = parameters.get('vehicle_capacity', {})
+        batt_per_car = parameters.get('batt_per_car', {})
+
+        # [Eqs. 2.24-2.25] F_t[j,h,td] = Shares[j] * (demand * time series / t_op), where the time
+        # series and t_op are defined
+        for category, variable, series, name in (
+            ('MOBILITY_PASSENGER', 'Shares_mobility_passenger', 'mob_pass_time_series', 'op_strategy_mob_pass'),
+            ('MOBILITY_FREIGHT', 'Shares_mobility_freight', 'mob_freight_time_series', 'op_strategy_mob_freight'),
+        ):
+            if category not in TECHNOLOGIES_OF_END_USES_CATEGORY:
+                continue
+            category_techs = TECHNOLOGIES_OF_END_USES_CATEGORY[category]
+            shares_ = m.add_variables(lower=0, coords=[category_techs], name=variable).labels.values
+            time_series = parameters.get(series, None)
+            if time_series is None or category not in end_uses_input:
+                continue
+            operated = [j for j in category_techs if j in TECH_NOSTORAGE]
+            profile = lookup(time_series, [HOURS, TYPICAL_DAYS], np.nan) \
+                / lookup(parameters.get('t_op', {}), [HOURS, TYPICAL_DAYS], np.nan)
+            block = ConstraintBlock((len(operated), n_h, n_td), mask=np.isfinite(profile))
+            block.add_terms(F_t_[entity(operated)])
+            block.add_terms(shares_[positions(operated, category_techs)][:, None, None],
+                            -end_uses_input[category] * np.nan_to_num(profile))
+            _add_block(m, name, block, '==', labels=[pd.Index(operated, name='tech'), hours, tds])
+
+        # [Eq. 2.30] F[battery] = F[vehicle] / vehicle_capacity * batt_per_car
+        if V2G and EVs_BATT_OF_V2G:
+            pairs = [(j, i) for j in V2G if j in EVs_BATT_OF_V2G for i in EVs_BATT_OF_V2G[j]
+                     if j in vehicle_capacity and j in batt_per_car]
+            if pairs:
+                vehicles = [j for j, _ in pairs]
+                block = ConstraintBlock(len(pairs))
+                block.add_terms(F_[tech([i for _, i in pairs])])
+                block.add_terms(F_[tech(vehicles)],
+                                -lookup(batt_per_car, [vehicles]) / lookup(vehicle_capacity, [vehicles]))
+                _add_block(m, 'EV_storage_size', block, '==', labels=[pd.MultiIndex.from_tuples(
+                    pairs, names=['v2g', 'battery']).to_flat_index().rename('pair')])
+
+    # ====================================================================
+    # CONSTRAINT GROUP 7: HEATING
+    # ====================================================================
+
+    if 'heating' in constraint_groups:
+        profiler.start('heating')
+        print("Adding Group 7: Heating constraints...")
+
+        TECHNOLOGIES_OF_END_USES_TYPE = sets.get('TECHNOLOGIES_OF_END_USES_TYPE', {})
+        techs_heat = [t for t in TECHNOLOGIES_OF_END_USES_TYPE.get('HEAT_LOW_T_DECEN', []) if t != 'DEC_SOLAR']
+        if techs_heat:
+            F_solar_ = m.add_variables(lower=0, coords=[techs_heat], name="F_solar").labels.values
+            F_t_solar_ = m.add_variables(lower=0, coords=[techs_heat, HOURS, TYPICAL_DAYS], name="F_t_solar").labels.values
+            m.add_variables(lower=0, coords=[techs_heat], name="Shares_lowT_dec")
+            heat_techs = pd.Index(techs_heat, name='tech')
+
+            # [Eq. 2.27] F_t_solar[j,h,td] <= F_solar[j] * c_p_t["DEC_SOLAR",h,td], where defined
+            if 'DEC_SOLAR' in c_p_t.index.get_level_values(0):
+                solar_cf = lookup(c_p_t, [['DEC_SOLAR'], HOURS, TYPICAL_DAYS], np.nan)[0]
+                block = ConstraintBlock(F_t_solar_.shape, mask=~np.isnan(solar_cf))
+                block.add_terms(F_t_solar_)
+                block.add_terms(F_solar_[:, None, None], -np.nan_to_num(solar_cf))
+                _add_block(m, 'thermal_solar_cf', block, '<=', labels=[heat_techs, hours, tds])
+
+            # [Eq. 2.28] F["DEC_SOLAR"] = sum(F_solar[j])
+            if 'DEC_SOLAR' in ALL_TECH:
+                block = ConstraintBlock(1)
+                block.add_terms(F_[ALL_TECH.index('DEC_SOLAR')], 1.0, 0)
+                block.add_terms(F_solar_, -1.0, 0)
+                _add_block(m, 'thermal_solar_total_capacity', block, '==')
+
+    profiler.stop()
+
+    # ====================================================================
+    # OBJECTIVE FUNCTION
+    # ====================================================================
+
+    if 'costs' in constraint_groups:
+        print("Adding objective function...")
+        m.add_objective(TotalCost, sense="min")
+    else:
+        # Placeholder objective: minimize total installed capacity
+        m.add_objective(F.sum(), sense="min")
+
+    return m
@@ -1,842 +1,914 @@
 """
 EnergyScope Core Model - XArray Vectorized Implementation
 
-This module implements the AMPL core model using fully vectorized xarray operations.
-All constraints use broadcasting, .shift(), and .sum() operations - minimal loops!
+This module implements the AMPL core model (ESTD_model_core.mod) using fully
+vectorized xarray operations. Every constraint family is one linopy constraint
+built by broadcasting, .sel(), .roll() and .sum() - no Python loop over hours,
+typical days or periods.
 
 Progress Tracker: ✅ ALL GROUPS IMPLEMENTED
-- [x] Setup and data loading
-- [x] Group 1: Energy Balance (3 constraints) - Fully vectorized
-- [x] Group 2: Resources (1 constraint) - Fully vectorized
-- [x] Group 3: Storage (5 constraints) - Mostly vectorized (period mapping needs data)
-- [x] Group 4: Costs & Objective - Fully vectorized
-- [x] Group 5: GWP (emissions) - Fully vectorized
-- [x] Group 6: Mobility - Semi-vectorized (vectorized over time)
-- [x] Group 7: Heating - Semi-vectorized (vectorized over time)
-- [x] Group 8: Network - Fully vectorized
-- [x] Group 9: Policy - Semi-vectorized (vectorized within categories)
-
-Vectorization Level: ~90% (only small category/tech loops remain)
+- [x] Setup and data loading (full ESTD dataset: data_loader_xarray.create_full_dataset_xarray)
+- [x] Group 1: Energy Balance (end uses, layer balance, capacity factors)
+- [x] Group 2: Resources (availability, constant imports)
+- [x] Group 3: Storage (level, daily storage, layer compatibility by masks, energy to power ratio incl. V2G)
+- [x] Group 4: Costs & Objective
+- [x] Group 5: GWP (emissions)
+- [x] Group 6: Mobility (operating strategies, freight shares, EV batteries)
+- [x] Group 7: Heating (decentralised thermal solar and storage)
+- [x] Group 8: Network (losses, extra grid and DHN)
+- [x] Group 9: Policy (technology shares, efficiency, solar area)
+
+Yearly quantities sum over the periods of the year, as in the AMPL model: the
+(hour, typical day) terms are weighted by the number of periods they represent.
+Storage flows are indexed by (hour, typical day) like in AMPL; the storage level
+is indexed by period and reads the flows of each period's (hour, typical day)
+through the sparse period -> (hour, typical day) incidence operator of TimeIndex.
+
+Structurally zero variables are not created (linopy masks): storage flows on
+incompatible layers, and operation levels of entities on no layer or at hours
+with a zero capacity factor.
 """
 
 import linopy
 import numpy as np
 import pandas as pd
 import xarray as xr
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from energyscope.profiling import BuildProfiler
+from energyscope.time_index import TimeIndex
+
+
+def _param(params: Dict[str, Any], name: str, coords: list, default: float = 0.0) -> xr.DataArray:
+    """
+    Parameter `name` over the product of `coords`, `default` where it is not defined.
+
+    Args:
+        params: Model parameters (xarray DataArrays)
+        name: Parameter name
+        coords: Axes (named pandas Index objects, the name being the dimension)
+        default: Value for missing labels (and for the whole array if the parameter is missing)
+
+    Returns:
+        xr.DataArray with the dimensions of `coords`, in that order
+    """
+    template = xr.DataArray(np.full([len(axis) for axis in coords], default, dtype=float),
+                            coords=list(coords), dims=[axis.name for axis in coords])
+    value = params.get(name)
+    if value is None:
+        return template
+    if not isinstance(value, xr.DataArray):
+        return xr.full_like(template, float(value))
+    value = value.reindex({axis.name: list(axis) for axis in coords if axis.name in value.dims})
+    return value.fillna(default).broadcast_like(template).transpose(*template.dims).astype(float)
+
+
+def _relabel(obj, dim: str, labels, new_dim: str, new_labels=None):
+    """
+    Select `labels` along `dim` and give them the dimension `new_dim`.
+
+    Used to align variables and parameters defined on different sets (e.g. the
+    storage technologies in F [tech] and in Storage_level [storage]).
+
+    Args:
+        obj: linopy Variable / LinearExpression or xarray DataArray
+        dim: Dimension to select on
+        labels: Labels to select
+        new_dim: Name of the resulting dimension
+        new_labels: Labels of the resulting dimension (default: `labels`)
+    """
+    out = obj.sel({dim: list(labels)}).rename({dim: new_dim})
+    if new_labels is not None:
+        out = out.assign_coords({new_dim: list(new_labels)})
+    return out
+
+
+def _by_period(obj, incidence, periods: pd.Index):
+    """
+    Value of each period's (hour, td) in an (..., hour, td) array or expression.
+
+    Applies the period -> (hour, td) incidence operator of TimeIndex.incidence.
+    Each of its rows holds a single entry, so applying it gathers the (hour, td)
+    columns: variables stay indexed by (hour, td), as in AMPL.
+
+    Args:
+        obj: linopy LinearExpression or xarray DataArray over 'hour' and 'td'
+        incidence: (periods, hours * typical days) CSR incidence matrix (hour-major columns)
+        periods: Periods (rows of `incidence`), named 'period'
+
+    Returns:
+        Same type as `obj` (a LinearExpression for a Variable), with 'period' in place of 'hour' and 'td'
+    """
+    if isinstance(obj, linopy.Variable):
+        obj = obj.to_linexpr()
+    n_td = obj.sizes['td']
+    columns = xr.DataArray(incidence.indices, dims=[periods.name])
+    out = obj.isel(hour=columns // n_td, td=columns % n_td)
+    return out.drop_vars(['hour', 'td']).assign_coords({periods.name: periods})
+
+
+def _by_day(obj, day_td_pos: np.ndarray, days: pd.Index):
+    """
+    Value of each day's typical day in an (..., td) array or expression.
+
+    Args:
+        obj: linopy Variable / LinearExpression or xarray DataArray over 'td'
+        day_td_pos: Position of the typical day of each day (TimeIndex.day_td_pos)
+        days: Days of the year, named 'day'
+
+    Returns:
+        Same type as `obj` (a LinearExpression for a Variable), with 'day' in place of 'td'
+    """
+    if isinstance(obj, linopy.Variable):
+        obj = obj.to_linexpr()
+    out = obj.isel(td=xr.DataArray(day_td_pos, dims=[days.name]))
+    return out.drop_vars('td').assign_coords({days.name: days})
 
 
-def build_core_model_xarray(data: Dict[str, Any], constraint_groups: list = None) -> linopy.Model:
+def _on_layers(profiles: Dict[str, Any], layers: pd.Index, template: xr.DataArray) -> xr.DataArray:
+    """
+    (layer, hour, td) array holding each profile on its layer, 0 on the other layers.
+
+    Args:
+        profiles: (hour, td) arrays or scalars, by layer
+        layers: Layers of the model
+        template: (hour, td) array giving the time coordinates
+    """
+    out = xr.zeros_like(template).expand_dims({layers.name: layers}).copy()
+    for layer, profile in profiles.items():
+        if layer in layers:
+            out.loc[{layers.name: layer}] = profile
+    return out
+
+
+def build_core_model_xarray(data: Dict[str, Any], constraint_groups: list = None,
+                            storage_formulation: str = 'chronological',
+                            profiler: Optional[BuildProfiler] = None) -> linopy.Model:
     """
     Build EnergyScope core model using vectorized xarray operations.
-    
+
     Args:
         data: Dictionary with 'sets' and 'params' containing pandas Index and xarray DataArrays
+            (see data_loader_xarray.create_full_dataset_xarray for the full ESTD dataset)
         constraint_groups: List of groups to include (default: all implemented)
-        
+        storage_formulation: 'chronological' (storage level at each period, as in AMPL by default)
+            or 'intra_inter' (daily storage level within each typical day, seasonal storage level
+            as an inter-day level plus an intra-day deviation, as intra_inter_storage = 1 in AMPL)
+        profiler: Records the wall time, CPU time, memory and size of each constraint group
+            (see energyscope.profiling.BuildProfiler)
+
     Returns:
         linopy.Model ready to solve
+
+    Raises:
+        ValueError: If the storage formulation is unknown, or if storage is modelled without T_H_TD
     """
+    if storage_formulation not in ('chronological', 'intra_inter'):
+        raise ValueError(f"Unknown storage formulation: {storage_formulation}")
     if constraint_groups is None:
         # Default: include all implemented groups
-        constraint_groups = ['energy_balance', 'resources', 'storage', 'costs', 'gwp', 
+        constraint_groups = ['energy_balance', 'resources', 'storage', 'costs', 'gwp',
                            'mobility', 'heating', 'network', 'policy']
-    
+
     m = linopy.Model()
-    
+    if profiler is None:
+        profiler = BuildProfiler(enabled=False)
+    profiler.bind(m.constraints)
+
     print("=" * 70)
     print("BUILDING CORE MODEL (XARRAY VECTORIZED)")
     print("=" * 70)
-    
+
     # =========================================================================
     # EXTRACT DATA
     # =========================================================================
-    
-    # Sets (pandas Index objects for proper dimension handling)
-    PERIODS = data['sets']['PERIODS']
-    HOURS = data['sets']['HOURS']
-    TYPICAL_DAYS = data['sets']['TYPICAL_DAYS']
-    TECHNOLOGIES = data['sets']['TECHNOLOGIES']
-    STORAGE_TECH = data['sets']['STORAGE_TECH']
-    RESOURCES = data['sets']['RESOURCES']
-    LAYERS = data['sets']['LAYERS']
-    END_USES_TYPES = data['sets'].get('END_USES_TYPES', pd.Index([]))
-    
-    # Derived sets
-    ALL_TECH = TECHNOLOGIES.union(STORAGE_TECH) if len(STORAGE_TECH) > 0 else TECHNOLOGIES
-    TECH_NOSTORAGE = TECHNOLOGIES.difference(STORAGE_TECH) if len(STORAGE_TECH) > 0 else TECHNOLOGIES
-    ENTITIES_WITH_F_T = RESOURCES.union(TECH_NOSTORAGE)
-    
-    # Parameters (xarray DataArrays)
-    F_MAX = data['params']['F_MAX']
-    F_MIN = data['params']['F_MIN']
-    LAYERS_IN_OUT = data['params']['LAYERS_IN_OUT']
-    C_P_T = data['params'].get('C_P_T')  # Capacity factors (tech, hour, td)
-    
-    # Time parameters
-    T_OP = data['params'].get('T_OP')  # Operating time per (hour, td)
-    TOTAL_TIME = data['params'].get('TOTAL_TIME', 8760.0)  # Annual hours
-    
-    # Other parameters
-    C_P = data['params'].get('C_P')  # Annual capacity factor (tech,)
-    
+
+    sets = data['sets']
+    params = data['params']
+
+    # Sets (pandas Index objects named after their dimension)
+    HOURS = pd.Index(sets['HOURS'], name='hour')
+    TYPICAL_DAYS = pd.Index(sets['TYPICAL_DAYS'], name='td')
+    STORAGE_TECH = pd.Index(sets['STORAGE_TECH'], name='storage')
+    RESOURCES = pd.Index(sets['RESOURCES'], name='resource')
+    LAYERS = pd.Index(sets['LAYERS'], name='layer')
+    END_USES_TYPES = pd.Index(sets.get('END_USES_TYPES', []), name='end_use_type')
+
+    # Derived sets (TECHNOLOGIES includes STORAGE_TECH in the AMPL model; each technology appears once)
+    ALL_TECH = pd.Index(list(dict.fromkeys(list(sets['TECHNOLOGIES']) + list(STORAGE_TECH))), name='tech')
+    TECH_NOSTORAGE = ALL_TECH[~ALL_TECH.isin(STORAGE_TECH)]
+    ENTITIES = pd.Index(list(dict.fromkeys(list(RESOURCES) + list(ALL_TECH))), name='entity')
+
+    # Time: each period is mapped to an (hour, typical day) through T_H_TD
+    T_OP = _param(params, 'T_OP', [HOURS, TYPICAL_DAYS], 1.0)  # Operating time per (hour, td)
+    T_H_TD = sets.get('T_H_TD')
+    if T_H_TD:
+        time_index = TimeIndex(T_H_TD, HOURS, TYPICAL_DAYS)
+        PERIODS = pd.Index(time_index.periods, name='period')
+        incidence = time_index.incidence()  # Sparse period -> (hour, td) operator
+        period_count = xr.DataArray(incidence.sum(axis=0).A1.reshape(len(HOURS), len(TYPICAL_DAYS)),
+                                    coords=[HOURS, TYPICAL_DAYS])
+        # Yearly sums run over the periods: each (h, td) counts once per period it represents
+        T_OP_YEAR = T_OP * period_count
+        TOTAL_TIME = float(T_OP_YEAR.sum())
+    else:
+        time_index = None
+        PERIODS = pd.Index(sets.get('PERIODS', []), name='period')
+        T_OP_YEAR = T_OP
+        TOTAL_TIME = params.get('TOTAL_TIME', 8760.0)  # Annual hours
+
+    def annual(expr):
+        """Yearly total of an (..., hour, td) expression."""
+        return (expr * T_OP_YEAR).sum(dim=['hour', 'td'])
+
+    # Parameters (xarray DataArrays, with the AMPL defaults)
+    F_MAX = _param(params, 'F_MAX', [ALL_TECH], np.inf)
+    F_MIN = _param(params, 'F_MIN', [ALL_TECH], 0.0)
+    LAYERS_IN_OUT = _param(params, 'LAYERS_IN_OUT', [ENTITIES, LAYERS])
+    C_P_T = _param(params, 'C_P_T', [ALL_TECH, HOURS, TYPICAL_DAYS], 1.0)  # Capacity factors (tech, hour, td)
+    C_P = _param(params, 'C_P', [ALL_TECH], 1.0)  # Annual capacity factor (tech,)
+    STORAGE_EFF_IN = _param(params, 'STORAGE_EFF_IN', [STORAGE_TECH, LAYERS])
+    STORAGE_EFF_OUT = _param(params, 'STORAGE_EFF_OUT', [STORAGE_TECH, LAYERS])
+    STORAGE_DAILY = [j for j in sets.get('STORAGE_DAILY', []) if j in STORAGE_TECH]
+    I_RATE = params.get('I_RATE', 0.05)
+
+    # End uses: yearly demands and time series (full model), or a fixed hourly demand
+    END_USES_INPUT = params.get('END_USES_INPUT')
+    END_USES = params.get('END_USES')
+
+    TECHNOLOGIES_OF_END_USES_TYPE = sets.get('TECHNOLOGIES_OF_END_USES_TYPE', {})
+    TECHNOLOGIES_OF_END_USES_CATEGORY = sets.get('TECHNOLOGIES_OF_END_USES_CATEGORY', {})
+    EVs_BATT_OF_V2G = sets.get('EVs_BATT_OF_V2G', {})
+    V2G = [i for i in sets.get('V2G', []) if EVs_BATT_OF_V2G.get(i) and i in ALL_TECH]
+    EV_BATTERIES = [EVs_BATT_OF_V2G[i][0] for i in V2G]  # One battery per V2G vehicle
+
     print(f"\nModel dimensions:")
-    print(f"  Technologies: {len(TECHNOLOGIES)}")
+    print(f"  Technologies: {len(ALL_TECH)}")
     print(f"  Storage: {len(STORAGE_TECH)}")
     print(f"  Resources: {len(RESOURCES)}")
     print(f"  Layers: {len(LAYERS)}")
     print(f"  Hours: {len(HOURS)}")
     print(f"  Typical days: {len(TYPICAL_DAYS)}")
     print(f"  Periods: {len(PERIODS)}")
-    
+
     # =========================================================================
     # DECISION VARIABLES
     # =========================================================================
-    
+
     print("\nCreating decision variables...")
-    
-    # F: Installed capacity [GW] or storage capacity [GWh]
-    F = m.add_variables(
-        lower=F_MIN,
-        upper=F_MAX,
-        coords=[ALL_TECH],
-        name="F"
-    )
-    
-    # F_t: Operation level [GW] - for resources and non-storage techs
-    F_t = m.add_variables(
-        lower=0,
-        coords=[ENTITIES_WITH_F_T, HOURS, TYPICAL_DAYS],
-        name="F_t"
-    )
-    
-    # Storage variables
-    # KEY CHANGE: Index Storage_in/out by PERIOD instead of (HOUR, TYPICAL_DAY)
-    # This enables proper .shift() vectorization with NO loops!
+
+    # F: Installed capacity [GW] or storage capacity [GWh] [Eq. 2.9: f_min <= F <= f_max]
+    F = m.add_variables(lower=F_MIN, upper=F_MAX, coords=[ALL_TECH], name="F")
+
+    # F_t: Operation level [GW] - for resources and all technologies (storage level of daily storage)
+    # Structurally zero entries are not created: entities on no layer (other than daily storage,
+    # whose F_t is the storage level) and technologies at hours without capacity factor. Absent
+    # entries count as 0 in the expressions (fillna)
+    operating = (LAYERS_IN_OUT != 0).any(dim='layer') | xr.DataArray(ENTITIES.isin(STORAGE_DAILY), coords=[ENTITIES])
+    available = C_P_T.rename(tech='entity').reindex(entity=list(ENTITIES), fill_value=1.0) > 0
+    F_t_mask = (operating & available).transpose('entity', 'hour', 'td')
+    F_t = m.add_variables(lower=0, coords=[ENTITIES, HOURS, TYPICAL_DAYS], name="F_t", mask=F_t_mask).fillna(0)
+    F_t_tech = _relabel(F_t, 'entity', ALL_TECH, 'tech')
+    F_t_resources = _relabel(F_t, 'entity', RESOURCES, 'resource')
+
+    # Storage variables: flows per (hour, td) as in AMPL, level per period
+    # Flows only exist on the layers a storage is compatible with (storage_layer_in/out [Eq. 2.17-2.18])
     if len(STORAGE_TECH) > 0:
-        Storage_in = m.add_variables(
-            lower=0,
-            coords=[STORAGE_TECH, LAYERS, PERIODS],  # Changed: PERIODS instead of (HOURS, TYPICAL_DAYS)
-            name="Storage_in"
-        )
-        
-        Storage_out = m.add_variables(
-            lower=0,
-            coords=[STORAGE_TECH, LAYERS, PERIODS],  # Changed: PERIODS instead of (HOURS, TYPICAL_DAYS)
-            name="Storage_out"
-        )
-        
-        Storage_level = m.add_variables(
-            lower=0,
-            coords=[STORAGE_TECH, PERIODS],
-            name="Storage_level"
-        )
-    
+        if time_index is None:
+            raise ValueError("Storage requires the period mapping T_H_TD")
+        flow_coords = [STORAGE_TECH, LAYERS, HOURS, TYPICAL_DAYS]
+        Storage_in = m.add_variables(lower=0, coords=flow_coords, name="Storage_in",
+                                     mask=STORAGE_EFF_IN > 0).fillna(0)
+        Storage_out = m.add_variables(lower=0, coords=flow_coords, name="Storage_out",
+                                      mask=STORAGE_EFF_OUT > 0).fillna(0)
+        if storage_formulation == 'chronological':
+            Storage_level = m.add_variables(lower=0, coords=[STORAGE_TECH, PERIODS], name="Storage_level")
+        else:
+            # Level within each typical day (daily storage) or change since the start of the day
+            # (seasonal storage), level of seasonal storage at the start of each day, and extreme
+            # changes of level within each typical day
+            SEASONAL = STORAGE_TECH[~STORAGE_TECH.isin(STORAGE_DAILY)]
+            day_td_pos = time_index.day_td_pos()
+            DAYS = pd.Index(np.arange(1, len(day_td_pos) + 1), name='day')
+            Storage_level_intra = m.add_variables(coords=[STORAGE_TECH, HOURS, TYPICAL_DAYS], name="Storage_level_intra")
+            Storage_level_inter = m.add_variables(lower=0, coords=[SEASONAL, DAYS], name="Storage_level_inter")
+            Storage_intra_max = m.add_variables(lower=0, coords=[SEASONAL, TYPICAL_DAYS], name="Storage_intra_max")
+            Storage_intra_min = m.add_variables(upper=0, coords=[SEASONAL, TYPICAL_DAYS], name="Storage_intra_min")
+
+    # Shares of the end-use demands (modal split, DHN share) [Eq. 2.8]
+    if END_USES_INPUT is not None:
+        shares = {}
+        for share in ('Share_mobility_public', 'Share_freight_train', 'Share_freight_road',
+                      'Share_freight_boat', 'Share_heat_dhn'):
+            shares[share] = m.add_variables(lower=params.get(f'{share.upper()}_MIN', 0.0),
+                                            upper=params.get(f'{share.upper()}_MAX', 1.0), name=share)
+        End_uses = m.add_variables(lower=0, coords=[LAYERS, HOURS, TYPICAL_DAYS], name="End_uses")
+
+    # Network losses [GW] (electricity grid and DHN)
+    if len(END_USES_TYPES) > 0:
+        Network_losses = m.add_variables(lower=0, coords=[END_USES_TYPES, HOURS, TYPICAL_DAYS], name="Network_losses")
+
     print(f"  ✓ Created {len(m.variables)} variable groups")
-    
+
     # =========================================================================
     # CONSTRAINT GROUP 1: ENERGY BALANCE (VECTORIZED)
     # =========================================================================
-    
+
     if 'energy_balance' in constraint_groups:
+        profiler.start('energy_balance')
         print("\n" + "=" * 70)
         print("GROUP 1: ENERGY BALANCE CONSTRAINTS (VECTORIZED)")
         print("=" * 70)
-        
+
         # ---------------------------------------------------------------------
-        # Constraint 1.1: capacity_factor_t (VECTORIZED)
-        # F_t[j,h,td] <= F[j] * C_P_T[j,h,td]
+        # Constraint 1.1: end_uses_t [Eq. 2.8] (VECTORIZED)
+        # End_uses[l,h,td] = fixed demand + demand shared by the share variables (+ DHN losses)
         # ---------------------------------------------------------------------
-        if C_P_T is not None:
-            print("\n1.1 Capacity factor (time-varying) - VECTORIZING...")
-            
-            # Select only non-storage techs from F and C_P_T
-            F_nostorage = F.loc[TECH_NOSTORAGE]
-            C_P_T_nostorage = C_P_T.sel(tech=TECH_NOSTORAGE)
-            
-            # Vectorized constraint: F_t <= F * C_P_T
-            # F_nostorage: (tech,) broadcasts to (tech, hour, td)
-            # C_P_T_nostorage: (tech, hour, td)
-            # F_t is already (entities, hour, td) but we only constrain TECH_NOSTORAGE rows
-            
-            # Select F_t rows for non-storage techs
-            F_t_nostorage = F_t.loc[TECH_NOSTORAGE, :, :]
-            
-            m.add_constraints(
-                F_t_nostorage <= F_nostorage * C_P_T_nostorage,
-                name='capacity_factor_t'
-            )
-            
-            n_constraints = len(TECH_NOSTORAGE) * len(HOURS) * len(TYPICAL_DAYS)
-            print(f"  ✓ Added {n_constraints} constraints (vectorized)")
-        else:
-            print("\n1.1 Capacity factor - SKIPPED (no C_P_T data)")
-        
-        # ---------------------------------------------------------------------
-        # Constraint 1.2: layer_balance (VECTORIZED)
-        # sum(F_t * LAYERS_IN_OUT) + sum(Storage_out - Storage_in) = End_uses
-        # ---------------------------------------------------------------------
-        print("\n1.2 Layer balance - VECTORIZING...")
-        
-        # Production by layer from technologies/resources
-        # LAYERS_IN_OUT: (entity, layer)
-        # F_t: (entity, hour, td)
-        # Want: (layer, hour, td)
-        
-        # Multiply F_t by LAYERS_IN_OUT and sum over entities
-        production_by_layer = (F_t * LAYERS_IN_OUT).sum(dim='entity')
-        # Result: (layer, hour, td)
-        
-        # Get demand (End_uses)
-        END_USES = data['params'].get('END_USES')
-        
-        # Add storage contribution - Now Storage is indexed by PERIOD
-        # Need to map periods to (hour, td) for layer balance
-        if len(STORAGE_TECH) > 0:
-            # Storage_in/out are now (storage, layer, period)
-            # Need to add them to layer balance which is (layer, hour, td)
-            # Use T_H_TD to map
-            
-            T_H_TD = data['sets'].get('T_H_TD')
-            if T_H_TD and END_USES is not None:
-                # For each (hour, td), find which period(s) map to it
-                # Then add storage flow for those periods to the balance
-                
-                for h in HOURS:
-                    for td in TYPICAL_DAYS:
-                        # Find period that corresponds to (h, td)
-                        matching_periods = [p for (p, ph, ptd) in T_H_TD if ph == h and ptd == td]
-                        
-                        if matching_periods:
-                            # For this (h, td), add storage contribution
-                            for p in matching_periods:
-                                # Storage_in/out.loc[:, :, p]: (storage, layer)
-                                storage_net_htd = (Storage_out.loc[:, :, p] - Storage_in.loc[:, :, p]).sum(dim='storage')
-                                # Sum over storage: (layer,)
-                                
-                                # Add to production at this (h, td)
-                                m.add_constraints(
-                                    production_by_layer.sel(hour=h, td=td) + storage_net_htd == 
-                                    END_USES.sel(hour=h, td=td),
-                                    name=f'layer_balance_{h}_{td}'
-                                )
-            else:
-                # No T_H_TD mapping or no demand, just balance without storage
-                if END_USES is not None:
-                    m.add_constraints(
-                        production_by_layer == END_USES,
-                        name='layer_balance'
-                    )
+        if END_USES_INPUT is not None:
+            print("\n1.1 End uses - VECTORIZING...")
+
+            eui = {key: END_USES_INPUT.get(key, 0.0) for key in (
+                'ELECTRICITY', 'LIGHTING', 'HEAT_HIGH_T', 'HEAT_LOW_T_HW', 'HEAT_LOW_T_SH',
+                'MOBILITY_PASSENGER', 'MOBILITY_FREIGHT')}
+            # Hourly demand profiles (hour, td)
+            elec = eui['ELECTRICITY'] / TOTAL_TIME + eui['LIGHTING'] * _param(params, 'ELEC_TS', [HOURS, TYPICAL_DAYS]) / T_OP
+            heat_low_t = eui['HEAT_LOW_T_HW'] / TOTAL_TIME + eui['HEAT_LOW_T_SH'] * _param(params, 'HEAT_TS', [HOURS, TYPICAL_DAYS]) / T_OP
+            passenger = eui['MOBILITY_PASSENGER'] * _param(params, 'MOB_PASS_TS', [HOURS, TYPICAL_DAYS]) / T_OP
+            freight = eui['MOBILITY_FREIGHT'] * _param(params, 'MOB_FREIGHT_TS', [HOURS, TYPICAL_DAYS]) / T_OP
+
+            fixed_demand = _on_layers({
+                'ELECTRICITY': elec, 'HEAT_LOW_T_DECEN': heat_low_t, 'MOB_PRIVATE': passenger,
+                'HEAT_HIGH_T': eui['HEAT_HIGH_T'] / TOTAL_TIME,
+            }, LAYERS, T_OP)
+            shared_demand = {
+                'Share_heat_dhn': {'HEAT_LOW_T_DHN': heat_low_t, 'HEAT_LOW_T_DECEN': -heat_low_t},
+                'Share_mobility_public': {'MOB_PUBLIC': passenger, 'MOB_PRIVATE': -passenger},
+                'Share_freight_train': {'MOB_FREIGHT_RAIL': freight},
+                'Share_freight_road': {'MOB_FREIGHT_ROAD': freight},
+                'Share_freight_boat': {'MOB_FREIGHT_BOAT': freight},
+            }
+            end_uses = sum(shares[share] * _on_layers(profiles, LAYERS, T_OP)
+                           for share, profiles in shared_demand.items())
+            if len(END_USES_TYPES) > 0:
+                # DHN losses are supplied on the DHN layer: incidence (end_use_type, layer)
+                dhn = xr.DataArray((END_USES_TYPES.to_numpy()[:, None] == LAYERS.to_numpy()[None, :])
+                                   & (LAYERS.to_numpy() == 'HEAT_LOW_T_DHN')[None, :],
+                                   coords=[END_USES_TYPES, LAYERS]).astype(float)
+                end_uses = end_uses + (Network_losses * dhn).sum(dim='end_use_type')
+
+            m.add_constraints(End_uses - end_uses == fixed_demand, name='end_uses_t')
+            demand = End_uses
+            print(f"  ✓ Added {End_uses.size:,} constraints (vectorized)")
+        elif END_USES is not None:
+            demand = END_USES.reindex(layer=list(LAYERS), fill_value=0.0)
         else:
-            # No storage, simple balance
-            if END_USES is not None:
-                m.add_constraints(
-                    production_by_layer == END_USES,
-                    name='layer_balance'
-                )
-        
-        if END_USES is not None:
-            n_constraints = len(HOURS) * len(TYPICAL_DAYS) if len(STORAGE_TECH) > 0 and T_H_TD else len(LAYERS) * len(HOURS) * len(TYPICAL_DAYS)
-            print(f"  ✓ Added {n_constraints} constraints (vectorized)")
+            demand = None
+
+        # ---------------------------------------------------------------------
+        # Constraint 1.2: capacity_factor_t [Eq. 2.10] (VECTORIZED)
+        # F_t[j,h,td] <= F[j] * C_P_T[j,h,td]
+        # ---------------------------------------------------------------------
+        print("\n1.2 Capacity factor (time-varying) - VECTORIZING...")
+        tech_mask = _relabel(F_t_mask, 'entity', ALL_TECH, 'tech')
+        m.add_constraints(F_t_tech <= F * C_P_T, name='capacity_factor_t', mask=tech_mask)
+        print(f"  ✓ Added {int(tech_mask.sum()):,} constraints (vectorized)")
+
+        # ---------------------------------------------------------------------
+        # Constraint 1.3: capacity_factor annual [Eq. 2.11] (VECTORIZED)
+        # sum over periods (F_t * T_OP) <= F * C_P * TOTAL_TIME
+        # ---------------------------------------------------------------------
+        print("\n1.3 Capacity factor (annual) - VECTORIZING...")
+        m.add_constraints(annual(F_t_tech) <= F * C_P * TOTAL_TIME, name='capacity_factor')
+        print(f"  ✓ Added {len(ALL_TECH)} constraints (vectorized)")
+
+        # ---------------------------------------------------------------------
+        # Constraint 1.4: layer_balance [Eq. 2.13] (VECTORIZED)
+        # sum(F_t * LAYERS_IN_OUT) + sum(Storage_out - Storage_in) = End_uses, per (layer, hour, td)
+        # ---------------------------------------------------------------------
+        print("\n1.4 Layer balance - VECTORIZING...")
+        if demand is not None:
+            production_by_layer = (F_t * LAYERS_IN_OUT).sum(dim='entity')
+            if len(STORAGE_TECH) > 0:
+                production_by_layer = production_by_layer + (Storage_out - Storage_in).sum(dim='storage')
+            m.add_constraints(production_by_layer - demand == 0, name='layer_balance')
+            print(f"  ✓ Added {len(LAYERS) * len(HOURS) * len(TYPICAL_DAYS):,} constraints (vectorized)")
         else:
             print("  ⚠ No END_USES data, skipping layer_balance")
-        
-        # ---------------------------------------------------------------------
-        # Constraint 1.3: capacity_factor annual (VECTORIZED)
-        # sum(F_t * T_OP) <= F * C_P * TOTAL_TIME
-        # ---------------------------------------------------------------------
-        if C_P is not None and T_OP is not None:
-            print("\n1.3 Capacity factor (annual) - VECTORIZING...")
-            
-            # F_t: (entity, hour, td) - select only TECH_NOSTORAGE
-            # T_OP: (hour, td)
-            # Sum over hour and td dimensions
-            
-            F_t_nostorage = F_t.loc[TECH_NOSTORAGE, :, :]
-            
-            # Annual operation: sum(F_t * T_OP) over (hour, td)
-            annual_operation = (F_t_nostorage * T_OP).sum(dim=['hour', 'td'])
-            # Result: (tech,)
-            
-            # Annual capacity: F * C_P * TOTAL_TIME
-            annual_capacity = F_nostorage * C_P.sel(tech=TECH_NOSTORAGE) * TOTAL_TIME
-            # Result: (tech,)
-            
-            m.add_constraints(
-                annual_operation <= annual_capacity,
-                name='capacity_factor_annual'
-            )
-            n_constraints = len(TECH_NOSTORAGE)
-            print(f"  ✓ Added {n_constraints} constraints (vectorized)")
-        else:
-            print("\n1.3 Capacity factor (annual) - SKIPPED (missing C_P or T_OP)")
-    
+
     # =========================================================================
     # CONSTRAINT GROUP 2: RESOURCES (VECTORIZED)
     # =========================================================================
-    
+
     if 'resources' in constraint_groups:
+        profiler.start('resources')
         print("\n" + "=" * 70)
         print("GROUP 2: RESOURCE CONSTRAINTS (VECTORIZED)")
         print("=" * 70)
-        
-        AVAIL = data['params'].get('AVAIL')
-        
-        if AVAIL is not None and T_OP is not None:
-            print("\n2.1 Resource availability - VECTORIZING...")
-            
-            # F_t for resources: (entity, hour, td) - select RESOURCES rows
-            # T_OP: (hour, td)
-            # Sum over (hour, td) dimensions
-            
-            F_t_resources = F_t.loc[RESOURCES, :, :]
-            
-            # Annual consumption: sum(F_t * T_OP)
-            annual_consumption = (F_t_resources * T_OP).sum(dim=['hour', 'td'])
-            # Result: (resource,)
-            
-            # AVAIL: (resource,)
+
+        # ---------------------------------------------------------------------
+        # Constraint 2.1: resource_availability [Eq. 2.12] (VECTORIZED)
+        # sum over periods (F_t * T_OP) <= AVAIL, for resources with a finite availability
+        # ---------------------------------------------------------------------
+        print("\n2.1 Resource availability - VECTORIZING...")
+        AVAIL = _param(params, 'AVAIL', [RESOURCES], np.inf)
+        limited = np.isfinite(AVAIL)
+        m.add_constraints(annual(F_t_resources) <= AVAIL.where(limited, 0.0), name='resource_availability',
+                          mask=limited)
+        print(f"  ✓ Added {int(limited.sum())} constraints (vectorized)")
+
+        # ---------------------------------------------------------------------
+        # Constraint 2.2: resource_constant_import (VECTORIZED)
+        # F_t[i,h,td] * T_OP[h,td] = Import_constant[i]
+        # ---------------------------------------------------------------------
+        RES_IMPORT_CONSTANT = pd.Index([i for i in sets.get('RES_IMPORT_CONSTANT', []) if i in RESOURCES],
+                                       name='resource')
+        if len(RES_IMPORT_CONSTANT) > 0:
+            print("\n2.2 Constant imports - VECTORIZING...")
+            Import_constant = m.add_variables(lower=0, coords=[RES_IMPORT_CONSTANT], name="Import_constant")
             m.add_constraints(
-                annual_consumption <= AVAIL,
-                name='resource_availability'
+                _relabel(F_t, 'entity', RES_IMPORT_CONSTANT, 'resource') * T_OP - Import_constant == 0,
+                name='resource_constant_import'
             )
-            n_constraints = len(RESOURCES)
-            print(f"  ✓ Added {n_constraints} constraints (vectorized)")
-        else:
-            print("\n2.1 Resource availability - SKIPPED (missing AVAIL or T_OP)")
-    
+            print(f"  ✓ Added {len(RES_IMPORT_CONSTANT) * len(HOURS) * len(TYPICAL_DAYS):,} constraints (vectorized)")
+
     # =========================================================================
-    # CONSTRAINT GROUP 3: STORAGE (VECTORIZED WITH .shift())
+    # CONSTRAINT GROUP 3: STORAGE (VECTORIZED)
     # =========================================================================
-    
+
     if 'storage' in constraint_groups and len(STORAGE_TECH) > 0:
+        profiler.start('storage')
         print("\n" + "=" * 70)
         print("GROUP 3: STORAGE CONSTRAINTS (VECTORIZED)")
         print("=" * 70)
-        
-        STORAGE_EFF_IN = data['params'].get('STORAGE_EFF_IN')
-        STORAGE_EFF_OUT = data['params'].get('STORAGE_EFF_OUT')
-        STORAGE_LOSSES = data['params'].get('STORAGE_LOSSES', 
-                                            xr.DataArray(np.zeros(len(STORAGE_TECH)), 
-                                                        coords=[STORAGE_TECH], dims=['storage']))
-        
-        # ---------------------------------------------------------------------
-        # Constraint 3.1 & 3.2: Storage layer compatibility (VECTORIZED)
-        # Set Storage_in/out = 0 for incompatible (storage, layer) pairs
-        # ---------------------------------------------------------------------
-        print("\n3.1-3.2 Storage layer compatibility - VECTORIZING...")
-        
-        if STORAGE_EFF_IN is not None:
-            # Storage_in/out are now (storage, layer, period)
-            # For incompatible (storage, layer) pairs, set to 0 across ALL periods
-            
-            # Small loop over (storage, layer) but vectorized over all periods (8760)
-            for storage in STORAGE_TECH:
-                for layer in LAYERS:
-                    if STORAGE_EFF_IN.sel(storage=storage, layer=layer).item() == 0:
-                        # Vectorized over all periods!
-                        m.add_constraints(
-                            Storage_in.loc[storage, layer, :] == 0,
-                            name=f'storage_layer_in_{storage}_{layer}'
-                        )
-            
-            for storage in STORAGE_TECH:
-                for layer in LAYERS:
-                    if STORAGE_EFF_OUT.sel(storage=storage, layer=layer).item() == 0:
-                        # Vectorized over all periods!
-                        m.add_constraints(
-                            Storage_out.loc[storage, layer, :] == 0,
-                            name=f'storage_layer_out_{storage}_{layer}'
-                        )
-            
-            print(f"  ✓ Added layer compatibility constraints (vectorized over {len(PERIODS)} periods)")
-        
-        # ---------------------------------------------------------------------
-        # Constraint 3.3: Storage level balance (FULLY VECTORIZED WITH .shift() - NO LOOPS!)
-        # Storage_level[j,t] = Storage_level[j,t-1] * (1-loss) + sum(inputs - outputs)
-        # ---------------------------------------------------------------------
-        print("\n3.3 Storage level balance - FULLY VECTORIZING with .shift() (NO LOOPS!)...")
-        
-        # Storage_in/out are now indexed by (storage, layer, period) - same time dimension as Storage_level!
-        # This allows perfect .shift() vectorization
-        
-        n_storage = len(STORAGE_TECH)
-        n_periods = len(PERIODS)
-        
-        # Storage flows: sum over layers to get (storage, period)
-        # Storage_in: (storage, layer, period) * STORAGE_EFF_IN: (storage, layer)
-        # Sum over layer dimension → (storage, period)
-        print(f"     Computing storage_in_total (sum over {len(LAYERS)} layers)...")
-        storage_in_total = (Storage_in * STORAGE_EFF_IN).sum(dim='layer')
-        print(f"     ✓ storage_in_total computed")
-        
-        print(f"     Computing storage_out_total (sum over {len(LAYERS)} layers)...")
-        storage_out_total = (Storage_out / STORAGE_EFF_OUT).sum(dim='layer')
-        print(f"     ✓ storage_out_total computed")
-        
-        # Get t_op by period (pre-computed in data if available, otherwise build it)
-        T_OP_BY_PERIOD = data['params'].get('T_OP_BY_PERIOD')
-        
-        if T_OP_BY_PERIOD is None:
-            # Need to build it from T_H_TD mapping
-            print("     Building t_op by period from T_H_TD...")
-            T_H_TD = data['sets'].get('T_H_TD')
-            
-            if T_H_TD and len(T_H_TD) > 0 and len(T_H_TD) >= n_periods:
-                # Vectorized array construction (faster than list append)
-                t_op_vals = np.array([
-                    T_OP.sel(hour=h, td=td).item() 
-                    for p, h, td in T_H_TD[:n_periods]
-                ])
-                t_op_by_period = xr.DataArray(
-                    t_op_vals,
-                    coords=[PERIODS],
-                    dims=['period']
-                )
-                print(f"     ✓ Built t_op_by_period from {len(T_H_TD)} mappings")
-            else:
-                # Default: all ones
-                t_op_by_period = xr.DataArray(
-                    np.ones(n_periods),
-                    coords=[PERIODS],
-                    dims=['period']
+
+        STORAGE_LOSSES = _param(params, 'STORAGE_LOSSES', [STORAGE_TECH])
+
+        # Constraints 3.1 & 3.2: storage_layer_in / storage_layer_out hold by construction
+        # (no flow variable on incompatible layers)
+
+        # Net charge per (storage, hour, td); outputs are divided by the efficiency of compatible layers only
+        inverse_eff_out = (1 / STORAGE_EFF_OUT.where(STORAGE_EFF_OUT > 0)).fillna(0.0)
+        net_charge = ((Storage_in * STORAGE_EFF_IN).sum(dim='layer')
+                      - (Storage_out * inverse_eff_out).sum(dim='layer')) * T_OP
+
+        if storage_formulation == 'chronological':
+            # ---------------------------------------------------------------------
+            # Constraint 3.3: storage_level [Eq. 2.14] (VECTORIZED WITH .roll())
+            # Storage_level[j,t] = Storage_level[j,t-1] * (1-loss) + t_op * (inputs - outputs)[j, h(t), td(t)]
+            # ---------------------------------------------------------------------
+            print("\n3.3 Storage level balance - VECTORIZING with .roll()...")
+            net_charge_by_period = _by_period(net_charge, incidence, PERIODS)
+
+            # One constraint block over (storage, period): the previous level is the level rolled by one
+            # period, so that the first period follows the last one (cyclic year)
+            m.add_constraints(
+                Storage_level - Storage_level.roll(period=1) * (1 - STORAGE_LOSSES) - net_charge_by_period == 0,
+                name='storage_level'
+            )
+            print(f"  ✓ Storage balance added")
+            print(f"     {len(STORAGE_TECH) * len(PERIODS):,} constraints (vectorized)")
+
+            # ---------------------------------------------------------------------
+            # Constraint 3.4: impose_daily_storage [Eq. 2.15] (VECTORIZED)
+            # Storage_level[j,t] = F_t[j, h(t), td(t)] for daily storage
+            # ---------------------------------------------------------------------
+            if STORAGE_DAILY:
+                print("\n3.4 Daily storage - VECTORIZING...")
+                daily_level = _relabel(F_t, 'entity', STORAGE_DAILY, 'storage')
+                m.add_constraints(
+                    Storage_level.sel(storage=STORAGE_DAILY)
+                    - _by_period(daily_level, incidence, PERIODS) == 0,
+                    name='impose_daily_storage'
                 )
-                print(f"     → Using default t_op_by_period (all 1.0)")
+                print(f"  ✓ Added {len(STORAGE_DAILY) * len(PERIODS):,} constraints (vectorized)")
+
+            # ---------------------------------------------------------------------
+            # Constraint 3.5: limit_energy_stored_to_maximum [Eq. 2.16] (VECTORIZED)
+            # Storage_level[j,t] <= F[j], for storage that is not daily
+            # ---------------------------------------------------------------------
+            print("\n3.5 Storage capacity limit - VECTORIZING...")
+            seasonal = [j for j in STORAGE_TECH if j not in STORAGE_DAILY]
+            m.add_constraints(
+                Storage_level.sel(storage=seasonal) <= _relabel(F, 'tech', seasonal, 'storage'),
+                name='limit_energy_stored_to_maximum'
+            )
+            print(f"  ✓ Added {len(seasonal) * len(PERIODS):,} constraints (vectorized)")
+
         else:
-            t_op_by_period = T_OP_BY_PERIOD
-            print(f"     ✓ Using pre-computed t_op_by_period")
-        
-        # Add constraints directly without creating huge intermediate expressions
-        # The issue: With 219,000 storage variables, intermediate expressions get too large
-        
-        first_period = PERIODS[0]
-        last_period = PERIODS[-1]
-        
-        # Initial period constraint
-        print(f"     Adding initial constraint (all {n_storage} storage, vectorized)...")
-        t_op_first = t_op_by_period.sel(period=first_period).item()
-        
-        m.add_constraints(
-            Storage_level.loc[:, first_period] == 
-            Storage_level.loc[:, last_period] * (1 - STORAGE_LOSSES) + 
-            t_op_first * (storage_in_total.loc[:, first_period] - storage_out_total.loc[:, first_period]),
-            name='storage_level_initial'
-        )
-        print(f"     ✓ Initial constraint added")
-        
-        # BATCHED APPROACH for large models (8760 periods is too many for one .shift())
-        # Process periods in chunks to avoid memory explosion
-        print(f"     Adding balance for {n_periods-1:,} periods in batches...")
-        
-        periods_list = list(PERIODS)
-        BATCH_SIZE = 100  # Process 100 periods at a time
-        
-        n_batches = (n_periods - 1 + BATCH_SIZE - 1) // BATCH_SIZE
-        print(f"     Processing {n_batches} batches of {BATCH_SIZE} periods each...")
-        
-        for batch_idx in range(n_batches):
-            start_idx = 1 + batch_idx * BATCH_SIZE
-            end_idx = min(1 + (batch_idx + 1) * BATCH_SIZE, n_periods)
-            
-            batch_periods = periods_list[start_idx:end_idx]
-            
-            if len(batch_periods) == 0:
-                break
-            
-            # For this batch, use .shift()
-            # Note: Can't use Storage_level.shift() directly in constraint
-            # Need to reference previous periods explicitly
-            
-            for i, p in enumerate(batch_periods):
-                p_idx = start_idx + i
-                p_prev = periods_list[p_idx - 1]
-                
-                t_op_p = t_op_by_period.sel(period=p).item()
-                
+            # -----------------------------------------------------------------
+            # Constraints 3.3-3.5, intra/inter-day formulation (Kotzur et al., 2018) (VECTORIZED)
+            # Levels within each typical day (.roll() over hours), carried from day to day for
+            # seasonal storage (.roll() over days)
+            # -----------------------------------------------------------------
+            print("\n3.3 Storage level within typical days - VECTORIZING with .roll()...")
+
+            # The first hour follows the last one of the same typical day for daily storage (cyclic
+            # day), and starts from 0 for seasonal storage (change since the start of the day)
+            carried = xr.DataArray(np.ones((len(STORAGE_TECH), len(HOURS))), coords=[STORAGE_TECH, HOURS])
+            carried.loc[{'storage': list(SEASONAL), 'hour': HOURS[0]}] = 0.0
+            m.add_constraints(
+                Storage_level_intra - Storage_level_intra.roll(hour=1) * (1 - STORAGE_LOSSES) * carried
+                - net_charge == 0,
+                name='storage_level_intra'
+            )
+            print(f"  ✓ Added {len(STORAGE_TECH) * len(HOURS) * len(TYPICAL_DAYS):,} constraints (vectorized)")
+
+            if STORAGE_DAILY:
+                print("\n3.4 Daily storage - VECTORIZING...")
+                m.add_constraints(
+                    Storage_level_intra.sel(storage=STORAGE_DAILY)
+                    - _relabel(F_t, 'entity', STORAGE_DAILY, 'storage') == 0,
+                    name='impose_daily_storage_td'
+                )
+                print(f"  ✓ Added {len(STORAGE_DAILY) * len(HOURS) * len(TYPICAL_DAYS):,} constraints (vectorized)")
+
+            if len(SEASONAL) > 0:
+                print("\n3.5 Seasonal storage across days - VECTORIZING with .roll()...")
+                intra = Storage_level_intra.sel(storage=SEASONAL)
+                day_loss = (1 - STORAGE_LOSSES.sel(storage=SEASONAL)) ** len(HOURS)
+                # Level at the start of each day = level at the start of the previous day + change
+                # over the typical day of the previous day (the first day follows the last one)
+                day_change = _by_day(intra.sel(hour=HOURS[-1], drop=True), day_td_pos, DAYS)
+                m.add_constraints(
+                    Storage_level_inter - Storage_level_inter.roll(day=1) * day_loss - day_change.roll(day=1) == 0,
+                    name='storage_level_inter'
+                )
+                m.add_constraints(intra - Storage_intra_max <= 0, name='storage_intra_max')
+                m.add_constraints(intra - Storage_intra_min >= 0, name='storage_intra_min')
+                # The level stays between 0 and the size of the storage unit within each day
+                m.add_constraints(
+                    Storage_level_inter + _by_day(Storage_intra_max, day_td_pos, DAYS)
+                    - _relabel(F, 'tech', SEASONAL, 'storage') <= 0,
+                    name='limit_energy_stored_inter_max'
+                )
                 m.add_constraints(
-                    Storage_level.loc[:, p] == 
-                    Storage_level.loc[:, p_prev] * (1 - STORAGE_LOSSES) + 
-                    t_op_p * (storage_in_total.loc[:, p] - storage_out_total.loc[:, p]),
-                    name=f'storage_balance_batch{batch_idx}_p{i}'
+                    Storage_level_inter * day_loss + _by_day(Storage_intra_min, day_td_pos, DAYS) >= 0,
+                    name='limit_energy_stored_inter_min'
                 )
-            
-            if (batch_idx + 1) % 10 == 0:
-                print(f"        Batch {batch_idx+1}/{n_batches} complete...")
-        
-        print(f"  ✓ Storage balance added ({n_batches} batches, each vectorized over {n_storage} storage)")
-        print(f"     {n_periods-1:,} constraints (vectorized over storage)")
-        print(f"     Memory: Batched approach prevents explosion")
-        
-        # ---------------------------------------------------------------------
-        # Constraint 3.4: Storage capacity limit (VECTORIZED)
-        # Storage_level[j,t] <= F[j]
-        # ---------------------------------------------------------------------
-        print("\n3.4 Storage capacity limit - VECTORIZING...")
-        
-        # Storage_level: (storage, period)
-        # F.loc[STORAGE_TECH]: (storage,) broadcasts to (storage, period)
-        
+                print(f"  ✓ Added {len(SEASONAL) * (3 * len(DAYS) + 2 * len(HOURS) * len(TYPICAL_DAYS)):,} "
+                      f"constraints (vectorized)")
+
+        # ---------------------------------------------------------------------
+        # Constraint 3.6: limit_energy_to_power_ratio [Eq. 2.17] (VECTORIZED)
+        # Storage_in * t_charge + Storage_out * t_discharge <= F * availability (not EV batteries)
+        # Rows of incompatible layers (no flow) are always satisfied and left out
+        # ---------------------------------------------------------------------
+        print("\n3.6 Energy to power ratio - VECTORIZING...")
+        CHARGE_TIME = _param(params, 'STORAGE_CHARGE_TIME', [STORAGE_TECH])
+        DISCHARGE_TIME = _param(params, 'STORAGE_DISCHARGE_TIME', [STORAGE_TECH])
+        AVAILABILITY = _param(params, 'STORAGE_AVAILABILITY', [STORAGE_TECH], 1.0)
+        F_storage = _relabel(F, 'tech', STORAGE_TECH, 'storage')
+        compatible = (STORAGE_EFF_IN > 0) | (STORAGE_EFF_OUT > 0)
+        not_ev = xr.DataArray(~STORAGE_TECH.isin(EV_BATTERIES), coords=[STORAGE_TECH])
         m.add_constraints(
-            Storage_level <= F.loc[STORAGE_TECH],
-            name='storage_capacity_limit'
+            Storage_in * CHARGE_TIME + Storage_out * DISCHARGE_TIME - F_storage * AVAILABILITY <= 0,
+            name='limit_energy_to_power_ratio', mask=compatible & not_ev
         )
-        n_constraints = len(STORAGE_TECH) * len(PERIODS)
-        print(f"  ✓ Added {n_constraints} constraints (vectorized)")
-    
+        print(f"  ✓ Added {int((compatible & not_ev).sum()) * len(HOURS) * len(TYPICAL_DAYS):,} constraints (vectorized)")
+
+        # ---------------------------------------------------------------------
+        # Constraint 3.7: limit_energy_to_power_ratio_bis [Eq. 2.18] (VECTORIZED)
+        # EV batteries: the power used by the vehicles and their capacity in use are not available
+        # ---------------------------------------------------------------------
+        if V2G:
+            print("\n3.7 Energy to power ratio (V2G) - VECTORIZING...")
+            vehicles = pd.Index(V2G, name='v2g')
+
+            def battery(obj, dim='storage'):
+                return _relabel(obj, dim, EV_BATTERIES, 'v2g', vehicles)
+
+            F_t_vehicle = _relabel(F_t, 'entity', vehicles, 'v2g')
+            elec_in_out = _relabel(LAYERS_IN_OUT.sel(layer='ELECTRICITY', drop=True), 'entity', vehicles, 'v2g')
+            batteries_in_use = (_param(params, 'BATT_PER_CAR', [pd.Index(vehicles, name='tech')]).rename(tech='v2g')
+                                / _relabel(_param(params, 'VEHICLE_CAPACITY', [ALL_TECH]), 'tech', vehicles, 'v2g'))
+            m.add_constraints(
+                battery(Storage_in) * battery(CHARGE_TIME)
+                + (battery(Storage_out) + elec_in_out * F_t_vehicle) * battery(DISCHARGE_TIME)
+                - (battery(F, 'tech') - F_t_vehicle * batteries_in_use) * battery(AVAILABILITY) <= 0,
+                name='limit_energy_to_power_ratio_bis'
+            )
+            print(f"  ✓ Added {len(vehicles) * len(LAYERS) * len(HOURS) * len(TYPICAL_DAYS):,} constraints (vectorized)")
+
     # =========================================================================
     # CONSTRAINT GROUP 4: COSTS (VECTORIZED)
     # =========================================================================
-    
+
     if 'costs' in constraint_groups:
+        profiler.start('costs')
         print("\n" + "=" * 70)
         print("GROUP 4: COST CONSTRAINTS (VECTORIZED)")
         print("=" * 70)
-        
-        C_INV = data['params'].get('C_INV')
-        C_MAINT = data['params'].get('C_MAINT')
-        C_OP = data['params'].get('C_OP')
-        LIFETIME = data['params'].get('LIFETIME')
-        I_RATE = data['params'].get('I_RATE', 0.05)
-        
-        if C_INV is not None and LIFETIME is not None:
-            # Calculate annualization factor (tau)
-            tau = I_RATE * (1 + I_RATE)**LIFETIME / ((1 + I_RATE)**LIFETIME - 1)
-            
-            # Investment cost (annualized)
-            investment_cost = (F * C_INV * tau).sum()
-            
-            # Maintenance cost
-            if C_MAINT is not None:
-                maintenance_cost = (F * C_MAINT).sum()
-            else:
-                maintenance_cost = 0
-            
-            # Operating cost (resources)
-            if C_OP is not None and T_OP is not None:
-                # F_t.loc[RESOURCES]: (resource, hour, td)
-                # T_OP: (hour, td)
-                # C_OP: (resource,)
-                F_t_resources = F_t.loc[RESOURCES, :, :]
-                annual_resource_use = (F_t_resources * T_OP).sum(dim=['hour', 'td'])
-                # Result: (resource,)
-                
-                operating_cost = (annual_resource_use * C_OP).sum()
-            else:
-                operating_cost = 0
-            
-            # Total cost
-            total_cost = investment_cost + maintenance_cost + operating_cost
-            
-            m.add_objective(total_cost, sense="min")
-            print(f"  ✓ Objective function added (fully vectorized)")
-        else:
-            print("  ⚠ Missing cost data, skipping objective")
-    
+
+        C_INV = _param(params, 'C_INV', [ALL_TECH])
+        C_MAINT = _param(params, 'C_MAINT', [ALL_TECH])
+        C_OP = _param(params, 'C_OP', [RESOURCES])
+        LIFETIME = _param(params, 'LIFETIME', [ALL_TECH])
+
+        # Annualisation factor [Eq. 2.2] (no investment cost without lifetime)
+        lifetime = LIFETIME.where(LIFETIME > 0)
+        tau = (I_RATE * (1 + I_RATE)**lifetime / ((1 + I_RATE)**lifetime - 1)).fillna(0.0)
+
+        C_inv = m.add_variables(lower=0, coords=[ALL_TECH], name="C_inv")
+        C_maint = m.add_variables(lower=0, coords=[ALL_TECH], name="C_maint")
+        C_op = m.add_variables(lower=0, coords=[RESOURCES], name="C_op")
+        TotalCost = m.add_variables(lower=0, name="TotalCost")
+
+        # Cost breakdown [Eqs. 2.3-2.5]
+        m.add_constraints(C_inv - C_INV * F == 0, name='investment_cost_calc')
+        m.add_constraints(C_maint - C_MAINT * F == 0, name='main_cost_calc')
+        m.add_constraints(C_op - C_OP * annual(F_t_resources) == 0, name='op_cost_calc')
+
+        # Total cost [Eq. 2.1]
+        m.add_constraints(
+            TotalCost - (tau * C_inv + C_maint).sum() - C_op.sum() == 0,
+            name='totalcost_cal'
+        )
+        m.add_objective(1 * TotalCost, sense="min")
+        print(f"  ✓ Objective function added (fully vectorized)")
+
     # =========================================================================
     # CONSTRAINT GROUP 5: GWP - EMISSIONS (VECTORIZED)
     # =========================================================================
-    
+
     if 'gwp' in constraint_groups:
+        profiler.start('gwp')
         print("\n" + "=" * 70)
         print("GROUP 5: GWP (EMISSIONS) CONSTRAINTS (VECTORIZED)")
         print("=" * 70)
-        
-        GWP_CONSTR = data['params'].get('GWP_CONSTR')
-        GWP_OP = data['params'].get('GWP_OP')
-        GWP_LIMIT = data['params'].get('GWP_LIMIT')
-        
-        if GWP_CONSTR is not None or GWP_OP is not None:
-            print("\n5.1 GWP construction emissions - VECTORIZING...")
-            
-            # GWP from construction: GWP_CONSTR * F
-            # GWP_CONSTR: (tech,), F: (tech,)
-            if GWP_CONSTR is not None:
-                gwp_construction = (F * GWP_CONSTR).sum()
-            else:
-                gwp_construction = 0
-            
-            print("\n5.2 GWP operational emissions - VECTORIZING...")
-            
-            # GWP from operations: GWP_OP * sum(F_t * T_OP)
-            # Similar to operating cost calculation
-            if GWP_OP is not None and T_OP is not None:
-                # F_t.loc[RESOURCES]: (resource, hour, td)
-                # T_OP: (hour, td)
-                # GWP_OP: (resource,)
-                F_t_resources = F_t.loc[RESOURCES, :, :]
-                annual_resource_use = (F_t_resources * T_OP).sum(dim=['hour', 'td'])
-                # Result: (resource,)
-                
-                gwp_operational = (annual_resource_use * GWP_OP).sum()
-            else:
-                gwp_operational = 0
-            
-            # Total GWP
-            total_gwp = gwp_construction + gwp_operational
-            
-            # GWP limit constraint (if specified)
-            if GWP_LIMIT is not None:
-                print("\n5.3 GWP limit constraint - ADDING...")
-                m.add_constraints(
-                    total_gwp <= GWP_LIMIT,
-                    name='gwp_limit'
-                )
-                print(f"  ✓ Added GWP limit constraint")
-            
-            print(f"  ✓ GWP calculations added (fully vectorized)")
-        else:
-            print("  ⚠ No GWP data, skipping emissions constraints")
-    
+
+        GWP_CONSTR = _param(params, 'GWP_CONSTR', [ALL_TECH])
+        GWP_OP = _param(params, 'GWP_OP', [RESOURCES])
+        GWP_LIMIT = params.get('GWP_LIMIT')
+
+        GWP_constr = m.add_variables(lower=0, coords=[ALL_TECH], name="GWP_constr")
+        GWP_op = m.add_variables(lower=0, coords=[RESOURCES], name="GWP_op")
+        TotalGWP = m.add_variables(lower=0, name="TotalGWP")
+
+        # Emission breakdown [Eqs. 2.6-2.7]
+        m.add_constraints(GWP_constr - GWP_CONSTR * F == 0, name='gwp_constr_calc')
+        m.add_constraints(GWP_op - GWP_OP * annual(F_t_resources) == 0, name='gwp_op_calc')
+
+        # Total GWP: operating emissions only, as in the AMPL model [Eq. 2.5]
+        m.add_constraints(TotalGWP - GWP_op.sum() == 0, name='totalGWP_calc')
+
+        # GWP limit [Eq. 2.38]
+        if GWP_LIMIT is not None and np.isfinite(GWP_LIMIT):
+            m.add_constraints(TotalGWP <= GWP_LIMIT, name='Minimum_GWP_reduction')
+            print(f"  ✓ Added GWP limit constraint")
+
+        print(f"  ✓ GWP calculations added (fully vectorized)")
+
     # =========================================================================
-    # CONSTRAINT GROUP 6: MOBILITY (SEMI-VECTORIZED)
+    # CONSTRAINT GROUP 6: MOBILITY (VECTORIZED)
     # =========================================================================
-    
-    if 'mobility' in constraint_groups:
+
+    if 'mobility' in constraint_groups and END_USES_INPUT is not None:
+        profiler.start('mobility')
         print("\n" + "=" * 70)
-        print("GROUP 6: MOBILITY CONSTRAINTS")
+        print("GROUP 6: MOBILITY CONSTRAINTS (VECTORIZED)")
         print("=" * 70)
-        
-        MOB_PASS_TS = data['params'].get('MOB_PASS_TS')  # (hour, td)
-        MOB_FREIGHT_TS = data['params'].get('MOB_FREIGHT_TS')  # (hour, td)
-        END_USES_INPUT = data['params'].get('END_USES_INPUT')  # Dict with annual demands
-        TECH_OF_CATEGORY = data['sets'].get('TECH_OF_CATEGORY', {})  # Dict mapping category -> techs
-        
-        # Create mobility share variables if needed
-        if 'MOBILITY_PASSENGER' in TECH_OF_CATEGORY:
-            techs_pass = TECH_OF_CATEGORY['MOBILITY_PASSENGER']
-            if len(techs_pass) > 0:
-                Shares_mob_pass = m.add_variables(
-                    lower=0, coords=[pd.Index(techs_pass)], name="Shares_mob_pass"
-                )
-                
-                # Passenger mobility constraints
-                if MOB_PASS_TS is not None and END_USES_INPUT is not None:
-                    if 'MOBILITY_PASSENGER' in END_USES_INPUT:
-                        print("\n6.1 Passenger mobility - VECTORIZING...")
-                        
-                        demand_annual = END_USES_INPUT['MOBILITY_PASSENGER']
-                        
-                        # For each tech, F_t = Share * demand * timeseries / t_op
-                        # This requires per-tech per-time constraints
-                        # Can vectorize over time but need loop over techs
-                        for tech in techs_pass:
-                            if tech in TECH_NOSTORAGE.tolist():
-                                # F_t.loc[tech, :, :] = Shares * demand * ts / t_op
-                                # Vectorized over (hour, td)
-                                m.add_constraints(
-                                    F_t.loc[tech, :, :] == 
-                                    Shares_mob_pass.loc[tech] * demand_annual * MOB_PASS_TS / T_OP,
-                                    name=f'mob_pass_{tech}'
-                                )
-                        
-                        print(f"  ✓ Added passenger mobility constraints")
-        
-        if 'MOBILITY_FREIGHT' in TECH_OF_CATEGORY:
-            techs_freight = TECH_OF_CATEGORY['MOBILITY_FREIGHT']
-            if len(techs_freight) > 0:
-                Shares_mob_freight = m.add_variables(
-                    lower=0, coords=[pd.Index(techs_freight)], name="Shares_mob_freight"
+
+        # ---------------------------------------------------------------------
+        # Constraints 6.1-6.2: operating strategies [Eqs. 2.24-2.25] (VECTORIZED)
+        # F_t[j,h,td] = Shares[j] * demand[h,td]: constant share of the mobility demand per vehicle
+        # ---------------------------------------------------------------------
+        for category, name, series, constraint in (
+            ('MOBILITY_PASSENGER', 'Shares_mobility_passenger', 'MOB_PASS_TS', 'operating_strategy_mob_passenger'),
+            ('MOBILITY_FREIGHT', 'Shares_mobility_freight', 'MOB_FREIGHT_TS', 'operating_strategy_mobility_freight'),
+        ):
+            techs = pd.Index([j for j in TECHNOLOGIES_OF_END_USES_CATEGORY.get(category, []) if j in ALL_TECH],
+                             name='tech')
+            if len(techs) == 0:
+                continue
+            print(f"\n6.x {category} - VECTORIZING...")
+            category_shares = m.add_variables(lower=0, coords=[techs], name=name)
+            mobility_demand = END_USES_INPUT.get(category, 0.0) * _param(params, series, [HOURS, TYPICAL_DAYS]) / T_OP
+            m.add_constraints(
+                _relabel(F_t, 'entity', techs, 'tech') - category_shares * mobility_demand == 0,
+                name=constraint
+            )
+            print(f"  ✓ Added {len(techs) * len(HOURS) * len(TYPICAL_DAYS):,} constraints (vectorized)")
+
+        # Freight shares [Eq. 2.26]
+        m.add_constraints(
+            shares['Share_freight_train'] + shares['Share_freight_road'] + shares['Share_freight_boat'] == 1,
+            name='Freight_shares'
+        )
+
+        # ---------------------------------------------------------------------
+        # Constraints 6.3-6.4: EV batteries [Eqs. 2.30-2.31] (VECTORIZED)
+        # ---------------------------------------------------------------------
+        if V2G:
+            print("\n6.3 EV battery sizing - VECTORIZING...")
+            vehicles = pd.Index(V2G, name='v2g')
+            F_vehicle = _relabel(F, 'tech', vehicles, 'v2g')
+            F_battery = _relabel(F, 'tech', EV_BATTERIES, 'v2g', vehicles)
+            batteries_per_vehicle = (_param(params, 'BATT_PER_CAR', [pd.Index(vehicles, name='tech')]).rename(tech='v2g')
+                                     / _relabel(_param(params, 'VEHICLE_CAPACITY', [ALL_TECH]), 'tech', vehicles, 'v2g'))
+            # Battery size proportional to the number of cars
+            m.add_constraints(F_battery - F_vehicle * batteries_per_vehicle == 0, name='EV_storage_size')
+
+            # The battery supplies the electricity used by the vehicle
+            if 'storage' in constraint_groups:
+                battery_out = _relabel(Storage_out.sel(layer='ELECTRICITY', drop=True), 'storage',
+                                       EV_BATTERIES, 'v2g', vehicles)
+                elec_in_out = _relabel(LAYERS_IN_OUT.sel(layer='ELECTRICITY', drop=True), 'entity', vehicles, 'v2g')
+                m.add_constraints(
+                    battery_out + elec_in_out * _relabel(F_t, 'entity', vehicles, 'v2g') >= 0,
+                    name='EV_storage_for_V2G_demand'
                 )
-                
-                # Freight mobility constraints
-                if MOB_FREIGHT_TS is not None and END_USES_INPUT is not None:
-                    if 'MOBILITY_FREIGHT' in END_USES_INPUT:
-                        print("\n6.2 Freight mobility - VECTORIZING...")
-                        
-                        demand_annual = END_USES_INPUT['MOBILITY_FREIGHT']
-                        
-                        for tech in techs_freight:
-                            if tech in TECH_NOSTORAGE.tolist():
-                                m.add_constraints(
-                                    F_t.loc[tech, :, :] == 
-                                    Shares_mob_freight.loc[tech] * demand_annual * MOB_FREIGHT_TS / T_OP,
-                                    name=f'mob_freight_{tech}'
-                                )
-                        
-                        print(f"  ✓ Added freight mobility constraints")
-        
-        # EV battery sizing constraints
-        V2G_TECHS = data['sets'].get('V2G_TECHS', pd.Index([]))
-        EV_BATT_MAP = data['params'].get('EV_BATT_MAP', {})  # Dict: vehicle -> battery
-        VEH_CAPACITY = data['params'].get('VEH_CAPACITY')  # (vehicle,)
-        BATT_PER_CAR = data['params'].get('BATT_PER_CAR')  # (vehicle,)
-        
-        if len(V2G_TECHS) > 0 and EV_BATT_MAP and VEH_CAPACITY is not None:
-            print("\n6.3 EV battery sizing - ADDING...")
-            for veh in V2G_TECHS:
-                if veh in EV_BATT_MAP and veh in VEH_CAPACITY.coords['tech'].values:
-                    batt = EV_BATT_MAP[veh]
-                    m.add_constraints(
-                        F.loc[batt] == F.loc[veh] / VEH_CAPACITY.sel(tech=veh) * BATT_PER_CAR.sel(tech=veh),
-                        name=f'ev_batt_{veh}'
-                    )
-            print(f"  ✓ Added EV battery sizing constraints")
-    
+            print(f"  ✓ Added EV battery constraints")
+
     # =========================================================================
-    # CONSTRAINT GROUP 7: HEATING (SEMI-VECTORIZED)
+    # CONSTRAINT GROUP 7: HEATING (VECTORIZED)
     # =========================================================================
-    
-    if 'heating' in constraint_groups:
+
+    if 'heating' in constraint_groups and END_USES_INPUT is not None:
+        profiler.start('heating')
         print("\n" + "=" * 70)
-        print("GROUP 7: HEATING CONSTRAINTS")
+        print("GROUP 7: HEATING CONSTRAINTS (VECTORIZED)")
         print("=" * 70)
-        
-        HEAT_TS = data['params'].get('HEAT_TS')  # (hour, td)
-        TECH_OF_TYPE = data['sets'].get('TECH_OF_TYPE', {})  # Dict mapping type -> techs
-        
-        # Decentralized heating with solar thermal
-        if 'HEAT_LOW_T_DECEN' in TECH_OF_TYPE:
-            techs_heat = [t for t in TECH_OF_TYPE['HEAT_LOW_T_DECEN'] if t != 'DEC_SOLAR']
-            
-            if len(techs_heat) > 0 and 'DEC_SOLAR' in C_P_T.coords['tech'].values:
-                print("\n7.1 Solar thermal heating - ADDING...")
-                
-                # Create solar capacity variables
-                F_solar = m.add_variables(
-                    lower=0, coords=[pd.Index(techs_heat)], name="F_solar"
-                )
-                
-                F_t_solar = m.add_variables(
-                    lower=0, coords=[pd.Index(techs_heat), HOURS, TYPICAL_DAYS], name="F_t_solar"
-                )
-                
-                # Solar capacity factor: F_t_solar <= F_solar * C_P_T['DEC_SOLAR']
-                # Vectorized over (hour, td) for each heating tech
-                solar_cf = C_P_T.sel(tech='DEC_SOLAR')
-                for tech in techs_heat:
-                    m.add_constraints(
-                        F_t_solar.loc[tech, :, :] <= F_solar.loc[tech] * solar_cf,
-                        name=f'solar_cf_{tech}'
-                    )
-                
-                # Total solar capacity
+
+        TS_OF_DEC_TECH = sets.get('TS_OF_DEC_TECH', {})
+        techs_heat = pd.Index([j for j in TECHNOLOGIES_OF_END_USES_TYPE.get('HEAT_LOW_T_DECEN', [])
+                               if j != 'DEC_SOLAR' and j in ALL_TECH], name='tech')
+
+        if len(techs_heat) > 0 and 'DEC_SOLAR' in ALL_TECH:
+            print("\n7.1 Solar thermal heating - VECTORIZING...")
+
+            F_solar = m.add_variables(lower=0, coords=[techs_heat], name="F_solar")
+            solar_cf = C_P_T.sel(tech='DEC_SOLAR', drop=True)
+            F_t_solar = m.add_variables(lower=0, coords=[techs_heat, HOURS, TYPICAL_DAYS], name="F_t_solar",
+                                        mask=solar_cf > 0).fillna(0)
+            Shares_lowT_dec = m.add_variables(lower=0, coords=[techs_heat], name="Shares_lowT_dec")
+
+            # Solar capacity factor [Eq. 2.27]: F_t_solar <= F_solar * C_P_T['DEC_SOLAR']
+            m.add_constraints(
+                F_t_solar <= F_solar * solar_cf,
+                name='thermal_solar_capacity_factor', mask=solar_cf > 0
+            )
+
+            # Total solar capacity [Eq. 2.28]
+            m.add_constraints(
+                F.sel(tech=['DEC_SOLAR']).sum() - F_solar.sum() == 0,
+                name='thermal_solar_total_capacity'
+            )
+
+            # Heat balance of each technology with its solar panels and thermal storage [Eq. 2.29]
+            techs_ts = pd.Index([j for j in techs_heat if TS_OF_DEC_TECH.get(j)], name='tech')
+            if len(techs_ts) > 0 and 'storage' in constraint_groups and len(STORAGE_TECH) > 0:
+                thermal_storage = [TS_OF_DEC_TECH[j][0] for j in techs_ts]  # One storage per technology
+                storage_net = _relabel((Storage_out - Storage_in).sum(dim='layer'), 'storage', thermal_storage,
+                                       'tech', techs_ts)
+                heat_low_t = (END_USES_INPUT.get('HEAT_LOW_T_HW', 0.0) / TOTAL_TIME
+                              + END_USES_INPUT.get('HEAT_LOW_T_SH', 0.0)
+                              * _param(params, 'HEAT_TS', [HOURS, TYPICAL_DAYS]) / T_OP)
                 m.add_constraints(
-                    F.loc['DEC_SOLAR'] == F_solar.sum(),
-                    name='solar_total'
+                    _relabel(F_t, 'entity', techs_ts, 'tech') + F_t_solar.sel(tech=list(techs_ts)) + storage_net
+                    - Shares_lowT_dec.sel(tech=list(techs_ts)) * heat_low_t == 0,
+                    name='decentralised_heating_balance'
                 )
-                
-                print(f"  ✓ Added solar thermal heating constraints")
-    
+
+            print(f"  ✓ Added solar thermal heating constraints")
+
     # =========================================================================
-    # CONSTRAINT GROUP 8: NETWORK LOSSES (VECTORIZED)
+    # CONSTRAINT GROUP 8: NETWORK (VECTORIZED)
     # =========================================================================
-    
+
     if 'network' in constraint_groups:
+        profiler.start('network')
         print("\n" + "=" * 70)
         print("GROUP 8: NETWORK CONSTRAINTS (VECTORIZED)")
         print("=" * 70)
-        
-        LOSS_NETWORK = data['params'].get('LOSS_NETWORK')  # (end_use_type,) - loss percentage
-        
-        if LOSS_NETWORK is not None and len(END_USES_TYPES) > 0:
+
+        # ---------------------------------------------------------------------
+        # Constraint 8.1: network_losses [Eq. 2.20] (VECTORIZED)
+        # Network_losses[eut,h,td] = loss_network[eut] * production to eut
+        # ---------------------------------------------------------------------
+        if len(END_USES_TYPES) > 0:
             print("\n8.1 Network losses - VECTORIZING...")
-            
-            # Create network loss variable: (end_use_type, hour, td)
-            Network_losses = m.add_variables(
-                lower=0,
-                coords=[END_USES_TYPES, HOURS, TYPICAL_DAYS],
-                name="Network_losses"
+            LOSS_NETWORK = _param(params, 'LOSS_NETWORK', [END_USES_TYPES])
+            eut_layers = [eut for eut in END_USES_TYPES if eut in LAYERS]
+            # Positive layers_in_out to each end-use type, 0 for end-use types that are not layers
+            production_coef = _relabel(LAYERS_IN_OUT.clip(min=0), 'layer', eut_layers, 'end_use_type')
+            production_coef = production_coef.reindex(end_use_type=list(END_USES_TYPES), fill_value=0.0)
+            m.add_constraints(
+                Network_losses - (F_t * production_coef * LOSS_NETWORK).sum(dim='entity') == 0,
+                name='network_losses'
+            )
+            print(f"  ✓ Added {len(END_USES_TYPES) * len(HOURS) * len(TYPICAL_DAYS):,} constraints (vectorized)")
+
+        # ---------------------------------------------------------------------
+        # Constraint 8.2: extra_grid [Eq. 2.21]
+        # F[GRID] = 1 + c_grid_extra / c_inv[GRID] * (new wind and PV capacity)
+        # ---------------------------------------------------------------------
+        C_INV = _param(params, 'C_INV', [ALL_TECH])
+        renewables = [j for j in ('WIND_ONSHORE', 'WIND_OFFSHORE', 'PV') if j in ALL_TECH]
+        if 'GRID' in ALL_TECH and renewables and C_INV.sel(tech='GRID') > 0:
+            print("\n8.2 Extra grid - ADDING...")
+            grid_per_capacity = params.get('C_GRID_EXTRA', 0.0) / float(C_INV.sel(tech='GRID'))
+            m.add_constraints(
+                F.sel(tech=['GRID']).sum() - grid_per_capacity * F.sel(tech=renewables).sum()
+                == 1 - grid_per_capacity * float(F_MIN.sel(tech=renewables).sum()),
+                name='extra_grid'
+            )
+
+        # ---------------------------------------------------------------------
+        # Constraint 8.3: extra_dhn [Eq. 2.22]
+        # F[DHN] = sum of the capacities supplying the DHN layer
+        # ---------------------------------------------------------------------
+        if 'DHN' in ALL_TECH and 'HEAT_LOW_T_DHN' in LAYERS:
+            print("\n8.3 Extra DHN - ADDING...")
+            dhn_supply = _relabel(LAYERS_IN_OUT.sel(layer='HEAT_LOW_T_DHN', drop=True).clip(min=0), 'entity',
+                                  TECH_NOSTORAGE, 'tech')
+            m.add_constraints(
+                F.sel(tech=['DHN']).sum() - (F.sel(tech=list(TECH_NOSTORAGE)) * dhn_supply).sum() == 0,
+                name='extra_dhn'
             )
-            
-            # For each end-use type, losses = production * loss_pct
-            # Production to end-use type: sum over entities of (F_t * LAYERS_IN_OUT)
-            
-            for eut in END_USES_TYPES:
-                loss_pct = LOSS_NETWORK.sel(end_use_type=eut).item() if eut in LOSS_NETWORK.coords['end_use_type'].values else 0
-                
-                if loss_pct > 0 and eut in LAYERS_IN_OUT.coords['layer'].values:
-                    # Production to this layer: sum(F_t * layers_in_out[entity, eut])
-                    # Vectorized over (hour, td)
-                    
-                    # Get entities that produce this end-use type (positive coef)
-                    layers_to_eut = LAYERS_IN_OUT.sel(layer=eut)
-                    
-                    # Production: (F_t * layers_to_eut).sum(over entities)
-                    # Only sum where coef > 0
-                    production_to_eut = (F_t * layers_to_eut.where(layers_to_eut > 0, 0)).sum(dim='entity')
-                    
-                    # Network_losses[eut, :, :] = production * loss_pct
-                    m.add_constraints(
-                        Network_losses.loc[eut, :, :] == production_to_eut * loss_pct,
-                        name=f'network_loss_{eut}'
-                    )
-            
-            print(f"  ✓ Added network loss constraints (vectorized)")
-    
+
+        print(f"  ✓ Added network constraints (vectorized)")
+
     # =========================================================================
-    # CONSTRAINT GROUP 9: POLICY (SEMI-VECTORIZED)
+    # CONSTRAINT GROUP 9: POLICY (VECTORIZED)
     # =========================================================================
-    
+
     if 'policy' in constraint_groups:
+        profiler.start('policy')
         print("\n" + "=" * 70)
-        print("GROUP 9: POLICY CONSTRAINTS")
+        print("GROUP 9: POLICY CONSTRAINTS (VECTORIZED)")
         print("=" * 70)
-        
-        F_MAX_PERC = data['params'].get('F_MAX_PERC')  # (tech,) - max percentage
-        F_MIN_PERC = data['params'].get('F_MIN_PERC')  # (tech,) - min percentage
-        
-        if F_MAX_PERC is not None or F_MIN_PERC is not None:
+
+        # ---------------------------------------------------------------------
+        # Constraint 9.1: f_max_perc / f_min_perc [Eq. 2.36] (VECTORIZED)
+        # Yearly output of j within [fmin_perc, fmax_perc] * yearly output of its end-use type.
+        # One row per (end-use type, technology) pair with an actual limit (fmax < 1 or fmin > 0)
+        # ---------------------------------------------------------------------
+        if TECHNOLOGIES_OF_END_USES_TYPE:
             print("\n9.1 Technology share limits - VECTORIZING...")
-            
-            # For each category, limit individual tech share
-            # annual_tech <= f_max_perc * annual_category
-            # annual_tech >= f_min_perc * annual_category
-            
-            if TECH_OF_CATEGORY and T_OP is not None:
-                for category, techs in TECH_OF_CATEGORY.items():
-                    techs_in_cat = [t for t in techs if t in TECH_NOSTORAGE.tolist()]
-                    
-                    if len(techs_in_cat) > 0:
-                        # Calculate annual output for each tech: sum(F_t * T_OP)
-                        # This is vectorized over (hour, td)
-                        
-                        for tech in techs_in_cat:
-                            # Annual output for this tech
-                            annual_tech = (F_t.loc[tech, :, :] * T_OP).sum()
-                            
-                            # Annual output for whole category
-                            annual_category = sum(
-                                (F_t.loc[t, :, :] * T_OP).sum() for t in techs_in_cat
-                            )
-                            
-                            # Max percentage constraint
-                            if F_MAX_PERC is not None and tech in F_MAX_PERC.coords['tech'].values:
-                                max_pct = F_MAX_PERC.sel(tech=tech).item()
-                                if max_pct < 1.0:  # Only add if it's an actual limit
-                                    m.add_constraints(
-                                        annual_tech <= max_pct * annual_category,
-                                        name=f'f_max_perc_{tech}'
-                                    )
-                            
-                            # Min percentage constraint
-                            if F_MIN_PERC is not None and tech in F_MIN_PERC.coords['tech'].values:
-                                min_pct = F_MIN_PERC.sel(tech=tech).item()
-                                if min_pct > 0:  # Only add if it's an actual requirement
-                                    m.add_constraints(
-                                        annual_tech >= min_pct * annual_category,
-                                        name=f'f_min_perc_{tech}'
-                                    )
-                
-                print(f"  ✓ Added technology share constraints")
-    
+            EUT = pd.Index(list(TECHNOLOGIES_OF_END_USES_TYPE), name='end_use_type')
+            membership = xr.DataArray(
+                np.array([[j in TECHNOLOGIES_OF_END_USES_TYPE[eut] for j in TECH_NOSTORAGE] for eut in EUT]),
+                coords=[EUT, TECH_NOSTORAGE]
+            )
+            yearly_output = annual(_relabel(F_t, 'entity', TECH_NOSTORAGE, 'tech'))
+            for name, param, default, sign in (('f_max_perc', 'F_MAX_PERC', 1.0, 1), ('f_min_perc', 'F_MIN_PERC', 0.0, -1)):
+                perc = _param(params, param, [TECH_NOSTORAGE], default)
+                limited = membership & (perc != default)
+                pairs = np.argwhere(limited.values)
+                if len(pairs) == 0:
+                    continue
+                pair = pd.RangeIndex(len(pairs), name='pair')
+                techs = TECH_NOSTORAGE[pairs[:, 1]]
+                eut_of_pair = xr.DataArray(membership.values[pairs[:, 0]], coords=[pair, TECH_NOSTORAGE])
+                tech_output = _relabel(yearly_output, 'tech', techs, 'pair', pair)
+                type_output = (yearly_output * eut_of_pair).sum(dim='tech')
+                pair_perc = xr.DataArray(perc.sel(tech=list(techs)).values, coords=[pair])
+                m.add_constraints(sign * (tech_output - pair_perc * type_output) <= 0, name=name)
+                print(f"  ✓ Added {len(pairs)} {name} constraints")
+
+        # ---------------------------------------------------------------------
+        # Constraint 9.2: extra_efficiency [Eq. 2.37]
+        # ---------------------------------------------------------------------
+        if 'EFFICIENCY' in ALL_TECH:
+            m.add_constraints(F.sel(tech=['EFFICIENCY']).sum() == 1 / (1 + I_RATE), name='extra_efficiency')
+
+        # ---------------------------------------------------------------------
+        # Constraint 9.3: solar_area_limited [Eq. 2.39]
+        # F[PV] / power_density_pv + (F[DEC_SOLAR] + F[DHN_SOLAR]) / power_density_solar_thermal <= solar_area
+        # ---------------------------------------------------------------------
+        density_pv = params.get('POWER_DENSITY_PV', 0.0)
+        density_thermal = params.get('POWER_DENSITY_SOLAR_THERMAL', 0.0)
+        solar_area = params.get('SOLAR_AREA', np.inf)
+        solar_thermal = [j for j in ('DEC_SOLAR', 'DHN_SOLAR') if j in ALL_TECH]
+        if 'PV' in ALL_TECH and density_pv > 0 and density_thermal > 0 and np.isfinite(solar_area):
+            m.add_constraints(
+                F.sel(tech=['PV']).sum() / density_pv + F.sel(tech=solar_thermal).sum() / density_thermal
+                <= solar_area,
+                name='solar_area_limited'
+            )
+
+        print(f"  ✓ Added policy constraints")
+
+    profiler.stop()
+
     # =========================================================================
     # SUMMARY
     # =========================================================================
-    
+
     print("\n" + "=" * 70)
     print("MODEL BUILD COMPLETE")
     print("=" * 70)
     print(f"Variables: {len(m.variables)} groups")
     print(f"Constraints: {len(m.constraints)} groups")
     print("=" * 70)
-    
+
     return m
 
 
 def test_constraint_group(group_name: str, data: Dict[str, Any]):
     """
     Test a single constraint group.
-    
+
     Args:
         group_name: Name of constraint group to test
         data: Model data dictionary
@@ -844,7 +916,7 @@ def test_constraint_group(group_name: str, data: Dict[str, Any]):
     print(f"\n{'='*70}")
     print(f"TESTING: {group_name}")
     print(f"{'='*70}")
-    
+
     try:
         model = build_core_model_xarray(data, constraint_groups=[group_name])
         print(f"\n✓ {group_name} constraints built successfully")
@@ -862,4 +934,3 @@ if __name__ == "__main__":
     print("\nExample usage:")
     print("  from core_model_xarray import test_constraint_group")
     print("  test_constraint_group('energy_balance', data)")
-
@@ -12,6 +12,8 @@ from typing import Union
 import pandas as pd
 import numpy as np
 
+from ..dat_parser import read_ampl_data
+
 
 @dataclass
 class ModelData:
@@ -26,27 +28,23 @@ class ModelData:
     time_series: dict[str, pd.DataFrame] = field(default_factory=dict)
     
     @classmethod
-    def from_ampl_dat(cls, dat_files: list[Path]):
+    def from_ampl_dat(cls, dat_files: list[Path], mod_file: Union[str, Path, None] = None):
         """
         Parse AMPL .dat files and extract data.
         
-        This is a placeholder implementation. In practice, you would either:
-        1. Use amplpy to load the data and extract it
-        2. Write a custom .dat file parser
-        3. Pre-process .dat files into a more convenient format (JSON, pickle)
+        The files are read with the native parser in ``energyscope.dat_parser``,
+        so no AMPL installation or license is required. When the model file
+        is given, range sets, declared defaults and the derived sets/parameters
+        of the core model are filled in as AMPL would.
         
         Args:
-            dat_files: List of paths to AMPL .dat files
+            dat_files: List of paths to AMPL .dat files (read in order)
+            mod_file: Optional path to the AMPL .mod file
             
         Returns:
             ModelData instance with loaded data
         """
-        # TODO: Implement AMPL .dat file parsing
-        # For now, return empty data structure
-        raise NotImplementedError(
-            "AMPL .dat parsing not yet implemented. "
-            "Please use from_dict() with manually prepared data."
-        )
+        return cls.from_dict(read_ampl_data(dat_files, mod_file))
     
     @classmethod
     def from_dict(cls, data_dict: dict):
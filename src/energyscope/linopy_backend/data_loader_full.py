@@ -8,9 +8,21 @@ the non-vectorized linopy core model.
 
 import os
 import pandas as pd
-from amplpy import AMPL, add_to_path
+from pathlib import Path
 from dotenv import load_dotenv
 
+from ..dat_parser import load_dat_data
+from ..data_cache import PARSER_FILES, cached_dataset
+
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+CORE_MODEL_FILE = DATA_DIR / "models" / "core" / "td" / "ESTD_model_core.mod"
+CORE_DATA_FILES = [
+    DATA_DIR / "datasets" / "core" / "td" / "ESTD_12TD.dat",
+    DATA_DIR / "datasets" / "core" / "td" / "ESTD_data_core.dat",
+]
+
+
 def load_ampl_data():
     """
     Load EnergyScope core data using amplpy.
@@ -18,6 +30,8 @@ def load_ampl_data():
     Returns:
         AMPL instance with loaded data
     """
+    from amplpy import AMPL, add_to_path
+
     load_dotenv()
     ampl_path = os.environ.get("AMPL_PATH")
     if ampl_path:
@@ -225,13 +239,39 @@ def extract_data_from_ampl(ampl):
 
     return data
 
-def create_full_dataset():
+def create_full_dataset(use_ampl=False, cache=True, cache_dir=None):
     """
     Loads and converts the full AMPL dataset for the linopy model.
+    
+    The extracted data is cached on disk, keyed by the content of the model
+    and data files and of the extraction code (parser and this module), so
+    that later calls skip the extraction.
+    
+    Args:
+        use_ampl: If True, read the data through an AMPL instance (requires
+            amplpy and a license) instead of the native .dat parser
+        cache: If False, always extract the data and bypass the cache
+        cache_dir: Cache root directory (default: ``$ENERGYSCOPE_CACHE_DIR``
+            or ``~/.cache/energyscope``)
     """
-    ampl = load_ampl_data()
-    data = extract_data_from_ampl(ampl)
-    return data
+    if use_ampl:
+        def loader():
+            return extract_data_from_ampl(load_ampl_data())
+    else:
+        def loader():
+            return load_dat_data(CORE_MODEL_FILE, CORE_DATA_FILES)
+    
+    if not cache:
+        return loader()
+    # This module converts the AMPL data (and the native parser's output), so it is part of the key
+    sources = [Path(__file__)] if use_ampl else [*PARSER_FILES, Path(__file__)]
+    return cached_dataset(
+        [CORE_MODEL_FILE, *CORE_DATA_FILES],
+        loader,
+        cache_dir=cache_dir,
+        tag='ampl' if use_ampl else 'native',
+        sources=sources,
+    )
 
 if __name__ == '__main__':
     # For testing purposes
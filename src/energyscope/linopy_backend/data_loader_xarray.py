@@ -34,7 +34,7 @@ def create_toy_data_xarray() -> dict:
     STORAGE_TECH = pd.Index(['BATTERY'], name='storage')
     LAYERS = pd.Index(['ELECTRICITY', 'GAS', 'END_USE'], name='layer')
     PERIODS = pd.RangeIndex(start=1, stop=25, name='period')  # 1 to 24
-    TECH_NOSTORAGE = TECHNOLOGIES.difference(STORAGE_TECH)
+    TECH_NOSTORAGE = TECHNOLOGIES.difference(STORAGE_TECH).rename('tech')  # difference drops the name if they differ
     
     # =========================================================================
     # 1D PARAMETERS (indexed by technology)
@@ -223,6 +223,141 @@ def create_toy_data_xarray() -> dict:
     }
 
 
+def _to_array(values, coords, default: float = 0.0) -> xr.DataArray:
+    """
+    DataArray of a parameter over the product of `coords`.
+
+    Args:
+        values: Parameter values (Series or dict, keyed by tuples for several axes)
+        coords: Axes of the array (named pandas Index objects)
+        default: Value where the parameter is not defined
+
+    Returns:
+        xr.DataArray with one dimension per axis, named after the axis
+    """
+    values = values if isinstance(values, pd.Series) else pd.Series(values, dtype=float)
+    index = coords[0] if len(coords) == 1 else pd.MultiIndex.from_product(coords)
+    array = values.astype(float).reindex(index).fillna(default).to_numpy()
+    return xr.DataArray(array.reshape([len(axis) for axis in coords]), coords=list(coords),
+                        dims=[axis.name for axis in coords])
+
+
+def create_full_dataset_xarray(data: dict = None) -> dict:
+    """
+    Convert the full ESTD core dataset to xarray format for build_core_model_xarray.
+
+    Parameters are given over the full product of their sets, with the defaults
+    of the AMPL model (e.g. c_p_t = 1, storage_availability = 1) where the data
+    leaves them undefined.
+
+    Args:
+        data: Dataset in the format of data_loader_full.create_full_dataset
+            (default: loaded with create_full_dataset)
+
+    Returns:
+        Dictionary with 'sets' (named pandas Index objects, the period mapping
+        T_H_TD and the indexed sets as dictionaries) and 'params' (xarray
+        DataArrays, scalars and the yearly end-use demands END_USES_INPUT)
+    """
+    if data is None:
+        from .data_loader_full import create_full_dataset
+        data = create_full_dataset()
+    sets, params = data['sets'], data['parameters']
+
+    # =========================================================================
+    # COORDINATE SETS
+    # =========================================================================
+
+    TECHNOLOGIES = pd.Index(sets['TECHNOLOGIES'], name='tech')
+    STORAGE_TECH = pd.Index(sets['STORAGE_TECH'], name='storage')
+    RESOURCES = pd.Index(sets['RESOURCES'], name='resource')
+    LAYERS = pd.Index(sets['LAYERS'], name='layer')
+    END_USES_TYPES = pd.Index(sets['END_USES_TYPES'], name='end_use_type')
+    HOURS = pd.Index(sets['HOURS'], name='hour')
+    TYPICAL_DAYS = pd.Index(sets['TYPICAL_DAYS'], name='td')
+    PERIODS = pd.Index(sets['PERIODS'], name='period')
+    ENTITIES = pd.Index(list(dict.fromkeys(list(RESOURCES) + list(TECHNOLOGIES))), name='entity')
+    V2G = pd.Index(sets.get('V2G', []), name='tech')
+
+    end_uses_input = params.get('end_uses_input')
+    if end_uses_input is None:
+        end_uses_input = params['end_uses_demand_year'].groupby(level=0).sum()
+
+    def scalar(name, default=0.0):
+        return float(params.get(name, default))
+
+    # =========================================================================
+    # PARAMETERS
+    # =========================================================================
+
+    tech_params = {
+        'F_MAX': ('f_max', np.inf), 'F_MIN': ('f_min', 0.0), 'C_INV': ('c_inv', 0.0),
+        'C_MAINT': ('c_maint', 0.0), 'LIFETIME': ('lifetime', 0.0), 'GWP_CONSTR': ('gwp_constr', 0.0),
+        'C_P': ('c_p', 1.0), 'F_MAX_PERC': ('fmax_perc', 1.0), 'F_MIN_PERC': ('fmin_perc', 0.0),
+        'VEHICLE_CAPACITY': ('vehicle_capacity', 0.0),
+    }
+    resource_params = {'AVAIL': ('avail', np.inf), 'C_OP': ('c_op', 0.0), 'GWP_OP': ('gwp_op', 0.0)}
+    storage_params = {
+        'STORAGE_LOSSES': ('storage_losses', 0.0), 'STORAGE_CHARGE_TIME': ('storage_charge_time', 0.0),
+        'STORAGE_DISCHARGE_TIME': ('storage_discharge_time', 0.0),
+        'STORAGE_AVAILABILITY': ('storage_availability', 1.0),
+    }
+    time_series = {
+        'ELEC_TS': 'electricity_time_series', 'HEAT_TS': 'heating_time_series',
+        'MOB_PASS_TS': 'mob_pass_time_series', 'MOB_FREIGHT_TS': 'mob_freight_time_series',
+    }
+
+    xr_params = {}
+    for name, (param, default) in tech_params.items():
+        xr_params[name] = _to_array(params.get(param, {}), [TECHNOLOGIES], default)
+    for name, (param, default) in resource_params.items():
+        xr_params[name] = _to_array(params.get(param, {}), [RESOURCES], default)
+    for name, (param, default) in storage_params.items():
+        xr_params[name] = _to_array(params.get(param, {}), [STORAGE_TECH], default)
+    for name, param in time_series.items():
+        xr_params[name] = _to_array(params.get(param, {}), [HOURS, TYPICAL_DAYS])
+
+    xr_params.update({
+        'LAYERS_IN_OUT': _to_array(params['layers_in_out'], [ENTITIES, LAYERS]),
+        'C_P_T': _to_array(params.get('c_p_t', {}), [TECHNOLOGIES, HOURS, TYPICAL_DAYS], 1.0),
+        'T_OP': _to_array(params.get('t_op', {}), [HOURS, TYPICAL_DAYS], 1.0),
+        'STORAGE_EFF_IN': _to_array(params.get('storage_eff_in', {}), [STORAGE_TECH, LAYERS]),
+        'STORAGE_EFF_OUT': _to_array(params.get('storage_eff_out', {}), [STORAGE_TECH, LAYERS]),
+        'LOSS_NETWORK': _to_array(params.get('loss_network', {}), [END_USES_TYPES]),
+        'BATT_PER_CAR': _to_array(params.get('batt_per_car', {}), [V2G]),
+        'END_USES_INPUT': end_uses_input.astype(float).to_dict(),
+        'I_RATE': scalar('i_rate', 0.05),
+        'GWP_LIMIT': scalar('gwp_limit', np.inf),
+        'C_GRID_EXTRA': scalar('c_grid_extra'),
+        'SOLAR_AREA': scalar('solar_area', np.inf),
+        'POWER_DENSITY_PV': scalar('power_density_pv'),
+        'POWER_DENSITY_SOLAR_THERMAL': scalar('power_density_solar_thermal'),
+    })
+    for share in ('share_mobility_public', 'share_freight_train', 'share_freight_road',
+                  'share_freight_boat', 'share_heat_dhn'):
+        xr_params[f'{share.upper()}_MIN'] = scalar(f'{share}_min', 0.0)
+        xr_params[f'{share.upper()}_MAX'] = scalar(f'{share}_max', 1.0)
+
+    xr_sets = {
+        'TECHNOLOGIES': TECHNOLOGIES,
+        'STORAGE_TECH': STORAGE_TECH,
+        'RESOURCES': RESOURCES,
+        'LAYERS': LAYERS,
+        'END_USES_TYPES': END_USES_TYPES,
+        'HOURS': HOURS,
+        'TYPICAL_DAYS': TYPICAL_DAYS,
+        'PERIODS': PERIODS,
+        'T_H_TD': [tuple(t) for t in sets['T_H_TD']],
+    }
+    for name in ('STORAGE_DAILY', 'RES_IMPORT_CONSTANT', 'V2G'):
+        xr_sets[name] = list(sets.get(name, []))
+    for name in ('TECHNOLOGIES_OF_END_USES_TYPE', 'TECHNOLOGIES_OF_END_USES_CATEGORY',
+                 'EVs_BATT_OF_V2G', 'TS_OF_DEC_TECH'):
+        xr_sets[name] = {key: list(value) for key, value in sets.get(name, {}).items()}
+
+    return {'sets': xr_sets, 'params': xr_params}
+
+
 def verify_xarray_data(data: dict) -> bool:
     """
     Verify that xarray data has correct dimensions and coordinates.
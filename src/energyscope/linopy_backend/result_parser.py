@@ -7,17 +7,21 @@ for compatibility with existing analysis and plotting tools.
 
 import pandas as pd
 import numpy as np
+import xarray as xr
 from energyscope.result import Result
 
 
-def parse_linopy_result(linopy_model, data, id_run=None) -> Result:
+def parse_linopy_result(linopy_model, data, id_run=None, profiler=None) -> Result:
     """
     Convert linopy model solution to EnergyScope Result format.
     
     Args:
         linopy_model: Solved linopy.Model instance
-        data: ModelData instance used to build the model
+        data: Data used to build the model: ModelData instance, or dict with 'sets'
+              and 'parameters' (core model) or 'params' (xarray core model)
         id_run: Optional run ID for multi-run scenarios
+        profiler: BuildProfiler given to the model builder, whose table is
+                  attached to the result as `build_profile`
         
     Returns:
         Result instance compatible with EnergyScope analysis tools
@@ -32,8 +36,13 @@ def parse_linopy_result(linopy_model, data, id_run=None) -> Result:
     variables = {}
     for var_name in linopy_model.variables:
         var = linopy_model.variables[var_name]
-        # Convert to DataFrame
-        df = var.solution.to_pandas()
+        # Convert to DataFrame (entries not created through a mask are structurally zero), in long
+        # format (one row per index combination) for variables over several sets
+        solution = var.solution.fillna(0.0)
+        if solution.ndim == 0:
+            df = pd.Series([solution.item()], name=var_name)
+        else:
+            df = solution.to_pandas() if solution.ndim == 1 else solution.to_series()
         
         # Ensure it's a DataFrame (not Series) and has consistent structure
         if isinstance(df, pd.Series):
@@ -61,10 +70,19 @@ def parse_linopy_result(linopy_model, data, id_run=None) -> Result:
     }
     
     # Extract parameters from data (these are input parameters, not computed)
+    if isinstance(data, dict):
+        data_parameters = data.get('parameters', data.get('params', {}))
+        data_sets = data['sets']
+    else:
+        data_parameters, data_sets = data.parameters, data.sets
     parameters = {}
-    for param_name, param_value in data.parameters.items():
+    for param_name, param_value in data_parameters.items():
+        if isinstance(param_value, xr.DataArray):
+            param_value = param_value.to_series() if param_value.ndim else param_value.item()
         if isinstance(param_value, pd.DataFrame):
             parameters[param_name] = param_value.copy()
+        elif isinstance(param_value, pd.Series):
+            parameters[param_name] = param_value.to_frame(name=param_name)
         elif isinstance(param_value, dict):
             # Convert dict to DataFrame
             df = pd.Series(param_value, name=param_name).to_frame()
@@ -75,7 +93,7 @@ def parse_linopy_result(linopy_model, data, id_run=None) -> Result:
             parameters[param_name] = pd.DataFrame({param_name: [param_value]})
     
     # Extract sets
-    sets = data.sets.copy()
+    sets = dict(data_sets)
     
     # Add Run column if id_run is specified
     if id_run is not None:
@@ -90,7 +108,8 @@ def parse_linopy_result(linopy_model, data, id_run=None) -> Result:
         objectives=objectives,
         variables=variables,
         parameters=parameters,
-        sets=sets
+        sets=sets,
+        build_profile=profiler.table() if profiler is not None else None
     )
 
 
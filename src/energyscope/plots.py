@@ -113,6 +113,12 @@ def generate_sankey_flows(results: Result, aggregate_mobility, aggregate_grid, a
     from an energy modeling process, and performs several transformations and aggregations.
     The goal is to prepare the flow data for use in a Sankey diagram.
 
+    The flows of all the runs are computed together on the first call for a given combination
+    of aggregation flags, and cached in `results.sankey_flows` (see `_sankey_flows_by_run`).
+    Later calls, for any run, are a dictionary lookup. The cache is reset by `postprocessing`
+    and when `postprocessing['df_monthly']`, `parameters` or `sets` are replaced; clear it
+    after modifying them in place.
+
     Args:
         results (Result):
             A `Result` object containing dictionaries of data frames for constraints,
@@ -123,11 +129,32 @@ def generate_sankey_flows(results: Result, aggregate_mobility, aggregate_grid, a
             A processed DataFrame with 'source', 'target', and 'value' columns,
             ready for Sankey diagram visualization.
     """
+    cache = results.sankey_flows
+    sources = (results.postprocessing['df_monthly'], results.parameters, results.sets)
+    if 'sources' not in cache or any(cached is not source for cached, source in zip(cache['sources'], sources)):
+        cache.clear()
+        cache.update(sources=sources, flows={})
+
+    key = (bool(aggregate_mobility), bool(aggregate_grid), bool(aggregate_technology))
+    if key not in cache['flows']:
+        cache['flows'][key] = _sankey_flows_by_run(results, *key)
+    flows = cache['flows'][key]
+    if run_id not in flows:
+        return pd.DataFrame(columns=['target', 'source', 'value'])
+    return flows[run_id].copy()
+
+
+def _sankey_flows_by_run(results: Result, aggregate_mobility: bool, aggregate_grid: bool,
+                         aggregate_technology: bool) -> dict:
+    """
+    Computes the Sankey flows of every run at once, 'Run' being carried as an extra key through
+    each aggregation, and splits them per run.
 
-    df_flow = results.postprocessing['df_monthly'].loc[results.postprocessing['df_monthly']['Run'] == run_id, :]
-
-    df_flow = df_flow.groupby(['Technologies', 'Flow']).sum().rename(columns={'Monthly_flow': 'value'}).loc[:,
-              ['value']].reset_index()
+    Returns:
+        dict: run -> DataFrame with 'target', 'source' and 'value' columns.
+    """
+    df_flow = results.postprocessing['df_monthly']
+    df_flow = df_flow.groupby(['Run', 'Technologies', 'Flow'])['Monthly_flow'].sum().rename('value').reset_index()
 
     # Swap target and source for positive values and take absolute value
     df_flow.rename(columns={'Technologies': 'target', 'Flow': 'source'}, inplace=True)
@@ -136,7 +163,7 @@ def generate_sankey_flows(results: Result, aggregate_mobility, aggregate_grid, a
     df_flow['value'] = abs(df_flow['value'])
 
     # Aggregate and clean data
-    df_flow = df_flow.groupby(['target', 'source']).sum().reset_index()
+    df_flow = df_flow.groupby(['Run', 'target', 'source'])['value'].sum().reset_index()
     df_flow.loc[df_flow['target'] == df_flow['source'], 'source'] = 'IMP_' + df_flow.loc[
         df_flow['target'] == df_flow['source'], 'source'].astype(str)
     df_flow = df_flow[~df_flow['source'].str.startswith('IMP_RES')]
@@ -147,30 +174,25 @@ def generate_sankey_flows(results: Result, aggregate_mobility, aggregate_grid, a
     df_flow = df_flow[(~df_flow['target'].str.contains("CO2_")) | (df_flow['target'] == 'CO2_TO_DIESEL') | (
             df_flow['target'] == 'CO2_TO_JETFUELS')]
 
-    df_flow.sort_values('source', inplace=True)
+    df_flow = df_flow.sort_values(['Run', 'source'], kind='stable')
 
-    # Transform pkm & tkm into GWh
-    techno_mob = df_flow.loc[df_flow['target'].str.startswith('MOB_'), :]['target'].unique().tolist()
-
-    df_flow.loc[df_flow['target'].isin(techno_mob), 'value'] = (
-        df_flow.loc[df_flow['target'].isin(df_flow.loc[df_flow['target'].isin(techno_mob), 'source']), :]
-        .groupby('target')
-        .sum()
-        .reset_index()
-        .sort_values('target')['value']
-        .values
-    )
+    # Transform pkm & tkm into GWh: the flow to a mobility layer becomes the total input of the technology
+    mask_mob = df_flow['target'].str.startswith('MOB_')
+    mob_techs = pd.MultiIndex.from_frame(df_flow.loc[mask_mob, ['Run', 'source']])
+    inputs = df_flow.loc[pd.MultiIndex.from_frame(df_flow[['Run', 'target']]).isin(mob_techs)]
+    inputs = inputs.groupby(['Run', 'target'])['value'].sum()
+    values = inputs.reindex(mob_techs).to_numpy()
+    df_flow.loc[mask_mob, 'value'] = np.where(np.isnan(values), df_flow.loc[mask_mob, 'value'], values)
 
     ## Add EUD
     EUD = results.parameters['end_uses_demand_year']
-    EUD = EUD.loc[EUD['Run'] == run_id, :]
     EUD = EUD.loc[EUD['end_uses_demand_year'] > 0, :]
-    EUD = EUD.reset_index().groupby('index0').sum().reset_index().loc[:, ['index0', 'end_uses_demand_year']]
+    EUD = EUD.reset_index().groupby(['Run', 'index0'])['end_uses_demand_year'].sum().reset_index()
     EUD = EUD.rename(columns={'index0': 'source', 'end_uses_demand_year': 'value'})
     EUD = EUD.loc[EUD['source'].str.contains('ELECTRICITY'), :]
     EUD['target'] = 'EUD_' + EUD['source']
 
-    df_flow = pd.concat([df_flow, EUD]).reset_index().drop(columns='index')
+    df_flow = pd.concat([df_flow, EUD]).reset_index(drop=True)
 
     ## Aggregate EUD types
     EUD_types = results.sets['END_USES_TYPES_OF_CATEGORY']
@@ -185,76 +207,60 @@ def generate_sankey_flows(results: Result, aggregate_mobility, aggregate_grid, a
     df_flow.loc[mask_source, 'source'] = df_flow.loc[mask_source, 'source'].map(EUD_types_reverse)
 
     # Ensure consistency: if 'target' changes, update corresponding 'source' if necessary
-    for index, row in df_flow.iterrows():
-        if row['target'] in EUD_types_reverse.values() and row['source'] in EUD_types_reverse.keys():
-            df_flow.at[index, 'source'] = EUD_types_reverse[row['source']]
+    mask = df_flow['target'].isin(EUD_types_reverse.values()) & df_flow['source'].isin(EUD_types_reverse.keys())
+    df_flow.loc[mask, 'source'] = df_flow.loc[mask, 'source'].map(EUD_types_reverse)
 
     if aggregate_mobility:
         ## Aggregation of mobility flows
-        # Extract rows concerning mobility
-        mob_flow = df_flow.loc[df_flow['target'].str.startswith('MOBILITY_'), :]
-        mob_flow_2 = df_flow.loc[df_flow['target'].isin(
-            df_flow.loc[df_flow['target'].str.startswith('MOBILITY_'), :]['source'].unique()), :]
+        # Extract rows concerning mobility, and the inputs of the technologies supplying mobility
+        mask_mob = df_flow['target'].str.startswith('MOBILITY_')
+        mob_techs = pd.MultiIndex.from_frame(df_flow.loc[mask_mob, ['Run', 'source']])
+        mask_mob_2 = pd.MultiIndex.from_frame(df_flow[['Run', 'target']]).isin(mob_techs)
+        mob_flow = df_flow.loc[mask_mob, :]
+        mob_flow_2 = df_flow.loc[mask_mob_2, :]
         # Drop rows concerning mobility as they will be merged
-        df_flow = df_flow.loc[~df_flow['target'].str.startswith('MOBILITY_') * ~df_flow['target'].isin(
-            df_flow.loc[df_flow['target'].str.startswith('MOBILITY_'), :]['source'].unique()), :]
+        df_flow = df_flow.loc[~mask_mob & ~mask_mob_2, :]
         # Aggregate value on type of technologies (source) and on type of mobility (target)
-        mob_flow = mob_flow.groupby([mob_flow['source'].str.split('_', expand=True).loc[:, 0],
-                                     mob_flow['target'].str.rsplit('_', n=1, expand=True).loc[:, 0]]).sum()
-        mob_flow_2 = mob_flow_2.groupby(
-            [mob_flow_2['target'].str.split('_', expand=True).loc[:, 0], mob_flow_2['source'].values]).sum()
-        # Clean df
-        mob_flow = mob_flow.drop(['source', 'target'], axis=1)
-        mob_flow_2 = mob_flow_2.drop(['source', 'target'], axis=1)
-        # Reset index
-        mob_flow.reset_index(names=['source', 'target'], inplace=True)
-        mob_flow_2.reset_index(names=['target', 'source'], inplace=True)
+        mob_flow = mob_flow.groupby([mob_flow['Run'], mob_flow['source'].str.split('_').str[0],
+                                     mob_flow['target'].str.rsplit('_', n=1).str[0]])['value'].sum()
+        mob_flow_2 = mob_flow_2.groupby([mob_flow_2['Run'], mob_flow_2['target'].str.split('_').str[0],
+                                         mob_flow_2['source']])['value'].sum()
         # Concat dfs
-        df_flow = pd.concat([df_flow, mob_flow, mob_flow_2]).reset_index().drop(columns='index')
+        df_flow = pd.concat([df_flow, mob_flow.reset_index(), mob_flow_2.reset_index()]).reset_index(drop=True)
 
     if aggregate_grid:
-        ## Add EUD
-        # TODO Aggregate flow of the different type of elec
-        EUD = results.parameters['end_uses_demand_year']
-        EUD = EUD.loc[EUD['end_uses_demand_year'] > 0, :]
-        EUD = EUD.reset_index().groupby('index0').sum().reset_index().loc[:, ['index0', 'end_uses_demand_year']]
-        EUD = EUD.rename(columns={'index0': 'source', 'end_uses_demand_year': 'value'})
-        EUD = EUD.loc[EUD['source'].str.contains('ELECTRICITY'), :]
-        EUD['source'] = "ELECTRICITY"
-        EUD['target'] = 'EUD_' + EUD['source']
-
         ## Aggregation of grids flows
         techno_grids = (
         'EXP', 'TRAFO', 'COMP')  # TODO might be replaced by a sets: INFRASTRUCTURE_GAS_GRID INFRASTRUCTURE_ELEC_GRID
         # Extract all flows that have an input/output of ELECTRICITY
         df_elec = df_flow.loc[
-                  df_flow['target'].str.contains('ELECTRICITY_') + df_flow['source'].str.contains('ELECTRICITY_'), :]
+                  df_flow['target'].str.contains('ELECTRICITY_') | df_flow['source'].str.contains('ELECTRICITY_'), :]
         # Exception for exports
         df_elec = df_elec.loc[~df_elec['target'].str.contains('EXPORT')]
         df_flow.loc[df_flow['target'].str.contains('EXPORT'), 'source'] = "ELECTRICITY"
         # Drop them from the main df
         df_flow = df_flow.drop(df_elec.index)
         # Remove the flows related to the grid infrastructure
-        df_elec = df_elec.loc[~df_elec['target'].str.contains('|'.join(techno_grids)) * ~df_elec['source'].str.contains(
+        df_elec = df_elec.loc[~df_elec['target'].str.contains('|'.join(techno_grids)) & ~df_elec['source'].str.contains(
             '|'.join(techno_grids)), :]
         # Rename ELECTRICITY_XXX layers
         df_elec = df_elec.replace(results.sets['ELECTRICITY_LAYERS'].loc[:, 'ELECTRICITY_LAYERS'].values, 'ELECTRICITY')
 
         # Aggregation for NG
-        df_ng = df_flow.loc[df_flow['target'].str.contains('NG_') + df_flow['source'].str.contains('NG_'), :]
+        df_ng = df_flow.loc[df_flow['target'].str.contains('NG_') | df_flow['source'].str.contains('NG_'), :]
         df_flow = df_flow.drop(df_ng.index)
-        df_ng = df_ng.loc[~df_ng['target'].str.contains('|'.join(techno_grids)) * ~df_ng['source'].str.contains(
+        df_ng = df_ng.loc[~df_ng['target'].str.contains('|'.join(techno_grids)) & ~df_ng['source'].str.contains(
             '|'.join(techno_grids)), :]
         df_ng = df_ng.replace(results.sets['NG_LAYERS'].loc[:, 'NG_LAYERS'].values, 'NG')
 
         # Aggregation for H2
-        df_h2 = df_flow.loc[df_flow['target'].str.contains('H2_') + df_flow['source'].str.contains('H2_'), :]
+        df_h2 = df_flow.loc[df_flow['target'].str.contains('H2_') | df_flow['source'].str.contains('H2_'), :]
         df_flow = df_flow.drop(df_h2.index)
-        df_h2 = df_h2.loc[~df_h2['target'].str.contains('|'.join(techno_grids)) * ~df_h2['source'].str.contains(
+        df_h2 = df_h2.loc[~df_h2['target'].str.contains('|'.join(techno_grids)) & ~df_h2['source'].str.contains(
             '|'.join(techno_grids)), :]
         df_h2 = df_h2.replace(results.sets['H2_LAYERS'].loc[:, 'H2_LAYERS'].values, 'H2')
 
-        df_flow = pd.concat([df_flow, df_elec, df_ng, df_h2]).reset_index().drop(columns='index')
+        df_flow = pd.concat([df_flow, df_elec, df_ng, df_h2]).reset_index(drop=True)
 
     if aggregate_technology:
         # List of technology types to aggregate
@@ -278,7 +284,8 @@ def generate_sankey_flows(results: Result, aggregate_mobility, aggregate_grid, a
                 (df_flow['source'].str.contains(tech)) & ~exclude_mask_source, 'source'
             ] = tech
 
-    return df_flow
+    return {run: frame.drop(columns='Run').reset_index(drop=True)
+            for run, frame in df_flow.groupby('Run', sort=False)}
 
 
 def plot_sankey(result: Result, aggregate_mobility: bool = True, aggregate_grid: bool = True,
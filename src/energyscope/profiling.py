@@ -0,0 +1,208 @@
+"""
+Per-constraint-group profiling of model builds.
+
+Model builders of every backend (AMPL, linopy, PyOptInterface, HiGHS) mark the
+start of each constraint group (energy balance, storage, costs, ...) on a
+:class:`BuildProfiler`. For each group, the profiler records the wall time,
+CPU time and peak Python memory spent building it, and the rows, nonzeros and
+distinct variables of the constraint families added meanwhile. The result is a
+DataFrame with one row per group (``BuildProfiler.table``), which tells which
+equation family dominates the build of a model.
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Constraint groups of the model builders, in build order
+GROUPS = ['energy_balance', 'resources', 'storage', 'costs', 'gwp', 'mobility', 'heating', 'network', 'policy']
+
+# Group of each constraint of the AMPL core model (ESTD_model_core.mod)
+AMPL_CONSTRAINT_GROUPS = {
+    'energy_balance': ['end_uses_t', 'size_limit', 'capacity_factor_t', 'capacity_factor', 'layer_balance'],
+    'resources': ['resource_availability', 'resource_constant_import'],
+    'storage': ['storage_level', 'impose_daily_storage', 'limit_energy_stored_to_maximum', 'storage_level_intra',
+                'impose_daily_storage_td', 'storage_level_inter', 'storage_intra_max', 'storage_intra_min',
+                'limit_energy_stored_inter_max', 'limit_energy_stored_inter_min', 'storage_layer_in',
+                'storage_layer_out', 'limit_energy_to_power_ratio', 'limit_energy_to_power_ratio_bis'],
+    'costs': ['totalcost_cal', 'investment_cost_calc', 'main_cost_calc', 'op_cost_calc'],
+    'gwp': ['totalGWP_calc', 'gwp_constr_calc', 'gwp_op_calc', 'Minimum_GWP_reduction'],
+    'mobility': ['operating_strategy_mob_passenger', 'operating_strategy_mobility_freight', 'Freight_shares',
+                 'EV_storage_size', 'EV_storage_for_V2G_demand'],
+    'heating': ['thermal_solar_capacity_factor', 'thermal_solar_total_capacity', 'decentralised_heating_balance'],
+    'network': ['network_losses', 'extra_grid', 'extra_dhn'],
+    'policy': ['f_max_perc', 'f_min_perc', 'extra_efficiency', 'solar_area_limited'],
+}
+
+COLUMNS = ['wall_time', 'cpu_time', 'peak_memory', 'rows', 'nonzeros', 'variables']
+
+
+def family_stats(family) -> Tuple[int, int, np.ndarray]:
+    """
+    Size of one constraint family.
+
+    Args:
+        family: linopy Constraint, or constraint array exposing ``nonzeros`` and
+            ``columns`` (PyOptInterface ConstraintArray, HiGHS RowArray)
+
+    Returns:
+        (rows, nonzeros, distinct variable indices)
+    """
+    if hasattr(family, 'columns'):
+        return len(family), family.nonzeros, family.columns
+    labels, variables = family.labels, family.vars
+    terms = ((variables != -1) & (family.coeffs != 0) & (labels != -1)).transpose(*variables.dims).values
+    rows = labels.broadcast_like(variables).transpose(*variables.dims).values[terms].astype(np.int64)
+    columns = variables.values[terms].astype(np.int64)
+    # Terms on the same (row, variable) are one nonzero
+    nonzeros = len(np.unique(rows * (columns.max(initial=0) + 1) + columns))
+    return int((labels != -1).sum()), nonzeros, np.unique(columns)
+
+
+class BuildProfiler:
+    """
+    Wall time, CPU time, peak memory and size of each constraint group of a model build.
+
+    Builders call :meth:`start` at the beginning of each group (which ends the
+    running one) and :meth:`stop` at the end of the build. Constraint families
+    added to the mapping given to :meth:`bind` while a group runs are counted
+    in that group; backends without such a mapping report sizes with :meth:`add`.
+    Starting a group again accumulates into it. The group each bound family was
+    added in is kept in :attr:`family_groups`.
+
+    Table columns: wall and CPU time [s], peak memory allocated by Python
+    (tracemalloc, including NumPy buffers) above the memory in use when the
+    group started [MB], rows, nonzeros and distinct variables of the group's
+    constraints (NaN when the backend does not report them).
+
+    Example:
+        >>> profiler = BuildProfiler()
+        >>> m = build_core_model_xarray(data, profiler=profiler)
+        >>> profiler.table().sort_values('wall_time', ascending=False)
+    """
+
+    def __init__(self, memory: bool = True, enabled: bool = True):
+        """
+        Args:
+            memory: Whether to trace the peak memory of each group (tracemalloc
+                slows the build down)
+            enabled: If False, every method is a no-op (builders use a disabled
+                profiler when none is given)
+        """
+        self.memory = memory
+        self.enabled = enabled
+        self._groups: Dict[str, dict] = {}
+        self.family_groups: Dict[str, str] = {}
+        self._families: Optional[Mapping] = None
+        self._running = None
+
+    def bind(self, families: Mapping) -> None:
+        """
+        Count the constraint families added to `families` in the running group.
+
+        Args:
+            families: Constraint families by name (linopy ``Model.constraints``,
+                dict of ConstraintArray or of RowArray), filled by the builder
+        """
+        self._families = families
+
+    def start(self, group: str) -> None:
+        """Stop the running group (if any) and start (or resume) `group`."""
+        if not self.enabled:
+            return
+        self.stop()
+        tracing = self.memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if self.memory:
+            tracemalloc.reset_peak()
+        self._running = {
+            'group': group,
+            'families': set(self._families) if self._families is not None else None,
+            'tracing': tracing,
+            'memory': tracemalloc.get_traced_memory()[0] if self.memory else 0,
+            'wall': time.perf_counter(),
+            'cpu': time.process_time(),
+        }
+        entry = self._entry(group)
+        if self._families is not None:
+            self._count(entry, 0, 0, np.empty(0, dtype=np.int64))
+
+    def stop(self) -> None:
+        """Stop the running group (no-op if none runs)."""
+        if not self.enabled or self._running is None:
+            return
+        running, self._running = self._running, None
+        entry = self._groups[running['group']]
+        entry['wall_time'] += time.perf_counter() - running['wall']
+        entry['cpu_time'] += time.process_time() - running['cpu']
+        if self.memory:
+            peak = (tracemalloc.get_traced_memory()[1] - running['memory']) / 1e6
+            entry['peak_memory'] = max(entry['peak_memory'], peak)
+            if running['tracing']:
+                tracemalloc.stop()
+        if running['families'] is not None:
+            for name in list(self._families):
+                if name not in running['families']:
+                    self._count(entry, *family_stats(self._families[name]))
+                    self.family_groups[name] = running['group']
+
+    @contextmanager
+    def group(self, group: str):
+        """Profile the enclosed block as `group`."""
+        self.start(group)
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def add(self, rows: int, nonzeros: Optional[int] = None, columns: Optional[np.ndarray] = None) -> None:
+        """
+        Count constraints in the running group.
+
+        Args:
+            rows: Number of rows
+            nonzeros: Number of nonzeros (None if unknown)
+            columns: Variable indices of the nonzeros (None if unknown)
+        """
+        if not self.enabled or self._running is None:
+            return
+        self._count(self._groups[self._running['group']], rows, nonzeros, columns)
+
+    def table(self) -> pd.DataFrame:
+        """
+        Profile of each group, in the order the groups were first started.
+
+        Returns:
+            pd.DataFrame: Indexed by group, with columns wall_time, cpu_time,
+            peak_memory, rows, nonzeros and variables
+        """
+        records = {
+            group: [
+                entry['wall_time'], entry['cpu_time'], entry['peak_memory'] if self.memory else np.nan,
+                entry['rows'], entry['nonzeros'],
+                len(np.unique(np.concatenate(entry['columns']))) if entry['columns'] is not None else np.nan,
+            ]
+            for group, entry in self._groups.items()
+        }
+        table = pd.DataFrame.from_dict(records, orient='index', columns=COLUMNS)
+        table.index.name = 'group'
+        return table
+
+    def _entry(self, group: str) -> dict:
+        if group not in self._groups:
+            self._groups[group] = {'wall_time': 0.0, 'cpu_time': 0.0, 'peak_memory': 0.0, 'rows': 0,
+                                   'nonzeros': np.nan, 'columns': None}
+        return self._groups[group]
+
+    @staticmethod
+    def _count(entry: dict, rows: int, nonzeros: Optional[int], columns: Optional[np.ndarray]) -> None:
+        entry['rows'] += rows
+        if nonzeros is not None:
+            entry['nonzeros'] = nonzeros if np.isnan(entry['nonzeros']) else entry['nonzeros'] + nonzeros
+        if columns is not None:
+            entry['columns'] = (entry['columns'] or [np.empty(0, dtype=np.int64)]) + [np.asarray(columns)]
@@ -7,6 +7,8 @@ using the pyoptinterface library.
 
 from .toy_model import build_toy_model
 from .full_model import build_full_model
+from .result_parser import parse_pyoptinterface_result
+from .parametric import ParametricModel
 
-__all__ = ['build_toy_model', 'build_full_model']
+__all__ = ['build_toy_model', 'build_full_model', 'parse_pyoptinterface_result', 'ParametricModel']
 
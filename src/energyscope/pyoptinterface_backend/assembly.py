@@ -0,0 +1,269 @@
+"""
+Bulk assembly of linear constraints for the PyOptInterface backend.
+
+A constraint family (layer balance, hourly capacity factor, storage level, ...)
+is described by NumPy arrays of (row, variable, coefficient) triplets instead of
+one PyOptInterface expression per constraint built from Python sums.
+:class:`ConstraintBlock` collects the triplets and merges them into CSR form
+with NumPy.
+
+Only the assembly is vectorized: PyOptInterface (0.6) has no call adding many
+rows at once (``add_m_linear_constraints`` also loops over the rows), so
+:meth:`ConstraintBlock.add_to` still adds one row per Python call. On the
+ESTD-sized synthetic dataset (500k rows), this takes 3.3 s of the 4.2 s build,
+against 0.14 s for the CSR assembly. Passing the whole matrix at once needs
+the direct HiGHS backend (energyscope.highs_backend).
+"""
+
+import itertools
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyoptinterface as poi
+
+
+def index_array(variables: Dict, axes: Sequence[Sequence]) -> np.ndarray:
+    """
+    Dense array of variable indices from a dictionary of variables.
+
+    Args:
+        variables: Variables keyed by labels (tuples of labels for several axes)
+        axes: Labels of each axis, without duplicates
+
+    Returns:
+        np.ndarray: int64 array of shape ``(len(axis) for axis in axes)`` holding the
+        index of each variable, -1 where no variable exists. Variables whose labels
+        are not in `axes` are left out.
+    """
+    out = np.full(tuple(len(axis) for axis in axes), -1, dtype=np.int64)
+    if not variables:
+        return out
+    keys = list(variables)
+    if len(axes) == 1:
+        keys = [(key,) for key in keys]
+    pos = np.array([pd.Index(axis).get_indexer([key[d] for key in keys]) for d, axis in enumerate(axes)])
+    found = (pos >= 0).all(axis=0)
+    indices = np.fromiter((v.index for v in variables.values()), dtype=np.int64, count=len(keys))
+    out[tuple(pos[:, found])] = indices[found]
+    return out
+
+
+def lookup(values, axes: Sequence[Sequence], default: float = 0.0) -> np.ndarray:
+    """
+    Dense array of a parameter over the product of `axes`.
+
+    Args:
+        values: Parameter values (dict or Series) keyed by labels (tuples for several axes)
+        axes: Labels of each axis
+        default: Value where the parameter is not defined
+
+    Returns:
+        np.ndarray: float array of shape ``(len(axis) for axis in axes)``
+    """
+    keys = axes[0] if len(axes) == 1 else itertools.product(*axes)
+    shape = tuple(len(axis) for axis in axes)
+    return np.fromiter((values.get(key, default) for key in keys), dtype=float,
+                       count=int(np.prod(shape))).reshape(shape)
+
+
+class ConstraintBlock:
+    """
+    Family of linear constraints assembled from index arrays.
+
+    Terms are added as broadcastable arrays of rows, variable indices and
+    coefficients. Terms on a missing variable (index -1) or a missing row
+    (row -1) and zero coefficients are dropped; terms on the same (row, variable)
+    are summed.
+
+    Example:
+        >>> block = ConstraintBlock(F_t_idx.shape)              # one row per (j, h, td)
+        >>> block.add_terms(F_t_idx)                            # F_t[j, h, td]
+        >>> block.add_terms(F_idx[:, None, None], -c_p_t)       # - c_p_t[j, h, td] * F[j]
+        >>> block.add_to(model, poi.Leq, 0.0, labels=(TECHNOLOGIES, HOURS, TYPICAL_DAYS))
+    """
+
+    def __init__(self, shape: Union[int, Tuple[int, ...]], mask: Optional[np.ndarray] = None):
+        """
+        Args:
+            shape: Shape of the family's candidate rows (e.g. (layers, hours, typical days))
+            mask: Candidate rows that are actual constraints, broadcastable to `shape`
+                (default: all)
+        """
+        self.shape = (shape,) if isinstance(shape, (int, np.integer)) else tuple(shape)
+        self.mask = None if mask is None else np.broadcast_to(np.asarray(mask, dtype=bool), self.shape)
+        if self.mask is None:
+            self.n_rows = int(np.prod(self.shape))
+            self.rows = np.arange(self.n_rows).reshape(self.shape)
+        else:
+            self.rows, self.n_rows = selected_rows(self.mask)
+        self._terms = []
+
+    def add_terms(self, variables, coefficients=1.0, rows=None) -> 'ConstraintBlock':
+        """
+        Add coefficient * variable terms to rows.
+
+        Args:
+            variables: Variable indices (VariableIndex.index), -1 for missing variables
+            coefficients: Coefficients, broadcastable against `variables` and `rows`
+            rows: Row numbers (default: one per candidate row, ``self.rows``), -1 to skip a term
+
+        Returns:
+            The block itself, so that calls can be chained
+        """
+        rows = self.rows if rows is None else rows
+        rows, variables, coefficients = np.broadcast_arrays(
+            np.asarray(rows, dtype=np.int64), np.asarray(variables, dtype=np.int64),
+            np.asarray(coefficients, dtype=float)
+        )
+        keep = (rows >= 0) & (variables >= 0) & (coefficients != 0)
+        self._terms.append((rows[keep], variables[keep], coefficients[keep]))
+        return self
+
+    def to_csr(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Merge the terms into CSR form.
+
+        Returns:
+            (indptr, variables, coefficients), the variables of each row in increasing order
+        """
+        if self._terms:
+            rows, variables, coefficients = (np.concatenate(parts) for parts in zip(*self._terms))
+        else:
+            rows = variables = np.empty(0, dtype=np.int64)
+            coefficients = np.empty(0)
+
+        order = np.lexsort((variables, rows))
+        rows, variables, coefficients = rows[order], variables[order], coefficients[order]
+        if len(rows):
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = (rows[1:] != rows[:-1]) | (variables[1:] != variables[:-1])
+            starts = np.flatnonzero(first)
+            coefficients = np.add.reduceat(coefficients, starts)
+            rows, variables = rows[starts], variables[starts]
+            nonzero = coefficients != 0
+            rows, variables, coefficients = rows[nonzero], variables[nonzero], coefficients[nonzero]
+
+        indptr = np.zeros(self.n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.n_rows), out=indptr[1:])
+        return indptr, variables, coefficients
+
+    def add_to(self, model, sense: poi.ConstraintSense, rhs=0.0, labels=None) -> 'ConstraintArray':
+        """
+        Add the rows to a PyOptInterface model, one add_linear_constraint call per row.
+
+        Args:
+            model: PyOptInterface model
+            sense: poi.Leq, poi.Eq or poi.Geq
+            rhs: Right-hand side, broadcastable to the block shape
+            labels: Labels of each axis of the block (default: positions)
+
+        Returns:
+            ConstraintArray: Constraint handles, with the block shape
+        """
+        indptr, variables, coefficients = self.to_csr()
+        nonzeros, columns = len(variables), np.unique(variables)
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=float), self.shape)
+        rhs = (rhs.ravel() if self.mask is None else rhs[self.mask]).tolist()
+        indptr, variables, coefficients = indptr.tolist(), variables.tolist(), coefficients.tolist()
+
+        add_constraint = model.add_linear_constraint
+        ScalarAffineFunction = poi.ScalarAffineFunction
+        constraints = np.empty(self.n_rows, dtype=object)
+        for k in range(self.n_rows):
+            start, end = indptr[k], indptr[k + 1]
+            constraints[k] = add_constraint(
+                ScalarAffineFunction(coefficients[start:end], variables[start:end]), sense, rhs[k]
+            )
+        handles = np.full(self.shape, None, dtype=object)
+        if self.mask is None:
+            handles[...] = constraints.reshape(self.shape)
+        else:
+            handles[self.mask] = constraints
+        return ConstraintArray(handles, labels, nonzeros, columns)
+
+
+class ConstraintArray:
+    """
+    Constraints of one family over the product of some sets.
+
+    Attributes:
+        handles: Object array of constraint handles, None where no constraint exists
+        labels: Labels of each axis (pd.Index)
+        nonzeros: Number of nonzero coefficients of the constraints
+        columns: Indices of the variables with a nonzero coefficient
+    """
+
+    def __init__(self, handles: np.ndarray, labels=None, nonzeros: int = 0, columns: Optional[np.ndarray] = None):
+        self.handles = handles
+        self.nonzeros = nonzeros
+        self.columns = np.empty(0, dtype=np.int64) if columns is None else columns
+        if labels is None:
+            labels = [range(n) for n in handles.shape]
+        self.labels = tuple(pd.Index(list(axis)) for axis in labels)
+        if tuple(len(axis) for axis in self.labels) != handles.shape:
+            raise ValueError(f"Labels of shape {[len(axis) for axis in self.labels]} for constraints of shape {handles.shape}")
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.handles.shape
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Combinations with a constraint."""
+        return self.handles != None  # noqa: E711 (element-wise comparison)
+
+    def __repr__(self) -> str:
+        return f"ConstraintArray(shape={self.shape}, constraints={len(self)})"
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.mask))
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        handle = self.handles[tuple(labels.get_loc(label) for labels, label in zip(self.labels, key))]
+        if handle is None:
+            raise KeyError(key)
+        return handle
+
+    def values(self, get) -> np.ndarray:
+        """
+        Attribute of every constraint as a dense array (NaN where no constraint exists).
+
+        Args:
+            get: Function of a constraint handle, e.g. ``model.get_constraint_dual``
+        """
+        mask = self.mask
+        values = np.full(self.shape, np.nan)
+        values[mask] = [get(handle) for handle in self.handles[mask].tolist()]
+        return values
+
+
+def selected_rows(mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Row numbers for the True entries of `mask`.
+
+    Args:
+        mask: Boolean array over the candidate rows
+
+    Returns:
+        (rows, n_rows): rows has the shape of `mask`, with consecutive row numbers
+        on True entries and -1 elsewhere
+    """
+    rows = np.full(mask.shape, -1, dtype=np.int64)
+    rows[mask] = np.arange(int(mask.sum()))
+    return rows, int(mask.sum())
+
+
+def positions(labels: Iterable, axis: Sequence) -> np.ndarray:
+    """
+    Positions of `labels` in `axis`.
+
+    Raises:
+        KeyError: If a label is not in `axis`
+    """
+    labels = list(labels)
+    pos = pd.Index(axis).get_indexer(labels)
+    if (pos < 0).any():
+        raise KeyError(f"Unknown labels: {[label for label, p in zip(labels, pos) if p < 0]}")
+    return pos
@@ -8,10 +8,17 @@ from Equations 2.1-2.39 with optimizations for computational efficiency.
 import time
 import pyoptinterface as poi
 from pyoptinterface import gurobi, highs
+import numpy as np
 import pandas as pd
 
+from energyscope.profiling import BuildProfiler
+from energyscope.time_index import TimeIndex
+from .assembly import ConstraintBlock, index_array, lookup, positions
+from .registry import VariableRegistry
 
-def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, timing=True):
+
+def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, timing=True, solve=True,
+                     storage_formulation='chronological', profiler=None):
     """
     Builds and solves the Energyscope full model using pyoptinterface.
     
@@ -28,6 +35,16 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
         Whether to enable solver output during optimization. Default is True.
     timing : bool, optional
         Whether to measure and report timing. Default is True.
+    solve : bool, optional
+        Whether to solve the model. If False, the model is only built (e.g. to be
+        updated and solved by a ParametricModel). Default is True.
+    storage_formulation : str, optional
+        'chronological' (storage level at each period of the year) or 'intra_inter'
+        (level within each typical day, carried across the days of the year for
+        seasonal storage, as in Kotzur et al., 2018). Default is 'chronological'.
+    profiler : BuildProfiler, optional
+        Records the wall time, CPU time, memory and size of each constraint group
+        (see energyscope.profiling.BuildProfiler). Default is None (no profiling).
         
     Returns
     -------
@@ -35,11 +52,23 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
         Dictionary with keys:
         - 'model': The optimization model object
         - 'variables': Dict of variable dictionaries (F, F_t, Storage_*, etc.)
+        - 'registry': VariableRegistry of the time-dependent variables
+        - 'constraints': Dict of ConstraintArray, by constraint family
         - 'status': Termination status
         - 'objective': Objective value (if optimal)
         - 'solution': Solution values for key variables (if optimal)
         - 'timing': Dict with timing information (if timing=True)
+        - 'profile': DataFrame of the build of each constraint group (if a profiler is given)
+    
+    Raises
+    ------
+    ValueError
+        If the storage formulation is unknown.
     """
+    if storage_formulation not in ('chronological', 'intra_inter'):
+        raise ValueError(f"Unknown storage formulation: {storage_formulation}")
+    if profiler is None:
+        profiler = BuildProfiler(enabled=False)
     if verbose:
         print("="*70)
         print("Building PyOptInterface full model")
@@ -71,6 +100,8 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
     EVs_BATT_OF_V2G = data['sets'].get('EVs_BATT_OF_V2G', {})
     TS_OF_DEC_TECH = data['sets'].get('TS_OF_DEC_TECH', {})
     
+    time_index = TimeIndex(T_H_TD, HOURS, TYPICAL_DAYS)
+
     ALL_TECH = TECHNOLOGIES + STORAGE_TECH
     TECH_NOSTORAGE = [t for t in ALL_TECH if t not in STORAGE_TECH]
     # F_t is defined for RESOURCES union TECHNOLOGIES (including storage)
@@ -188,36 +219,42 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
         for tech in ALL_TECH
     }
 
+    # Time-dependent variables are stored as integer-coded arrays of the registry (unnamed,
+    # names are built on demand by registry.set_names() / registry.write())
+    ENTITIES = list(dict.fromkeys(ENTITIES_WITH_F_T))
+    registry = VariableRegistry(model, {
+        'ENTITIES': ENTITIES, 'STORAGE_TECH': STORAGE_TECH, 'LAYERS': LAYERS, 'END_USES_TYPES': END_USES_TYPES,
+        'HOURS': HOURS, 'TYPICAL_DAYS': TYPICAL_DAYS, 'PERIODS': PERIODS, 'RESOURCES': RESOURCES,
+    })
+
     # Operational variables
-    F_t = {
-        (entity, h, td): model.add_variable(lb=0, name=f"F_t_{entity}_{h}_{td}")
-        for entity in ENTITIES_WITH_F_T for h in HOURS for td in TYPICAL_DAYS
-    }
+    F_t = registry.add('F_t', ('ENTITIES', 'HOURS', 'TYPICAL_DAYS'))
 
     # Storage variables
     # OPTIMIZATION: Only create storage variables where efficiency > 0
     # This eliminates ~500K unnecessary constraints and ~300K variables
-    Storage_in, Storage_out, Storage_level = {}, {}, {}
-    if STORAGE_TECH:
-        Storage_in = {
-            (s, l, h, td): model.add_variable(lb=0, name=f"Storage_in_{s}_{l}_{h}_{td}")
-            for s in STORAGE_TECH 
-            for l in LAYERS 
-            if storage_eff_in.get((s, l), 0) > 0  # Only create if storage can accept this layer
-            for h in HOURS 
-            for td in TYPICAL_DAYS
-        }
-        Storage_out = {
-            (s, l, h, td): model.add_variable(lb=0, name=f"Storage_out_{s}_{l}_{h}_{td}")
-            for s in STORAGE_TECH 
-            for l in LAYERS 
-            if storage_eff_out.get((s, l), 0) > 0  # Only create if storage can output this layer
-            for h in HOURS 
-            for td in TYPICAL_DAYS
-        }
-        Storage_level = {
-            (s, t): model.add_variable(lb=0, name=f"Storage_level_{s}_{t}")
-            for s in STORAGE_TECH for t in PERIODS
+    eff_in = lookup(storage_eff_in, [STORAGE_TECH, LAYERS])
+    eff_out = lookup(storage_eff_out, [STORAGE_TECH, LAYERS])
+    storage_flow = ('STORAGE_TECH', 'LAYERS', 'HOURS', 'TYPICAL_DAYS')
+    Storage_in = registry.add('Storage_in', storage_flow, mask=(eff_in > 0)[:, :, None, None])
+    Storage_out = registry.add('Storage_out', storage_flow, mask=(eff_out > 0)[:, :, None, None])
+    STORAGE_SEASONAL = [j for j in STORAGE_TECH if j not in STORAGE_DAILY]
+    if storage_formulation == 'chronological':
+        storage_levels = {'Storage_level': registry.add('Storage_level', ('STORAGE_TECH', 'PERIODS'))}
+    else:
+        # Level within each typical day (absolute for daily storage, change since the start of the
+        # day for seasonal storage), level at the start of each day and extreme changes within each
+        # typical day for seasonal storage
+        day_td_pos = time_index.day_td_pos()
+        registry.sets['STORAGE_SEASONAL'] = pd.Index(STORAGE_SEASONAL, name='STORAGE_SEASONAL')
+        registry.sets['DAYS'] = pd.Index(range(1, len(day_td_pos) + 1), name='DAYS')
+        storage_levels = {
+            'Storage_level_intra': registry.add('Storage_level_intra', ('STORAGE_TECH', 'HOURS', 'TYPICAL_DAYS'),
+                                                lb=-float('inf')),
+            'Storage_level_inter': registry.add('Storage_level_inter', ('STORAGE_SEASONAL', 'DAYS')),
+            'Storage_intra_max': registry.add('Storage_intra_max', ('STORAGE_SEASONAL', 'TYPICAL_DAYS')),
+            'Storage_intra_min': registry.add('Storage_intra_min', ('STORAGE_SEASONAL', 'TYPICAL_DAYS'),
+                                              lb=-float('inf'), ub=0.0),
         }
 
     # Share variables (decision variables for modal split, DHN share, etc.)
@@ -247,298 +284,311 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
     
     # Thermal solar variables (F_solar, F_t_solar)
     F_solar = {}
-    F_t_solar = {}
-    if dec_heat_techs_no_solar:
-        for tech in dec_heat_techs_no_solar:
-            F_solar[tech] = model.add_variable(lb=0, name=f"F_solar_{tech}")
-            for h in HOURS:
-                for td in TYPICAL_DAYS:
-                    F_t_solar[tech, h, td] = model.add_variable(lb=0, name=f"F_t_solar_{tech}_{h}_{td}")
+    for tech in dec_heat_techs_no_solar:
+        F_solar[tech] = model.add_variable(lb=0, name=f"F_solar_{tech}")
+    registry.sets['DEC_HEAT_TECH'] = pd.Index(dec_heat_techs_no_solar, name='DEC_HEAT_TECH')
+    F_t_solar = registry.add('F_t_solar', ('DEC_HEAT_TECH', 'HOURS', 'TYPICAL_DAYS'))
     
     # End_uses as VARIABLES (not fixed parameters!)
-    End_uses = {
-        (l, h, td): model.add_variable(lb=0, name=f"End_uses_{l}_{h}_{td}")
-        for l in LAYERS for h in HOURS for td in TYPICAL_DAYS
-    }
+    End_uses = registry.add('End_uses', ('LAYERS', 'HOURS', 'TYPICAL_DAYS'))
     
     # Network losses variables
-    Network_losses = {
-        (eut, h, td): model.add_variable(lb=0, name=f"Network_losses_{eut}_{h}_{td}")
-        for eut in END_USES_TYPES for h in HOURS for td in TYPICAL_DAYS
-    }
+    Network_losses = registry.add('Network_losses', ('END_USES_TYPES', 'HOURS', 'TYPICAL_DAYS'))
     
     # Cost and GWP variables
     TotalCost = model.add_variable(lb=0, name="TotalCost")
-    TotalGWP = model.add_variable(lb=0, name="TotalGWP")
+    # The GWP limit [Eq. 2.38] is the upper bound of TotalGWP
+    TotalGWP = model.add_variable(lb=0, ub=gwp_limit_param, name="TotalGWP")
+
+    # Yearly use of each resource, bounded by its availability [Eq. 2.12]. Limits are
+    # bounds rather than right-hand sides so that they can be changed in place.
+    Resources_use = registry.add('Resources_use', ('RESOURCES',),
+                                 ub=np.nan_to_num(lookup(avail, [RESOURCES], float('inf')), nan=float('inf')))
 
     # 4. Add constraints
-    
+    # Each family of constraints is assembled as a CSR block from integer index arrays and
+    # added to the solver in bulk (see assembly.ConstraintBlock).
+
+    # Integer indices of the variables, -1 where a variable does not exist
+    F_idx = np.array([F[j].index for j in ALL_TECH], dtype=np.int64)
+    F_t_idx = F_t.index
+    Storage_in_idx = Storage_in.index
+    Storage_out_idx = Storage_out.index
+    End_uses_idx = End_uses.index
+    Network_losses_idx = Network_losses.index
+
+    def f_t_of(entities):
+        """F_t indices of `entities`, shape (entities, hours, typical days)."""
+        return F_t_idx[positions(entities, ENTITIES)]
+
+    # Parameters as dense arrays
+    t_op_arr = lookup(t_op, [HOURS, TYPICAL_DAYS], 1.0)
+    safe_t_op = np.where(t_op_arr > 0, t_op_arr, 1.0)
+
+    def hourly_demand(annual, time_series):
+        """Demand per (h, td) of an annual end use distributed along a time series."""
+        return np.where(t_op_arr > 0, annual * lookup(time_series, [HOURS, TYPICAL_DAYS], 0) / safe_t_op, 0)
+
+    def constant_share(annual):
+        """Demand per (h, td) of an annual end use spread evenly over the year."""
+        return annual / total_time if total_time > 0 else 0
+
+    heat_low_t = constant_share(end_uses_input.get("HEAT_LOW_T_HW", 0)) + \
+        hourly_demand(end_uses_input.get("HEAT_LOW_T_SH", 0), heating_time_series)
+    mob_pass = hourly_demand(end_uses_input.get("MOBILITY_PASSENGER", 0), mob_pass_time_series)
+    mob_freight = hourly_demand(end_uses_input.get("MOBILITY_FREIGHT", 0), mob_freight_time_series)
+
+    constraints = {}
+    profiler.bind(constraints)
+
+    profiler.start('mobility')
     # Constraint: Freight shares must sum to 1 [Eq. 2.26]
     model.add_linear_constraint(Share_freight_train + Share_freight_road + Share_freight_boat == 1)
     
+    profiler.start('energy_balance')
     # Constraint: End-uses demand calculation [Eq. 2.8 / Figure 2.8]
-    for l in LAYERS:
-        for h in HOURS:
-            for td in TYPICAL_DAYS:
-                t_op_val = t_op.get((h, td), 1.0)
-                
-                # Build the end-use expression based on layer type
-                if l == "ELECTRICITY":
-                    # Electricity: base load + lighting profile
-                    base = end_uses_input.get("ELECTRICITY", 0) / total_time if total_time > 0 else 0
-                    lighting = end_uses_input.get("LIGHTING", 0) * electricity_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                    model.add_linear_constraint(End_uses[l, h, td] == base + lighting)
-                    
-                elif l == "HEAT_LOW_T_DHN":
-                    # DHN heat: (HW + SH profile) * DHN_share + network losses
-                    hw = end_uses_input.get("HEAT_LOW_T_HW", 0) / total_time if total_time > 0 else 0
-                    sh = end_uses_input.get("HEAT_LOW_T_SH", 0) * heating_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                    model.add_linear_constraint(End_uses[l, h, td] == (hw + sh) * Share_heat_dhn + Network_losses[l, h, td])
-                    
-                elif l == "HEAT_LOW_T_DECEN":
-                    # Decentralized heat: (HW + SH profile) * (1 - DHN_share)
-                    hw = end_uses_input.get("HEAT_LOW_T_HW", 0) / total_time if total_time > 0 else 0
-                    sh = end_uses_input.get("HEAT_LOW_T_SH", 0) * heating_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                    model.add_linear_constraint(End_uses[l, h, td] == (hw + sh) * (1 - Share_heat_dhn))
-                    
-                elif l == "MOB_PUBLIC":
-                    # Public mobility
-                    mob_pass = end_uses_input.get("MOBILITY_PASSENGER", 0) * mob_pass_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                    model.add_linear_constraint(End_uses[l, h, td] == mob_pass * Share_mobility_public)
-                    
-                elif l == "MOB_PRIVATE":
-                    # Private mobility
-                    mob_pass = end_uses_input.get("MOBILITY_PASSENGER", 0) * mob_pass_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                    model.add_linear_constraint(End_uses[l, h, td] == mob_pass * (1 - Share_mobility_public))
-                    
-                elif l == "MOB_FREIGHT_RAIL":
-                    # Rail freight
-                    mob_freight = end_uses_input.get("MOBILITY_FREIGHT", 0) * mob_freight_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                    model.add_linear_constraint(End_uses[l, h, td] == mob_freight * Share_freight_train)
-                    
-                elif l == "MOB_FREIGHT_ROAD":
-                    # Road freight
-                    mob_freight = end_uses_input.get("MOBILITY_FREIGHT", 0) * mob_freight_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                    model.add_linear_constraint(End_uses[l, h, td] == mob_freight * Share_freight_road)
-                    
-                elif l == "MOB_FREIGHT_BOAT":
-                    # Boat freight
-                    mob_freight = end_uses_input.get("MOBILITY_FREIGHT", 0) * mob_freight_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                    model.add_linear_constraint(End_uses[l, h, td] == mob_freight * Share_freight_boat)
-                    
-                elif l == "HEAT_HIGH_T":
-                    # High temperature heat: constant
-                    ht_demand = end_uses_input.get("HEAT_HIGH_T", 0) / total_time if total_time > 0 else 0
-                    model.add_linear_constraint(End_uses[l, h, td] == ht_demand)
-                    
-                else:
-                    # Other layers: zero demand
-                    model.add_linear_constraint(End_uses[l, h, td] == 0)
-    
+    # End_uses[l, h, td] + coefficient * share variable (+ network losses) == demand, by layer type
+    block = ConstraintBlock((len(LAYERS), len(HOURS), len(TYPICAL_DAYS)))
+    block.add_terms(End_uses_idx)
+    end_uses_rhs = np.zeros(block.shape)
+    for k, l in enumerate(LAYERS):
+        rows = block.rows[k]
+        if l == "ELECTRICITY":
+            # Electricity: base load + lighting profile
+            end_uses_rhs[k] = constant_share(end_uses_input.get("ELECTRICITY", 0)) + \
+                hourly_demand(end_uses_input.get("LIGHTING", 0), electricity_time_series)
+        elif l == "HEAT_LOW_T_DHN":
+            # DHN heat: (HW + SH profile) * DHN_share + network losses
+            block.add_terms(Share_heat_dhn.index, -heat_low_t, rows)
+            block.add_terms(Network_losses_idx[END_USES_TYPES.index(l)], -1.0, rows)
+        elif l == "HEAT_LOW_T_DECEN":
+            # Decentralized heat: (HW + SH profile) * (1 - DHN_share)
+            block.add_terms(Share_heat_dhn.index, heat_low_t, rows)
+            end_uses_rhs[k] = heat_low_t
+        elif l == "MOB_PUBLIC":
+            block.add_terms(Share_mobility_public.index, -mob_pass, rows)
+        elif l == "MOB_PRIVATE":
+            block.add_terms(Share_mobility_public.index, mob_pass, rows)
+            end_uses_rhs[k] = mob_pass
+        elif l == "MOB_FREIGHT_RAIL":
+            block.add_terms(Share_freight_train.index, -mob_freight, rows)
+        elif l == "MOB_FREIGHT_ROAD":
+            block.add_terms(Share_freight_road.index, -mob_freight, rows)
+        elif l == "MOB_FREIGHT_BOAT":
+            block.add_terms(Share_freight_boat.index, -mob_freight, rows)
+        elif l == "HEAT_HIGH_T":
+            # High temperature heat: constant
+            end_uses_rhs[k] = constant_share(end_uses_input.get("HEAT_HIGH_T", 0))
+        # Other layers: zero demand
+    constraints['end_uses'] = block.add_to(model, poi.Eq, end_uses_rhs, labels=(LAYERS, HOURS, TYPICAL_DAYS))
+    
+    profiler.start('network')
     # Constraint: Network losses [Eq. 2.20]
-    for eut in END_USES_TYPES:
+    # Network_losses[eut, h, td] == loss_network[eut] * production of eut (0 without losses)
+    block = ConstraintBlock(Network_losses_idx.shape)
+    block.add_terms(Network_losses_idx)
+    producers = f_t_of(ENTITIES_WITH_F_T)
+    for k, eut in enumerate(END_USES_TYPES):
         loss_pct = loss_network.get(eut, 0)
         if loss_pct > 0:
-            for h in HOURS:
-                for td in TYPICAL_DAYS:
-                    production = sum(
-                        layers_in_out.get((entity, eut), 0) * F_t[entity, h, td]
-                        for entity in ENTITIES_WITH_F_T
-                        if layers_in_out.get((entity, eut), 0) > 0
-                    )
-                    model.add_linear_constraint(Network_losses[eut, h, td] == production * loss_pct)
-        else:
-            for h in HOURS:
-                for td in TYPICAL_DAYS:
-                    model.add_linear_constraint(Network_losses[eut, h, td] == 0)
+            production = np.array([max(layers_in_out.get((entity, eut), 0), 0) for entity in ENTITIES_WITH_F_T])
+            block.add_terms(producers, -loss_pct * production[:, None, None], block.rows[k])
+    constraints['network_losses'] = block.add_to(model, poi.Eq, labels=(END_USES_TYPES, HOURS, TYPICAL_DAYS))
     
+    profiler.start('energy_balance')
     # Constraint: Hourly capacity factor [Eq. 2.10]
-    for j in ALL_TECH:  # Applies to all technologies including storage
-        for h in HOURS:
-            for td in TYPICAL_DAYS:
-                cf = c_p_t.get((j, h, td), 1.0)
-                model.add_linear_constraint(F_t[j, h, td] <= F[j] * cf)
+    # F_t[j, h, td] <= F[j] * c_p_t[j, h, td], for all technologies including storage
+    block = ConstraintBlock((len(ALL_TECH), len(HOURS), len(TYPICAL_DAYS)))
+    block.add_terms(f_t_of(ALL_TECH))
+    block.add_terms(F_idx[:, None, None], -lookup(c_p_t, [ALL_TECH, HOURS, TYPICAL_DAYS], 1.0))
+    constraints['capacity_factor_t'] = block.add_to(model, poi.Leq, labels=(ALL_TECH, HOURS, TYPICAL_DAYS))
     
     # Constraint: Yearly capacity factor [Eq. 2.11]
     # This limits total annual output to account for downtime and maintenance
     c_p = data['parameters'].get('c_p', pd.Series()).to_dict() if 'c_p' in data['parameters'] else {}
-    for j in ALL_TECH:
-        if j in c_p:
-            annual_output = sum(
-                F_t[j, h, td] * t_op.get((h, td), 1.0)
-                for h in HOURS for td in TYPICAL_DAYS
-            )
-            model.add_linear_constraint(annual_output <= F[j] * c_p[j] * total_time)
+    techs_c_p = [k for k, j in enumerate(ALL_TECH) if j in c_p]
+    block = ConstraintBlock(len(techs_c_p))
+    block.add_terms(f_t_of([ALL_TECH[k] for k in techs_c_p]), t_op_arr, block.rows[:, None, None])
+    block.add_terms(F_idx[techs_c_p], [-c_p[ALL_TECH[k]] * total_time for k in techs_c_p])
+    constraints['capacity_factor'] = block.add_to(model, poi.Leq, labels=([ALL_TECH[k] for k in techs_c_p],))
 
     # Constraint: Layer balance [Eq. 2.13]
-    for l in LAYERS:
-        for h in HOURS:
-            for td in TYPICAL_DAYS:
-                # Sum over RESOURCES and non-storage TECHNOLOGIES only
-                balance_expr = sum(
-                    layers_in_out.get((entity, l), 0) * F_t[entity, h, td]
-                    for entity in (RESOURCES + TECH_NOSTORAGE)
-                )
-                
-                # Add storage contribution (only for layers where storage is compatible)
-                if STORAGE_TECH:
-                    for s in STORAGE_TECH:
-                        # Only add if variables exist (efficiency > 0)
-                        if (s, l, h, td) in Storage_out:
-                            balance_expr += Storage_out[s, l, h, td]
-                        if (s, l, h, td) in Storage_in:
-                            balance_expr -= Storage_in[s, l, h, td]
-                
-                model.add_linear_constraint(balance_expr == End_uses[l, h, td])
+    # Sum over RESOURCES and non-storage TECHNOLOGIES, plus storage outputs minus inputs
+    # (storage flows only exist for compatible layers), equals End_uses[l, h, td]
+    block = ConstraintBlock(End_uses_idx.shape)
+    balance_entities = RESOURCES + TECH_NOSTORAGE
+    block.add_terms(f_t_of(balance_entities)[:, None], lookup(layers_in_out, [balance_entities, LAYERS])[:, :, None, None],
+                    block.rows[None])
+    block.add_terms(Storage_out_idx, 1.0, block.rows[None])
+    block.add_terms(Storage_in_idx, -1.0, block.rows[None])
+    block.add_terms(End_uses_idx, -1.0)
+    constraints['layer_balance'] = block.add_to(model, poi.Eq, labels=(LAYERS, HOURS, TYPICAL_DAYS))
 
+    profiler.start('resources')
     # Constraint: Resources availability [Eq. 2.12]
-    for i in RESOURCES:
-        if i in avail:
-            if pd.isna(avail[i]) or avail[i] == float('inf'):
-                continue
-            annual_consumption = sum(
-                F_t[i, h, td] * t_op.get((h, td), 1.0) 
-                for h in HOURS for td in TYPICAL_DAYS
-            )
-            model.add_linear_constraint(annual_consumption <= avail[i])
+    # Resources_use[i] == sum over (h, td) of F_t[i, h, td] * t_op[h, td] (bounded by avail[i])
+    block = ConstraintBlock(len(RESOURCES))
+    block.add_terms(f_t_of(RESOURCES), t_op_arr, block.rows[:, None, None])
+    block.add_terms(Resources_use.index, -1.0)
+    constraints['resources_availability'] = block.add_to(model, poi.Eq, labels=(RESOURCES,))
 
+    profiler.start('storage')
     # Constraint: Storage level [Eq. 2.14]
     if STORAGE_TECH:
-        for j in STORAGE_TECH:
-            loss_rate = storage_losses.get(j, 0)
-            for t in PERIODS:
-                h_td_for_t = [(h, td) for (p, h, td) in T_H_TD if p == t]
-                if not h_td_for_t: 
-                    continue
-                h, td = h_td_for_t[0]
-                t_op_val = t_op.get((h, td), 1.0)
-                
-                # Storage input: sum over layers with eff_in > 0
-                storage_input = sum(
-                    Storage_in[j, l, h, td] * storage_eff_in[(j, l)]
-                    for l in LAYERS 
-                    if (j, l, h, td) in Storage_in  # Variable exists
-                )
-                # Storage output: sum over layers with eff_out > 0
-                storage_output = sum(
-                    Storage_out[j, l, h, td] / storage_eff_out[(j, l)]
-                    for l in LAYERS 
-                    if (j, l, h, td) in Storage_out  # Variable exists
-                )
-
-                if t == 1:
-                    last_period = PERIODS[-1]
-                    model.add_linear_constraint(
-                        Storage_level[j, t] == Storage_level[j, last_period] * (1.0 - loss_rate) + 
-                        t_op_val * (storage_input - storage_output)
-                    )
-                else:
-                    model.add_linear_constraint(
-                        Storage_level[j, t] == Storage_level[j, t-1] * (1.0 - loss_rate) + 
-                        t_op_val * (storage_input - storage_output)
-                    )
-        
-        # Constraint: Daily storage [Eq. 2.15]
-        # For daily storage, level must equal F_t at each period
-        for j in STORAGE_DAILY:
-            for t in PERIODS:
-                h_td_for_t = [(h, td) for (p, h, td) in T_H_TD if p == t]
-                if not h_td_for_t: 
-                    continue
-                h, td = h_td_for_t[0]
-                # In AMPL: Storage_level [j, t] = F_t [j, h, td]
-                # F_t for storage represents the storage level at that time
-                model.add_linear_constraint(Storage_level[j, t] == F_t[j, h, td])
-        
-        # Constraint: Seasonal storage level cannot exceed capacity [Eq. 2.16]
-        for j in STORAGE_TECH:
-            if j not in STORAGE_DAILY:  # Only for seasonal storage
-                for t in PERIODS:
-                    model.add_linear_constraint(Storage_level[j, t] <= F[j])
+        losses = np.array([storage_losses.get(j, 0) for j in STORAGE_TECH])
+        # (storage, layer) pairs with a flow variable
+        pairs_in = np.nonzero(eff_in > 0)
+        pairs_out = np.nonzero(eff_out > 0)
+        daily = positions(STORAGE_DAILY, STORAGE_TECH)
+        seasonal = positions(STORAGE_SEASONAL, STORAGE_TECH)
+        F_storage_idx = np.array([F[j].index for j in STORAGE_TECH], dtype=np.int64)
+
+        if storage_formulation == 'chronological':
+            Storage_level_idx = storage_levels['Storage_level'].index
+            period_pos = positions(time_index.periods, PERIODS)
+            level = Storage_level_idx[:, period_pos]
+            t_op_t = t_op_arr[time_index.hour_pos, time_index.td_pos]
+
+            # Storage_level[j, t] == Storage_level[j, t-1] * (1 - losses) + t_op * (inputs * eff_in - outputs / eff_out),
+            # the first period following the last one (cyclic year)
+            block = ConstraintBlock(level.shape)
+            block.add_terms(level)
+            block.add_terms(level[:, time_index.previous], -(1.0 - losses)[:, None])
+            block.add_terms(Storage_in_idx[pairs_in][:, time_index.hour_pos, time_index.td_pos],
+                            -eff_in[pairs_in][:, None] * t_op_t, block.rows[pairs_in[0]])
+            block.add_terms(Storage_out_idx[pairs_out][:, time_index.hour_pos, time_index.td_pos],
+                            t_op_t / eff_out[pairs_out][:, None], block.rows[pairs_out[0]])
+            constraints['storage_level'] = block.add_to(model, poi.Eq, labels=(STORAGE_TECH, time_index.periods))
+
+            # Constraint: Daily storage [Eq. 2.15]
+            # For daily storage, level must equal F_t at each period
+            # In AMPL: Storage_level [j, t] = F_t [j, h, td]
+            block = ConstraintBlock((len(daily), len(time_index)))
+            block.add_terms(level[daily])
+            block.add_terms(f_t_of(STORAGE_DAILY)[:, time_index.hour_pos, time_index.td_pos], -1.0)
+            constraints['storage_daily'] = block.add_to(model, poi.Eq, labels=(STORAGE_DAILY, time_index.periods))
+
+            # Constraint: Seasonal storage level cannot exceed capacity [Eq. 2.16]
+            block = ConstraintBlock((len(seasonal), len(PERIODS)))
+            block.add_terms(Storage_level_idx[seasonal])
+            block.add_terms(F_storage_idx[seasonal, None], -1.0)
+            constraints['storage_level_max'] = block.add_to(model, poi.Leq, labels=(STORAGE_SEASONAL, PERIODS))
+        else:
+            intra = storage_levels['Storage_level_intra'].index
+            inter = storage_levels['Storage_level_inter'].index
+            intra_max = storage_levels['Storage_intra_max'].index
+            intra_min = storage_levels['Storage_intra_min'].index
+
+            # Storage_level_intra[j, h, td] == Storage_level_intra[j, h-1, td] * (1 - losses) + t_op * (inputs - outputs),
+            # the first hour following the last one of the same typical day for daily storage (cyclic
+            # day) and starting from 0 for seasonal storage
+            carried = np.ones((len(STORAGE_TECH), len(HOURS)))
+            carried[seasonal, 0] = 0.0
+            block = ConstraintBlock(intra.shape)
+            block.add_terms(intra)
+            block.add_terms(np.roll(intra, 1, axis=1), -((1.0 - losses)[:, None] * carried)[:, :, None])
+            block.add_terms(Storage_in_idx[pairs_in], -eff_in[pairs_in][:, None, None] * t_op_arr,
+                            block.rows[pairs_in[0]])
+            block.add_terms(Storage_out_idx[pairs_out], t_op_arr / eff_out[pairs_out][:, None, None],
+                            block.rows[pairs_out[0]])
+            constraints['storage_level_intra'] = block.add_to(model, poi.Eq, labels=(STORAGE_TECH, HOURS, TYPICAL_DAYS))
+
+            # Daily storage: Storage_level_intra[j, h, td] == F_t[j, h, td]
+            block = ConstraintBlock((len(daily), len(HOURS), len(TYPICAL_DAYS)))
+            block.add_terms(intra[daily])
+            block.add_terms(f_t_of(STORAGE_DAILY), -1.0)
+            constraints['storage_daily'] = block.add_to(model, poi.Eq, labels=(STORAGE_DAILY, HOURS, TYPICAL_DAYS))
+
+            # Seasonal storage: the level at the start of day d is the level at the start of day d-1
+            # plus the change over its typical day (the first day following the last one)
+            day_loss = (1.0 - losses[seasonal]) ** len(HOURS)
+            previous_day = np.roll(np.arange(inter.shape[1]), 1)
+            block = ConstraintBlock(inter.shape)
+            block.add_terms(inter)
+            block.add_terms(inter[:, previous_day], -day_loss[:, None])
+            block.add_terms(intra[seasonal, -1][:, day_td_pos[previous_day]], -1.0)
+            constraints['storage_level_inter'] = block.add_to(model, poi.Eq,
+                                                              labels=(STORAGE_SEASONAL, registry.sets['DAYS']))
+
+            # Extreme changes within each typical day
+            block = ConstraintBlock((len(seasonal), len(HOURS), len(TYPICAL_DAYS)))
+            block.add_terms(intra[seasonal])
+            block.add_terms(intra_max[:, None, :], -1.0)
+            constraints['storage_intra_max'] = block.add_to(model, poi.Leq, labels=(STORAGE_SEASONAL, HOURS, TYPICAL_DAYS))
+            block = ConstraintBlock((len(seasonal), len(HOURS), len(TYPICAL_DAYS)))
+            block.add_terms(intra[seasonal])
+            block.add_terms(intra_min[:, None, :], -1.0)
+            constraints['storage_intra_min'] = block.add_to(model, poi.Geq, labels=(STORAGE_SEASONAL, HOURS, TYPICAL_DAYS))
+
+            # The level stays between 0 and the capacity within each day [Eq. 2.16]
+            block = ConstraintBlock(inter.shape)
+            block.add_terms(inter)
+            block.add_terms(intra_max[:, day_td_pos])
+            block.add_terms(F_storage_idx[seasonal, None], -1.0)
+            constraints['storage_level_max'] = block.add_to(model, poi.Leq,
+                                                            labels=(STORAGE_SEASONAL, registry.sets['DAYS']))
+            block = ConstraintBlock(inter.shape)
+            block.add_terms(inter, day_loss[:, None])
+            block.add_terms(intra_min[:, day_td_pos])
+            constraints['storage_level_min'] = block.add_to(model, poi.Geq,
+                                                            labels=(STORAGE_SEASONAL, registry.sets['DAYS']))
         
         # Constraint: Storage layer compatibility [Eqs. 2.17-2.18]
         # OPTIMIZATION: No longer needed! We only created variables where eff > 0
         # The constraint is implicitly satisfied by not creating incompatible variables
         
         # Constraint: Energy-to-power ratio [Eq. 2.19]
-        for j in STORAGE_TECH:
-            # Skip EV batteries (they have special constraints in Eq. 2.19-bis)
-            if j in EVs_BATT:
-                continue
-            
-            charge_time = storage_charge_time.get(j, 0)
-            discharge_time = storage_discharge_time.get(j, 0)
-            availability = storage_availability.get(j, 1.0)
-            
-            # Apply constraint per layer (only where variables exist)
-            for l in LAYERS:
-                for h in HOURS:
-                    for td in TYPICAL_DAYS:
-                        # Only add constraint if both variables exist
-                        if (j, l, h, td) in Storage_in and (j, l, h, td) in Storage_out:
-                            model.add_linear_constraint(
-                                Storage_in[j, l, h, td] * charge_time + 
-                                Storage_out[j, l, h, td] * discharge_time <= 
-                                F[j] * availability
-                            )
+        # Storage_in * charge_time + Storage_out * discharge_time <= F * availability, per layer where
+        # both flows exist. EV batteries are skipped (they have special constraints in Eq. 2.19-bis)
+        charge_time = np.array([storage_charge_time.get(j, 0) for j in STORAGE_TECH])
+        discharge_time = np.array([storage_discharge_time.get(j, 0) for j in STORAGE_TECH])
+        availability = np.array([storage_availability.get(j, 1.0) for j in STORAGE_TECH])
+        both_flows = (Storage_in_idx >= 0) & (Storage_out_idx >= 0)
+        not_ev = np.array([j not in EVs_BATT for j in STORAGE_TECH])
+        block = ConstraintBlock(both_flows.shape, mask=both_flows & not_ev[:, None, None, None])
+        block.add_terms(Storage_in_idx, charge_time[:, None, None, None])
+        block.add_terms(Storage_out_idx, discharge_time[:, None, None, None])
+        block.add_terms(F_storage_idx[:, None, None, None], -availability[:, None, None, None])
+        constraints['storage_e2p'] = block.add_to(model, poi.Leq, labels=(STORAGE_TECH, LAYERS, HOURS, TYPICAL_DAYS))
         
         # Constraint: Energy-to-power ratio for EV batteries [Eq. 2.19-bis]
         # This accounts for battery discharge to power the vehicle (F_t) in addition to V2G discharge
+        # AMPL: Storage_in * charge_time + (Storage_out + layers_in_out[i,"ELECTRICITY"]* F_t) * discharge_time 
+        #       <= (F[j] - F_t[i] / vehicle_capacity * batt_per_car) * availability
+        # layers_in_out[i,"ELECTRICITY"] is negative (consumption), so we take absolute value
         if V2G and EVs_BATT_OF_V2G:
-            for i in V2G:
-                if i not in EVs_BATT_OF_V2G:
-                    continue
-                # Get the battery associated with this V2G vehicle
-                batt_list = EVs_BATT_OF_V2G[i]
-                if not batt_list:
-                    continue
-                j = batt_list[0]  # Should be exactly one battery per V2G technology
-                
-                charge_time = storage_charge_time.get(j, 0)
-                discharge_time = storage_discharge_time.get(j, 0)
-                availability = storage_availability.get(j, 1.0)
+            vehicles = [i for i in V2G if EVs_BATT_OF_V2G.get(i)]
+            # Should be exactly one battery per V2G technology
+            batteries = positions([EVs_BATT_OF_V2G[i][0] for i in vehicles], STORAGE_TECH)
+            block = ConstraintBlock(both_flows[batteries].shape, mask=both_flows[batteries])
+            block.add_terms(Storage_in_idx[batteries], charge_time[batteries, None, None, None])
+            block.add_terms(Storage_out_idx[batteries], discharge_time[batteries, None, None, None])
+            block.add_terms(F_storage_idx[batteries, None, None, None], -availability[batteries, None, None, None])
+            # Available battery capacity = Total battery - battery in use by driving vehicles
+            for k, (i, j) in enumerate(zip(vehicles, batteries)):
                 veh_cap = vehicle_capacity.get(i, 1.0)
-                batt_size = batt_per_car.get(i, 0)
-                
-                # AMPL: Storage_in * charge_time + (Storage_out + layers_in_out[i,"ELECTRICITY"]* F_t) * discharge_time 
-                #       <= (F[j] - F_t[i] / vehicle_capacity * batt_per_car) * availability
-                # layers_in_out[i,"ELECTRICITY"] is negative (consumption), so we take absolute value
-                layers_elec_consumption = abs(layers_in_out.get((i, "ELECTRICITY"), 0))
-                
-                for l in LAYERS:
-                    for h in HOURS:
-                        for td in TYPICAL_DAYS:
-                            # Only add constraint if both variables exist
-                            if (j, l, h, td) in Storage_in and (j, l, h, td) in Storage_out:
-                                # Available battery capacity = Total battery - battery in use by driving vehicles
-                                available_batt = F[j] - (F_t[i, h, td] / veh_cap * batt_size if veh_cap > 0 else 0)
-                                
-                                model.add_linear_constraint(
-                                    Storage_in[j, l, h, td] * charge_time + 
-                                    (Storage_out[j, l, h, td] + layers_elec_consumption * F_t[i, h, td]) * discharge_time <= 
-                                    available_batt * availability
-                                )
+                in_use = batt_per_car.get(i, 0) / veh_cap if veh_cap > 0 else 0
+                coefficient = discharge_time[j] * abs(layers_in_out.get((i, "ELECTRICITY"), 0)) + availability[j] * in_use
+                block.add_terms(f_t_of([i])[:, None], coefficient, block.rows[k])
+            constraints['storage_e2p_ev'] = block.add_to(
+                model, poi.Leq, labels=([STORAGE_TECH[j] for j in batteries], LAYERS, HOURS, TYPICAL_DAYS))
     
+    profiler.start('mobility')
     # Constraint: Operating strategy for passenger mobility [Eq. 2.24]
-    if 'MOBILITY_PASSENGER' in TECHNOLOGIES_OF_END_USES_CATEGORY and Shares_mobility_passenger:
-        for j in TECHNOLOGIES_OF_END_USES_CATEGORY['MOBILITY_PASSENGER']:
-            if j in TECH_NOSTORAGE:
-                for h in HOURS:
-                    for td in TYPICAL_DAYS:
-                        t_op_val = t_op.get((h, td), 1.0)
-                        mob_pass_demand = end_uses_input.get("MOBILITY_PASSENGER", 0) * mob_pass_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                        model.add_linear_constraint(F_t[j, h, td] == Shares_mobility_passenger[j] * mob_pass_demand)
-    
+    # F_t[j, h, td] == Shares_mobility_passenger[j] * passenger mobility demand
     # Constraint: Operating strategy for freight mobility [Eq. 2.25]
-    if 'MOBILITY_FREIGHT' in TECHNOLOGIES_OF_END_USES_CATEGORY and Shares_mobility_freight:
-        for j in TECHNOLOGIES_OF_END_USES_CATEGORY['MOBILITY_FREIGHT']:
-            if j in TECH_NOSTORAGE:
-                for h in HOURS:
-                    for td in TYPICAL_DAYS:
-                        t_op_val = t_op.get((h, td), 1.0)
-                        mob_freight_demand = end_uses_input.get("MOBILITY_FREIGHT", 0) * mob_freight_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                        model.add_linear_constraint(F_t[j, h, td] == Shares_mobility_freight[j] * mob_freight_demand)
-    
+    for name, category, shares, demand in (
+        ('mobility_passenger', 'MOBILITY_PASSENGER', Shares_mobility_passenger, mob_pass),
+        ('mobility_freight', 'MOBILITY_FREIGHT', Shares_mobility_freight, mob_freight),
+    ):
+        if category in TECHNOLOGIES_OF_END_USES_CATEGORY and shares:
+            techs = [j for j in TECHNOLOGIES_OF_END_USES_CATEGORY[category] if j in TECH_NOSTORAGE]
+            block = ConstraintBlock((len(techs), len(HOURS), len(TYPICAL_DAYS)))
+            block.add_terms(f_t_of(techs))
+            block.add_terms(np.array([shares[j].index for j in techs], dtype=np.int64)[:, None, None], -demand)
+            constraints[name] = block.add_to(model, poi.Eq, labels=(techs, HOURS, TYPICAL_DAYS))
+    
+    profiler.start('network')
     # Constraint: Extra grid [Eq. 2.21]
     c_grid_extra = data['parameters'].get('c_grid_extra', 0)
     if 'GRID' in ALL_TECH and c_grid_extra > 0:
@@ -556,6 +606,7 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
         )
         model.add_linear_constraint(F['DHN'] == dhn_capacity)
     
+    profiler.start('policy')
     # Constraint: Extra efficiency [Eq. 2.37]
     if 'EFFICIENCY' in ALL_TECH:
         model.add_linear_constraint(F['EFFICIENCY'] == 1 / (1 + i_rate))
@@ -564,7 +615,8 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
     solar_area = data['parameters'].get('solar_area', float('inf'))
     power_density_pv = data['parameters'].get('power_density_pv', 1)
     power_density_solar_thermal = data['parameters'].get('power_density_solar_thermal', 1)
-    if solar_area < float('inf') and power_density_pv > 0:
+    solar_techs = [t for t in ['PV', 'DEC_SOLAR', 'DHN_SOLAR'] if t in F]
+    if solar_area < float('inf') and power_density_pv > 0 and solar_techs:
         pv_area = F.get('PV', 0) / power_density_pv if 'PV' in F else 0
         solar_thermal_area = 0
         if power_density_solar_thermal > 0:
@@ -575,14 +627,17 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
             )
         model.add_linear_constraint(pv_area + solar_thermal_area <= solar_area)
     
+    profiler.start('heating')
     # Constraint: Thermal solar capacity factor [Eq. 2.27]
+    # F_t_solar[j, h, td] <= F_solar[j] * c_p_t['DEC_SOLAR', h, td]
     if F_solar and 'DEC_SOLAR' in ALL_TECH:
-        for j in dec_heat_techs_no_solar:
-            if j in F_solar:
-                for h in HOURS:
-                    for td in TYPICAL_DAYS:
-                        cf_solar = c_p_t.get(('DEC_SOLAR', h, td), 1.0)
-                        model.add_linear_constraint(F_t_solar[j, h, td] <= F_solar[j] * cf_solar)
+        solar_techs = [j for j in dec_heat_techs_no_solar if j in F_solar]
+        F_solar_idx = index_array(F_solar, [solar_techs])
+        F_t_solar_idx = F_t_solar.index[positions(solar_techs, dec_heat_techs_no_solar)]
+        block = ConstraintBlock(F_t_solar_idx.shape)
+        block.add_terms(F_t_solar_idx)
+        block.add_terms(F_solar_idx[:, None, None], -lookup(c_p_t, [['DEC_SOLAR'], HOURS, TYPICAL_DAYS], 1.0))
+        constraints['solar_capacity_factor'] = block.add_to(model, poi.Leq, labels=(solar_techs, HOURS, TYPICAL_DAYS))
     
     # Constraint: Total thermal solar capacity [Eq. 2.28]
     if F_solar and 'DEC_SOLAR' in ALL_TECH:
@@ -590,39 +645,23 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
         model.add_linear_constraint(F['DEC_SOLAR'] == total_solar)
     
     # Constraint: Decentralized heating balance with thermal solar [Eq. 2.29]
+    # Heat balance: tech output + solar output + storage net output = share * demand
+    # F_t[j] + F_t_solar[j] + sum_over_layers(Storage_out - Storage_in) = Shares_lowT_dec[j] * demand
     if TS_OF_DEC_TECH and Shares_lowT_dec:
-        for j in dec_heat_techs_no_solar:
-            if j not in TS_OF_DEC_TECH or j not in Shares_lowT_dec:
-                continue
-            # Get the thermal storage associated with this technology
-            ts_list = TS_OF_DEC_TECH[j]
-            if not ts_list:
-                continue
-            i = ts_list[0]  # Should be exactly one thermal storage per technology
-            
-            for h in HOURS:
-                for td in TYPICAL_DAYS:
-                    t_op_val = t_op.get((h, td), 1.0)
-                    
-                    # Heat demand for decentralized heating
-                    hw = end_uses_input.get("HEAT_LOW_T_HW", 0) / total_time if total_time > 0 else 0
-                    sh = end_uses_input.get("HEAT_LOW_T_SH", 0) * heating_time_series.get((h, td), 0) / t_op_val if t_op_val > 0 else 0
-                    heat_demand = hw + sh
-                    
-                    # Heat balance: tech output + solar output + storage net output = share * demand
-                    # F_t[j] + F_t_solar[j] + sum_over_layers(Storage_out - Storage_in) = Shares_lowT_dec[j] * demand
-                    storage_contribution = 0
-                    for l in LAYERS:
-                        if (i, l, h, td) in Storage_out:
-                            storage_contribution += Storage_out[i, l, h, td]
-                        if (i, l, h, td) in Storage_in:
-                            storage_contribution -= Storage_in[i, l, h, td]
-                    
-                    model.add_linear_constraint(
-                        F_t[j, h, td] + F_t_solar[j, h, td] + storage_contribution == 
-                        Shares_lowT_dec[j] * heat_demand
-                    )
-    
+        # Get the thermal storage associated with each technology (exactly one per technology)
+        dec_techs = [j for j in dec_heat_techs_no_solar
+                     if j in TS_OF_DEC_TECH and j in Shares_lowT_dec and TS_OF_DEC_TECH[j]]
+        thermal_storage = positions([TS_OF_DEC_TECH[j][0] for j in dec_techs], STORAGE_TECH)
+        block = ConstraintBlock((len(dec_techs), len(HOURS), len(TYPICAL_DAYS)))
+        block.add_terms(f_t_of(dec_techs))
+        block.add_terms(F_t_solar.index[positions(dec_techs, dec_heat_techs_no_solar)])
+        block.add_terms(Storage_out_idx[thermal_storage], 1.0, block.rows[:, None])
+        block.add_terms(Storage_in_idx[thermal_storage], -1.0, block.rows[:, None])
+        block.add_terms(np.array([Shares_lowT_dec[j].index for j in dec_techs], dtype=np.int64)[:, None, None],
+                        -heat_low_t)
+        constraints['heat_decen_solar'] = block.add_to(model, poi.Eq, labels=(dec_techs, HOURS, TYPICAL_DAYS))
+    
+    profiler.start('mobility')
     # Constraint: EV storage sizing [Eq. 2.30]
     if V2G and EVs_BATT_OF_V2G and vehicle_capacity and batt_per_car:
         for j in V2G:
@@ -641,83 +680,66 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
                 model.add_linear_constraint(F[i] == F[j] / veh_cap * batt_size)
     
     # Constraint: EV battery supplies vehicle demand (V2G) [Eq. 2.31]
-    if V2G and EVs_BATT_OF_V2G:
-        for j in V2G:
-            if j not in EVs_BATT_OF_V2G:
-                continue
-            batt_list = EVs_BATT_OF_V2G[j]
-            if not batt_list:
-                continue
-            i = batt_list[0]  # Battery for this V2G vehicle
-            
-            # layers_in_out[j, "ELECTRICITY"] is negative (consumption)
-            elec_consumption = abs(layers_in_out.get((j, "ELECTRICITY"), 0))
-            
-            for h in HOURS:
-                for td in TYPICAL_DAYS:
-                    # Storage_out must be at least enough to power the vehicle
-                    # Only add if variable exists
-                    if (i, "ELECTRICITY", h, td) in Storage_out:
-                        model.add_linear_constraint(
-                            Storage_out[i, "ELECTRICITY", h, td] >= elec_consumption * F_t[j, h, td]
-                        )
-    
+    # Storage_out[battery, "ELECTRICITY", h, td] >= |layers_in_out[j, "ELECTRICITY"]| * F_t[j, h, td],
+    # only where the storage output exists
+    if V2G and EVs_BATT_OF_V2G and "ELECTRICITY" in LAYERS:
+        vehicles = [j for j in V2G if EVs_BATT_OF_V2G.get(j)]
+        batteries = positions([EVs_BATT_OF_V2G[j][0] for j in vehicles], STORAGE_TECH)
+        battery_out = Storage_out_idx[batteries, LAYERS.index("ELECTRICITY")]
+        elec_consumption = np.array([abs(layers_in_out.get((j, "ELECTRICITY"), 0)) for j in vehicles])
+        block = ConstraintBlock(battery_out.shape, mask=battery_out >= 0)
+        block.add_terms(battery_out)
+        block.add_terms(f_t_of(vehicles), -elec_consumption[:, None, None])
+        constraints['v2g_supply'] = block.add_to(model, poi.Geq, labels=(vehicles, HOURS, TYPICAL_DAYS))
+    
+    profiler.start('policy')
     # Constraint: fmax_perc and fmin_perc [Eq. 2.36]
-    # These limit technology output as a percentage of total sector output
+    # These limit technology output as a percentage of total sector output:
+    # tech_output <= fmax_perc[j] * total_output and tech_output >= fmin_perc[j] * total_output
     fmax_perc = data['parameters'].get('fmax_perc', pd.Series()).to_dict() if 'fmax_perc' in data['parameters'] else {}
     fmin_perc = data['parameters'].get('fmin_perc', pd.Series()).to_dict() if 'fmin_perc' in data['parameters'] else {}
-    
-    for eut in END_USES_TYPES:
-        if eut in TECHNOLOGIES_OF_END_USES_TYPE:
-            techs_in_type = [t for t in TECHNOLOGIES_OF_END_USES_TYPE[eut] if t in TECH_NOSTORAGE]
-            if not techs_in_type:
-                continue
-            
-            # Total output for this end-use type across all technologies
-            total_output = sum(
-                F_t[j2, h, td] * t_op.get((h, td), 1.0)
-                for j2 in techs_in_type
-                for h in HOURS for td in TYPICAL_DAYS
-            )
-            
-            # Apply constraints for each technology
-            for j in techs_in_type:
-                tech_output = sum(
-                    F_t[j, h, td] * t_op.get((h, td), 1.0)
-                    for h in HOURS for td in TYPICAL_DAYS
-                )
-                
-                # fmax_perc constraint
-                if j in fmax_perc and fmax_perc[j] < 1.0:
-                    model.add_linear_constraint(tech_output <= fmax_perc[j] * total_output)
-                
-                # fmin_perc constraint
-                if j in fmin_perc and fmin_perc[j] > 0.0:
-                    model.add_linear_constraint(tech_output >= fmin_perc[j] * total_output)
 
+    for name, sense, perc, applies in (
+        ('f_max_perc', poi.Leq, fmax_perc, lambda value: value < 1.0),
+        ('f_min_perc', poi.Geq, fmin_perc, lambda value: value > 0.0),
+    ):
+        rows = []  # (technology, technologies of its end-use type)
+        for eut in END_USES_TYPES:
+            techs_in_type = [t for t in TECHNOLOGIES_OF_END_USES_TYPE.get(eut, []) if t in TECH_NOSTORAGE]
+            rows += [(j, techs_in_type) for j in techs_in_type if j in perc and applies(perc[j])]
+        block = ConstraintBlock(len(rows))
+        for k, (j, techs_in_type) in enumerate(rows):
+            block.add_terms(f_t_of([j]), t_op_arr, k)
+            block.add_terms(f_t_of(techs_in_type), -perc[j] * t_op_arr, k)
+        constraints[name] = block.add_to(model, sense, labels=([j for j, _ in rows],))
+
+    profiler.start('costs')
     # 5. Define objective function
-    
-    investment_total = sum(
-        i_rate * (1 + i_rate)**lifetime[j] / ((1 + i_rate)**lifetime[j] - 1) * c_inv[j] * F[j] 
+    # TotalCost == investment (annualised) + maintenance + operating costs of resources
+    annuity = {
+        j: i_rate * (1 + i_rate)**lifetime[j] / ((1 + i_rate)**lifetime[j] - 1)
         for j in ALL_TECH if j in c_inv and j in lifetime
-    )
-    maintenance_total = sum(c_maint.get(j, 0) * F[j] for j in ALL_TECH)
-    operating_total = sum(
-        c_op.get(i, 0) * sum(F_t[i, h, td] * t_op.get((h,td), 1.0) for h in HOURS for td in TYPICAL_DAYS) 
-        for i in RESOURCES if i in c_op
-    )
-    model.add_linear_constraint(TotalCost == investment_total + maintenance_total + operating_total)
+    }
+    invested = [k for k, j in enumerate(ALL_TECH) if j in annuity]
+    costly_resources = [i for i in RESOURCES if i in c_op]
+    block = ConstraintBlock(1)
+    block.add_terms(TotalCost.index, 1.0)
+    block.add_terms(F_idx[invested], [-annuity[ALL_TECH[k]] * c_inv[ALL_TECH[k]] for k in invested], 0)
+    block.add_terms(F_idx, [-c_maint.get(j, 0) for j in ALL_TECH], 0)
+    block.add_terms(f_t_of(costly_resources), -np.array([c_op[i] for i in costly_resources])[:, None, None] * t_op_arr, 0)
+    constraints['total_cost'] = block.add_to(model, poi.Eq, labels=(['TotalCost'],))
 
+    profiler.start('gwp')
     # GWP calculation - ONLY operational emissions from resources (construction emissions commented out in AMPL)
     # gwp_constr_total = sum(gwp_constr_param.get(j, 0) * F[j] for j in ALL_TECH)  # NOT USED
-    gwp_op_total = sum(
-        gwp_op_param.get(i, 0) * sum(F_t[i, h, td] * t_op.get((h,td), 1.0) for h in HOURS for td in TYPICAL_DAYS) 
-        for i in RESOURCES if i in gwp_op_param
-    )
     # TotalGWP = operational emissions only (as per AMPL line 214)
-    model.add_linear_constraint(TotalGWP == gwp_op_total)
-    if gwp_limit_param < float('inf'):
-        model.add_linear_constraint(TotalGWP <= gwp_limit_param)
+    emitting_resources = [i for i in RESOURCES if i in gwp_op_param]
+    block = ConstraintBlock(1)
+    block.add_terms(TotalGWP.index, 1.0)
+    block.add_terms(f_t_of(emitting_resources),
+                    -np.array([gwp_op_param[i] for i in emitting_resources])[:, None, None] * t_op_arr, 0)
+    constraints['total_gwp'] = block.add_to(model, poi.Eq, labels=(['TotalGWP'],))
+    profiler.stop()
     
     model.set_objective(TotalCost, poi.ObjectiveSense.Minimize)
     
@@ -731,9 +753,44 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
             print(f"  ✓ Model built successfully")
         
         # Get model statistics
-        n_vars = len(F) + len(F_t) + len(Storage_in) + len(Storage_out) + len(Storage_level) + len(End_uses) + len(Network_losses) + len(Shares_mobility_passenger) + len(Shares_mobility_freight) + len(Shares_lowT_dec) + len(F_solar) + len(F_t_solar) + 7
+        n_vars = len(F) + len(F_t) + len(Storage_in) + len(Storage_out) + sum(len(v) for v in storage_levels.values()) + len(End_uses) + len(Network_losses) + len(Shares_mobility_passenger) + len(Shares_mobility_freight) + len(Shares_lowT_dec) + len(F_solar) + len(F_t_solar) + 7
         print(f"    Variables: ~{n_vars:,}")
-        print(f"    F: {len(F):,}, F_t: {len(F_t):,}, Storage vars: {len(Storage_in) + len(Storage_out) + len(Storage_level):,}")
+        print(f"    F: {len(F):,}, F_t: {len(F_t):,}, Storage vars: {len(Storage_in) + len(Storage_out) + sum(len(v) for v in storage_levels.values()):,}")
+        if profiler.enabled:
+            print("\n  BUILD PROFILE (by constraint group):")
+            print(profiler.table().to_string(float_format=lambda value: f"{value:.3f}"))
+
+    variables = {
+        'F': F,
+        'F_t': F_t,
+        'Storage_in': Storage_in,
+        'Storage_out': Storage_out,
+        **storage_levels,
+        'End_uses': End_uses,
+        'Network_losses': Network_losses,
+        'Resources_use': Resources_use,
+        'Share_mobility_public': Share_mobility_public,
+        'Share_freight_train': Share_freight_train,
+        'Share_freight_road': Share_freight_road,
+        'Share_freight_boat': Share_freight_boat,
+        'Share_heat_dhn': Share_heat_dhn,
+        'Shares_mobility_passenger': Shares_mobility_passenger,
+        'Shares_mobility_freight': Shares_mobility_freight,
+        'Shares_lowT_dec': Shares_lowT_dec,
+        'F_solar': F_solar,
+        'F_t_solar': F_t_solar,
+        'TotalCost': TotalCost,
+        'TotalGWP': TotalGWP
+    }
+
+    if not solve:
+        result = {'model': model, 'variables': variables, 'registry': registry, 'constraints': constraints,
+                  'status': None}
+        if timing:
+            result['timing'] = {'build': t_build}
+        if profiler.enabled:
+            result['profile'] = profiler.table()
+        return result
 
     # Solve the model
     if verbose:
@@ -767,22 +824,9 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
     
     result = {
         'model': model,
-        'variables': {
-            'F': F,
-            'F_t': F_t,
-            'Storage_in': Storage_in,
-            'Storage_out': Storage_out,
-            'Storage_level': Storage_level,
-            'End_uses': End_uses,
-            'Network_losses': Network_losses,
-            'Share_mobility_public': Share_mobility_public,
-            'Share_freight_train': Share_freight_train,
-            'Share_freight_road': Share_freight_road,
-            'Share_freight_boat': Share_freight_boat,
-            'Share_heat_dhn': Share_heat_dhn,
-            'TotalCost': TotalCost,
-            'TotalGWP': TotalGWP
-        },
+        'variables': variables,
+        'registry': registry,
+        'constraints': constraints,
         'status': term_status
     }
     
@@ -792,6 +836,8 @@ def build_full_model(data, solver='gurobi', verbose=True, enable_output=True, ti
             'solve': t_solve,
             'total': t_total
         }
+    if profiler.enabled:
+        result['profile'] = profiler.table()
     
     if verbose:
         print("\n" + "="*70)
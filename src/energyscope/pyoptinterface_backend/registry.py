@@ -0,0 +1,228 @@
+"""
+Integer-coded, array-backed variable registry for the PyOptInterface backend.
+
+Every set is coded as integers (position of each label in the set) and each
+variable family (F_t, Storage_in, ...) is stored as a dense NumPy array of
+variable indices over the product of its sets, -1 marking combinations
+without a variable. Variables are created without names: names are produced
+on demand for debugging and LP export. Solution values of all families are
+read with a single gather over the model's variables.
+
+PyOptInterface (0.6) has no public call reading many values at once, so the
+gather still calls ``get_value`` once per variable (about 0.4 µs each, 20 ms
+for 50k variables). What it saves is the dictionary lookup and key handling
+per variable.
+"""
+
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyoptinterface as poi
+
+
+class VariableArray:
+    """
+    Variables of one family over the product of some sets.
+
+    Supports dictionary-style access by labels (``F_t['PV', 1, 1]``), so that it can be
+    used where a dictionary of variables keyed by tuples was expected.
+
+    Attributes:
+        name: Name of the family (prefix of the variable names)
+        sets: Names of the sets indexing the family
+        labels: Labels of each set (pd.Index)
+        index: int64 array of variable indices, -1 where no variable exists
+    """
+
+    def __init__(self, name: str, sets: Tuple[str, ...], labels: Tuple[pd.Index, ...], index: np.ndarray):
+        self.name = name
+        self.sets = sets
+        self.labels = labels
+        self.index = index
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.index.shape
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Combinations with a variable."""
+        return self.index >= 0
+
+    def __repr__(self) -> str:
+        return f"VariableArray({self.name!r}, sets={self.sets}, variables={len(self)})"
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.mask))
+
+    def codes(self, key) -> Tuple[int, ...]:
+        """
+        Integer codes of a key.
+
+        Raises:
+            KeyError: If a label is not in its set
+        """
+        key = key if isinstance(key, tuple) else (key,)
+        if len(key) != len(self.sets):
+            raise KeyError(key)
+        return tuple(labels.get_loc(label) for labels, label in zip(self.labels, key))
+
+    def __getitem__(self, key) -> poi.VariableIndex:
+        index = self.index[self.codes(key)]
+        if index < 0:
+            raise KeyError(key)
+        return poi.VariableIndex(int(index))
+
+    def __contains__(self, key) -> bool:
+        try:
+            return self.index[self.codes(key)] >= 0
+        except KeyError:
+            return False
+
+    def __iter__(self) -> Iterator[tuple]:
+        return self.keys()
+
+    def keys(self) -> Iterator[tuple]:
+        """Labels of the existing variables, in index order."""
+        for codes in zip(*np.nonzero(self.mask)):
+            key = tuple(labels[c] for labels, c in zip(self.labels, codes))
+            yield key if len(key) > 1 else key[0]
+
+    def values(self) -> Iterator[poi.VariableIndex]:
+        """Existing variables."""
+        return (poi.VariableIndex(i) for i in self.index[self.mask].tolist())
+
+    def items(self) -> Iterator[tuple]:
+        return zip(self.keys(), self.values())
+
+    def names(self) -> np.ndarray:
+        """Names of the existing variables (e.g. ``F_t_PV_1_1``), built on demand."""
+        parts = [np.asarray(labels.astype(str))[codes] for labels, codes in zip(self.labels, np.nonzero(self.mask))]
+        names = np.full(len(self), self.name, dtype=object)
+        for part in parts:
+            names = names + '_' + part.astype(object)
+        return names
+
+    def multi_index(self) -> pd.MultiIndex:
+        """Labels of the existing variables."""
+        codes = np.nonzero(self.mask)
+        return pd.MultiIndex(levels=list(self.labels), codes=list(codes), names=list(self.sets))
+
+
+class VariableRegistry:
+    """
+    Integer codes of the sets and array-backed variable families of a model.
+
+    Example:
+        >>> registry = VariableRegistry(model, {'ENTITIES': ENTITIES, 'HOURS': HOURS, 'TYPICAL_DAYS': TYPICAL_DAYS})
+        >>> F_t = registry.add('F_t', ('ENTITIES', 'HOURS', 'TYPICAL_DAYS'), lb=0)
+        >>> F_t.index[0, :, :]                     # indices of F_t['PV', h, td] if ENTITIES[0] == 'PV'
+        >>> model.optimize()
+        >>> registry.to_series('F_t')             # solution, indexed by (ENTITIES, HOURS, TYPICAL_DAYS)
+    """
+
+    def __init__(self, model, sets: Dict[str, Sequence]):
+        """
+        Args:
+            model: PyOptInterface model
+            sets: Labels of each set, by set name (without duplicates)
+        """
+        self.model = model
+        self.sets = {name: pd.Index(labels, name=name) for name, labels in sets.items()}
+        self.arrays: Dict[str, VariableArray] = {}
+
+    def __repr__(self) -> str:
+        return f"VariableRegistry({list(self.arrays)})"
+
+    def __getitem__(self, name: str) -> VariableArray:
+        return self.arrays[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+    def add(self, name: str, sets: Sequence[str], mask: Optional[np.ndarray] = None,
+            lb=0.0, ub=float('inf')) -> VariableArray:
+        """
+        Create a family of unnamed variables.
+
+        Args:
+            name: Name of the family
+            sets: Names of the indexing sets
+            mask: Combinations for which a variable is created, broadcastable to the
+                product of the sets (default: all)
+            lb: Lower bounds of the variables, broadcastable to the product of the sets
+            ub: Upper bounds of the variables, broadcastable to the product of the sets
+
+        Returns:
+            VariableArray: The new family
+        """
+        labels = tuple(self.sets[s] for s in sets)
+        shape = tuple(len(l) for l in labels)
+        mask = np.ones(shape, dtype=bool) if mask is None else np.broadcast_to(mask, shape)
+        index = np.full(shape, -1, dtype=np.int64)
+        add_variable = self.model.add_variable
+        if np.ndim(lb) == 0 and np.ndim(ub) == 0:
+            index[mask] = [add_variable(lb=lb, ub=ub).index for _ in range(int(np.count_nonzero(mask)))]
+        else:
+            lbs = np.broadcast_to(np.asarray(lb, dtype=float), shape)[mask].tolist()
+            ubs = np.broadcast_to(np.asarray(ub, dtype=float), shape)[mask].tolist()
+            index[mask] = [add_variable(lb=l, ub=u).index for l, u in zip(lbs, ubs)]
+        self.arrays[name] = VariableArray(name, tuple(sets), labels, index)
+        return self.arrays[name]
+
+    def name_of(self, index: int) -> str:
+        """Name of the registered variable with the given index."""
+        for array in self.arrays.values():
+            codes = np.argwhere(array.index == index)
+            if len(codes):
+                return '_'.join([array.name] + [str(labels[c]) for labels, c in zip(array.labels, codes[0])])
+        raise KeyError(index)
+
+    def set_names(self):
+        """Give the registered variables their names in the model (for LP export or debugging)."""
+        set_variable_name = self.model.set_variable_name
+        for array in self.arrays.values():
+            for variable, name in zip(array.values(), array.names()):
+                set_variable_name(variable, name)
+
+    def write(self, filename: str):
+        """Write the model (e.g. as .lp or .mps), with named variables."""
+        self.set_names()
+        self.model.write(filename)
+
+    def solution(self, reduced_costs: bool = False) -> np.ndarray:
+        """
+        Values of the registered variables, gathered once from the solved model.
+
+        Args:
+            reduced_costs: Whether to gather the reduced costs instead of the values
+
+        Returns:
+            np.ndarray: Values indexed by variable index (NaN for variables not registered)
+        """
+        indices = np.concatenate([a.index[a.mask] for a in self.arrays.values()]) if self.arrays else np.empty(0, int)
+        values = np.full(int(indices.max()) + 1 if len(indices) else 0, np.nan)
+        get = self.model.get_variable_dual if reduced_costs else self.model.get_value
+        values[indices] = [get(poi.VariableIndex(i)) for i in indices.tolist()]
+        return values
+
+    def values(self, name: str, solution: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Solution values of a family as a dense array (NaN where no variable exists).
+
+        Args:
+            name: Name of the family
+            solution: Result of :meth:`solution`, to reuse across families (default: gathered now)
+        """
+        array = self.arrays[name]
+        solution = self.solution() if solution is None else solution
+        values = np.full(array.shape, np.nan)
+        values[array.mask] = solution[array.index[array.mask]]
+        return values
+
+    def to_series(self, name: str, solution: Optional[np.ndarray] = None) -> pd.Series:
+        """Solution values of the existing variables of a family, indexed by their labels."""
+        array = self.arrays[name]
+        solution = self.solution() if solution is None else solution
+        return pd.Series(solution[array.index[array.mask]], index=array.multi_index(), name=name)
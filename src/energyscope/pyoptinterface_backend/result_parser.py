@@ -0,0 +1,157 @@
+"""
+Result parser for PyOptInterface models.
+
+Converts the solution of :func:`build_full_model` into EnergyScope Result format
+for compatibility with existing analysis and plotting tools. Values are read with
+one gather over the registered variables (see registry.VariableRegistry.solution)
+instead of a Python loop per variable dictionary.
+"""
+
+import numpy as np
+import pandas as pd
+import pyoptinterface as poi
+
+from energyscope.result import Result
+from .assembly import lookup
+
+
+def _frame(name: str, labels, values: np.ndarray) -> pd.DataFrame:
+    """
+    DataFrame of `values` over the product of `labels`, in AMPL format.
+
+    Args:
+        name: Name of the value column
+        labels: Labels of each axis
+        values: Dense array over the product of the labels
+
+    Returns:
+        pd.DataFrame: One column `name`, indexed by index0..indexN
+    """
+    names = [f'index{i}' for i in range(len(labels))]
+    if len(labels) == 1:
+        index = pd.Index(list(labels[0]), name=names[0])
+    else:
+        index = pd.MultiIndex.from_product([list(l) for l in labels], names=names)
+    return pd.DataFrame({name: values.ravel()}, index=index)
+
+
+def _scalar_frame(name: str, value: float) -> pd.DataFrame:
+    return pd.DataFrame({name: [value]})
+
+
+def _parameter_frame(name: str, value) -> pd.DataFrame:
+    """Input parameter in AMPL format (Series indexed by index0..indexN, or one-row frame for scalars)."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        value = pd.Series(value, dtype=object if not value else None)
+    if isinstance(value, pd.Series):
+        df = value.rename(name).to_frame()
+        df.index.names = [f'index{i}' for i in range(df.index.nlevels)]
+        return df
+    return _scalar_frame(name, value)
+
+
+def _set_frame(name: str, value):
+    """Set in AMPL format (DataFrame with a column named after the set); indexed sets stay dictionaries."""
+    if isinstance(value, dict):
+        return value
+    return pd.DataFrame({name: list(value)})
+
+
+def parse_pyoptinterface_result(result: dict, data: dict, id_run=None, duals: bool = False,
+                                reduced_costs: bool = False) -> Result:
+    """
+    Convert the solution of a PyOptInterface full model to EnergyScope Result format.
+
+    Registered families (F_t, Storage_in, ...) are given over the full product of
+    their sets, with 0 for combinations without a variable (e.g. storage flows on
+    incompatible layers). The cost and emission breakdowns of the core model
+    (C_inv, C_maint, C_op, GWP_constr, GWP_op) are computed from the solution.
+
+    Args:
+        result: Output of build_full_model (solved)
+        data: Dataset used to build the model (dict with 'sets' and 'parameters')
+        id_run: Optional run ID for multi-run scenarios
+        duals: Whether to read the duals of the constraint families into `constraints`
+        reduced_costs: Whether to add the reduced costs of the variables, as a
+            '<name>.rc' column
+
+    Returns:
+        Result instance compatible with EnergyScope analysis tools
+
+    Raises:
+        ValueError: If the model was not solved to optimality
+    """
+    model = result['model']
+    if result['status'] != poi.TerminationStatusCode.OPTIMAL:
+        raise ValueError(f"Model has no optimal solution (status: {result['status']})")
+    registry = result['registry']
+
+    # Registered families, read with a single gather
+    solution = registry.solution()
+    rc_solution = registry.solution(reduced_costs=True) if reduced_costs else None
+    variables = {}
+    dense = {}
+    for name, array in registry.arrays.items():
+        dense[name] = values = np.nan_to_num(registry.values(name, solution))
+        df = _frame(name, array.labels, values)
+        if reduced_costs:
+            df[f'{name}.rc'] = np.nan_to_num(registry.values(name, rc_solution)).ravel()
+        variables[name] = df
+
+    # Remaining variables: scalars and small dictionaries keyed by technology
+    for name, var in result['variables'].items():
+        if name in variables:
+            continue
+        handles = list(var.values()) if isinstance(var, dict) else [var]
+        if isinstance(var, dict):
+            df = pd.DataFrame({name: [model.get_value(v) for v in handles]},
+                              index=pd.Index(list(var), name='index0'))
+        else:
+            df = _scalar_frame(name, model.get_value(handles[0]))
+        if reduced_costs:
+            df[f'{name}.rc'] = [model.get_variable_dual(v) for v in handles]
+        variables[name] = df
+
+    # Cost and emission breakdowns [Eqs. 2.3-2.7]
+    parameters_in = data['parameters']
+    F = variables['F']['F']
+    F_t = registry['F_t']
+    t_op = lookup(parameters_in.get('t_op', {}), F_t.labels[1:], 1.0)
+    annual = pd.Series((dense['F_t'] * t_op).sum(axis=(1, 2)), index=F_t.labels[0])
+    annual_resources = annual.reindex(pd.Index(data['sets']['RESOURCES'], name='index0'), fill_value=0.0)
+
+    def per_unit(param, index):
+        return pd.Series(parameters_in.get(param, {}), dtype=float).reindex(index, fill_value=0.0)
+
+    for name, param, base in (
+        ('C_inv', 'c_inv', F), ('C_maint', 'c_maint', F), ('GWP_constr', 'gwp_constr', F),
+        ('C_op', 'c_op', annual_resources), ('GWP_op', 'gwp_op', annual_resources),
+    ):
+        variables[name] = (per_unit(param, base.index) * base).rename(name).to_frame()
+
+    objectives = {'TotalCost': _scalar_frame('TotalCost', model.get_model_attribute(poi.ModelAttribute.ObjectiveValue))}
+
+    constraints = {}
+    if duals:
+        for name, array in result['constraints'].items():
+            constraints[name] = _frame(name, array.labels, array.values(model.get_constraint_dual)).dropna()
+
+    parameters = {name: _parameter_frame(name, value) for name, value in parameters_in.items()}
+    sets = {name: _set_frame(name, value) for name, value in data['sets'].items()}
+
+    # Add Run column if id_run is specified
+    if id_run is not None:
+        for group in (objectives, variables, parameters, constraints):
+            for df in group.values():
+                df['Run'] = id_run
+
+    return Result(
+        constraints=constraints,
+        objectives=objectives,
+        variables=variables,
+        parameters=parameters,
+        sets=sets,
+        build_profile=result.get('profile')
+    )
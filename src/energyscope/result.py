@@ -1,8 +1,206 @@
+import functools
+import json
+import shutil
+from collections.abc import MutableMapping
 from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
 import numpy as np
 import pandas as pd
 
 
+class LazyFrames(MutableMapping):
+    """
+    Dictionary of DataFrames whose values are only computed when first accessed.
+
+    Each lazy entry is given as a function without arguments returning the DataFrame.
+    """
+    _PENDING = object()
+
+    def __init__(self, loaders: dict[str, Callable[[], pd.DataFrame]] = None):
+        self._frames = {}
+        self._loaders = {}
+        for name, loader in (loaders or {}).items():
+            self._frames[name] = self._PENDING
+            self._loaders[name] = loader
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        frame = self._frames[name]
+        if frame is self._PENDING:
+            frame = self._frames[name] = self._loaders.pop(name)()
+        return frame
+
+    def __setitem__(self, name: str, frame: pd.DataFrame) -> None:
+        self._loaders.pop(name, None)
+        self._frames[name] = frame
+
+    def __delitem__(self, name: str) -> None:
+        self._loaders.pop(name, None)
+        del self._frames[name]
+
+    def __iter__(self):
+        return iter(self._frames)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def __repr__(self) -> str:
+        return f"LazyFrames({list(self._frames)}, pending={list(self._loaders)})"
+
+    def materialize(self) -> 'LazyFrames':
+        """
+        Loads all pending entries.
+        """
+        for name in list(self._loaders):
+            self[name]
+        return self
+
+
+class RunParameters(MutableMapping):
+    """
+    Parameters of a sequence of runs, stored without repeating what does not change.
+
+    Parameters whose values are the same in every run are stored once (`invariant`, without 'Run'
+    column). For the others, the first run is stored in full (`base`) and the other runs only as
+    the rows that differ from it (`deltas`, with a 'Run' column). Indexing returns the usual
+    Run-tagged DataFrame, rebuilt on demand.
+    """
+
+    def __init__(self, invariant: dict[str, pd.DataFrame], base: dict[str, pd.DataFrame],
+                 deltas: dict[str, pd.DataFrame], runs: list):
+        self.invariant = invariant
+        self.base = base
+        self.deltas = deltas
+        self.runs = runs
+        self._extra = {}
+
+    @classmethod
+    def from_first_run(cls, parameters: dict[str, pd.DataFrame], run, varying: set = ()) -> 'RunParameters':
+        """
+        Starts the deduplicated parameters of a sequence from its first run (complete).
+
+        Every parameter is invariant until a later run changes it (see `add_run`), except those
+        named in `varying`, which are stored per run even if their values do not change.
+        """
+        invariant, base, deltas = {}, {}, {}
+        for name in parameters:
+            frame = parameters[name].drop(columns='Run', errors='ignore')
+            if name in varying:
+                base[name] = frame
+                deltas[name] = frame.iloc[:0].assign(Run=run)
+            else:
+                invariant[name] = frame
+        return cls(invariant, base, deltas, [run])
+
+    def add_run(self, parameters: dict[str, pd.DataFrame], run) -> None:
+        """
+        Adds a later run, keeping only the rows of its parameters that differ from the first run.
+
+        Each parameter is compared with the first run, so that parameters computed by the model
+        from varied ones (e.g. `tau` from `i_rate`) are kept per run. A parameter missing from the
+        run is taken as unchanged, and one missing from the first run is ignored.
+        """
+        self.runs.append(run)
+        for name in parameters:
+            if name in self.invariant:
+                reference = self.invariant[name]
+            elif name in self.base:
+                reference = self.base[name]
+            else:
+                continue
+            current = parameters[name].drop(columns='Run', errors='ignore')
+            changed = _changed_rows(current, reference)
+            if not changed.any():
+                continue
+            if name in self.invariant:
+                self.base[name] = self.invariant.pop(name)
+                self.deltas[name] = reference.iloc[:0].assign(Run=run)
+            self.deltas[name] = pd.concat([self.deltas[name], current[changed].assign(Run=run)])
+
+    @classmethod
+    def from_results(cls, results: list['Result'], varying: set = ()) -> 'RunParameters':
+        """
+        Builds the deduplicated parameters of `results` (one per run, first run complete).
+
+        See `from_first_run` and `add_run`.
+        """
+        runs = [_run_id(result, k + 1) for k, result in enumerate(results)]
+        parameters = cls.from_first_run(results[0].parameters, runs[0], varying)
+        for run, result in zip(runs[1:], results[1:]):
+            parameters.add_run(result.parameters, run)
+        return parameters
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        if name in self._extra:
+            return self._extra[name]
+        if name in self.invariant:
+            frame = self.invariant[name]
+            return pd.concat([frame.assign(Run=run) for run in self.runs])
+        base, delta = self.base[name], self.deltas[name]
+        frames = []
+        for run in self.runs:
+            frame = base.copy()
+            changes = delta.loc[delta['Run'] == run].drop(columns='Run')
+            if not changes.empty:
+                # Explicit assignment: DataFrame.update would skip the values that became NaN
+                common = changes.index.intersection(frame.index)
+                columns = changes.columns.intersection(frame.columns)
+                frame.loc[common, columns] = changes.loc[common, columns]
+                extra = changes.index.difference(frame.index)
+                if len(extra):
+                    frame = pd.concat([frame, changes.loc[extra]])
+            frames.append(frame.assign(Run=run))
+        return pd.concat(frames)
+
+    def __setitem__(self, name: str, frame: pd.DataFrame) -> None:
+        if name in self:
+            del self[name]
+        self._extra[name] = frame
+
+    def __delitem__(self, name: str) -> None:
+        if name not in self:
+            raise KeyError(name)
+        for store in (self._extra, self.invariant, self.base, self.deltas):
+            store.pop(name, None)
+
+    def __iter__(self):
+        yield from self.invariant
+        yield from self.base
+        yield from self._extra
+
+    def __len__(self) -> int:
+        return len(self.invariant) + len(self.base) + len(self._extra)
+
+    def __contains__(self, name) -> bool:
+        return name in self.invariant or name in self.base or name in self._extra
+
+    def __repr__(self) -> str:
+        return (f"RunParameters(runs={len(self.runs)}, invariant={len(self.invariant)}, "
+                f"varying={list(self.base)})")
+
+
+def _changed_rows(current: pd.DataFrame, base: pd.DataFrame) -> pd.Series:
+    """
+    Flags the rows of `current` that are new or differ from `base` (NaN equal to NaN).
+    """
+    reference = base.reindex(index=current.index, columns=current.columns)
+    same = current.eq(reference) | (current.isna() & reference.isna())
+    return ~same.all(axis=1) | ~current.index.isin(base.index)
+
+
+def _run_id(result: 'Result', default):
+    """
+    Returns the 'Run' value of a single-run result, or `default` if it has none.
+    """
+    for entities in (result.objectives, result.variables, result.parameters):
+        for name in entities:
+            frame = entities[name]
+            if 'Run' in frame.columns and len(frame):
+                return frame['Run'].iloc[0]
+    return default
+
+
 @dataclass
 class Result:
     constraints: dict[str, pd.DataFrame] = field(default_factory=dict)
@@ -11,6 +209,9 @@ class Result:
     sets: dict[str, pd.DataFrame] = field(default_factory=dict)
     variables: dict[str, pd.DataFrame] = field(default_factory=dict)
     postprocessing: dict[str, pd.DataFrame] = field(default_factory=dict)
+    build_profile: pd.DataFrame = None  # Per constraint group build profile (see energyscope.profiling)
+    # Cache of plots.generate_sankey_flows, reset by `postprocessing`
+    sankey_flows: dict = field(default_factory=dict, init=False, repr=False, compare=False)
 
     def __add__(self, other: 'Result') -> 'Result':
         def __concat(current: dict[str, pd.DataFrame], other: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
@@ -31,8 +232,319 @@ class Result:
 
                       )
 
+    @functools.cached_property
+    def technology_categories(self) -> dict[str, dict]:
+        """
+        Maps from technology to end-use type ('Category') and to sector ('Category_2').
+
+        Built once from the sets, the first time they are needed (e.g. by `postprocessing`). When a
+        technology belongs to several end-use types, the first one is kept.
+        """
+        sectors = {sector: list(techs) for sector, techs in _SECTOR_TECHNOLOGIES.items()}
+        for tech in self.sets['TECHNOLOGIES']['TECHNOLOGIES']:
+            if any(keyword in tech.upper() for keyword in _MOBILITY_KEYWORDS):
+                sectors['Mobility'].append(tech)
+        sectors['Resources'] = self.sets['RESOURCES']['RESOURCES'].tolist()
+
+        categories = {}
+        for end_use_type, techs in self.sets['TECHNOLOGIES_OF_END_USES_TYPE'].items():
+            for tech in techs:
+                categories.setdefault(tech, end_use_type)
+        return {'Category': categories,
+                'Category_2': {tech: sector for sector, techs in sectors.items() for tech in techs}}
+
+    def materialize(self) -> 'Result':
+        """
+        Loads all the entities that were parsed lazily (see `parse_result(lazy=True)`).
+
+        Must be called before the AMPL instance the results come from is modified or re-solved.
+        """
+        for entities in (self.constraints, self.parameters, self.objectives, self.variables, self.postprocessing):
+            if isinstance(entities, LazyFrames):
+                entities.materialize()
+        return self
+
+    @classmethod
+    def concat(cls, results: list['Result'], varying_parameters=None) -> 'Result':
+        """
+        Concatenates the results of several runs in a single pass.
+
+        Each entity is concatenated once over all the results in which it appears (in order),
+        instead of re-copying the accumulated frames at every step as repeated `+` would.
+        Sets do not depend on the run: the first occurrence of each set is kept.
+
+        Parameters:
+        ----------
+        results : list[Result]
+            The results to concatenate, typically one per run.
+
+        varying_parameters : Iterable[str], optional
+            If given (possibly empty), the parameters are stored in a `RunParameters`: those whose
+            values are the same in every result are kept once (from the first result, which must
+            be complete) and the others as per-run differences to the first run. The named
+            parameters are always stored per run.
+
+        Returns:
+        -------
+        Result : object
+            A new Result object containing all runs.
+        """
+        def __collect(name: str) -> dict[str, pd.DataFrame]:
+            frames = {}
+            for result in results:
+                for key, frame in getattr(result, name).items():
+                    frames.setdefault(key, []).append(frame)
+            return {key: pd.concat(parts) if len(parts) > 1 else parts[0] for key, parts in frames.items()}
+
+        sets = {}
+        for result in results:
+            for key, value in result.sets.items():
+                sets.setdefault(key, value)
+
+        if varying_parameters is None:
+            parameters = __collect('parameters')
+        else:
+            parameters = RunParameters.from_results(results, set(varying_parameters))
+
+        return cls(constraints=__collect('constraints'), parameters=parameters,
+                   objectives=__collect('objectives'), sets=sets, variables=__collect('variables'),
+                   postprocessing=__collect('postprocessing'))
+
+    def to_parquet(self, path) -> None:
+        """
+        Writes the result to a directory, as one Parquet dataset per entity.
+
+        Each objective, variable, parameter, constraint and postprocessing DataFrame is stored in
+        `<path>/<field>/<name>/`, partitioned by 'Run' (one sub-directory per run) when it has a
+        'Run' column. Index columns are stored dictionary-encoded (categorical). Sets and the
+        layout of the archive are kept in `<path>/result.json`. Deduplicated parameters
+        (`RunParameters`) are written as such, without expanding them to every run.
+
+        Parameters:
+        ----------
+        path : str or Path
+            The target directory. Existing entities in it are replaced.
+
+        Example:
+        -------
+        >>> results.to_parquet('results/sweep')
+        >>> results = Result.open('results/sweep', runs=[3])
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        manifest = {'format': _ARCHIVE_FORMAT, 'sets': _sets_to_json(self.sets), 'fields': {}}
+        for field_name in _RESULT_FIELDS:
+            entities = getattr(self, field_name)
+            entries = manifest['fields'][field_name] = {}
+            if isinstance(entities, RunParameters):
+                manifest['runs'] = [_to_json(run) for run in entities.runs]
+                stores = {'invariant': entities.invariant, 'base': entities.base, 'delta': entities.deltas,
+                          'frame': entities._extra}
+                for kind, store in stores.items():
+                    for name in store:
+                        target = Path(field_name, kind, name)
+                        entries.setdefault(name, {})[kind] = _write_entity(store[name], path / target, target)
+                continue
+            for name in entities:
+                target = Path(field_name, name)
+                entries[name] = {'frame': _write_entity(entities[name], path / target, target)}
+
+        with open(path / "result.json", 'w') as f:
+            json.dump(manifest, f, default=_to_json)
+
+    @classmethod
+    def open(cls, path, runs=None, filters=None) -> 'Result':
+        """
+        Opens a result written by `Result.to_parquet`.
+
+        Entities are only read when first accessed (see `LazyFrames`), with memory mapping. Run
+        selection and `filters` are pushed down to the Parquet reader: only the partitions of the
+        selected runs are read and, within them, only the matching row groups.
+
+        Parameters:
+        ----------
+        path : str or Path
+            The directory written by `to_parquet`.
+
+        runs : Iterable, optional
+            Runs to read. Defaults to all of them.
+
+        filters : dict, optional
+            Mapping from index column name (e.g. 'index0') to the accepted values. Each filter
+            applies to the entities that have this column, the others are read unfiltered.
+
+        Returns:
+        -------
+        Result : object
+            The stored results, restricted to the selection.
+
+        Example:
+        -------
+        >>> results = Result.open('results/sweep', runs=[1, 2], filters={'index0': ['PV_LV', 'WIND_ONSHORE']})
+        >>> results.variables['F']
+        """
+        path = Path(path)
+        with open(path / "result.json") as f:
+            manifest = json.load(f)
+        runs = None if runs is None else [_to_json(run) for run in runs]
+        filters = {} if filters is None else {column: list(values) for column, values in filters.items()}
+
+        def __loaders(entries: dict, kind: str) -> LazyFrames:
+            return LazyFrames({name: functools.partial(_read_entity, path, entry[kind], runs, filters)
+                               for name, entry in entries.items() if kind in entry})
+
+        fields = {}
+        for field_name in _RESULT_FIELDS:
+            entries = manifest['fields'].get(field_name, {})
+            if field_name == 'parameters' and 'runs' in manifest:
+                kept = manifest['runs'] if runs is None else [run for run in manifest['runs'] if run in runs]
+                parameters = RunParameters(__loaders(entries, 'invariant'), __loaders(entries, 'base'),
+                                           __loaders(entries, 'delta'), kept)
+                parameters._extra = __loaders(entries, 'frame')
+                fields[field_name] = parameters
+            else:
+                fields[field_name] = __loaders(entries, 'frame')
+        return cls(sets=_sets_from_json(manifest['sets']), **fields)
+
+
+_ARCHIVE_FORMAT = 1
+_RESULT_FIELDS = ('constraints', 'parameters', 'objectives', 'variables', 'postprocessing')
+
+
+def _to_json(value):
+    """
+    Converts NumPy scalars to Python ones (also used as json.dump fallback).
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _sets_to_json(sets: dict) -> dict:
+    encoded = {}
+    for name, members in sets.items():
+        if isinstance(members, pd.DataFrame):
+            encoded[name] = {'frame': {column: members[column].tolist() for column in members.columns}}
+        elif isinstance(members, dict):
+            encoded[name] = {'indexed': [[list(key) if isinstance(key, tuple) else key, list(values)]
+                                         for key, values in members.items()]}
+        else:
+            encoded[name] = {'members': list(members)}
+    return encoded
+
+
+def _sets_from_json(encoded: dict) -> dict:
+    sets = {}
+    for name, entry in encoded.items():
+        if 'frame' in entry:
+            sets[name] = pd.DataFrame(entry['frame'])
+        elif 'indexed' in entry:
+            sets[name] = {tuple(key) if isinstance(key, list) else key: values for key, values in entry['indexed']}
+        else:
+            sets[name] = entry['members']
+    return sets
+
 
-def parse_result(ampl, id_run=None, results_old=None) -> Result:
+def _write_entity(frame: pd.DataFrame, directory: Path, relative: Path) -> dict:
+    """
+    Writes one DataFrame as a Parquet dataset (partitioned by 'Run' if present) and returns the
+    manifest entry needed to read it back with `_read_entity`.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    index_names = list(frame.index.names)
+    index_columns = [name if name is not None else f'__index_level_{i}__' for i, name in enumerate(index_names)]
+    table = frame.reset_index(names=index_columns)
+    for column in index_columns:
+        if table[column].dtype == object:
+            table[column] = table[column].astype('category')
+    if directory.exists():
+        shutil.rmtree(directory)
+    directory.mkdir(parents=True)
+    entry = {'path': relative.as_posix(), 'index': index_columns, 'index_names': index_names,
+             'partitioned': 'Run' in table.columns and len(table) > 0}
+    if not entry['partitioned']:
+        pq.write_table(pa.Table.from_pandas(table, preserve_index=False), directory / "part-0.parquet")
+        return entry
+
+    # One Hive-style directory per run ('Run=<id>'), written in order so that reading back preserves the row order
+    entry['columns'] = list(table.columns)
+    entry['runs'] = [_to_json(run) for run in table['Run'].unique()]
+    entry['run_dtype'] = str(table['Run'].dtype)
+    for run, rows in table.groupby('Run', sort=False, observed=True):
+        (directory / f"Run={run}").mkdir()
+        rows = pa.Table.from_pandas(rows.drop(columns='Run'), preserve_index=False)
+        pq.write_table(rows, directory / f"Run={run}" / "part-0.parquet")
+    return entry
+
+
+def _read_entity(root: Path, entry: dict, runs=None, filters=None) -> pd.DataFrame:
+    """
+    Reads one dataset written by `_write_entity`, keeping only the selected runs and the rows
+    matching `filters` ({column: accepted values}, ignored for absent columns).
+    """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    dataset = ds.dataset(str(root / entry['path']), format='parquet',
+                         partitioning='hive' if entry['partitioned'] else None,
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    condition = None
+    selection = dict(filters or {})
+    if runs is not None:
+        selection['Run'] = runs
+    for column, values in selection.items():
+        if column in dataset.schema.names:
+            term = ds.field(column).isin(values)
+            condition = term if condition is None else condition & term
+
+    frame = dataset.to_table(filter=condition).to_pandas()
+    if entry['partitioned']:
+        run = frame['Run'].astype(entry['run_dtype'])
+        order = np.argsort(pd.Categorical(run, categories=entry['runs']).codes, kind='stable')
+        frame = frame.assign(Run=run).iloc[order][entry['columns']]
+    frame = frame.set_index(entry['index'])
+    frame.index.names = entry['index_names']
+    return frame
+
+
+def parse_result(ampl, id_run=None, results_old=None, include=None, exclude=None, lazy=False) -> Result:
+    """
+    Converts the objectives, variables, parameters and sets of a solved AMPL instance into a Result.
+
+    Parameters:
+    ----------
+    ampl : AMPL
+        The solved AMPL instance.
+
+    id_run : int, optional
+        If given, a 'Run' column with this value is added to every objective, variable and parameter.
+
+    include : Iterable[str], optional
+        Names of the objectives, variables and parameters to parse. Defaults to all of them.
+        Sets are always parsed.
+
+    exclude : Iterable[str], optional
+        Names of objectives, variables and parameters to skip (e.g. hourly variables like 'F_t').
+
+    lazy : bool, optional
+        If True, objectives, variables and parameters are only converted to pandas when first
+        accessed in the Result. The values are then read from `ampl` at access time, so the
+        instance must not be modified or re-solved in between (see `Result.materialize`).
+
+    Returns:
+    -------
+    Result : object
+        The parsed results.
+
+    Example:
+    -------
+    >>> parser = functools.partial(parse_result, include=['F', 'C_inv', 'C_op', 'TotalCost'])
+    >>> es.calc_sequence(seq_data, parser=parser)
+    """
     def _parse_set(ampl, name, set_) -> dict[str, pd.DataFrame]:
         if set_.is_scalar():
             return {name: set_.to_pandas().reset_index().rename(columns={'index': name})}
@@ -45,32 +557,36 @@ def parse_result(ampl, id_run=None, results_old=None) -> Result:
                 result[instance[0]] = []
         return {name: result}
 
-    objectives = {name: objective.to_pandas().rename(columns=lambda v: v.rstrip('.val')) for name, objective in
-                  ampl.get_objectives()}
-    variables = {name: variable.to_pandas().rename(columns=lambda v: v.rstrip('.val')) for name, variable in
-                 ampl.get_variables()}
-    parameters = {name: parameter.to_pandas() for name, parameter in ampl.get_parameters()}
-    sets = {}
-    for name, set_ in ampl.get_sets():
-        sets = {**sets, **_parse_set(ampl, name, set_)}
+    include = None if include is None else set(include)
+    exclude = set() if exclude is None else set(exclude)
 
     # If the solving of the model is not ideal we replace all results by 0 so that the rest of the optimizations continue,
     #  to check which optimizations failed check the objectives results, OBJ = 0 means failed optimization
-    if ampl.solve_result_num > 99:
-        for key in variables.keys():
-            variables[key].loc[:, :] = 0
-        for key in parameters.keys():
-            parameters[key].loc[:, :] = 0
-        for key in objectives.keys():
-            objectives[key].loc[:, :] = 0
-
-    if id_run is not None:
-        for _, value in objectives.items():
-            value['Run'] = id_run
-        for _, value in variables.items():
-            value['Run'] = id_run
-        for _, value in parameters.items():
-            value['Run'] = id_run  # for _, value in sets.items():  #     value['Run'] = id_run
+    failed = ampl.solve_result_num > 99
+
+    def _to_pandas(entity, strip_val: bool) -> pd.DataFrame:
+        df = entity.to_pandas()
+        if strip_val:
+            df = df.rename(columns=lambda v: v.rstrip('.val'))
+        if failed:
+            df.loc[:, :] = 0
+        if id_run is not None:
+            df['Run'] = id_run
+        return df
+
+    def _parse_entities(entities, strip_val: bool):
+        selected = [(name, entity) for name, entity in entities
+                    if (include is None or name in include) and name not in exclude]
+        if lazy:
+            return LazyFrames({name: functools.partial(_to_pandas, entity, strip_val) for name, entity in selected})
+        return {name: _to_pandas(entity, strip_val) for name, entity in selected}
+
+    objectives = _parse_entities(ampl.get_objectives(), strip_val=True)
+    variables = _parse_entities(ampl.get_variables(), strip_val=True)
+    parameters = _parse_entities(ampl.get_parameters(), strip_val=False)
+    sets = {}
+    for name, set_ in ampl.get_sets():
+        sets = {**sets, **_parse_set(ampl, name, set_)}
 
     # if results_old is not None:   # TODO implement the option to merge results in the parser
     #     variables = {name: pd.concat([results_old.variables[name], variables[name]]) for name in results_old.variables.keys()}
@@ -79,6 +595,98 @@ def parse_result(ampl, id_run=None, results_old=None) -> Result:
     return Result(objectives=objectives, variables=variables, parameters=parameters, sets=sets, )
 
 
+_SECTOR_TECHNOLOGIES = {
+    "Electricity": ["CCGT", "CCGT_CC", "COAL_US", "COAL_IGCC", "COAL_US_CC", "COAL_IGCC_CC", "HYDRO_GAS_CHP"],
+    "Nuclear": ["NUCLEAR"],
+    "Mobility": ["TRAMWAY", "COACH_CNG_STOICH", "COACH_DIESEL", "COACH_EV", "COACH_FC_HYBRID_H2",
+                 "COACH_FC_HYBRID_CH4", "COACH_HY_DIESEL", "COMMUTER_RAIL_DIESEL", "COMMUTER_RAIL_ELEC",
+                 "TRAIN_DIESEL",
+                 "TRAIN_ELEC", "TRAIN_NG", "TRAIN_H2", "BUS_CNG_STOICH", "BUS_DIESEL", "BUS_FC_HYBRID_H2",
+                 "BUS_FC_HYBRID_CH4", "BUS_HY_DIESEL", "BUS_EV", "CAR_BEV_LOWRANGE", "CAR_BEV_MEDRANGE_LOCAL",
+                 "CAR_DIESEL_LOCAL", "CAR_DME_D10_LOCAL", "CAR_ETOH_E10_LOCAL", "CAR_ETOH_E85_LOCAL",
+                 "CAR_FC_H2_LOCAL",
+                 "CAR_FC_CH4_LOCAL", "CAR_GASOLINE_LOCAL", "CAR_HEV_LOCAL", "CAR_MEOH_LOCAL", "CAR_NG_LOCAL",
+                 "CAR_PHEV_LOCAL", "CAR_BEV_MEDRANGE_LONGD", "CAR_DIESEL_LONGD", "CAR_DME_D10_LONGD",
+                 "CAR_ETOH_E10_LONGD",
+                 "CAR_ETOH_E85_LONGD", "CAR_FC_H2_LONGD", "CAR_FC_CH4_LONGD", "CAR_GASOLINE_LONGD", "CAR_HEV_LONGD",
+                 "CAR_HEV", "CAR_MEOH_LONGD", "CAR_NG_LONGD", "CAR_PHEV_LONGD", "TRAIN_FREIGHT",
+                 "TRAIN_FREIGHT_DIESEL",
+                 "TRAIN_FREIGHT_NG", "TRAIN_FREIGHT_H2", "TRUCK", "TRUCK_CO2", "TRUCK_EV", "TRUCK_SNG", "TRUCK_FC",
+                 "PLANE",
+                 "CAR_GASOLINE", "CAR_DIESEL", "CAR_NG", "CAR_PHEV", "CAR_MEOH", "CAR_FC_H2", "CAR_FC_CH4",
+                 "CAR_BEV_MEDRANGE", "CAR_ETOH_E10", "CAR_ETOH_E85", "CAR_DME_D10"],
+    "Electric Infrastructure": ["TRAFO_ML", "TRAFO_LM", "TRAFO_HM", "TRAFO_MH", "TRAFO_EH", "TRAFO_HE", "EHV_GRID",
+                                "HV_GRID", "MV_GRID", "LV_GRID", "GRID"],
+    "Gas Infrastructure": ["EHP_H2_GRID", "HP_H2_GRID", "MP_H2_GRID", "LP_H2_GRID", "EHP_NG_GRID", "HP_NG_GRID",
+                           "MP_NG_GRID", "LP_NG_GRID", "NG_EXP_EH", "NG_EXP_HM", "NG_EXP_ML", "NG_EXP_EH_COGEN",
+                           "NG_EXP_HM_COGEN",
+                           "NG_EXP_ML_COGEN", "NG_COMP_HE", "NG_COMP_MH", "NG_COMP_LM", "H2_EXP_EH", "H2_EXP_HM",
+                           "H2_EXP_ML",
+                           "H2_EXP_EH_COGEN", "H2_EXP_HM_COGEN", "H2_EXP_ML_COGEN", "H2_COMP_HE", "H2_COMP_MH",
+                           "H2_COMP_LM"],
+    "Wind": ["WIND", "WIND_ONSHORE", "WIND_OFFSHORE"], "PV": ["PV_LV", "PV_MV", "PV_HV", "PV_EHV", "PV"],
+    "Geothermal": ["GEOTHERMAL", "DHN_DEEP_GEO", "DEC_DEEP_GEO"],
+    "Hydro River & Dam": ["NEW_HYDRO_RIVER", "NEW_HYDRO_DAM", "HYDRO_RIVER", "HYDRO_DAM"],
+    "Industry": ["AL_MAKING", "AL_MAKING_HR", "CEMENT_PROD", "CEMENT_PROD_HP", "FOOD_PROD", "FOOD_PROD_HP",
+                 "FOOD_PROD_HR", "PAPER_MAKING", "PAPER_MAKING_HP", "PAPER_MAKING_HR", "STEEL_MAKING",
+                 "STEEL_MAKING_HP",
+                 "STEEL_MAKING_HR", "WOOD_METHANOL", "CO2_METHANOL", "METHANOL_FT", "METHANE_TO_METHANOL",
+                 "CUMENE_PROCESS",
+                 "METHANOL_CARBONYLATION", "ETHANE_OXIDATION", "ETHYLENE_POLYMERIZATION", "PET_FORMATION",
+                 "PVC_FORMATION",
+                 "POLYPROPYLENE_PP", "STYRENE_POLYMERIZATION", "HYDRO_GAS", "AN_DIG_SI", "BIOMASS_ETHANOL", "FT",
+                 "AN_DIG",
+                 "SNG_NG", "EFFICIENCY", "METHANATION", "GASIFICATION_SNG", "PYROLYSIS", "NG_REFORMING",
+                 "METHANOL_TO_AROMATICS", "METHANOL_TO_OLEFINS", "CO2-To-Diesel", "ETHANE_CRACKING",
+                 "METATHESIS_PROPYLENE",
+                 "SMART_PROCESS", "CROPS_TO_JETFUELS", "CO2_TO_JETFUELS", "BIOGAS_BIOMETHANE", "CROPS_TO_ETHANOL",
+                 "ETHANE_TO_ETHYLENE", "ETHANOL_TO_JETFUELS", "GASIFICATION_H2", "OTHER_BIOMASS", "EOR", "DOGR",
+                 "UNMINEABLE_COAL_SEAM", "DEEP_SALINE", "MINES_STORAGE", "DIRECT_USAGE", "CEMENT"],
+    "Low Temperature Heat": ["DHN_HP_ELEC", "DHN_COGEN_GAS", "DHN_COGEN_WOOD", "DHN_COGEN_WASTE", "DHN_BOILER_GAS",
+                             "DHN_BOILER_WOOD", "DHN_BOILER_OIL", "DHN_RENOVATION", "DEC_HP_ELEC", "DEC_THHP_GAS",
+                             "DEC_COGEN_GAS",
+                             "DEC_COGEN_OIL", "DEC_COGEN_WOOD", "DEC_ADVCOGEN_H2", "DEC_BOILER_GAS",
+                             "DEC_BOILER_WOOD", "DEC_BOILER_OIL",
+                             "DEC_SOLAR", "DEC_DIRECT_ELEC", "DEC_RENOVATION", "DHN", "LT_DEC_WH", "LT_DHN_WH",
+                             "HT_LT", "HT_LT_DEC", ],
+    "High Temperature Heat": ["IND_COGEN_GAS", "IND_COGEN_WOOD", "IND_COGEN_WASTE", "IND_BOILER_GAS",
+                              "IND_BOILER_WOOD", "IND_BOILER_OIL", "IND_BOILER_COAL", "IND_BOILER_WASTE",
+                              "IND_HP_ELEC",
+                              "IND_DIRECT_ELEC"],
+    "Storage": ["DIE_STO", "STO_DIE", "GASO_STO", "STO_GASO", "ELEC_STO", "STO_ELEC", "H2_STO", "STO_H2", "CO2_STO",
+                "STO_CO2", "NG_STO", "STO_NG", "DHN_TH_STORAGE", "DEC_TH_STORAGE", "BATTERY", ""],
+    "Electrolysis": ["ALKALINE_ELECTROLYSIS", "PEM_ELECTROLYSIS", "SOEC_ELECTROLYSIS"],
+    "Carbon Capture": ["CARBON_CAPTURE", "DAC_HT", "DAC_LT"]}
+
+# Technologies whose name contains one of these keywords are also assigned to the "Mobility" sector
+_MOBILITY_KEYWORDS = ["BUS_", "CAR_", "COACH_", "PLANE_", "SEMI_", "SUV_", "TRAIN_", "TRUCK_"]
+
+# Sector of an end-use type or layer, from its name: (substring, sector), first match wins
+_SECTOR_PATTERNS = [('HEAT_LOW', 'Domestic Heat'), ('HEAT_HIGH', 'Industrial Heat'),
+                    ('ELECTRICITY_', 'Electricity'), ('MOB_', 'Mobility')]
+_INDUSTRY_TYPES = ['METHANOL', 'ALUMINUM', 'PHENOL', 'ACETIC_ACID', 'ACETONE', 'PE', 'PET', 'PVC', 'PP', 'PS',
+                   'CEMENT', 'FOOD', 'PAPER', 'STEEL']
+
+
+def _map_labels(labels, mapper) -> np.ndarray:
+    """
+    Applies `mapper` (dict or function) to each distinct label only once and broadcasts the
+    result back to all rows. Labels that are missing, or absent from a dict, give NaN.
+    """
+    codes, uniques = pd.factorize(labels)
+    mapped = pd.Index(uniques, dtype=object).map(mapper).to_numpy(dtype=object)
+    return np.append(mapped, np.nan)[codes]
+
+
+def _sector_of(label: str, industry=()):
+    """
+    Sector of an end-use type or layer name, NaN if no rule applies.
+    """
+    if label in industry:
+        return 'Industry'
+    return next((sector for pattern, sector in _SECTOR_PATTERNS if pattern in label), np.nan)
+
+
 def postprocessing(Result, df_monthly=True, df_annual=True) -> Result:
     """
     Performs post-processing of EnergyScope results by organizing and categorizing key metrics into annual and monthly dataframes.
@@ -100,84 +708,9 @@ def postprocessing(Result, df_monthly=True, df_annual=True) -> Result:
     Result : object
         The updated Result object, containing the processed dataframes.
     """
-    sector_technologies = {
-        "Electricity": ["CCGT", "CCGT_CC", "COAL_US", "COAL_IGCC", "COAL_US_CC", "COAL_IGCC_CC", "HYDRO_GAS_CHP"],
-        "Nuclear": ["NUCLEAR"],
-        "Mobility": ["TRAMWAY", "COACH_CNG_STOICH", "COACH_DIESEL", "COACH_EV", "COACH_FC_HYBRID_H2",
-                     "COACH_FC_HYBRID_CH4", "COACH_HY_DIESEL", "COMMUTER_RAIL_DIESEL", "COMMUTER_RAIL_ELEC",
-                     "TRAIN_DIESEL",
-                     "TRAIN_ELEC", "TRAIN_NG", "TRAIN_H2", "BUS_CNG_STOICH", "BUS_DIESEL", "BUS_FC_HYBRID_H2",
-                     "BUS_FC_HYBRID_CH4", "BUS_HY_DIESEL", "BUS_EV", "CAR_BEV_LOWRANGE", "CAR_BEV_MEDRANGE_LOCAL",
-                     "CAR_DIESEL_LOCAL", "CAR_DME_D10_LOCAL", "CAR_ETOH_E10_LOCAL", "CAR_ETOH_E85_LOCAL",
-                     "CAR_FC_H2_LOCAL",
-                     "CAR_FC_CH4_LOCAL", "CAR_GASOLINE_LOCAL", "CAR_HEV_LOCAL", "CAR_MEOH_LOCAL", "CAR_NG_LOCAL",
-                     "CAR_PHEV_LOCAL", "CAR_BEV_MEDRANGE_LONGD", "CAR_DIESEL_LONGD", "CAR_DME_D10_LONGD",
-                     "CAR_ETOH_E10_LONGD",
-                     "CAR_ETOH_E85_LONGD", "CAR_FC_H2_LONGD", "CAR_FC_CH4_LONGD", "CAR_GASOLINE_LONGD", "CAR_HEV_LONGD",
-                     "CAR_HEV", "CAR_MEOH_LONGD", "CAR_NG_LONGD", "CAR_PHEV_LONGD", "TRAIN_FREIGHT",
-                     "TRAIN_FREIGHT_DIESEL",
-                     "TRAIN_FREIGHT_NG", "TRAIN_FREIGHT_H2", "TRUCK", "TRUCK_CO2", "TRUCK_EV", "TRUCK_SNG", "TRUCK_FC",
-                     "PLANE",
-                     "CAR_GASOLINE", "CAR_DIESEL", "CAR_NG", "CAR_PHEV", "CAR_MEOH", "CAR_FC_H2", "CAR_FC_CH4",
-                     "CAR_BEV_MEDRANGE", "CAR_ETOH_E10", "CAR_ETOH_E85", "CAR_DME_D10"],
-        "Electric Infrastructure": ["TRAFO_ML", "TRAFO_LM", "TRAFO_HM", "TRAFO_MH", "TRAFO_EH", "TRAFO_HE", "EHV_GRID",
-                                    "HV_GRID", "MV_GRID", "LV_GRID", "GRID"],
-        "Gas Infrastructure": ["EHP_H2_GRID", "HP_H2_GRID", "MP_H2_GRID", "LP_H2_GRID", "EHP_NG_GRID", "HP_NG_GRID",
-                               "MP_NG_GRID", "LP_NG_GRID", "NG_EXP_EH", "NG_EXP_HM", "NG_EXP_ML", "NG_EXP_EH_COGEN",
-                               "NG_EXP_HM_COGEN",
-                               "NG_EXP_ML_COGEN", "NG_COMP_HE", "NG_COMP_MH", "NG_COMP_LM", "H2_EXP_EH", "H2_EXP_HM",
-                               "H2_EXP_ML",
-                               "H2_EXP_EH_COGEN", "H2_EXP_HM_COGEN", "H2_EXP_ML_COGEN", "H2_COMP_HE", "H2_COMP_MH",
-                               "H2_COMP_LM"],
-        "Wind": ["WIND", "WIND_ONSHORE", "WIND_OFFSHORE"], "PV": ["PV_LV", "PV_MV", "PV_HV", "PV_EHV", "PV"],
-        "Geothermal": ["GEOTHERMAL", "DHN_DEEP_GEO", "DEC_DEEP_GEO"],
-        "Hydro River & Dam": ["NEW_HYDRO_RIVER", "NEW_HYDRO_DAM", "HYDRO_RIVER", "HYDRO_DAM"],
-        "Industry": ["AL_MAKING", "AL_MAKING_HR", "CEMENT_PROD", "CEMENT_PROD_HP", "FOOD_PROD", "FOOD_PROD_HP",
-                     "FOOD_PROD_HR", "PAPER_MAKING", "PAPER_MAKING_HP", "PAPER_MAKING_HR", "STEEL_MAKING",
-                     "STEEL_MAKING_HP",
-                     "STEEL_MAKING_HR", "WOOD_METHANOL", "CO2_METHANOL", "METHANOL_FT", "METHANE_TO_METHANOL",
-                     "CUMENE_PROCESS",
-                     "METHANOL_CARBONYLATION", "ETHANE_OXIDATION", "ETHYLENE_POLYMERIZATION", "PET_FORMATION",
-                     "PVC_FORMATION",
-                     "POLYPROPYLENE_PP", "STYRENE_POLYMERIZATION", "HYDRO_GAS", "AN_DIG_SI", "BIOMASS_ETHANOL", "FT",
-                     "AN_DIG",
-                     "SNG_NG", "EFFICIENCY", "METHANATION", "GASIFICATION_SNG", "PYROLYSIS", "NG_REFORMING",
-                     "METHANOL_TO_AROMATICS", "METHANOL_TO_OLEFINS", "CO2-To-Diesel", "ETHANE_CRACKING",
-                     "METATHESIS_PROPYLENE",
-                     "SMART_PROCESS", "CROPS_TO_JETFUELS", "CO2_TO_JETFUELS", "BIOGAS_BIOMETHANE", "CROPS_TO_ETHANOL",
-                     "ETHANE_TO_ETHYLENE", "ETHANOL_TO_JETFUELS", "GASIFICATION_H2", "OTHER_BIOMASS", "EOR", "DOGR",
-                     "UNMINEABLE_COAL_SEAM", "DEEP_SALINE", "MINES_STORAGE", "DIRECT_USAGE", "CEMENT"],
-        "Low Temperature Heat": ["DHN_HP_ELEC", "DHN_COGEN_GAS", "DHN_COGEN_WOOD", "DHN_COGEN_WASTE", "DHN_BOILER_GAS",
-                                 "DHN_BOILER_WOOD", "DHN_BOILER_OIL", "DHN_RENOVATION", "DEC_HP_ELEC", "DEC_THHP_GAS",
-                                 "DEC_COGEN_GAS",
-                                 "DEC_COGEN_OIL", "DEC_COGEN_WOOD", "DEC_ADVCOGEN_H2", "DEC_BOILER_GAS",
-                                 "DEC_BOILER_WOOD", "DEC_BOILER_OIL",
-                                 "DEC_SOLAR", "DEC_DIRECT_ELEC", "DEC_RENOVATION", "DHN", "LT_DEC_WH", "LT_DHN_WH",
-                                 "HT_LT", "HT_LT_DEC", ],
-        "High Temperature Heat": ["IND_COGEN_GAS", "IND_COGEN_WOOD", "IND_COGEN_WASTE", "IND_BOILER_GAS",
-                                  "IND_BOILER_WOOD", "IND_BOILER_OIL", "IND_BOILER_COAL", "IND_BOILER_WASTE",
-                                  "IND_HP_ELEC",
-                                  "IND_DIRECT_ELEC"],
-        "Storage": ["DIE_STO", "STO_DIE", "GASO_STO", "STO_GASO", "ELEC_STO", "STO_ELEC", "H2_STO", "STO_H2", "CO2_STO",
-                    "STO_CO2", "NG_STO", "STO_NG", "DHN_TH_STORAGE", "DEC_TH_STORAGE", "BATTERY", ""],
-        "Electrolysis": ["ALKALINE_ELECTROLYSIS", "PEM_ELECTROLYSIS", "SOEC_ELECTROLYSIS"],
-        "Carbon Capture": ["CARBON_CAPTURE", "DAC_HT", "DAC_LT"]}
-
-    # Extract all technologies from Result for dynamic assignment
-    # Extract all technologies from Result for dynamic assignment
-    all_technologies = Result.sets['TECHNOLOGIES']['TECHNOLOGIES'].tolist()
-
-    # Ensure keywords and technology names are checked in a case-insensitive manner
-    mobility_keywords = ["BUS_", "CAR_", "COACH_", "PLANE_", "SEMI_", "SUV_", "TRAIN_", "TRUCK_"]
-
-    # Iterate through all technologies and check if any match the keywords
-    for tech in all_technologies:
-        if any(keyword in tech.upper() for keyword in mobility_keywords):
-            sector_technologies.setdefault("Mobility", []).append(tech)
-
-    # Extract and add all resources to the "Resources" category
-    all_resources = Result.sets['RESOURCES']['RESOURCES'].tolist()
-    sector_technologies['Resources'] = all_resources
+    maps = Result.technology_categories
+    # Flows computed from the previous postprocessing are stale
+    Result.sankey_flows = {}
 
     if df_annual:
         # Process annual data as in the original function
@@ -187,7 +720,8 @@ def postprocessing(Result, df_monthly=True, df_annual=True) -> Result:
                Result.variables['F_Mult'].set_index('Run', append=True),
                Result.parameters['tau'].set_index('Run', append=True),
                Result.variables['C_op'].set_index('Run', append=True), ]
-        df_ = pd.concat(df_, axis=1).loc[:, ~pd.concat(df_, axis=1).columns.duplicated()]
+        df_ = pd.concat(df_, axis=1)
+        df_ = df_.loc[:, ~df_.columns.duplicated()]
         df_.rename(columns={'C_in': 'C_inv'}, inplace=True)
         df_['C_inv_an'] = df_['C_inv'] * df_['tau']
 
@@ -200,6 +734,7 @@ def postprocessing(Result, df_monthly=True, df_annual=True) -> Result:
         # Calculate "Annual_Use" directly for `df_annual`
         F_Mult_t = Result.variables['F_Mult_t'].reset_index().rename(
             columns={"index0": "Technologies", "index1": "Periods"})
+        F_Mult_t = F_Mult_t[F_Mult_t['F_Mult_t'] != 0]
         t_op = Result.parameters['t_op'].reset_index().rename(columns={'index': 'Periods'})
 
         # Merge to calculate monthly usage
@@ -214,24 +749,11 @@ def postprocessing(Result, df_monthly=True, df_annual=True) -> Result:
         df_['Annual_Use'] = annual_usage['Monthly_Use']
         df_['Annual_Use'] = df_['Annual_Use'].fillna(0)
 
-        # Add categories before adding the "Annual_Use" column
-        df_['Category'] = df_.index.to_series().apply(
-            lambda x: next((k for k, v in Result.sets['TECHNOLOGIES_OF_END_USES_TYPE'].items() if x[0] in v), pd.NA))
-
-        # Create `Category_2` with correct mapping
-        df_["Category_2"] = df_.index.get_level_values(0).map(
-            {tech: sector for sector, techs in sector_technologies.items() for tech in techs})
-
-        # Add sectors based on categories
-        df_['Sector'] = pd.Series(dtype='str')
-        df_.loc[df_['Category'].str.contains('MOB_', na=False), 'Sector'] = 'Mobility'
-        df_.loc[df_['Category'].str.contains('ELECTRICITY_', na=False), 'Sector'] = 'Electricity'
-        df_.loc[df_['Category'].str.contains('HEAT_HIGH', na=False), 'Sector'] = 'Industrial Heat'
-        df_.loc[df_['Category'].str.contains('HEAT_LOW', na=False), 'Sector'] = 'Domestic Heat'
-
-        Industry_list = ['METHANOL', 'ALUMINUM', 'PHENOL', 'ACETIC_ACID', 'ACETONE', 'PE', 'PET', 'PVC', 'PP', 'PS',
-                         'CEMENT', 'FOOD', 'PAPER', 'STEEL']
-        df_.loc[df_['Category'].isin(Industry_list), 'Sector'] = 'Industry'
+        # Add categories and sectors, looked up once per technology / category
+        technologies = df_.index.get_level_values(0)
+        df_['Category'] = _map_labels(technologies, maps['Category'])
+        df_['Category_2'] = _map_labels(technologies, maps['Category_2'])
+        df_['Sector'] = _map_labels(df_['Category'], functools.partial(_sector_of, industry=_INDUSTRY_TYPES))
         df_.loc[df_['Category'].isna(), 'Sector'] = 'Others'
 
         # Fill missing categories with "Others"
@@ -253,15 +775,9 @@ def postprocessing(Result, df_monthly=True, df_annual=True) -> Result:
         df_ = pd.merge(df_, lyrio, on=["Technologies", 'Run'])
         df_['Monthly_flow'] = df_['F_Mult_t'] * df_['t_op'] * df_['layers_in_out']
         df_ = df_.loc[df_['layers_in_out'] != 0, :]  # Drop rows without production info
-        df_['Category'] = df_['Technologies'].apply(
-            lambda x: next((k for k, v in Result.sets['TECHNOLOGIES_OF_END_USES_TYPE'].items() if x in v), pd.NA))
-        df_["Category_2"] = df_.index.get_level_values(0).map(
-            {tech: sector for sector, techs in sector_technologies.items() for tech in techs})
-        df_['Sector'] = pd.Series(dtype='object')
-        df_.loc[df_['Flow'].str.contains('MOB_', na=False), 'Sector'] = 'Mobility'
-        df_.loc[df_['Flow'].str.contains('ELECTRICITY_', na=False), 'Sector'] = 'Electricity'
-        df_.loc[df_['Flow'].str.contains('HEAT_HIGH', na=False), 'Sector'] = 'Industrial Heat'
-        df_.loc[df_['Flow'].str.contains('HEAT_LOW', na=False), 'Sector'] = 'Domestic Heat'
+        df_['Category'] = _map_labels(df_['Technologies'], maps['Category'])
+        df_['Category_2'] = _map_labels(df_['Technologies'], maps['Category_2'])
+        df_['Sector'] = _map_labels(df_['Flow'], _sector_of)
         df_['Category'] = df_['Category'].fillna('Others')
         df_['Category_2'] = df_['Category_2'].fillna('Others')
         df_['Sector'] = df_['Sector'].fillna('Others')
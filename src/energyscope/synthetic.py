@@ -0,0 +1,285 @@
+"""
+Synthetic ESTD-shaped datasets of any size.
+
+:func:`create_synthetic_dataset` generates a dataset in the format of
+``data_loader_full.create_full_dataset`` (the format the HiGHS and
+PyOptInterface backends consume; :func:`create_synthetic_dataset_xarray`
+converts it for the xarray linopy model) with a chosen number of
+technologies, storage technologies, layers, resources, typical days and
+periods, and a chosen sparsity of ``layers_in_out``. It is meant for scaling
+studies of build and solve times ("what happens at 24 TDs and 300
+technologies"), not for energy system analysis.
+
+The generated system is feasible by construction:
+
+- The first two layers are the end-use layers ELECTRICITY and HEAT_HIGH_T,
+  with yearly demands; the other layers are energy carriers (CARRIER_003, ...).
+- Each resource (RES_001, ...) supplies one layer, carriers first.
+- Conversion technologies (TECH_001, ...) produce one layer each, round-robin
+  over the layers, from inputs drawn among the layers supplied by a resource.
+  A share of them are renewables producing electricity without input, with
+  hourly capacity factors.
+- Storage technologies (STO_001, ...) store one layer each, round-robin from
+  ELECTRICITY.
+
+Example:
+    >>> data = create_synthetic_dataset(n_technologies=300, n_typical_days=24)
+    >>> model = build_core_model_highs(data)
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+HOURS = list(range(1, 25))
+END_USE_LAYERS = ['ELECTRICITY', 'HEAT_HIGH_T']
+SECTORS = ['HOUSEHOLDS', 'SERVICES', 'INDUSTRY', 'TRANSPORTATION']
+
+# Yearly demand of each end use [GWh], as in the ESTD data (LIGHTING follows the electricity profile)
+END_USES_DEMAND = {'ELECTRICITY': 50000.0, 'LIGHTING': 8000.0, 'HEAT_HIGH_T': 40000.0}
+
+
+def _names(prefix: str, count: int, start: int = 1) -> list:
+    width = max(3, len(str(start + count - 1)))
+    return [f"{prefix}_{k:0{width}d}" for k in range(start, start + count)]
+
+
+def _profile(values: np.ndarray, n_days: np.ndarray) -> pd.Series:
+    """Hourly profile (hour, td) normalised to a yearly sum of 1 over the periods."""
+    values = values / (values * n_days).sum()
+    index = pd.MultiIndex.from_product([HOURS, range(1, len(n_days) + 1)])
+    return pd.Series(values.ravel(), index=index)
+
+
+def create_synthetic_dataset(n_technologies: int = 83, n_storage: int = 25, n_layers: int = 28,
+                             n_resources: int = 28, n_typical_days: int = 12, n_periods: int = 8760,
+                             layers_in_out_density: float = 0.1, renewable_share: float = 0.2,
+                             seed: Optional[int] = 0) -> dict:
+    """
+    Generate a synthetic ESTD-shaped dataset.
+
+    The defaults have the set sizes of the ESTD core dataset (83
+    technologies, 25 storage technologies and 28 layers and resources on 12
+    typical days).
+
+    Args:
+        n_technologies: Number of conversion technologies (storage excluded)
+        n_storage: Number of storage technologies
+        n_layers: Number of layers, including the two end-use layers
+        n_resources: Number of resources
+        n_typical_days: Number of typical days
+        n_periods: Number of hourly periods of the year (a multiple of 24, at
+            least 24 per typical day); days are assigned to typical days at random
+        layers_in_out_density: Probability that a conversion technology consumes
+            each layer supplied by a resource (at least one input each)
+        renewable_share: Share of the conversion technologies that are renewables
+        seed: Seed of the random generator (None for a random dataset)
+
+    Returns:
+        Dictionary with 'sets', 'parameters' and 'time_series', in the format of
+        data_loader_full.create_full_dataset
+
+    Raises:
+        ValueError: If the sizes cannot make a feasible system
+    """
+    if n_layers < len(END_USE_LAYERS) or n_technologies < len(END_USE_LAYERS):
+        raise ValueError(f"At least {len(END_USE_LAYERS)} layers and technologies are needed")
+    if n_resources < 1 or n_storage < 0 or n_typical_days < 1:
+        raise ValueError("At least one resource and one typical day are needed")
+    if n_periods % 24 or n_periods < 24 * n_typical_days:
+        raise ValueError("The number of periods must be a multiple of 24, with at least 24 per typical day")
+    if not 0 <= layers_in_out_density <= 1 or not 0 <= renewable_share <= 1:
+        raise ValueError("layers_in_out_density and renewable_share must be between 0 and 1")
+    rng = np.random.default_rng(seed)
+
+    # =========================================================================
+    # SETS
+    # =========================================================================
+
+    LAYERS = END_USE_LAYERS + _names('CARRIER', n_layers - len(END_USE_LAYERS), start=len(END_USE_LAYERS) + 1)
+    RESOURCES = _names('RES', n_resources)
+    TECH_NOSTORAGE = _names('TECH', n_technologies)
+    STORAGE_TECH = _names('STO', n_storage)
+    TYPICAL_DAYS = list(range(1, n_typical_days + 1))
+
+    # Each typical day represents at least one day
+    n_days_year = n_periods // 24
+    day_td = np.concatenate([TYPICAL_DAYS, rng.choice(TYPICAL_DAYS, n_days_year - n_typical_days)])
+    rng.shuffle(day_td)
+    T_H_TD = [(24 * d + h, h, int(td)) for d, td in enumerate(day_td) for h in HOURS]
+    n_days = np.bincount(day_td, minlength=n_typical_days + 1)[1:]
+
+    # =========================================================================
+    # ENERGY FLOWS
+    # =========================================================================
+
+    # Resources supply the carriers first, then the end-use layers
+    supply_order = LAYERS[len(END_USE_LAYERS):] + END_USE_LAYERS
+    supplied = [supply_order[r % n_layers] for r in range(n_resources)]
+    layers_in_out = pd.DataFrame(0.0, index=RESOURCES + TECH_NOSTORAGE, columns=LAYERS)
+    for resource, layer in zip(RESOURCES, supplied):
+        layers_in_out.loc[resource, layer] = 1.0
+
+    # Renewables are taken after the first producer of each layer, so that every layer has a
+    # dispatchable producer
+    candidates = np.arange(min(n_layers, n_technologies), n_technologies)
+    renewables = set(rng.choice(candidates, min(len(candidates), round(renewable_share * n_technologies)),
+                                replace=False).tolist())
+    inputs_of = sorted(set(supplied))
+    for k, tech in enumerate(TECH_NOSTORAGE):
+        output = 'ELECTRICITY' if k in renewables else LAYERS[k % n_layers]
+        layers_in_out.loc[tech, output] = 1.0
+        options = [layer for layer in inputs_of if layer != output]
+        if k in renewables or not options:
+            continue
+        chosen = [layer for layer in options if rng.random() < layers_in_out_density]
+        if not chosen:
+            chosen = [options[rng.integers(len(options))]]
+        # Inputs of 1 / efficiency per unit of output, split at random
+        layers_in_out.loc[tech, chosen] = -rng.dirichlet(np.ones(len(chosen))) / rng.uniform(0.3, 0.95)
+
+    storage_eff = pd.DataFrame(0.0, index=STORAGE_TECH, columns=LAYERS)
+    for k, storage in enumerate(STORAGE_TECH):
+        storage_eff.loc[storage, LAYERS[k % n_layers]] = rng.uniform(0.8, 0.98)
+
+    # =========================================================================
+    # TIME SERIES
+    # =========================================================================
+
+    hours = np.array(HOURS)[:, None]
+    daylight = np.clip(np.sin(np.pi * (hours - 6) / 12), 0, None)
+    c_p_t = {}
+    for k, tech in enumerate(TECH_NOSTORAGE):
+        if k in renewables:
+            # Solar (daylight shape) or wind (random) capacity factors, varying across typical days
+            if rng.random() < 0.5:
+                values = daylight * rng.uniform(0.3, 1.0, n_typical_days)
+            else:
+                values = rng.beta(2, 5, (24, n_typical_days))
+        else:
+            values = np.ones((24, n_typical_days))
+        c_p_t.update({(tech, h, td): float(values[h - 1, td - 1]) for h in HOURS for td in TYPICAL_DAYS})
+    for storage in STORAGE_TECH:
+        c_p_t.update({(storage, h, td): 1.0 for h in HOURS for td in TYPICAL_DAYS})
+
+    electricity = 1 + 0.3 * np.sin(np.pi * (hours - 8) / 12) + 0.1 * rng.random((24, n_typical_days))
+    heating = 1 + 0.5 * rng.random((1, n_typical_days)) + 0.1 * rng.random((24, n_typical_days))
+    flat = np.ones((24, n_typical_days))
+
+    # =========================================================================
+    # PARAMETERS
+    # =========================================================================
+
+    ALL_TECH = TECH_NOSTORAGE + STORAGE_TECH
+    i_rate = 0.015
+    lifetime = pd.Series(rng.integers(15, 61, len(ALL_TECH)).astype(float), index=ALL_TECH)
+    demand = pd.Series({(end_use, sector): value / len(SECTORS)
+                        for end_use, value in END_USES_DEMAND.items() for sector in SECTORS})
+
+    def tech_series(low, high):
+        return pd.Series(rng.uniform(low, high, len(ALL_TECH)), index=ALL_TECH)
+
+    def constant(index, value):
+        return pd.Series(value, index=index, dtype=float)
+
+    # Imports of end-use layers are expensive and limited, as electricity imports in the ESTD data
+    imported_end_use = [layer in END_USE_LAYERS for layer in supplied]
+    avail = pd.Series(np.where(imported_end_use, 0.1 * END_USES_DEMAND['ELECTRICITY'], np.inf), index=RESOURCES)
+    c_op = pd.Series(rng.uniform(0.01, 0.15, n_resources) * np.where(imported_end_use, 3.0, 1.0), index=RESOURCES)
+
+    parameters = {
+        'electricity_time_series': _profile(electricity, n_days),
+        'heating_time_series': _profile(heating, n_days),
+        'mob_pass_time_series': _profile(flat, n_days),
+        'mob_freight_time_series': _profile(flat, n_days),
+        'c_p_t': pd.Series(c_p_t),
+        'i_rate': i_rate,
+        'gwp_limit': np.inf,
+        'solar_area': 250.0,
+        'power_density_pv': 0.2367,
+        'power_density_solar_thermal': 0.2857,
+        'batt_per_car': pd.Series(dtype=float),
+        'vehicle_capacity': constant(ALL_TECH, 0.0),
+        'c_grid_extra': 367.8,
+        'end_uses_demand_year': demand,
+        'share_mobility_public_min': 0.0, 'share_mobility_public_max': 1.0,
+        'share_freight_train_min': 0.0, 'share_freight_train_max': 1.0,
+        'share_freight_road_min': 0.0, 'share_freight_road_max': 1.0,
+        'share_freight_boat_min': 0.0, 'share_freight_boat_max': 1.0,
+        'share_heat_dhn_min': 0.0, 'share_heat_dhn_max': 1.0,
+        'layers_in_out': layers_in_out.stack(),
+        'c_inv': tech_series(100.0, 3000.0),
+        'c_maint': tech_series(5.0, 100.0),
+        'gwp_constr': tech_series(0.0, 1000.0),
+        'lifetime': lifetime,
+        'c_p': constant(ALL_TECH, 1.0),
+        'fmin_perc': constant(ALL_TECH, 0.0),
+        'fmax_perc': constant(ALL_TECH, 1.0),
+        'f_min': constant(ALL_TECH, 0.0),
+        'f_max': constant(ALL_TECH, np.inf),
+        'avail': avail,
+        'gwp_op': pd.Series(rng.uniform(0.0, 0.4, n_resources), index=RESOURCES),
+        'c_op': c_op,
+        'storage_eff_in': storage_eff.stack(),
+        'storage_eff_out': storage_eff.stack(),
+        'storage_charge_time': pd.Series(rng.uniform(2.0, 10.0, n_storage), index=STORAGE_TECH),
+        'storage_discharge_time': pd.Series(rng.uniform(2.0, 10.0, n_storage), index=STORAGE_TECH),
+        'storage_availability': constant(STORAGE_TECH, 1.0),
+        'storage_losses': pd.Series(rng.uniform(0.0, 0.001, n_storage), index=STORAGE_TECH),
+        'loss_network': pd.Series({'ELECTRICITY': 0.047, 'HEAT_HIGH_T': 0.0}),
+        't_op': pd.Series(1.0, index=pd.MultiIndex.from_product([HOURS, TYPICAL_DAYS])),
+        'intra_inter_storage': 0.0,
+        'end_uses_input': demand.groupby(level=0).sum(),
+        'tau': i_rate * (1 + i_rate) ** lifetime / ((1 + i_rate) ** lifetime - 1),
+        'total_time': float(n_periods),
+    }
+
+    sets = {
+        'T_H_TD': T_H_TD,
+        'SECTORS': SECTORS,
+        'END_USES_INPUT': list(END_USES_DEMAND),
+        'END_USES_CATEGORIES': END_USE_LAYERS,
+        'RESOURCES': RESOURCES,
+        'RES_IMPORT_CONSTANT': [],
+        'BIOFUELS': [],
+        'RE_RESOURCES': [],
+        'EXPORT': [],
+        'END_USES_TYPES_OF_CATEGORY': {layer: [layer] for layer in END_USE_LAYERS},
+        'TECHNOLOGIES_OF_END_USES_TYPE': {
+            layer: [tech for tech in TECH_NOSTORAGE if layers_in_out.loc[tech, layer] > 0] for layer in END_USE_LAYERS
+        },
+        'STORAGE_TECH': STORAGE_TECH,
+        'INFRASTRUCTURE': [],
+        'EVs_BATT': [],
+        'V2G': [],
+        'STORAGE_DAILY': [],
+        'STORAGE_OF_END_USES_TYPES': {},
+        'TS_OF_DEC_TECH': {},
+        'EVs_BATT_OF_V2G': {},
+        'COGEN': [],
+        'BOILERS': [],
+        'PERIODS': [t for t, _, _ in T_H_TD],
+        'HOURS': HOURS,
+        'TYPICAL_DAYS': TYPICAL_DAYS,
+        'END_USES_TYPES': END_USE_LAYERS,
+        'LAYERS': LAYERS,
+        'TECHNOLOGIES': ALL_TECH,
+    }
+    sets['TECHNOLOGIES_OF_END_USES_CATEGORY'] = dict(sets['TECHNOLOGIES_OF_END_USES_TYPE'])
+    return {'sets': sets, 'parameters': parameters, 'time_series': {}}
+
+
+def create_synthetic_dataset_xarray(**kwargs) -> dict:
+    """
+    Generate a synthetic dataset in the format of the xarray core model.
+
+    Args:
+        **kwargs: Sizes and seed, as for create_synthetic_dataset
+
+    Returns:
+        Dictionary with 'sets' and 'params' (see
+        data_loader_xarray.create_full_dataset_xarray)
+    """
+    from energyscope.linopy_backend.data_loader_xarray import create_full_dataset_xarray
+    return create_full_dataset_xarray(create_synthetic_dataset(**kwargs))
@@ -0,0 +1,161 @@
+"""
+Mapping between the periods of the year and the (hour, typical day) pairs.
+
+ESTD represents the year by typical days: each period t is mapped to an hour h
+and a typical day td through the set ``T_H_TD``. Model builders need this
+mapping in both directions (storage level per period, layer balance per
+(h, td)). :class:`TimeIndex` is built once from ``T_H_TD`` and exposes it as
+integer arrays and as a sparse incidence operator, so that builders neither
+scan ``T_H_TD`` for each period nor for each (h, td).
+"""
+
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class TimeIndex:
+    """
+    Period <-> (hour, typical day) mapping built from ``T_H_TD``.
+
+    Attributes:
+        periods: Periods, in increasing order
+        hours: Hours (order of the HOURS set)
+        typical_days: Typical days (order of the TYPICAL_DAYS set)
+        period_hour: Hour of each period (aligned with `periods`)
+        period_td: Typical day of each period (aligned with `periods`)
+        hour_pos: Position of each period's hour in `hours`
+        td_pos: Position of each period's typical day in `typical_days`
+        htd_pos: Position of each period's (hour, td) in the HOURS x TYPICAL_DAYS
+            product, hour-major (``hour_pos * len(typical_days) + td_pos``)
+        previous: Position of the previous period of each period, the first
+            period being preceded by the last one (cyclic year)
+        td_count: Number of days of the year represented by each typical day
+    """
+
+    def __init__(self, t_h_td: Iterable[tuple], hours: Optional[Iterable] = None,
+                 typical_days: Optional[Iterable] = None):
+        """
+        Args:
+            t_h_td: (period, hour, typical day) triplets
+            hours: HOURS set (default: the hours found in `t_h_td`, sorted)
+            typical_days: TYPICAL_DAYS set (default: the typical days found in `t_h_td`, sorted)
+
+        Raises:
+            ValueError: If a period is mapped twice or to an unknown hour or typical day
+        """
+        triplets = list(t_h_td)
+        frame = pd.DataFrame(triplets, columns=['period', 'hour', 'td']).sort_values('period', kind='stable')
+        if frame['period'].duplicated().any():
+            raise ValueError("T_H_TD maps some periods to several (hour, typical day) pairs")
+
+        self.periods = frame['period'].to_numpy()
+        self.period_hour = frame['hour'].to_numpy()
+        self.period_td = frame['td'].to_numpy()
+        self.hours = np.asarray(list(hours)) if hours is not None else np.unique(self.period_hour)
+        self.typical_days = np.asarray(list(typical_days)) if typical_days is not None else np.unique(self.period_td)
+
+        self.hour_pos = pd.Index(self.hours).get_indexer(self.period_hour)
+        self.td_pos = pd.Index(self.typical_days).get_indexer(self.period_td)
+        if (self.hour_pos < 0).any() or (self.td_pos < 0).any():
+            raise ValueError("T_H_TD refers to hours or typical days outside HOURS / TYPICAL_DAYS")
+        self.htd_pos = self.hour_pos * len(self.typical_days) + self.td_pos
+        self.previous = np.roll(np.arange(len(self.periods)), 1)
+
+        # (hour, td) -> periods, stored as CSR: the periods of pair k are _htd_periods[_htd_start[k]:_htd_start[k + 1]]
+        n_pairs = len(self.hours) * len(self.typical_days)
+        order = np.argsort(self.htd_pos, kind='stable')
+        self._htd_periods = self.periods[order]
+        self._htd_start = np.concatenate([[0], np.cumsum(np.bincount(self.htd_pos, minlength=n_pairs))])
+        first_hour = self.hour_pos == 0
+        self.td_count = np.bincount(self.td_pos[first_hour], minlength=len(self.typical_days))
+
+        self._period_pos = pd.Index(self.periods)
+
+    @classmethod
+    def from_sets(cls, sets: dict) -> 'TimeIndex':
+        """
+        Build the index from a data dictionary's sets (T_H_TD, and HOURS / TYPICAL_DAYS if present).
+        """
+        return cls(sets['T_H_TD'], sets.get('HOURS'), sets.get('TYPICAL_DAYS'))
+
+    def __len__(self) -> int:
+        return len(self.periods)
+
+    def __repr__(self) -> str:
+        return (f"TimeIndex(periods={len(self.periods)}, hours={len(self.hours)}, "
+                f"typical_days={len(self.typical_days)})")
+
+    def __contains__(self, period) -> bool:
+        return period in self._period_pos
+
+    def iter_periods(self):
+        """
+        Iterate over the periods in order.
+
+        Yields:
+            (period, hour, typical day, previous period), as Python scalars
+        """
+        periods = self.periods.tolist()
+        previous = [periods[k] for k in self.previous]
+        return zip(periods, self.period_hour.tolist(), self.period_td.tolist(), previous)
+
+    def position(self, period) -> int:
+        """Position of `period` in `periods`."""
+        return self._period_pos.get_loc(period)
+
+    def hour_td(self, period) -> tuple:
+        """(hour, typical day) of `period`."""
+        k = self.position(period)
+        return self.period_hour[k].item(), self.period_td[k].item()
+
+    def previous_period(self, period):
+        """Period preceding `period` (the last period for the first one)."""
+        return self.periods[self.previous[self.position(period)]].item()
+
+    def periods_of(self, hour, td) -> np.ndarray:
+        """Periods mapped to (`hour`, `td`), in increasing order."""
+        k = pd.Index(self.hours).get_loc(hour) * len(self.typical_days) + pd.Index(self.typical_days).get_loc(td)
+        return self._htd_periods[self._htd_start[k]:self._htd_start[k + 1]]
+
+    def period_counts(self) -> np.ndarray:
+        """Number of periods mapped to each (hour, td), as a (hours, typical days) array."""
+        return np.diff(self._htd_start).reshape(len(self.hours), len(self.typical_days))
+
+    def day_td_pos(self) -> np.ndarray:
+        """
+        Position in `typical_days` of the typical day of each day of the year.
+
+        Days are consecutive blocks of len(hours) periods, each running through
+        the hours in order within a single typical day.
+
+        Raises:
+            ValueError: If the periods do not split into such days
+        """
+        n_hours = len(self.hours)
+        if len(self.periods) % n_hours:
+            raise ValueError("The periods do not split into whole days of HOURS")
+        hour_pos = self.hour_pos.reshape(-1, n_hours)
+        td_pos = self.td_pos.reshape(-1, n_hours)
+        if (hour_pos != np.arange(n_hours)).any() or (td_pos != td_pos[:, :1]).any():
+            raise ValueError("Each day must run through HOURS in order within a single typical day")
+        return td_pos[:, 0]
+
+    def incidence(self) -> sparse.csr_matrix:
+        """
+        Period -> (hour, td) incidence operator.
+
+        Row k has a single 1, in the column of the k-th period's (hour, td) in the
+        hour-major HOURS x TYPICAL_DAYS product (``htd_pos``). Applied to a
+        vector over (hour, td) it gives the value of each period; its transpose
+        sums a vector over periods by (hour, td), and its column sums are the
+        period counts.
+
+        Returns:
+            (periods, hours * typical days) CSR matrix
+        """
+        n_periods = len(self.periods)
+        return sparse.csr_matrix((np.ones(n_periods), self.htd_pos, np.arange(n_periods + 1)),
+                                 shape=(n_periods, len(self.hours) * len(self.typical_days)))
@@ -0,0 +1,75 @@
+"""
+Shared fixtures of the test suite.
+"""
+
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+HOURS = [1, 2]
+TYPICAL_DAYS = [1, 2]
+
+
+def _storage_dataset(daily=False, loss=0.0):
+    """
+    Three days of two hours (sunny, dark, sunny) with a flat electricity demand.
+
+    PV only produces on the first typical day, so the battery carries energy from one
+    day to the next unless it is daily storage.
+    """
+    T_H_TD = [(2 * d + h, h, td) for d, td in enumerate([1, 2, 1]) for h in HOURS]
+    time_series = pd.Series({(h, td): 0.0 for h in HOURS for td in TYPICAL_DAYS})
+    return {
+        'sets': {
+            'TECHNOLOGIES': ['CCGT', 'PV', 'BATT'], 'STORAGE_TECH': ['BATT'], 'STORAGE_DAILY': ['BATT'] if daily else [],
+            'RESOURCES': ['GAS'], 'LAYERS': ['ELECTRICITY', 'GAS'], 'END_USES_TYPES': ['ELECTRICITY'],
+            'HOURS': HOURS, 'TYPICAL_DAYS': TYPICAL_DAYS, 'PERIODS': [t for t, _, _ in T_H_TD], 'T_H_TD': T_H_TD,
+        },
+        'parameters': {
+            'f_max': pd.Series({'CCGT': 10.0, 'PV': 10.0, 'BATT': 10.0}),
+            'f_min': pd.Series({'CCGT': 0.0, 'PV': 0.0, 'BATT': 0.0}),
+            'c_p_t': pd.Series({('PV', h, td): float(td == 1) for h in HOURS for td in TYPICAL_DAYS}),
+            'layers_in_out': pd.Series({('GAS', 'GAS'): 1.0, ('CCGT', 'ELECTRICITY'): 1.0,
+                                        ('CCGT', 'GAS'): -2.0, ('PV', 'ELECTRICITY'): 1.0}),
+            'storage_eff_in': pd.Series({('BATT', 'ELECTRICITY'): 0.95}),
+            'storage_eff_out': pd.Series({('BATT', 'ELECTRICITY'): 0.95}),
+            'storage_losses': pd.Series({'BATT': loss}),
+            'storage_charge_time': pd.Series({'BATT': 1.0}), 'storage_discharge_time': pd.Series({'BATT': 1.0}),
+            'avail': pd.Series({'GAS': 100.0}),
+            't_op': pd.Series({(h, td): 1.0 for h in HOURS for td in TYPICAL_DAYS}),
+            'c_inv': pd.Series({'CCGT': 1.0, 'PV': 1.0, 'BATT': 0.1}),
+            'c_maint': pd.Series({'CCGT': 0.5, 'PV': 0.1, 'BATT': 0.0}),
+            'c_op': pd.Series({'GAS': 1.0}), 'lifetime': pd.Series({'CCGT': 20.0, 'PV': 20.0, 'BATT': 20.0}),
+            'i_rate': 0.05, 'gwp_constr': pd.Series({'CCGT': 0.0, 'PV': 0.0, 'BATT': 0.0}),
+            'gwp_op': pd.Series({'GAS': 1.0}), 'gwp_limit': 1000.0,
+            'heating_time_series': time_series, 'electricity_time_series': time_series,
+            'end_uses_demand_year': pd.Series({'ELECTRICITY': 12.0}),
+        },
+    }
+
+
+def _xarray_objective(data, storage_formulation):
+    """Optimal objective of the xarray core model on `data`."""
+    pytest.importorskip("linopy")
+    from energyscope.linopy_backend.core_model_xarray import build_core_model_xarray
+    from energyscope.linopy_backend.data_loader_xarray import create_full_dataset_xarray
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = build_core_model_xarray(create_full_dataset_xarray(data), storage_formulation=storage_formulation)
+    model.solve(solver_name='highs', output_flag=False)
+    assert model.termination_condition == 'optimal'
+    return model.objective.value
+
+
+@pytest.fixture
+def storage_dataset():
+    """Factory of the three-day PV and battery dataset: ``storage_dataset(daily=False, loss=0.0)``."""
+    return _storage_dataset
+
+
+@pytest.fixture
+def xarray_objective():
+    """Optimal objective of the xarray core model: ``xarray_objective(data, storage_formulation)``."""
+    return _xarray_objective
@@ -0,0 +1,55 @@
+"""
+Tests for the bulk constraint assembly of the PyOptInterface backend.
+"""
+
+import numpy as np
+import pytest
+
+poi = pytest.importorskip("pyoptinterface")
+from pyoptinterface import highs
+
+from energyscope.pyoptinterface_backend.assembly import ConstraintBlock, index_array, selected_rows
+
+
+class TestConstraintBlock:
+    """Test suite for ConstraintBlock."""
+
+    def test_csr_merges_and_drops_terms(self):
+        block = ConstraintBlock((2, 2))
+        block.add_terms(np.array([[3, -1], [1, 0]]))
+        block.add_terms(3, 2.0, rows=0)
+        block.add_terms(np.array([[5, 5], [5, 5]]), [[0.0, 1.0], [1.0, 1.0]])
+
+        indptr, variables, coefficients = block.to_csr()
+        assert indptr.tolist() == [0, 1, 2, 4, 6]
+        assert variables.tolist() == [3, 5, 1, 5, 0, 5]
+        assert coefficients.tolist() == [3.0, 1.0, 1.0, 1.0, 1.0, 1.0]
+
+    def test_selected_rows(self):
+        rows, n_rows = selected_rows(np.array([[True, False], [False, True]]))
+        assert n_rows == 2
+        assert rows.tolist() == [[0, -1], [-1, 1]]
+
+    def test_add_to_model(self):
+        model = highs.Model()
+        model.set_model_attribute(poi.ModelAttribute.Silent, True)
+        x = {(j, t): model.add_variable(lb=0) for j in ('PV', 'WIND') for t in (1, 2)}
+        capacity = {j: model.add_variable(lb=0) for j in ('PV', 'WIND')}
+        x_idx = index_array(x, [['PV', 'WIND'], [1, 2]])
+        capacity_idx = index_array(capacity, [['PV', 'WIND']])
+
+        # x[j, t] <= c_p_t[j, t] * capacity[j]
+        block = ConstraintBlock(x_idx.shape)
+        block.add_terms(x_idx)
+        block.add_terms(capacity_idx[:, None], -np.array([[0.5, 0.25], [1.0, 0.5]]))
+        constraints = block.add_to(model, poi.Leq)
+        assert constraints.shape == (2, 2)
+
+        # Production of both technologies meets a demand of 1 in each period
+        demand = ConstraintBlock(2)
+        demand.add_terms(x_idx, 1.0, demand.rows[None])
+        demand.add_to(model, poi.Geq, 1.0)
+
+        model.set_objective(capacity['PV'] + 2 * capacity['WIND'], poi.ObjectiveSense.Minimize)
+        model.optimize()
+        assert model.get_model_attribute(poi.ModelAttribute.ObjectiveValue) == pytest.approx(4.0)
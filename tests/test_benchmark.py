@@ -0,0 +1,80 @@
+"""
+Tests for the end-to-end benchmark of the model backends.
+"""
+
+import copy
+
+import pytest
+
+from energyscope.benchmark import (
+    STAGES, compare_results, format_report, load_results, run_benchmark, run_case, save_results
+)
+
+
+def results(**stages):
+    """Benchmark results with one xarray run on the toy dataset."""
+    times = dict.fromkeys(STAGES, 0.1)
+    times.update(stages)
+    run = {'backend': 'xarray', 'dataset': 'toy', 'status': 'ok', 'reason': None, 'stages': times,
+           'objective': 2548.52}
+    machine = {'platform': 'linux', 'processor': 'x86_64', 'cpu_count': 1, 'memory_gb': 8.0, 'python': '3.11',
+               'packages': {'linopy': '0.10.0'}}
+    return {'created': '2026-01-01T00:00:00', 'machine': machine, 'solver_options': {}, 'repeat': 1,
+            'runs': [run]}
+
+
+class TestBenchmark:
+    """Test suite for running benchmarks."""
+
+    def test_toy_runs(self, tmp_path):
+        pytest.importorskip("linopy")
+        pytest.importorskip("highspy")
+        benchmark = run_benchmark(backends=['xarray', 'highs'], datasets=['toy'])
+
+        xarray, highs = benchmark['runs']
+        assert xarray['status'] == 'ok' and xarray['objective'] == pytest.approx(2548.52, rel=1e-4)
+        assert all(xarray['stages'][stage] >= 0 for stage in STAGES)
+        assert highs['status'] == 'skipped' and highs['stages']['solve'] is None
+        assert benchmark['machine']['cpu_count'] >= 1
+
+        save_results(benchmark, tmp_path / 'benchmark.json')
+        assert load_results(tmp_path / 'benchmark.json') == benchmark
+
+    def test_pyoptinterface_toy_has_no_build_stage(self):
+        pytest.importorskip("highspy")
+        run = run_case('pyoptinterface', 'toy')
+        assert run['status'] == 'ok' and run['objective'] == pytest.approx(2548.52, rel=1e-4)
+        assert run['stages']['build'] is None and run['stages']['solve'] > 0
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            run_case('cplex', 'toy')
+
+
+class TestCompare:
+    """Test suite for comparing benchmark results."""
+
+    def test_regressions(self):
+        baseline = results(build=1.0, solve=0.01)
+        current = results(build=1.5, solve=0.02)
+        current['machine']['packages']['linopy'] = '0.11.0'
+        comparison = compare_results(baseline, current)
+
+        assert comparison.loc[('xarray', 'toy', 'build'), 'ratio'] == pytest.approx(1.5)
+        # Stages faster than min_time are timer noise
+        regressions = comparison.index[comparison['regression']].get_level_values('stage')
+        assert set(regressions) == {'build', 'total'}
+        report = format_report(comparison, baseline, current)
+        assert 'Package versions differ: linopy' in report
+
+    def test_objective_change(self):
+        current = copy.deepcopy(results())
+        current['runs'][0]['objective'] *= 1.01
+        comparison = compare_results(results(), current)
+        assert comparison.loc[('xarray', 'toy', 'objective'), 'regression']
+        assert 'No regression' in format_report(compare_results(results(), results()))
+
+    def test_failed_runs_are_not_compared(self):
+        current = results()
+        current['runs'][0]['status'] = 'failed'
+        assert compare_results(results(), current).empty
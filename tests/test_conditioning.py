@@ -0,0 +1,106 @@
+"""
+Tests for the conditioning analysis and scaling of assembled models.
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from energyscope.conditioning import analyze_conditioning, geometric_mean_scaling, model_matrix
+from energyscope.synthetic import create_synthetic_dataset
+
+SIZES = dict(n_technologies=12, n_storage=3, n_layers=6, n_resources=5, n_typical_days=3, n_periods=24 * 10)
+
+
+def highs_model(data, **kwargs):
+    pytest.importorskip("highspy")
+    from energyscope.highs_backend import build_core_model_highs
+    return build_core_model_highs(data, verbose=False, **kwargs)
+
+
+class TestAnalyzeConditioning:
+    """Test suite for analyze_conditioning."""
+
+    def test_near_zero_storage_efficiency_is_flagged(self):
+        from energyscope.profiling import BuildProfiler
+
+        data = create_synthetic_dataset(**SIZES)
+        eff_out = data['parameters']['storage_eff_out']
+        eff_out[eff_out.index[eff_out > 0][0]] = 1e-12
+        profiler = BuildProfiler(memory=False)
+        report = analyze_conditioning(highs_model(data, profiler=profiler), groups=profiler.family_groups)
+
+        assert report.summary.loc['matrix', 'max'] == pytest.approx(1e12)
+        offender = report.offenders.loc[('matrix', 'storage', 'storage_level', 'large')]
+        assert offender['extreme'] == pytest.approx(1e12)
+        assert offender['example'].startswith('storage_level[STO_001') and 'Storage_out[STO_001' in offender['example']
+        assert 'storage_eff_out' in offender['hint'] and 'storage_level' in str(report)
+        assert report.constraints.loc[('storage', 'storage_level'), 'matrix_max'] == pytest.approx(1e12)
+
+    def test_families_match_model(self):
+        model = highs_model(create_synthetic_dataset(**SIZES))
+        report = analyze_conditioning(model)
+
+        assert report.constraints['rows'].sum() == model.n_rows
+        assert report.variables['columns'].sum() == model.n_cols
+        assert report.constraints.loc[('energy_balance', 'layer_balance'), 'rows'] == len(model.constraints['layer_balance'])
+        assert 'other' not in report.constraints.index.get_level_values('group')
+
+    def test_linopy_and_pyoptinterface_extraction(self):
+        pytest.importorskip("linopy")
+        from energyscope.linopy_backend.core_model_xarray import build_core_model_xarray
+        from energyscope.synthetic import create_synthetic_dataset_xarray
+
+        model = highs_model(create_synthetic_dataset(**SIZES))
+        with contextlib.redirect_stdout(io.StringIO()):
+            m = build_core_model_xarray(create_synthetic_dataset_xarray(**SIZES))
+        linopy_matrix, highs_matrix = model_matrix(m), model_matrix(model)
+        assert linopy_matrix.A.shape == highs_matrix.A.shape and linopy_matrix.A.nnz == highs_matrix.A.nnz
+        assert linopy_matrix.row_label(0).startswith(linopy_matrix.row_families[linopy_matrix.row_family[0]] + '[')
+
+        poi = pytest.importorskip("pyoptinterface")
+        from energyscope.pyoptinterface_backend import build_full_model
+
+        result = build_full_model(create_synthetic_dataset(**SIZES), solver='highs', verbose=False,
+                                  enable_output=False)
+        poi_model = result['model']
+        poi_matrix = model_matrix(result)
+        assert poi_matrix.A.shape == (poi_model.number_of_constraints(poi.ConstraintType.Linear),
+                                      poi_model.number_of_variables())
+        assert 'capacity_factor_t' in poi_matrix.row_families
+        # Original variable names are restored after the MPS export
+        assert poi_model.get_variable_name(result['variables']['F']['TECH_001']) == 'F_TECH_001'
+
+    def test_unknown_model(self):
+        with pytest.raises(TypeError):
+            model_matrix(object())
+
+
+class TestScaling:
+    """Test suite for geometric-mean scaling."""
+
+    def test_scaling_reduces_range(self):
+        A = sp.csr_matrix(np.array([[1e6, 2e6, 0.0], [0.0, 1e-3, 4e-3], [3.0, 0.0, 5.0]]))
+        row_scale, col_scale = geometric_mean_scaling(A)
+        scaled = abs(sp.diags(row_scale) @ A @ sp.diags(col_scale)).data
+
+        assert scaled.max() / scaled.min() < 1e-2 * A.data.max() / A.data.min()
+        # Powers of 2
+        assert np.all(np.log2(row_scale) == np.round(np.log2(row_scale)))
+
+    def test_scaled_solve_is_unscaled(self):
+        model = highs_model(create_synthetic_dataset(**SIZES))
+        model.solve()
+        objective, solution = model.objective, model.solution()
+        cost, _, _, A, _, _ = model.matrices()
+        model.solve(scale=True)
+
+        assert model.col_scale is not None
+        assert model.objective == pytest.approx(objective)
+        assert np.allclose(model.solution(), solution, atol=1e-6)
+        # Unscaled duals and reduced costs satisfy c - A'y = d
+        reduced_costs = np.asarray(model.highs.getSolution().col_dual) / model.col_scale
+        assert np.allclose(cost - A.T @ model.row_duals(), reduced_costs, atol=1e-8)
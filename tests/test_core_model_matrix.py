@@ -0,0 +1,131 @@
+"""
+Tests for the matrix assembly engine of the loop-based linopy core model.
+"""
+
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("linopy")
+pytest.importorskip("highspy")
+
+from energyscope.linopy_backend.core_model import build_core_model, build_core_model_partial, hourly_end_uses
+from energyscope.linopy_backend.test_data_core import create_minimal_core_data
+
+HOURS = [1, 2, 3, 4]
+
+
+def small_data():
+    """
+    Minimal core data on 4 hours, with the policy, mobility, V2G and heating data the
+    minimal dataset does not have.
+    """
+    data = create_minimal_core_data()
+    sets, parameters = data['sets'], data['parameters']
+    TYPICAL_DAYS = sets['TYPICAL_DAYS']
+    sets['HOURS'] = HOURS
+    sets['T_H_TD'] = [(t, h, td) for t, (h, td) in enumerate(
+        [(h, td) for td in TYPICAL_DAYS for h in HOURS], start=1)]
+    sets['PERIODS'] = [t for t, _, _ in sets['T_H_TD']]
+    sets['END_USES_TYPES'] = ['END_USE', 'ELECTRICITY']
+    for name in ('c_p_t', 't_op'):
+        series = parameters[name]
+        parameters[name] = series[series.index.get_level_values(-2).isin(HOURS)]
+    data['time_series']['End_uses'] = data['time_series']['End_uses'].loc[:, HOURS, :]
+    parameters['total_time'] = parameters['t_op'].sum()
+
+    # Wind limited to 60% of the electricity production (emissions no longer limiting)
+    parameters['gwp_limit'] = 1e6
+    sets['TECHNOLOGIES_OF_END_USES_TYPE'] = {'ELECTRICITY': ['WIND', 'GAS_PLANT'], 'HEAT_LOW_T_DECEN': ['GRID']}
+    parameters['fmax_perc'] = {'WIND': 0.6}
+    # The gas plant follows a "mobility" profile, the battery is sized by the grid
+    sets['TECHNOLOGIES_OF_END_USES_CATEGORY'] = {'MOBILITY_PASSENGER': ['GAS_PLANT']}
+    parameters['end_uses_input']['MOBILITY_PASSENGER'] = 1000.0
+    parameters['mob_pass_time_series'] = pd.Series({(h, td): 0.001 * h for h in HOURS for td in TYPICAL_DAYS})
+    sets['V2G'] = ['GRID']
+    sets['EVs_BATT_OF_V2G'] = {'GRID': ['BATTERY']}
+    parameters['vehicle_capacity'] = {'GRID': 4.0}
+    parameters['batt_per_car'] = {'GRID': 1.0}
+    parameters['c_p_t'] = pd.concat([parameters['c_p_t'], pd.Series(
+        {('DEC_SOLAR', h, td): 0.5 for h in HOURS for td in TYPICAL_DAYS})])
+    return data
+
+
+def estd_data(storage_dataset):
+    """
+    ESTD-format data (yearly demands by sector and normalized profiles): the battery
+    dataset with passenger mobility split between a train and cars.
+    """
+    data = storage_dataset()
+    sets, parameters = data['sets'], data['parameters']
+    sets['TECHNOLOGIES'] += ['TRAIN', 'CAR']
+    sets['LAYERS'] += ['MOB_PUBLIC', 'MOB_PRIVATE']
+    for name, values in (('f_max', 10.0), ('f_min', 0.0), ('c_inv', 1.0), ('c_maint', 0.1),
+                         ('lifetime', 20.0), ('gwp_constr', 0.0)):
+        parameters[name] = pd.concat([parameters[name], pd.Series({'TRAIN': values, 'CAR': values})])
+    parameters['layers_in_out'] = pd.concat([parameters['layers_in_out'], pd.Series({
+        ('TRAIN', 'MOB_PUBLIC'): 1.0, ('TRAIN', 'ELECTRICITY'): -0.5,
+        ('CAR', 'MOB_PRIVATE'): 1.0, ('CAR', 'GAS'): -0.8})])
+    parameters['end_uses_demand_year'] = pd.Series({
+        ('ELECTRICITY', 'HOUSEHOLDS'): 8.0, ('ELECTRICITY', 'SERVICES'): 4.0, ('MOBILITY_PASSENGER', 'HOUSEHOLDS'): 6.0})
+    # Three days of the first typical day's profile, one day of the second: each period weighs 1/6
+    parameters['mob_pass_time_series'] = pd.Series({(h, td): 1 / 6 for h in (1, 2) for td in (1, 2)})
+    parameters['share_mobility_public_min'] = 0.25
+    parameters['total_time'] = 6.0
+    return data
+
+
+def build(data, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return build_core_model(data, **kwargs)
+
+
+def solve(model):
+    model.solve(solver_name='highs', output_flag=False)
+    assert model.termination_condition == 'optimal'
+    return model.objective.value
+
+
+class TestMatrixEngine:
+    """Test suite for build_core_model(engine='matrix')."""
+
+    @pytest.mark.parametrize('storage_formulation', ['chronological', 'intra_inter'])
+    def test_same_model_as_loop(self, storage_formulation):
+        data = small_data()
+        loop = build(data, storage_formulation=storage_formulation)
+        matrix = build(data, storage_formulation=storage_formulation, engine='matrix')
+
+        assert (matrix.nvars, matrix.ncons) == (loop.nvars, loop.ncons)
+        assert list(matrix.variables) == list(loop.variables)
+        assert solve(matrix) == pytest.approx(solve(loop))
+
+    def test_one_block_per_family(self):
+        model = build(small_data(), engine='matrix')
+
+        assert dict(model.constraints['capacity_factor_t'].labels.sizes) == {'tech': 3, 'hour': 4, 'td': 2}
+        assert dict(model.constraints['storage_level'].labels.sizes) == {'storage': 1, 'period': 8}
+        assert 'f_max_perc' in model.constraints and 'EV_storage_size' in model.constraints
+        assert not any(name.startswith('capacity_factor_t_') for name in model.constraints)
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            build_core_model_partial(small_data(), engine='sparse')
+
+    @pytest.mark.parametrize('storage_formulation', ['chronological', 'intra_inter'])
+    def test_same_model_as_loop_on_estd_data(self, storage_dataset, storage_formulation):
+        data = estd_data(storage_dataset)
+        loop = build(data, storage_formulation=storage_formulation)
+        matrix = build(data, storage_formulation=storage_formulation, engine='matrix')
+
+        assert (matrix.nvars, matrix.ncons) == (loop.nvars, loop.ncons)
+        assert solve(matrix) == pytest.approx(solve(loop))
+
+    def test_hourly_end_uses(self, storage_dataset):
+        end_uses = hourly_end_uses(estd_data(storage_dataset))
+
+        # Yearly totals over the six periods: the sectors are summed, public mobility has its minimum share
+        periods = pd.Series({1: 2, 2: 1}).rename_axis('td')
+        yearly = end_uses.mul(periods, level=2).groupby(level=0).sum()
+        assert yearly.to_dict() == pytest.approx({'ELECTRICITY': 12.0, 'MOB_PUBLIC': 1.5, 'MOB_PRIVATE': 4.5})
@@ -0,0 +1,107 @@
+"""
+Tests for the vectorized (xarray) linopy core model.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("linopy")
+pytest.importorskip("highspy")
+import xarray as xr
+
+from energyscope.linopy_backend.core_model_xarray import build_core_model_xarray
+from energyscope.linopy_backend.data_loader_xarray import create_full_dataset_xarray
+
+
+def solve(model):
+    model.solve(solver_name='highs', output_flag=False)
+    assert model.termination_condition == 'optimal'
+    return model.objective.value
+
+
+@pytest.fixture
+def weighted_data():
+    """
+    CCGT burning gas (maintenance 10, gas 1) to meet a demand of 1 and 2 in two hours.
+
+    Hour 2 stands for two periods of the year, and the battery cannot discharge to the
+    gas layer (efficiency 0).
+    """
+    TECHNOLOGIES = pd.Index(['CCGT', 'BATT'], name='tech')
+    STORAGE_TECH = pd.Index(['BATT'], name='storage')
+    RESOURCES = pd.Index(['GAS'], name='resource')
+    LAYERS = pd.Index(['ELECTRICITY', 'GAS'], name='layer')
+    ENTITIES = pd.Index(['GAS', 'CCGT'], name='entity')
+    HOURS = pd.Index([1, 2], name='hour')
+    TYPICAL_DAYS = pd.Index([1], name='td')
+    return {
+        'sets': {
+            'TECHNOLOGIES': TECHNOLOGIES, 'STORAGE_TECH': STORAGE_TECH, 'RESOURCES': RESOURCES,
+            'LAYERS': LAYERS, 'HOURS': HOURS, 'TYPICAL_DAYS': TYPICAL_DAYS,
+            'PERIODS': pd.Index([1, 2, 3], name='period'), 'T_H_TD': [(1, 1, 1), (2, 2, 1), (3, 2, 1)],
+        },
+        'params': {
+            'F_MAX': xr.DataArray([10.0, 10.0], coords=[TECHNOLOGIES]),
+            'LAYERS_IN_OUT': xr.DataArray([[0.0, 1.0], [1.0, -2.0]], coords=[ENTITIES, LAYERS]),
+            'END_USES': xr.DataArray([[[1.0], [2.0]], [[0.0], [0.0]]], coords=[LAYERS, HOURS, TYPICAL_DAYS]),
+            'C_MAINT': xr.DataArray([10.0, 100.0], coords=[TECHNOLOGIES]),
+            'C_OP': xr.DataArray([1.0], coords=[RESOURCES]),
+            'STORAGE_EFF_IN': xr.DataArray([[0.9, 0.0]], coords=[STORAGE_TECH, LAYERS]),
+            'STORAGE_EFF_OUT': xr.DataArray([[0.9, 0.0]], coords=[STORAGE_TECH, LAYERS]),
+        },
+    }
+
+
+class TestCoreModelXarray:
+    """Test suite for build_core_model_xarray."""
+
+    def test_yearly_sums_weighted_by_periods(self, weighted_data):
+        model = build_core_model_xarray(weighted_data)
+
+        # Capacity 2 (maintenance 20) and gas 2 * (1 + 2 * 2) over the three periods of the year
+        assert solve(model) == pytest.approx(30.0)
+        # One block per family: a row per (layer, hour, td) and per (storage, period)
+        assert dict(model.constraints['layer_balance'].labels.sizes) == {'layer': 2, 'hour': 2, 'td': 1}
+        assert dict(model.constraints['storage_level'].labels.sizes) == {'storage': 1, 'period': 3}
+        # No division by the efficiency of the incompatible layer
+        assert not np.isinf(model.constraints['storage_level'].coeffs.values).any()
+
+    def test_structural_zeros_not_created(self, weighted_data):
+        model = build_core_model_xarray(weighted_data)
+
+        # The battery has no flow on the gas layer and, not being daily storage, no F_t
+        assert (model.variables['Storage_in'].labels.sel(layer='GAS') == -1).all()
+        assert (model.variables['Storage_out'].labels.sel(layer='ELECTRICITY') >= 0).all()
+        assert (model.variables['F_t'].labels.sel(entity='BATT') == -1).all()
+        assert 'storage_layer_in' not in model.constraints
+        assert solve(model) == pytest.approx(30.0)
+
+    def test_matches_pyoptinterface_model(self):
+        poi_backend = pytest.importorskip("energyscope.pyoptinterface_backend")
+        data = {
+            'sets': {
+                'TECHNOLOGIES': ['CCGT', 'PV'], 'STORAGE_TECH': [], 'RESOURCES': ['GAS'],
+                'LAYERS': ['ELECTRICITY', 'GAS'], 'END_USES_TYPES': ['ELECTRICITY'],
+                'HOURS': [1, 2], 'TYPICAL_DAYS': [1], 'PERIODS': [1, 2], 'T_H_TD': [(1, 1, 1), (2, 2, 1)],
+            },
+            'parameters': {
+                'f_max': pd.Series({'CCGT': 10.0, 'PV': 10.0}), 'f_min': pd.Series({'CCGT': 0.0, 'PV': 0.0}),
+                'c_p_t': pd.Series({('PV', 1, 1): 1.0, ('PV', 2, 1): 0.0}),
+                'layers_in_out': pd.Series({('GAS', 'GAS'): 1.0, ('CCGT', 'ELECTRICITY'): 1.0,
+                                            ('CCGT', 'GAS'): -2.0, ('PV', 'ELECTRICITY'): 1.0}),
+                'avail': pd.Series({'GAS': 5.0}),
+                't_op': pd.Series({(1, 1): 1.0, (2, 1): 1.0}),
+                'c_inv': pd.Series({'CCGT': 1.0, 'PV': 3.0}), 'c_maint': pd.Series({'CCGT': 0.5, 'PV': 0.1}),
+                'c_op': pd.Series({'GAS': 1.0}), 'lifetime': pd.Series({'CCGT': 20.0, 'PV': 20.0}),
+                'i_rate': 0.05, 'gwp_constr': pd.Series({'CCGT': 0.0, 'PV': 0.0}), 'gwp_op': pd.Series({'GAS': 1.0}),
+                'gwp_limit': 100.0, 'heating_time_series': pd.Series({(1, 1): 0.0, (2, 1): 0.0}),
+                'electricity_time_series': pd.Series({(1, 1): 0.0, (2, 1): 0.0}),
+                'end_uses_demand_year': pd.Series({'ELECTRICITY': 4.0}),
+            },
+        }
+        expected = poi_backend.build_full_model(data, solver='highs', verbose=False,
+                                                enable_output=False)['objective']
+
+        model = build_core_model_xarray(create_full_dataset_xarray(data))
+        assert solve(model) == pytest.approx(expected)
@@ -0,0 +1,117 @@
+"""
+Tests for the native AMPL .dat parser.
+
+This module checks the supported data-language constructs on small inline
+files and verifies that the bundled ESTD core dataset is read completely.
+"""
+
+from pathlib import Path
+
+import pytest
+import pandas as pd
+
+from energyscope.dat_parser import load_dat_data, parse_dat_files
+
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "src" / "energyscope" / "data"
+CORE_MOD = DATA_DIR / "models" / "core" / "td" / "ESTD_model_core.mod"
+CORE_DATS = [
+    DATA_DIR / "datasets" / "core" / "td" / "ESTD_12TD.dat",
+    DATA_DIR / "datasets" / "core" / "td" / "ESTD_data_core.dat",
+]
+
+
+SAMPLE_DAT = """
+# comment line
+set TECHS := PV WIND  BATT; # trailing comment
+set T_H_TD :=
+( 1 , 1 , 1 )
+( 2 , 2 , 1 )
+;
+set TECH_OF_TYPE["ELEC"] := PV WIND;
+param i_rate := 0.015;
+param:	batt_size := # single column table
+BATT	4.4
+;
+param :	c_inv	f_max :=
+PV	100	Infinity
+WIND	80	.
+;
+param eff :	ELEC	HEAT =
+PV	1	0
+WIND	1	0
+;
+param cf :=
+["PV",*,*]:	1	2 :=
+1	0.0	0.1
+2	0.5	0.6
+;
+param loss default 0 :=
+ELEC 0.05
+;
+let c_inv['BATT'] := 50;
+"""
+
+
+class TestDatParser:
+    """Test suite for the individual .dat constructs."""
+
+    @pytest.fixture
+    def parsed(self, tmp_path):
+        dat_file = tmp_path / "sample.dat"
+        dat_file.write_text(SAMPLE_DAT)
+        return parse_dat_files(dat_file)
+
+    def test_sets(self, parsed):
+        sets, _ = parsed
+        assert sets['TECHS'] == ['PV', 'WIND', 'BATT']
+        assert sets['T_H_TD'] == [(1, 1, 1), (2, 2, 1)]
+        assert sets['TECH_OF_TYPE'] == {'ELEC': ['PV', 'WIND']}
+
+    def test_scalar_and_columns(self, parsed):
+        _, params = parsed
+        assert params['i_rate'] == 0.015
+        assert params['batt_size']['BATT'] == 4.4
+        assert params['f_max']['PV'] == float('inf')
+        assert 'WIND' not in params['f_max'].index
+        assert params['c_inv']['BATT'] == 50.0
+
+    def test_tables_and_slices(self, parsed):
+        _, params = parsed
+        assert isinstance(params['eff'].index, pd.MultiIndex)
+        assert params['eff'][('PV', 'ELEC')] == 1.0
+        assert params['eff'][('WIND', 'HEAT')] == 0.0
+        assert params['cf'][('PV', 2, 1)] == 0.5
+        assert params['cf'][('PV', 1, 2)] == 0.1
+        assert params['loss']['ELEC'] == 0.05
+
+
+class TestCoreDataset:
+    """Test suite for the full ESTD core dataset."""
+
+    @pytest.fixture(scope="class")
+    def core_data(self):
+        return load_dat_data(CORE_MOD, CORE_DATS)
+
+    def test_sets(self, core_data):
+        sets = core_data['sets']
+        assert len(sets['T_H_TD']) == 8760
+        assert sets['PERIODS'] == list(range(1, 8761))
+        assert len(sets['HOURS']) == 24
+        assert len(sets['TYPICAL_DAYS']) == 12
+        assert set(sets['STORAGE_TECH']) <= set(sets['TECHNOLOGIES'])
+        assert 'HEAT_LOW_T_DHN' in sets['LAYERS']
+        assert 'BIOETHANOL' not in sets['LAYERS']
+
+    def test_parameters(self, core_data):
+        sets, params = core_data['sets'], core_data['parameters']
+        n_tech = len(sets['TECHNOLOGIES'])
+        assert len(params['c_p_t']) == n_tech * 24 * 12
+        assert params['c_p_t'][('CCGT', 1, 1)] == 1.0
+        assert len(params['t_op']) == 24 * 12
+        assert list(params['t_op'].index.names) == ['hour', 'td']
+        assert params['total_time'] == 8760.0
+        assert params['end_uses_input']['ELECTRICITY'] == pytest.approx(
+            params['end_uses_demand_year'].loc['ELECTRICITY'].sum()
+        )
+        assert len(params['vehicle_capacity']) == n_tech
@@ -0,0 +1,84 @@
+"""
+Tests for the on-disk dataset cache.
+"""
+
+import pytest
+import pandas as pd
+
+from energyscope import data_cache
+from energyscope.data_cache import cached_dataset, dataset_key, load_dataset, save_dataset
+
+
+@pytest.fixture
+def sample_data():
+    index = pd.MultiIndex.from_tuples([('PV', 1, 1), ('PV', 2, 1)])
+    return {
+        'sets': {
+            'TECHNOLOGIES': ['PV', 'WIND'],
+            'T_H_TD': [(1, 1, 1), (2, 2, 1)],
+            'TECH_OF_TYPE': {'ELECTRICITY': ['PV', 'WIND']},
+        },
+        'parameters': {
+            'i_rate': 0.015,
+            'f_max': pd.Series([10.0, 5.0], index=['PV', 'WIND'], name='f_max'),
+            'c_p_t': pd.Series([0.1, 0.5], index=index, name='c_p_t'),
+        },
+        'time_series': {},
+    }
+
+
+class TestDataCache:
+    """Test suite for dataset caching."""
+
+    def test_roundtrip(self, sample_data, tmp_path):
+        save_dataset(sample_data, tmp_path / "entry")
+        loaded = load_dataset(tmp_path / "entry")
+
+        assert loaded['sets'] == sample_data['sets']
+        assert loaded['parameters']['i_rate'] == 0.015
+        pd.testing.assert_series_equal(loaded['parameters']['f_max'], sample_data['parameters']['f_max'])
+        pd.testing.assert_series_equal(loaded['parameters']['c_p_t'], sample_data['parameters']['c_p_t'])
+
+    def test_key_depends_on_content(self, tmp_path):
+        dat_file = tmp_path / "data.dat"
+        dat_file.write_text("param i_rate := 0.015;")
+        key = dataset_key([dat_file])
+        assert dataset_key([dat_file]) == key
+        assert dataset_key([dat_file], tag='ampl') != key
+
+        dat_file.write_text("param i_rate := 0.02;")
+        assert dataset_key([dat_file]) != key
+
+    def test_key_depends_on_parser(self, tmp_path, monkeypatch):
+        dat_file, parser_file = tmp_path / "data.dat", tmp_path / "dat_parser.py"
+        dat_file.write_text("param i_rate := 0.015;")
+        parser_file.write_text("VERSION = 1")
+        monkeypatch.setattr(data_cache, 'PARSER_FILES', (parser_file,))
+        key = dataset_key([dat_file])
+
+        parser_file.write_text("VERSION = 2")
+        assert dataset_key([dat_file]) != key
+
+    def test_key_depends_on_loader(self, tmp_path):
+        dat_file, loader_file = tmp_path / "data.dat", tmp_path / "data_loader.py"
+        dat_file.write_text("param i_rate := 0.015;")
+        loader_file.write_text("SCALE = 1")
+        key = dataset_key([dat_file], tag='ampl', sources=[loader_file])
+        assert key != dataset_key([dat_file], tag='ampl')
+
+        loader_file.write_text("SCALE = 2")
+        assert dataset_key([dat_file], tag='ampl', sources=[loader_file]) != key
+
+    def test_loader_called_once(self, sample_data, tmp_path):
+        dat_file = tmp_path / "data.dat"
+        dat_file.write_text("param i_rate := 0.015;")
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return sample_data
+
+        cached_dataset([dat_file], loader, cache_dir=tmp_path / "cache")
+        data = cached_dataset([dat_file], loader, cache_dir=tmp_path / "cache")
+        assert len(calls) == 1
+        assert data['sets']['T_H_TD'] == [(1, 1, 1), (2, 2, 1)]
@@ -0,0 +1,230 @@
+"""
+Tests for the AMPL-independent parts of Energyscope.calc_sequence.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("amplpy")
+
+from energyscope import energyscope as es_module
+from energyscope.energyscope import Energyscope, _with_solver_threads
+from energyscope.result import Result
+
+
+def sequence_data(**values):
+    """Sequence DataFrame varying the scalar parameter i_rate."""
+    data = pd.DataFrame({'param': ['i_rate'], 'index0': [pd.NA], 'index1': [pd.NA], 'index2': [pd.NA],
+                         'index3': [pd.NA]})
+    for name, value in values.items():
+        data[name] = [value]
+    return data
+
+
+class ThreadPool(ThreadPoolExecutor):
+    """Stand-in for the process pool of calc_sequence, running the workers in threads."""
+
+    def __init__(self, max_workers, mp_context=None, initializer=None, initargs=()):
+        super().__init__(max_workers=max_workers, initializer=initializer, initargs=initargs)
+
+
+class TestSolverThreads:
+    """Test suite for _with_solver_threads."""
+
+    def test_appended(self):
+        assert _with_solver_threads({'solver': 'gurobi'}, 2) == {'solver': 'gurobi', 'gurobi_options': 'threads=2'}
+        options = _with_solver_threads({'solver': 'highs', 'highs_options': 'time_limit=60'}, 4)
+        assert options['highs_options'] == 'time_limit=60 threads=4'
+
+    def test_overridden(self):
+        solver_options = {'solver': 'gurobi', 'gurobi_options': 'threads=8 mipgap=1e-3'}
+        options = _with_solver_threads(solver_options, 2)
+        assert options['gurobi_options'] == 'threads=2 mipgap=1e-3'
+        # The caller's options are not modified
+        assert solver_options['gurobi_options'] == 'threads=8 mipgap=1e-3'
+        # Options merely ending in 'threads' are kept
+        options = _with_solver_threads({'solver': 'cplex', 'cplex_options': 'barthreads=8'}, 2)
+        assert options['cplex_options'] == 'barthreads=8 threads=2'
+
+
+class TestParallelSequence:
+    """Test suite for the process-parallel mode of calc_sequence, with stub workers."""
+
+    def test_results_in_run_order(self, monkeypatch):
+        finished = []
+
+        def run_worker(groups, values, col_name, id_run, parser):
+            # Earlier runs finish last
+            time.sleep(0.05 * (4 - id_run))
+            finished.append(id_run)
+            return Result(objectives={'TotalCost': pd.DataFrame({'TotalCost': [values[0]], 'Run': id_run})})
+
+        monkeypatch.setattr(es_module, 'ProcessPoolExecutor', ThreadPool)
+        monkeypatch.setattr(es_module, '_init_sequence_worker', lambda config: None)
+        monkeypatch.setattr(es_module, '_run_sequence_worker', run_worker)
+        data = sequence_data(value1=0.01, value2=0.02, value3=0.03)
+        result = Energyscope(solver_options={'solver': 'highs'}).calc_sequence(data, n_workers=3,
+                                                                               deduplicate_parameters=False)
+
+        assert finished == [3, 2, 1]
+        total_cost = result.objectives['TotalCost']
+        assert list(total_cost['Run']) == [1, 2, 3]
+        assert list(total_cost['TotalCost']) == [0.01, 0.02, 0.03]
+
+    def test_worker_configuration(self, monkeypatch):
+        configs = []
+        monkeypatch.setattr(es_module, 'ProcessPoolExecutor', ThreadPool)
+        monkeypatch.setattr(es_module, '_init_sequence_worker', configs.append)
+        monkeypatch.setattr(es_module, '_run_sequence_worker',
+                            lambda groups, values, col_name, id_run, parser: Result())
+        data = sequence_data(value1=0.01, value2=0.02)
+        Energyscope(solver_options={'solver': 'highs'}).calc_sequence(data, n_workers=4, threads_per_worker=3)
+
+        assert configs and configs[0]['threads'] == 3
+        assert configs[0]['solver_options']['highs_options'] == 'threads=3'
+
+
+class FakeParameter:
+    """Records the values pushed to an AMPL parameter."""
+
+    def __init__(self):
+        self.values = {}
+
+    def set(self, value):
+        self.values[None] = value
+
+    def set_values(self, frame):
+        for key, value in frame.iloc[:, 0].items():
+            self.values[key] = value
+
+
+class FakeAMPL:
+    """AMPL stand-in with a loaded model, whose solves do nothing."""
+    solve_result_num = 0
+
+    def __init__(self):
+        self.parameters = {}
+
+    def get_parameter(self, name):
+        return self.parameters.setdefault(name, FakeParameter())
+
+    def getSets(self):
+        return ['TECHNOLOGIES']
+
+    def solve(self):
+        pass
+
+
+def run_values(data, col_name='value1'):
+    """Values pushed to AMPL for one run, as {param: {index: value}}."""
+    es = Energyscope()
+    ampl = FakeAMPL()
+    es._Energyscope__es_model = ampl
+    es._set_run_values(Energyscope._group_sequence_data(data), data[col_name].to_numpy(), col_name)
+    return {name: parameter.values for name, parameter in ampl.parameters.items()}
+
+
+class TestSequenceGroups:
+    """Test suite for the grouping of calc_sequence rows into one AMPL call per parameter."""
+
+    DATA = pd.DataFrame({
+        'param': ['i_rate', 'c_inv', 'c_inv', 'layers_in_out', 'c_inv', 'i_rate', 'layers_in_out'],
+        'index0': [pd.NA, 'PV', 'WIND', 'PV', 'PV', pd.NA, 'PV'],
+        'index1': [pd.NA, pd.NA, pd.NA, 'ELECTRICITY', pd.NA, pd.NA, 'HEAT'],
+        'index2': [pd.NA] * 7,
+        'index3': [pd.NA] * 7,
+        'value1': [0.01, 100.0, 80.0, 1.0, 120.0, 0.02, -0.5],
+    })
+
+    def test_groups(self):
+        groups = {name: (index, positions) for name, index, positions
+                  in Energyscope._group_sequence_data(self.DATA)}
+
+        assert set(groups) == {'i_rate', 'c_inv', 'layers_in_out'}
+        index, positions = groups['i_rate']
+        assert index is None and list(positions) == [5]
+        index, positions = groups['c_inv']
+        assert list(index) == ['WIND', 'PV'] and list(positions) == [2, 4]
+        index, positions = groups['layers_in_out']
+        assert list(index) == [('PV', 'ELECTRICITY'), ('PV', 'HEAT')] and list(positions) == [3, 6]
+
+    def test_arities_within_one_parameter(self):
+        data = pd.DataFrame({'param': ['p', 'p', 'p'], 'index0': ['A', 'A', pd.NA],
+                             'index1': [pd.NA, 'B', pd.NA], 'index2': [pd.NA] * 3, 'index3': [pd.NA] * 3,
+                             'value1': [1.0, 2.0, 3.0]})
+        groups = Energyscope._group_sequence_data(data)
+
+        # One group per index arity, each set in its own call
+        assert [(name, None if index is None else list(index)) for name, index, _ in groups] == \
+            [('p', ['A']), ('p', [('A', 'B')]), ('p', None)]
+        assert run_values(data) == {'p': {'A': 1.0, ('A', 'B'): 2.0, None: 3.0}}
+
+    def test_same_values_as_row_by_row_updates(self):
+        expected = {}
+        for _, row in self.DATA.iterrows():
+            index = tuple(value for value in row[['index0', 'index1', 'index2', 'index3']] if not pd.isna(value))
+            key = None if not index else index[0] if len(index) == 1 else index
+            expected.setdefault(row['param'], {})[key] = row['value1']
+
+        assert run_values(self.DATA) == expected
+        # Duplicated (param, index) rows: the last one wins
+        assert expected['c_inv']['PV'] == 120.0 and expected['i_rate'][None] == 0.02
+
+
+def parse_annualisation(ampl, id_run=None):
+    """Parser stub reporting i_rate and the annualisation factor tau the model computes from it."""
+    i_rate = ampl.get_parameter('i_rate').values[None]
+    lifetime = pd.Series({'PV': 25.0, 'WIND': 20.0})
+    tau = i_rate * (1 + i_rate) ** lifetime / ((1 + i_rate) ** lifetime - 1)
+    return Result(parameters={
+        'i_rate': pd.DataFrame({'i_rate': [i_rate], 'Run': id_run}),
+        'tau': pd.DataFrame({'tau': tau, 'Run': id_run}),
+        'lifetime': pd.DataFrame({'lifetime': lifetime, 'Run': id_run}),
+    })
+
+
+class TestParameterDeduplication:
+    """Test suite for the deduplicated parameters of calc_sequence."""
+
+    def test_computed_parameters_are_kept_per_run(self):
+        es = Energyscope()
+        es._Energyscope__es_model = FakeAMPL()
+        result = es.calc_sequence(sequence_data(value1=0.1, value2=0.2), parser=parse_annualisation)
+
+        tau = result.parameters['tau']
+        for run, i_rate in ((1, 0.1), (2, 0.2)):
+            rows = tau.loc[tau['Run'] == run, 'tau']
+            assert rows['WIND'] == pytest.approx(i_rate * (1 + i_rate) ** 20 / ((1 + i_rate) ** 20 - 1))
+        assert list(result.parameters['i_rate']['i_rate']) == [0.1, 0.2]
+        # Parameters that do not change are stored once
+        assert 'lifetime' in result.parameters.invariant and 'tau' in result.parameters.base
+
+    def test_runs_reduced_before_next_solve(self, monkeypatch):
+        parsed = []
+
+        def parser(ampl, id_run=None):
+            # The parameters of the previous runs were already reduced to their changes
+            assert all(result.parameters == {} for result in parsed)
+            parsed.append(parse_annualisation(ampl, id_run))
+            return parsed[-1]
+
+        es = Energyscope()
+        es._Energyscope__es_model = FakeAMPL()
+        result = es.calc_sequence(sequence_data(value1=0.1, value2=0.2, value3=0.3), parser=parser)
+        assert list(result.parameters['i_rate']['i_rate']) == [0.1, 0.2, 0.3]
+
+        # Same in parallel mode, as the results come back from the workers
+        def run_worker(groups, values, col_name, id_run, parser):
+            ampl = FakeAMPL()
+            ampl.get_parameter('i_rate').set(values[0])
+            return parse_annualisation(ampl, id_run)
+
+        monkeypatch.setattr(es_module, 'ProcessPoolExecutor', ThreadPool)
+        monkeypatch.setattr(es_module, '_init_sequence_worker', lambda config: None)
+        monkeypatch.setattr(es_module, '_run_sequence_worker', run_worker)
+        result = Energyscope().calc_sequence(sequence_data(value1=0.1, value2=0.2), n_workers=2)
+        assert list(result.parameters['i_rate']['i_rate']) == [0.1, 0.2]
+        assert 'lifetime' in result.parameters.invariant and 'tau' in result.parameters.base
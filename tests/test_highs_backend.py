@@ -0,0 +1,86 @@
+"""
+Tests for the direct HiGHS matrix backend.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+highspy = pytest.importorskip("highspy")
+
+from energyscope.highs_backend import MatrixModel, build_core_model_highs, parse_highs_result
+from energyscope.pyoptinterface_backend.assembly import ConstraintBlock
+
+
+class TestMatrixModel:
+    """Test suite for MatrixModel."""
+
+    def test_solve_and_map_back(self):
+        # min F[a] + 2 F[b] s.t. F[a] + F[b] >= 3, F[a] <= 1 (masked F[c] not created)
+        model = MatrixModel()
+        F = model.add_variables('F', [pd.Index(['a', 'b', 'c'], name='tech')], upper=[1.0, np.inf, np.inf],
+                                mask=[True, True, False])
+        block = ConstraintBlock(1)
+        block.add_terms(F.index, 1.0, 0)
+        model.add_constraints('demand', block, '>=', 3.0)
+        model.add_objective(F.index, [1.0, 2.0, 5.0])
+
+        assert model.n_cols == 2
+        assert model.solve() == highspy.HighsModelStatus.kOptimal
+        assert model.objective == pytest.approx(5.0)
+        values = model.values('F')
+        assert values[:2] == pytest.approx([1.0, 2.0])
+        assert np.isnan(values[2])
+        assert model.duals('demand') == pytest.approx([2.0])
+
+    def test_duplicate_family(self):
+        model = MatrixModel()
+        model.add_variables('F', [['a']])
+        with pytest.raises(ValueError):
+            model.add_variables('F', [['b']])
+
+    def test_no_solution_before_solve(self):
+        with pytest.raises(ValueError):
+            MatrixModel().solution()
+
+
+class TestCoreModelHighs:
+    """Test suite for build_core_model_highs."""
+
+    @pytest.mark.parametrize('storage_formulation', ['chronological', 'intra_inter'])
+    @pytest.mark.parametrize('kwargs', [{}, {'daily': True}, {'loss': 0.01}])
+    def test_matches_xarray_model(self, storage_formulation, kwargs, storage_dataset, xarray_objective):
+        data = storage_dataset(**kwargs)
+        model = build_core_model_highs(data, storage_formulation=storage_formulation, verbose=False)
+        model.solve()
+        assert model.objective == pytest.approx(xarray_objective(data, storage_formulation))
+
+    def test_structural_zeros_not_created(self, storage_dataset):
+        model = build_core_model_highs(storage_dataset(), verbose=False)
+
+        # PV has no F_t on the dark typical day, the battery (not daily storage) none at all
+        F_t = model.variables['F_t']
+        entities = list(F_t.labels[0])
+        assert (F_t.index[entities.index('PV'), :, 1] == -1).all()
+        assert (F_t.index[entities.index('BATT')] == -1).all()
+        # One storage level per period
+        assert model.variables['Storage_level'].shape == (1, 6)
+
+    def test_unknown_formulation(self, storage_dataset):
+        with pytest.raises(ValueError):
+            build_core_model_highs(storage_dataset(), storage_formulation='hourly', verbose=False)
+
+    def test_parse_result(self, storage_dataset):
+        data = storage_dataset()
+        model = build_core_model_highs(data, verbose=False)
+        model.solve()
+        result = parse_highs_result(model, data, id_run=1, duals=True)
+
+        assert result.objectives['TotalCost']['TotalCost'].iloc[0] == pytest.approx(model.objective)
+        assert result.variables['TotalCost']['TotalCost'].iloc[0] == pytest.approx(model.objective)
+        assert result.variables['F'].loc['PV', 'F'] > 0
+        # Missing variables are reported as 0 over the full product of the sets
+        assert len(result.variables['Storage_in']) == 1 * 2 * 2 * 2
+        assert not result.variables['F_t']['F_t'].isna().any()
+        assert 'layer_balance' in result.constraints
+        assert (result.variables['F']['Run'] == 1).all()
@@ -0,0 +1,86 @@
+"""
+Tests for the persistent parametric PyOptInterface model.
+"""
+
+import pandas as pd
+import pytest
+
+poi = pytest.importorskip("pyoptinterface")
+
+from energyscope.pyoptinterface_backend import ParametricModel, build_full_model
+from energyscope.synthetic import create_synthetic_dataset
+
+
+@pytest.fixture
+def data():
+    """Two hours of electricity demand (2 each) met by PV (sunny in hour 1 only) and CCGT burning gas."""
+    return {
+        'sets': {
+            'TECHNOLOGIES': ['CCGT', 'PV'], 'STORAGE_TECH': [], 'RESOURCES': ['GAS'],
+            'LAYERS': ['ELECTRICITY', 'GAS'], 'END_USES_TYPES': ['ELECTRICITY'],
+            'HOURS': [1, 2], 'TYPICAL_DAYS': [1], 'PERIODS': [1, 2], 'T_H_TD': [(1, 1, 1), (2, 2, 1)],
+        },
+        'parameters': {
+            'f_max': pd.Series({'CCGT': 10.0, 'PV': 10.0}), 'f_min': pd.Series({'CCGT': 0.0, 'PV': 0.0}),
+            'c_p_t': pd.Series({('PV', 1, 1): 1.0, ('PV', 2, 1): 0.0}),
+            'layers_in_out': pd.Series({('GAS', 'GAS'): 1.0, ('CCGT', 'ELECTRICITY'): 1.0, ('CCGT', 'GAS'): -2.0,
+                                        ('PV', 'ELECTRICITY'): 1.0}),
+            'avail': pd.Series({'GAS': float('inf')}),
+            't_op': pd.Series({(1, 1): 1.0, (2, 1): 1.0}),
+            'c_inv': pd.Series({'CCGT': 1.0, 'PV': 1.0}), 'c_maint': pd.Series({'CCGT': 0.5, 'PV': 0.1}),
+            'c_op': pd.Series({'GAS': 1.0}), 'lifetime': pd.Series({'CCGT': 20.0, 'PV': 20.0}), 'i_rate': 0.05,
+            'gwp_constr': pd.Series({'CCGT': 0.0, 'PV': 0.0}), 'gwp_op': pd.Series({'GAS': 1.0}),
+            'electricity_time_series': pd.Series({(1, 1): 0.0, (2, 1): 0.0}),
+            'heating_time_series': pd.Series({(1, 1): 0.0, (2, 1): 0.0}),
+            'end_uses_demand_year': pd.Series({'ELECTRICITY': 4.0}),
+        },
+    }
+
+
+def cold_objective(data):
+    return build_full_model(data, solver='highs', verbose=False, enable_output=False)['objective']
+
+
+class TestParametricModel:
+    """Test suite for ParametricModel."""
+
+    def test_first_solve_matches_build(self, data):
+        model = ParametricModel(data)
+        assert model.solve() == poi.TerminationStatusCode.OPTIMAL
+        assert model.objective == pytest.approx(cold_objective(data))
+
+    def test_updates_match_rebuild(self, data):
+        model = ParametricModel(data)
+        model.solve()
+        first = model.objective
+
+        model.update_objective_coefficients(c_inv={'CCGT': 3.0}, c_op={'GAS': 0.5})
+        model.update_bounds(f_max={'PV': 1.0})
+        model.update_rhs(avail={'GAS': 8.0})
+        model.solve()
+
+        assert model.objective != pytest.approx(first)
+        assert model.objective == pytest.approx(cold_objective(model.data))
+        assert data['parameters']['c_inv']['CCGT'] == 1.0
+        assert model.to_result().variables['F'].loc['PV', 'F'] == pytest.approx(1.0)
+
+    def test_gwp_limit(self, data):
+        model = ParametricModel(data)
+        model.update_rhs(gwp_limit=1.0)
+        assert model.solve() == poi.TerminationStatusCode.INFEASIBLE
+        model.update_rhs(gwp_limit=float('inf'))
+        assert model.solve() == poi.TerminationStatusCode.OPTIMAL
+
+    def test_warm_start(self):
+        data = create_synthetic_dataset(n_technologies=12, n_storage=3, n_layers=6, n_resources=5,
+                                        n_typical_days=3, n_periods=24 * 10)
+        model = ParametricModel(data)
+        model.solve()
+        model.update_rhs(gwp_limit=0.9 * model.model.get_value(model.variables['TotalGWP']))
+        model.solve()
+
+        # The re-solve starts from the basis HiGHS kept from the first solve
+        cold = build_full_model(model.data, solver='highs', verbose=False, enable_output=False)
+        assert model.objective == pytest.approx(cold['objective'])
+        iterations = model.model.get_raw_info_int('simplex_iteration_count')
+        assert 0 < iterations < cold['model'].get_raw_info_int('simplex_iteration_count')
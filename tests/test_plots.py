@@ -0,0 +1,171 @@
+"""
+Tests for the Sankey flows of the plotting module.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("plotly")
+pytest.importorskip("ipywidgets")
+
+from energyscope.plots import generate_sankey_flows
+from energyscope.result import Result
+
+# (technology, layer, flow) of one run; positive flows are outputs of the technology
+FLOWS = [
+    ('PV_ROOF', 'ELECTRICITY_LV', 3.0),
+    ('CCGT', 'ELECTRICITY_HV', 5.0), ('CCGT', 'NG_HP', -9.0),
+    ('TRAFO_HM', 'ELECTRICITY_HV', -4.0), ('TRAFO_HM', 'ELECTRICITY_MV', 3.9),
+    ('ELEC_EXPORT', 'ELECTRICITY_HV', -0.5),
+    ('NG_HP', 'NG_HP', 12.0), ('RES_WIND', 'RES_WIND', 2.0), ('WIND', 'RES_WIND', -2.0),
+    ('WIND', 'ELECTRICITY_HV', 2.0),
+    ('H2_ELECTROLYSIS', 'ELECTRICITY_MV', -1.0), ('H2_ELECTROLYSIS', 'H2_HP', 0.7),
+    ('NG_EHP', 'NG_HP', -1.5), ('NG_EHP', 'HEAT_LOW_T_DECEN', 3.0),
+    ('DHN_HP_ELEC', 'ELECTRICITY_LV', -1.0), ('DHN_HP_ELEC', 'HEAT_LOW_T_DHN', 3.5),
+    ('BOILER_GAS', 'NG_HP', -2.0), ('BOILER_GAS', 'HEAT_HIGH_T', 1.8),
+    ('CAR_BEV', 'ELECTRICITY_LV', -0.8), ('CAR_BEV', 'MOB_PRIVATE', 4.0),
+    ('BUS_DIESEL', 'DIESEL', -0.6), ('BUS_DIESEL', 'MOBILITY_PASSENGER_PUBLIC', 2.5),
+    ('TRAIN_ELEC', 'ELECTRICITY_MV', -0.4), ('TRAIN_ELEC', 'MOBILITY_FREIGHT_RAIL', 1.2),
+    ('DIESEL', 'DIESEL', 0.6),
+    ('DAC', 'CO2_ATM', -1.0), ('DAC', 'CO2_CAPTURED', 1.0), ('CO2_TO_DIESEL', 'CO2_CAPTURED', -1.0),
+    ('CO2_TO_DIESEL', 'DIESEL', 0.3),
+]
+
+SETS = {
+    'END_USES_TYPES_OF_CATEGORY': {'HEAT_LOW_T': ['HEAT_LOW_T_DHN', 'HEAT_LOW_T_DECEN'],
+                                   'MOBILITY_PASSENGER': ['MOBILITY_PASSENGER_PUBLIC'],
+                                   'ELECTRICITY': ['ELECTRICITY_LV', 'ELECTRICITY_MV']},
+    'ELECTRICITY_LAYERS': pd.DataFrame({'ELECTRICITY_LAYERS': ['ELECTRICITY_LV', 'ELECTRICITY_MV',
+                                                               'ELECTRICITY_HV']}),
+    'NG_LAYERS': pd.DataFrame({'NG_LAYERS': ['NG_HP']}),
+    'H2_LAYERS': pd.DataFrame({'H2_LAYERS': ['H2_HP']}),
+}
+
+TECHNOLOGY_TYPES = ['COGEN', 'BOILER', 'HP', 'DIRECT_ELEC', 'PV', 'RENOVATION']
+
+
+def sankey_result(runs=(1, 2)) -> Result:
+    """Result with the monthly flows of several runs (two months per flow, scaled per run)."""
+    rng = np.random.default_rng(0)
+    rows = [(run, tech, layer, flow * run * share, month)
+            for run in runs for tech, layer, flow in FLOWS for month, share in ((1, 0.4), (2, 0.6))]
+    df_monthly = pd.DataFrame(rows, columns=['Run', 'Technologies', 'Flow', 'Monthly_flow', 'Month'])
+    demand = pd.DataFrame([(layer, sector, value * run, run)
+                           for run in runs
+                           for layer, sector, value in (('ELECTRICITY_LV', 'HOUSEHOLDS', 2.0),
+                                                        ('ELECTRICITY_LV', 'SERVICES', 1.0),
+                                                        ('ELECTRICITY_MV', 'INDUSTRY', rng.uniform(1, 2)),
+                                                        ('HEAT_LOW_T_DHN', 'HOUSEHOLDS', 4.0),
+                                                        ('ELECTRICITY_MV', 'TRANSPORT', 0.0))],
+                          columns=['index0', 'index1', 'end_uses_demand_year', 'Run'])
+    return Result(parameters={'end_uses_demand_year': demand}, sets=SETS,
+                  postprocessing={'df_monthly': df_monthly})
+
+
+def reference_flows(result: Result, run, aggregate_mobility, aggregate_grid, aggregate_technology) -> pd.Series:
+    """Sankey flows of one run, computed row by row: value by (source, target)."""
+    monthly = result.postprocessing['df_monthly']
+    totals = monthly[monthly['Run'] == run].groupby(['Technologies', 'Flow'])['Monthly_flow'].sum()
+    rows = {}
+    for (tech, layer), value in totals.items():
+        source, target = (tech, layer) if value > 0 else (layer, tech)
+        rows[source, target] = rows.get((source, target), 0.0) + abs(value)
+
+    flows = []
+    for (source, target), value in rows.items():
+        if source == target:
+            source = 'IMP_' + source
+        if source.startswith('IMP_RES'):
+            continue
+        if any('CO2_' in name and name not in ('CO2_TO_DIESEL', 'CO2_TO_JETFUELS') for name in (source, target)):
+            continue
+        flows.append([source, target, value])
+
+    # pkm/tkm of MOB_ layers are replaced by the total input of the technology
+    inputs = {}
+    for source, target, value in flows:
+        inputs[target] = inputs.get(target, 0.0) + value
+    for flow in flows:
+        if flow[1].startswith('MOB_') and flow[0] in inputs:
+            flow[2] = inputs[flow[0]]
+
+    demand = result.parameters['end_uses_demand_year']
+    demand = demand[(demand['Run'] == run) & (demand['end_uses_demand_year'] > 0)]
+    for layer, value in demand.groupby('index0')['end_uses_demand_year'].sum().items():
+        if 'ELECTRICITY' in layer:
+            flows.append([layer, 'EUD_' + layer, value])
+
+    category = {layer: name for name, layers in SETS['END_USES_TYPES_OF_CATEGORY'].items() for layer in layers}
+    flows = [[category.get(source, source), category.get(target, target), value] for source, target, value in flows]
+
+    if aggregate_mobility:
+        mobility = [flow for flow in flows if flow[1].startswith('MOBILITY_')]
+        mobility_techs = {source for source, _, _ in mobility}
+        fuels = [flow for flow in flows if flow[1] in mobility_techs]
+        flows = [flow for flow in flows if not flow[1].startswith('MOBILITY_') and flow[1] not in mobility_techs]
+        flows += [[source.split('_')[0], target.rsplit('_', 1)[0], value] for source, target, value in mobility]
+        flows += [[source, target.split('_')[0], value] for source, target, value in fuels]
+
+    if aggregate_grid:
+        grids = ('EXP', 'TRAFO', 'COMP')
+        aggregated = []
+        for layer_set, carrier, pattern in (('ELECTRICITY_LAYERS', 'ELECTRICITY', 'ELECTRICITY_'),
+                                            ('NG_LAYERS', 'NG', 'NG_'), ('H2_LAYERS', 'H2', 'H2_')):
+            layers = set(SETS[layer_set][layer_set])
+            selected = [flow for flow in flows if (pattern in flow[0] or pattern in flow[1])
+                        and not (carrier == 'ELECTRICITY' and 'EXPORT' in flow[1])]
+            flows = [flow for flow in flows if not any(flow is other for other in selected)]
+            if carrier == 'ELECTRICITY':
+                flows = [['ELECTRICITY', target, value] if 'EXPORT' in target else [source, target, value]
+                         for source, target, value in flows]
+            aggregated += [[carrier if source in layers else source, carrier if target in layers else target, value]
+                           for source, target, value in selected
+                           if not any(grid in source or grid in target for grid in grids)]
+        flows += aggregated
+
+    if aggregate_technology:
+        def aggregate(name):
+            if pd.Series([name]).str.contains(r'(?:NG|H2|IMP_H2)_(?:EHP|HP)', regex=True).iloc[0]:
+                return name
+            for tech in TECHNOLOGY_TYPES:
+                if tech in name:
+                    name = tech
+            return name
+        flows = [[aggregate(source), aggregate(target), value] for source, target, value in flows]
+
+    frame = pd.DataFrame(flows, columns=['source', 'target', 'value'])
+    return frame.groupby(['source', 'target'])['value'].sum()
+
+
+class TestSankeyFlows:
+    """Test suite for generate_sankey_flows."""
+
+    @pytest.mark.parametrize('flags', list(itertools.product([False, True], repeat=3)))
+    def test_same_flows_as_reference(self, flags):
+        result = sankey_result()
+        for run in (1, 2):
+            flows = generate_sankey_flows(result, *flags, run_id=run)
+            assert set(flows.columns) == {'target', 'source', 'value'}
+            actual = flows.groupby(['source', 'target'])['value'].sum()
+            expected = reference_flows(result, run, *flags)
+            pd.testing.assert_series_equal(actual.sort_index(), expected.sort_index(), check_names=False)
+
+    def test_unknown_run(self):
+        assert generate_sankey_flows(sankey_result(), True, True, True, run_id=3).empty
+
+    def test_cache(self):
+        result = sankey_result()
+        first = generate_sankey_flows(result, True, True, True, run_id=1)
+        assert (True, True, True) in result.sankey_flows['flows']
+
+        # Replacing the inputs invalidates the cached flows
+        result.parameters = {'end_uses_demand_year': result.parameters['end_uses_demand_year'].assign(
+            end_uses_demand_year=lambda frame: frame['end_uses_demand_year'] * 2)}
+        second = generate_sankey_flows(result, True, True, True, run_id=1)
+        assert second['value'].sum() > first['value'].sum()
+
+        # Results built from others start with an empty cache
+        assert Result.concat([result]).sankey_flows == {}
@@ -0,0 +1,87 @@
+"""
+Tests for the per-constraint-group build profiler.
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from energyscope.profiling import BuildProfiler
+
+
+class TestBuildProfiler:
+    """Test suite for BuildProfiler."""
+
+    def test_groups_accumulate(self):
+        profiler = BuildProfiler()
+        profiler.start('storage')
+        profiler.add(3, 6, np.array([0, 1, 1]))
+        profiler.start('costs')
+        profiler.add(1)
+        profiler.start('storage')
+        profiler.add(2, 2, np.array([1, 2]))
+        profiler.stop()
+
+        table = profiler.table()
+        assert list(table.index) == ['storage', 'costs']
+        assert table.loc['storage', ['rows', 'nonzeros', 'variables']].tolist() == [5, 8, 3]
+        assert table.loc['costs', 'rows'] == 1
+        assert np.isnan(table.loc['costs', 'nonzeros']) and np.isnan(table.loc['costs', 'variables'])
+        assert (table[['wall_time', 'cpu_time', 'peak_memory']] >= 0).all().all()
+
+    def test_peak_memory(self):
+        profiler = BuildProfiler()
+        with profiler.group('energy_balance'):
+            buffer = np.ones(2_000_000)  # 16 MB
+        del buffer
+
+        assert profiler.table().loc['energy_balance', 'peak_memory'] >= 16
+
+        profiler = BuildProfiler(memory=False)
+        with profiler.group('energy_balance'):
+            pass
+        assert np.isnan(profiler.table().loc['energy_balance', 'peak_memory'])
+
+    def test_disabled(self):
+        profiler = BuildProfiler(enabled=False)
+        with profiler.group('storage'):
+            profiler.add(1)
+        assert profiler.table().empty
+
+
+class TestBackends:
+    """The backends report the same groups for the same model."""
+
+    def test_xarray_and_highs(self, storage_dataset):
+        pytest.importorskip("linopy")
+        from energyscope.highs_backend import build_core_model_highs
+        from energyscope.linopy_backend.core_model_xarray import build_core_model_xarray
+        from energyscope.linopy_backend.data_loader_xarray import create_full_dataset_xarray
+
+        data = storage_dataset()
+        linopy_profiler, highs_profiler = BuildProfiler(memory=False), BuildProfiler(memory=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            m = build_core_model_xarray(create_full_dataset_xarray(data), profiler=linopy_profiler)
+        model = build_core_model_highs(data, verbose=False, profiler=highs_profiler)
+
+        sizes = ['rows', 'nonzeros', 'variables']
+        linopy_table = linopy_profiler.table()
+        assert linopy_table['rows'].sum() == m.ncons
+        assert linopy_table.loc['storage', 'rows'] > 0
+        # Groups without constraints (no heating data) are reported with zero sizes
+        highs_table = model.profile
+        assert (highs_table[sizes] == linopy_table.loc[highs_table.index, sizes]).all().all()
+        assert linopy_profiler.family_groups['storage_level'] == highs_profiler.family_groups['storage_level'] == 'storage'
+
+    def test_pyoptinterface_result(self, storage_dataset):
+        from energyscope.pyoptinterface_backend import build_full_model, parse_pyoptinterface_result
+
+        data = storage_dataset()
+        result = build_full_model(data, solver='highs', verbose=False, enable_output=False,
+                                  profiler=BuildProfiler())
+        profile = result['profile']
+        assert profile['rows'].sum() == sum(len(array) for array in result['constraints'].values())
+        assert profile.loc['storage', 'rows'] > 0
+        assert parse_pyoptinterface_result(result, data).build_profile is profile
@@ -0,0 +1,87 @@
+"""
+Tests for the conversion of PyOptInterface solutions to Result format.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+poi = pytest.importorskip("pyoptinterface")
+from pyoptinterface import highs
+
+from energyscope.pyoptinterface_backend.assembly import ConstraintBlock
+from energyscope.pyoptinterface_backend.registry import VariableRegistry
+from energyscope.pyoptinterface_backend.result_parser import parse_pyoptinterface_result
+
+
+@pytest.fixture
+def solved():
+    """CCGT burning gas to meet a demand of 1 and 2 in two hours (c_inv = 10, c_op gas = 1)."""
+    model = highs.Model()
+    model.set_model_attribute(poi.ModelAttribute.Silent, True)
+    registry = VariableRegistry(model, {'ENTITIES': ['GAS', 'CCGT'], 'HOURS': [1, 2], 'TYPICAL_DAYS': [1]})
+    F = {'CCGT': model.add_variable(lb=0)}
+    F_t = registry.add('F_t', ('ENTITIES', 'HOURS', 'TYPICAL_DAYS'))
+    TotalCost = model.add_variable(lb=0)
+
+    constraints = {}
+    block = ConstraintBlock((2, 1))
+    block.add_terms(F_t.index[1])
+    constraints['demand'] = block.add_to(model, poi.Geq, [[1.0], [2.0]], labels=([1, 2], [1]))
+    block = ConstraintBlock((2, 1))
+    block.add_terms(F_t.index[1])
+    block.add_terms(F['CCGT'].index, -1.0)
+    constraints['capacity_factor_t'] = block.add_to(model, poi.Leq, labels=([1, 2], [1]))
+    block = ConstraintBlock((2, 1))
+    block.add_terms(F_t.index[0])
+    block.add_terms(F_t.index[1], -2.0)
+    constraints['layer_balance'] = block.add_to(model, poi.Eq, labels=([1, 2], [1]))
+    block = ConstraintBlock(1)
+    block.add_terms(TotalCost.index, 1.0)
+    block.add_terms(F['CCGT'].index, -10.0, 0)
+    block.add_terms(F_t.index[0], -1.0, 0)
+    constraints['total_cost'] = block.add_to(model, poi.Eq)
+
+    model.set_objective(TotalCost, poi.ObjectiveSense.Minimize)
+    model.optimize()
+    result = {
+        'model': model, 'registry': registry, 'constraints': constraints,
+        'variables': {'F': F, 'F_t': F_t, 'TotalCost': TotalCost},
+        'status': model.get_model_attribute(poi.ModelAttribute.TerminationStatus),
+    }
+    data = {
+        'sets': {'RESOURCES': ['GAS'], 'TECHNOLOGIES': ['CCGT']},
+        'parameters': {'c_inv': {'CCGT': 10.0}, 'c_op': {'GAS': 1.0}, 'i_rate': 0.015},
+    }
+    return result, data
+
+
+class TestParsePyOptInterfaceResult:
+    """Test suite for parse_pyoptinterface_result."""
+
+    def test_variables_in_ampl_format(self, solved):
+        result = parse_pyoptinterface_result(*solved)
+
+        assert result.objectives['TotalCost']['TotalCost'].iloc[0] == pytest.approx(26.0)
+        F_t = result.variables['F_t']
+        assert list(F_t.index.names) == ['index0', 'index1', 'index2']
+        assert F_t.loc[('GAS', 2, 1), 'F_t'] == pytest.approx(4.0)
+        assert result.variables['F'].loc['CCGT', 'F'] == pytest.approx(2.0)
+        assert result.variables['C_inv'].loc['CCGT', 'C_inv'] == pytest.approx(20.0)
+        assert result.variables['C_op'].loc['GAS', 'C_op'] == pytest.approx(6.0)
+        assert result.parameters['c_inv'].index.name == 'index0'
+        assert result.sets['TECHNOLOGIES']['TECHNOLOGIES'].tolist() == ['CCGT']
+
+    def test_duals_and_run(self, solved):
+        result = parse_pyoptinterface_result(*solved, id_run=3, duals=True, reduced_costs=True)
+
+        demand = result.constraints['demand']['demand']
+        # One more unit in the peak hour costs capacity and gas, in the other hour only gas
+        assert np.abs(demand.to_numpy()) == pytest.approx([2.0, 12.0])
+        assert 'F_t.rc' in result.variables['F_t'] and 'TotalCost.rc' in result.variables['TotalCost']
+        assert (result.variables['F']['Run'] == 3).all()
+
+    def test_not_solved(self, solved):
+        result, data = solved
+        with pytest.raises(ValueError):
+            parse_pyoptinterface_result(dict(result, status=poi.TerminationStatusCode.INFEASIBLE), data)
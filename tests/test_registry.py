@@ -0,0 +1,70 @@
+"""
+Tests for the array-backed variable registry of the PyOptInterface backend.
+"""
+
+import numpy as np
+import pytest
+
+poi = pytest.importorskip("pyoptinterface")
+from pyoptinterface import highs
+
+from energyscope.pyoptinterface_backend.registry import VariableRegistry
+
+
+@pytest.fixture
+def registry():
+    model = highs.Model()
+    model.set_model_attribute(poi.ModelAttribute.Silent, True)
+    return VariableRegistry(model, {'STORAGE_TECH': ['BATT', 'PHS'], 'LAYERS': ['ELEC', 'HEAT'], 'HOURS': [1, 2]})
+
+
+class TestVariableRegistry:
+    """Test suite for VariableRegistry."""
+
+    def test_masked_family(self, registry):
+        storage_in = registry.add('Storage_in', ('STORAGE_TECH', 'LAYERS', 'HOURS'),
+                                  mask=np.array([[True, False], [True, False]])[:, :, None])
+
+        assert len(storage_in) == 4
+        assert storage_in.index[:, 1].tolist() == [[-1, -1], [-1, -1]]
+        assert ('PHS', 'ELEC', 2) in storage_in and ('PHS', 'HEAT', 2) not in storage_in
+        assert storage_in['PHS', 'ELEC', 2].index == storage_in.index[1, 0, 1]
+        with pytest.raises(KeyError):
+            storage_in['PHS', 'HEAT', 2]
+        assert list(storage_in.keys())[:2] == [('BATT', 'ELEC', 1), ('BATT', 'ELEC', 2)]
+
+    def test_names_on_demand(self, registry, tmp_path):
+        level = registry.add('Storage_level', ('STORAGE_TECH', 'HOURS'))
+
+        assert list(level.names()) == ['Storage_level_BATT_1', 'Storage_level_BATT_2',
+                                       'Storage_level_PHS_1', 'Storage_level_PHS_2']
+        assert registry.name_of(int(level.index[1, 0])) == 'Storage_level_PHS_1'
+
+        registry.write(str(tmp_path / "model.lp"))
+        assert registry.model.get_variable_name(level['PHS', 1]) == 'Storage_level_PHS_1'
+
+    def test_solution_gather(self, registry):
+        level = registry.add('Storage_level', ('STORAGE_TECH', 'HOURS'), lb=1.0)
+        flows = registry.add('Storage_out', ('STORAGE_TECH', 'LAYERS'), mask=np.array([True, False])[None, :])
+        model = registry.model
+        model.add_linear_constraint(level['PHS', 2] >= 3.0)
+        model.set_objective(poi.quicksum(level.values()) + poi.quicksum(flows.values()), poi.ObjectiveSense.Minimize)
+        model.optimize()
+
+        solution = registry.solution()
+        assert registry.values('Storage_level', solution).tolist() == [[1.0, 1.0], [1.0, 3.0]]
+        assert np.isnan(registry.values('Storage_out', solution)[:, 1]).all()
+        series = registry.to_series('Storage_level', solution)
+        assert series.loc[('PHS', 2)] == 3.0
+        assert list(series.index.names) == ['STORAGE_TECH', 'HOURS']
+
+    def test_reduced_costs(self, registry):
+        level = registry.add('Storage_level', ('STORAGE_TECH', 'HOURS'), lb=1.0, ub=5.0)
+        model = registry.model
+        model.add_linear_constraint(level['BATT', 1] + level['PHS', 1] >= 4.0)
+        model.set_objective(poi.quicksum((i + 1) * v for i, v in enumerate(level.values())), poi.ObjectiveSense.Minimize)
+        model.optimize()
+
+        values, reduced_costs = registry.solution(), registry.solution(reduced_costs=True)
+        assert values.tolist() == [model.get_value(v) for v in level.values()]
+        assert reduced_costs.tolist() == [model.get_variable_dual(v) for v in level.values()]
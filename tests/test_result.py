@@ -0,0 +1,185 @@
+"""
+Tests for the Result container.
+"""
+
+import pandas as pd
+
+from energyscope.result import LazyFrames, Result, RunParameters, postprocessing
+
+
+def _run_result(id_run):
+    return Result(
+        variables={'F': pd.DataFrame({'index0': ['PV', 'WIND'], 'F': [1.0 * id_run, 2.0], 'Run': id_run})},
+        objectives={'TotalCost': pd.DataFrame({'TotalCost': [10.0 * id_run], 'Run': id_run})},
+        sets={'TECHNOLOGIES': ['PV', 'WIND']},
+    )
+
+
+class TestResultConcat:
+    """Test suite for Result.concat."""
+
+    def test_concat_keeps_run_order(self):
+        merged = Result.concat([_run_result(j) for j in range(1, 4)])
+
+        assert list(merged.variables['F']['Run']) == [1, 1, 2, 2, 3, 3]
+        assert list(merged.objectives['TotalCost']['TotalCost']) == [10.0, 20.0, 30.0]
+        assert merged.sets == {'TECHNOLOGIES': ['PV', 'WIND']}
+
+    def test_concat_entities_missing_in_some_runs(self):
+        first, second = _run_result(1), _run_result(2)
+        second.variables['F_t'] = pd.DataFrame({'F_t': [0.5], 'Run': 2})
+
+        merged = Result.concat([first, second])
+        assert len(merged.variables['F']) == 4
+        assert len(merged.variables['F_t']) == 1
+
+
+class TestLazyFrames:
+    """Test suite for lazily loaded result entities."""
+
+    def test_loaded_on_first_access(self):
+        calls = []
+
+        def loader():
+            calls.append('F')
+            return pd.DataFrame({'F': [1.0]})
+
+        frames = LazyFrames({'F': loader})
+        assert list(frames) == ['F'] and calls == []
+
+        assert frames['F']['F'].iloc[0] == 1.0
+        frames['F']
+        assert calls == ['F']
+
+    def test_materialize_result(self):
+        frames = LazyFrames({'F': lambda: pd.DataFrame({'F': [1.0], 'Run': 1})})
+        result = Result(variables=frames).materialize()
+        assert repr(result.variables) == "LazyFrames(['F'], pending=[])"
+
+
+class TestRunParameters:
+    """Test suite for deduplicated parameters across runs."""
+
+    @staticmethod
+    def _run(id_run):
+        parameters = {
+            'f_max': pd.DataFrame({'f_max': [float(id_run), 5.0]}, index=['PV', 'WIND']).assign(Run=id_run),
+        }
+        if id_run == 1:
+            parameters['i_rate'] = pd.DataFrame({'i_rate': [0.015]}).assign(Run=id_run)
+        return Result(parameters=parameters, objectives={'TotalCost': pd.DataFrame({'TotalCost': [1.0], 'Run': id_run})})
+
+    def test_only_changes_are_stored(self):
+        merged = Result.concat([self._run(j) for j in (1, 2, 3)], varying_parameters=['f_max'])
+
+        assert list(merged.parameters.deltas['f_max'].index) == ['PV', 'PV']
+        assert 'i_rate' in merged.parameters.invariant
+
+    def test_run_tagged_view(self):
+        merged = Result.concat([self._run(j) for j in (1, 2, 3)], varying_parameters=['f_max'])
+
+        f_max = merged.parameters['f_max']
+        assert list(f_max['f_max']) == [1.0, 5.0, 2.0, 5.0, 3.0, 5.0]
+        assert list(f_max['Run']) == [1, 1, 2, 2, 3, 3]
+        assert list(merged.parameters['i_rate']['Run']) == [1, 2, 3]
+
+    def test_unlisted_parameters_are_compared(self):
+        # tau is computed by the model from the swept i_rate: it changes without being listed
+        runs = [Result(parameters={'i_rate': pd.DataFrame({'i_rate': [rate], 'Run': j}),
+                                   'tau': pd.DataFrame({'tau': [rate * 2], 'Run': j}, index=['PV']),
+                                   'f_max': pd.DataFrame({'f_max': [5.0, None], 'Run': j}, index=['PV', 'WIND'])})
+                for j, rate in ((1, 0.1), (2, 0.2))]
+        merged = Result.concat(runs, varying_parameters=['i_rate'])
+
+        assert list(merged.parameters['tau']['tau']) == [0.2, 0.4]
+        assert set(merged.parameters.base) == {'i_rate', 'tau'}
+        # Missing values (NaN) are equal across runs
+        assert 'f_max' in merged.parameters.invariant
+
+    def test_changes_to_nan_roundtrip(self):
+        # PV becomes NaN in run 2, HYDRO appears in run 3
+        techs = ['PV', 'WIND', 'HYDRO']
+        runs = [Result(parameters={'f_max': pd.DataFrame({'f_max': values, 'Run': j}, index=techs[:len(values)])})
+                for j, values in ((1, [5.0, 2.0]), (2, [float('nan'), 2.0]), (3, [5.0, 2.0, 1.0]))]
+        merged = Result.concat(runs, varying_parameters=[])
+
+        f_max = merged.parameters['f_max']
+        pd.testing.assert_frame_equal(f_max, pd.concat([run.parameters['f_max'] for run in runs]))
+        assert f_max.loc[f_max['Run'] == 2, 'f_max'].isna().tolist() == [True, False]
+
+
+class TestParquetArchive:
+    """Test suite for Result.to_parquet / Result.open."""
+
+    @staticmethod
+    def _sweep():
+        results = []
+        for id_run in range(1, 12):
+            index = pd.MultiIndex.from_tuples([('PV', 1), ('WIND', 2)], names=['index0', 'index1'])
+            results.append(Result(
+                variables={'F': pd.DataFrame({'F': [1.0 * id_run, 2.0]}, index=index).assign(Run=id_run)},
+                parameters={'f_max': pd.DataFrame({'f_max': [float(id_run), 5.0]}, index=['PV', 'WIND']).assign(Run=id_run)},
+                sets={'TECHNOLOGIES': pd.DataFrame({'TECHNOLOGIES': ['PV', 'WIND']}), 'TECH_OF_TYPE': {'ELEC': ['PV']}},
+            ))
+        return Result.concat(results, varying_parameters=['f_max'])
+
+    def test_roundtrip(self, tmp_path):
+        result = self._sweep()
+        result.to_parquet(tmp_path / "sweep")
+        opened = Result.open(tmp_path / "sweep")
+
+        assert isinstance(opened.parameters, RunParameters)
+        assert opened.sets['TECH_OF_TYPE'] == {'ELEC': ['PV']}
+        for loaded, original in ((opened.variables['F'], result.variables['F']),
+                                 (opened.parameters['f_max'], result.parameters['f_max'])):
+            assert list(loaded.index) == list(original.index)
+            assert loaded.reset_index(drop=True).equals(original.reset_index(drop=True))
+        assert isinstance(opened.variables['F'].index.levels[0], pd.CategoricalIndex)
+
+    def test_run_and_index_selection(self, tmp_path):
+        self._sweep().to_parquet(tmp_path / "sweep")
+        opened = Result.open(tmp_path / "sweep", runs=[3, 11], filters={'index0': ['PV']})
+
+        assert list(opened.variables['F']['F']) == [3.0, 11.0]
+        assert list(opened.parameters['f_max']['Run']) == [3, 3, 11, 11]
+
+
+class TestPostprocessing:
+    """Test suite for the technology categories used by postprocessing."""
+
+    @staticmethod
+    def _result():
+        techs = ['CCGT', 'CAR_BEV', 'NEWTECH']
+        index = pd.MultiIndex.from_product([techs + ['GAS'], [1, 2]], names=['index0', 'index1'])
+        variables = {name: pd.DataFrame({name: 1.0}, index=pd.Index(techs, name='index0')).assign(Run=1)
+                     for name in ('C_inv', 'C_maint', 'Annual_Prod', 'F_Mult', 'C_op')}
+        variables['F_Mult_t'] = pd.DataFrame({'F_Mult_t': 1.0}, index=index).assign(Run=1)
+        layers = pd.MultiIndex.from_tuples([('CCGT', 'ELECTRICITY_MV'), ('CAR_BEV', 'MOB_PRIVATE'), ('GAS', 'GAS')],
+                                           names=['index0', 'index1'])
+        parameters = {
+            'tau': pd.DataFrame({'tau': 0.1}, index=pd.Index(techs)).assign(Run=1),
+            't_op': pd.DataFrame({'t_op': 1.0}, index=pd.Index([1, 2])).assign(Run=1),
+            'layers_in_out': pd.DataFrame({'layers_in_out': 1.0}, index=layers).assign(Run=1),
+        }
+        sets = {
+            'TECHNOLOGIES': pd.DataFrame({'TECHNOLOGIES': techs}),
+            'RESOURCES': pd.DataFrame({'RESOURCES': ['GAS']}),
+            'TECHNOLOGIES_OF_END_USES_TYPE': {'ELECTRICITY_MV': ['CCGT'], 'MOB_PRIVATE': ['CAR_BEV']},
+        }
+        return Result(variables=variables, parameters=parameters, sets=sets)
+
+    def test_annual_categories(self):
+        annual = postprocessing(self._result(), df_monthly=False).postprocessing['df_annual']
+
+        assert list(annual['Category']) == ['ELECTRICITY_MV', 'MOB_PRIVATE', 'Others']
+        assert list(annual['Category_2']) == ['Electricity', 'Mobility', 'Others']
+        assert list(annual['Sector']) == ['Electricity', 'Mobility', 'Others']
+        assert list(annual['Annual_Use']) == [2.0, 2.0, 2.0]
+
+    def test_monthly_categories(self):
+        monthly = postprocessing(self._result(), df_annual=False).postprocessing['df_monthly']
+
+        by_tech = monthly.drop_duplicates('Technologies').set_index('Technologies')
+        assert by_tech.loc['CAR_BEV', 'Sector'] == 'Mobility'
+        assert by_tech.loc['GAS', 'Category_2'] == 'Resources'
+        assert by_tech.loc['GAS', 'Sector'] == 'Others'
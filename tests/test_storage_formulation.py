@@ -0,0 +1,55 @@
+"""
+Tests for the chronological and intra/inter-day storage level formulations.
+"""
+
+import contextlib
+import io
+
+import pytest
+
+pytest.importorskip("highspy")
+
+
+def pyoptinterface_objective(data, storage_formulation):
+    poi_backend = pytest.importorskip("energyscope.pyoptinterface_backend")
+    return poi_backend.build_full_model(data, solver='highs', verbose=False, enable_output=False,
+                                        storage_formulation=storage_formulation)['objective']
+
+
+@pytest.fixture(params=['xarray', 'pyoptinterface'])
+def objective(request, xarray_objective):
+    """Optimal objective of the full model of each backend."""
+    return xarray_objective if request.param == 'xarray' else pyoptinterface_objective
+
+
+class TestStorageFormulation:
+    """Test suite for the storage_formulation option of the full model builders."""
+
+    @pytest.mark.parametrize('daily', [False, True])
+    def test_same_optimum_without_losses(self, objective, storage_dataset, daily):
+        data = storage_dataset(daily=daily)
+        assert objective(data, 'intra_inter') == pytest.approx(objective(data, 'chronological'))
+
+    def test_conservative_bounds_with_losses(self, objective, storage_dataset):
+        # Bounds on the level within a day are taken at the start of the day, before self-discharge
+        data = storage_dataset(loss=0.01)
+        chronological = objective(data, 'chronological')
+        assert chronological <= objective(data, 'intra_inter') <= chronological * 1.01
+
+    def test_unknown_formulation(self, objective, storage_dataset):
+        with pytest.raises(ValueError):
+            objective(storage_dataset(), 'hourly')
+
+
+def test_intra_inter_variables(storage_dataset):
+    pytest.importorskip("linopy")
+    from energyscope.linopy_backend.core_model_xarray import build_core_model_xarray
+    from energyscope.linopy_backend.data_loader_xarray import create_full_dataset_xarray
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = build_core_model_xarray(create_full_dataset_xarray(storage_dataset()), storage_formulation='intra_inter')
+
+    # Levels over (hour, typical day) and days instead of periods
+    assert 'Storage_level' not in model.variables
+    assert dict(model.variables['Storage_level_intra'].labels.sizes) == {'storage': 1, 'hour': 2, 'td': 2}
+    assert dict(model.variables['Storage_level_inter'].labels.sizes) == {'storage': 1, 'day': 3}
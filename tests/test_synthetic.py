@@ -0,0 +1,79 @@
+"""
+Tests for the synthetic ESTD-shaped dataset generator.
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from energyscope.synthetic import create_synthetic_dataset
+
+SIZES = dict(n_technologies=12, n_storage=3, n_layers=6, n_resources=5, n_typical_days=3, n_periods=24 * 10)
+
+
+class TestSyntheticDataset:
+    """Test suite for create_synthetic_dataset."""
+
+    def test_sizes(self):
+        data = create_synthetic_dataset(**SIZES)
+        sets, parameters = data['sets'], data['parameters']
+
+        assert len(sets['TECHNOLOGIES']) == 15 and sets['STORAGE_TECH'] == ['STO_001', 'STO_002', 'STO_003']
+        assert (len(sets['LAYERS']), len(sets['RESOURCES']), len(sets['TYPICAL_DAYS'])) == (6, 5, 3)
+        assert len(sets['PERIODS']) == 240
+        # Every typical day represents at least one day
+        assert set(td for _, _, td in sets['T_H_TD']) == {1, 2, 3}
+        assert parameters['total_time'] == 240
+        # Demand profiles sum to 1 over the year
+        days = pd.Series([td for _, h, td in sets['T_H_TD'] if h == 1]).value_counts()
+        profile = parameters['electricity_time_series']
+        assert sum(profile[h, td] * days[td] for h, td in profile.index) == pytest.approx(1.0)
+        assert len(parameters['c_p_t']) == 15 * 24 * 3
+
+    def test_layers_in_out(self):
+        sparse = create_synthetic_dataset(**SIZES, layers_in_out_density=0.0)['parameters']['layers_in_out']
+        dense = create_synthetic_dataset(**SIZES, layers_in_out_density=1.0)['parameters']['layers_in_out']
+
+        # One output per technology, and at least one input for non-renewables
+        outputs = (sparse > 0).groupby(level=0).sum()
+        assert (outputs == 1).all()
+        assert (dense < 0).sum() > (sparse < 0).sum()
+
+    def test_seed(self):
+        first, second = create_synthetic_dataset(**SIZES), create_synthetic_dataset(**SIZES)
+        assert first['parameters']['layers_in_out'].equals(second['parameters']['layers_in_out'])
+        other = create_synthetic_dataset(**SIZES, seed=1)
+        assert not np.allclose(other['parameters']['c_inv'], first['parameters']['c_inv'])
+
+    def test_invalid_sizes(self):
+        with pytest.raises(ValueError):
+            create_synthetic_dataset(n_layers=1)
+        with pytest.raises(ValueError):
+            create_synthetic_dataset(n_typical_days=12, n_periods=24 * 10)
+
+    @pytest.mark.parametrize('seed', [0, 1, 2])
+    def test_feasible_and_same_model_in_backends(self, seed):
+        pytest.importorskip("linopy")
+        pytest.importorskip("highspy")
+        from energyscope.highs_backend import build_core_model_highs
+        from energyscope.linopy_backend.core_model_xarray import build_core_model_xarray
+        from energyscope.synthetic import create_synthetic_dataset_xarray
+
+        model = build_core_model_highs(create_synthetic_dataset(**SIZES, seed=seed), verbose=False)
+        model.solve()
+        with contextlib.redirect_stdout(io.StringIO()):
+            m = build_core_model_xarray(create_synthetic_dataset_xarray(**SIZES, seed=seed))
+        m.solve(solver_name='highs', output_flag=False)
+
+        assert m.termination_condition == 'optimal'
+        assert model.objective == pytest.approx(m.objective.value)
+        assert (model.n_cols, model.n_rows) == (m.nvars, m.ncons)
+
+    def test_pyoptinterface(self):
+        poi_backend = pytest.importorskip("energyscope.pyoptinterface_backend")
+        result = poi_backend.build_full_model(create_synthetic_dataset(**SIZES), solver='highs', verbose=False,
+                                              enable_output=False)
+        assert result['objective'] > 0
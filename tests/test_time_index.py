@@ -0,0 +1,51 @@
+"""
+Tests for the period <-> (hour, typical day) mapping.
+"""
+
+import pytest
+
+from energyscope.time_index import TimeIndex
+
+
+@pytest.fixture
+def time_index():
+    # Three days of two hours, mapped to two typical days (1, 2, 1); periods given out of order
+    t_h_td = [(t, (t - 1) % 2 + 1, (1, 2, 1)[(t - 1) // 2]) for t in (6, 1, 2, 3, 4, 5)]
+    return TimeIndex(t_h_td, hours=[1, 2], typical_days=[1, 2])
+
+
+class TestTimeIndex:
+    """Test suite for TimeIndex."""
+
+    def test_period_to_hour_td(self, time_index):
+        assert list(time_index.periods) == [1, 2, 3, 4, 5, 6]
+        assert time_index.hour_td(4) == (2, 2)
+        assert list(time_index.htd_pos) == [0, 2, 1, 3, 0, 2]
+
+    def test_previous_is_cyclic(self, time_index):
+        assert time_index.previous_period(1) == 6
+        assert time_index.previous_period(4) == 3
+        assert [t_prev for _, _, _, t_prev in time_index.iter_periods()] == [6, 1, 2, 3, 4, 5]
+
+    def test_hour_td_to_periods(self, time_index):
+        assert list(time_index.periods_of(1, 1)) == [1, 5]
+        assert list(time_index.periods_of(2, 2)) == [4]
+        assert time_index.period_counts().tolist() == [[2, 1], [2, 1]]
+        assert list(time_index.td_count) == [2, 1]
+
+    def test_incidence(self, time_index):
+        incidence = time_index.incidence()
+        assert incidence.shape == (6, 4)
+        assert list(incidence.indices) == list(time_index.htd_pos)
+        # Values per (hour, td) -> values per period, and column sums = period counts
+        assert list(incidence @ [10, 20, 30, 40]) == [10, 30, 20, 40, 10, 30]
+        assert incidence.sum(axis=0).A1.tolist() == time_index.period_counts().ravel().tolist()
+
+    def test_days(self, time_index):
+        assert list(time_index.day_td_pos()) == [0, 1, 0]
+        with pytest.raises(ValueError):
+            TimeIndex([(1, 1, 1), (2, 2, 2)], hours=[1, 2], typical_days=[1, 2]).day_td_pos()
+
+    def test_unknown_typical_day(self):
+        with pytest.raises(ValueError):
+            TimeIndex([(1, 1, 3)], hours=[1], typical_days=[1, 2])